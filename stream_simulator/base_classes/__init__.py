@@ -3,12 +3,22 @@ This module contains the base classes for the Stream Simulator.
 It provides the following classes:
     BaseThing: A class that represents a basic thing in the simulator.
     BasicSensor: A class that represents a basic sensor in the simulator.
+    StartBarrier: The process-wide barrier that starts all controllers together.
+    Scheduler: The process-wide timer scheduler driving the long running actions.
+    StepAutomation: The step program of an automated device, run on the Scheduler.
+    MockSignals: The vectorized bank of the mock sensor signals.
 """
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 
 from __future__ import absolute_import
 
+from .start_barrier import StartBarrier
+from .scheduler import Scheduler
+from .step_automation import StepAutomation
+from .mock_signals import MockSignals
+from .change_publisher import ChangePublisher
+from .kinematics_state import KinematicsState
 from .base_thing import BaseThing
 from .basic_sensor import BasicSensor
 from .base_actor import BaseActor
\ No newline at end of file
@@ -8,10 +8,11 @@ import logging
 import threading
 import time
 import abc
+import copy
 import math
 from commlib.msg import PubSubMessage
 
-from stream_simulator.base_classes import BaseThing
+from stream_simulator.base_classes import BaseThing, StepAutomation
 
 class PositionMsg(PubSubMessage):
     """
@@ -70,7 +71,7 @@ class BaseActor(BaseThing):
         super().__init__(_name, auto_start=False)
         self.precision_mode = precision_mode
 
-        id_ = BaseThing.id
+        id_ = self.thing_id
 
         info = {
             "type": _type,
@@ -91,6 +92,11 @@ class BaseActor(BaseThing):
         self._x = self.pose['x'] * self.resolution
         self._y = self.pose['y'] * self.resolution
         self._theta = self.pose['theta']
+        # The initial pose, route and properties, restored by reset
+        self.initial_pose = (self._x, self._y, self._theta)
+        self.initial_points = None
+        self.initial_properties = copy.deepcopy(_properties)
+        self.route_reset = False
 
         self.set_tf_communication(package)
 
@@ -102,7 +108,7 @@ class BaseActor(BaseThing):
         self.state_automation_terminated = True
         self.pose_publishing_terminated = True
         self.automation_thread = None
-        self.state_automation_thread = None
+        self.state_automation = None
         self.velocities_for_target = None
         self.pois_index = None
         self.resolution = package['resolution']
@@ -127,7 +133,7 @@ class BaseActor(BaseThing):
             "automation_state": True if ('automation' in conf and "steps" in conf['automation']) else False
         }
 
-        self.tf_declare_rpc.call(tf_package)
+        self.declare_tf(tf_package)
 
         # Motion pose publisher
         topic = namespace + f".actor.{_type.lower()}." + self.name + ".pose.internal"
@@ -173,18 +179,26 @@ class BaseActor(BaseThing):
                 self._x = self.pose['x'] * self.resolution
                 self._y = self.pose['y'] * self.resolution
                 self._theta = 0
+                self.initial_pose = (self._x, self._y, self._theta)
+                self.initial_points = copy.deepcopy(self.automation['points'])
                 self.dt = 0.5 if self.precision_mode is False else 0.01
                 self.target_to_reach = None
 
-                self.terminated = False
-                self.automation_thread = threading.Thread(target = self.automation_thread_loop)
-                self.automation_thread.start()
+                crowd = package.get('crowd') if _type == "HUMAN" else None
+                if crowd is not None:
+                    # The crowd walks all the humans together, in one thread
+                    crowd.add(self)
+                else:
+                    self.terminated = False
+                    self.automation_thread = \
+                        threading.Thread(target = self.automation_thread_loop)
+                    self.automation_thread.start()
             if 'steps' in self.automation and len(self.automation['steps']) > 0: # we have state machine
                 self.logger.critical("Human %s is automated with state machine", self.name)
                 self.state_automation_terminated = False
-                self.state_automation_thread = \
-                    threading.Thread(target = self.state_automation_thread_loop)
-                self.state_automation_thread.start()
+                self.state_automation = StepAutomation(self.name, self.automation, \
+                    self.update_class_state_variables, on_end = self.state_automation_end)
+                self.state_automation.start()
         else:
             # Create a thread that dispatches the pose every 1 second
             self.pose_publishing_terminated = False
@@ -211,49 +225,11 @@ class BaseActor(BaseThing):
         """
         return self.logger
 
-    def state_automation_thread_loop(self):
+    def state_automation_end(self):
         """
-        Manages the automation loop for the relay device.
-        This method runs in a separate thread and controls the relay based on the 
-        predefined automation steps. It supports reversing the steps and looping 
-        through them based on the configuration.
+        Called when the state machine of the actor ends or is stopped.
         """
-        self.logger.warning("%s state automation starts", self.name)
-        self.stopped = False
-        automation_steps = self.automation["steps"]
-        step_index = -1
-        reverse_mode = False
-        while self.active:
-            step_index += 1
-            if step_index >= len(automation_steps):
-                if self.automation["reverse"] and reverse_mode is False:
-                    automation_steps.reverse()
-                    step_index = 1
-                    reverse_mode = True
-                elif self.automation["reverse"] and reverse_mode is True:
-                    if self.automation["loop"]:
-                        automation_steps.reverse()
-                        step_index = 1
-                        reverse_mode = False
-                    else:
-                        self.active = False
-                        break
-                elif self.automation["reverse"] is False and self.automation["loop"]:
-                    step_index = 0
-                else:
-                    self.active = False
-                    break
-            step = automation_steps[step_index]
-
-            self.update_class_state_variables(step)
-
-            sleep = step['duration']
-            while sleep > 0 and self.active: # to be preemptable
-                time.sleep(0.1)
-                sleep -= 0.1
-
         self.state_automation_terminated = True
-        self.logger.warning("Light %s automation stops", self.name)
 
     @abc.abstractmethod
     def update_class_state_variables(self, step):
@@ -282,6 +258,14 @@ class BaseActor(BaseThing):
         logging_counter = 0
         self.pois_index = -1
         while self.stopped is False:
+            if self.route_reset:
+                # The route starts over from the initial pose
+                self.route_reset = False
+                self.restore_route()
+                has_target = False
+                reverse_mode = False
+                t = time.time()
+
             # update time interval
             dt = time.time() - t
             t = time.time()
@@ -383,7 +367,45 @@ class BaseActor(BaseThing):
         self.logger.critical("Stopped %s simulation thread", self.name)
         self.terminated = True
 
-    def dispatch_pose_local(self):
+    def restore_route(self):
+        """
+        Puts the actor back at its initial pose, before the first point of its route.
+        """
+        if self.initial_points is not None:
+            self.automation['points'][:] = copy.deepcopy(self.initial_points)
+            self.pois_index = -1
+            self.target_to_reach = None
+        self._x, self._y, self._theta = self.initial_pose
+        self.dispatch_pose_local(teleport = True)
+
+    def reset(self):
+        """
+        Restores the initial pose and properties of the actor, for the in-place reset of
+        the simulation. The automated route and state program start over.
+        """
+        if self.automation_thread is not None and self.initial_points is not None:
+            if self.terminated and self.active:
+                # The route had ended, it is walked again by a new thread
+                self.restore_route()
+                self.stopped = False
+                self.terminated = False
+                self.automation_thread = \
+                    threading.Thread(target = self.automation_thread_loop)
+                self.automation_thread.start()
+            else:
+                # Picked up by the automation thread, between two steps
+                self.route_reset = True
+        else:
+            # Not automated, or walked by the crowd which restores it on its own
+            self.restore_route()
+        if self.state_automation is not None:
+            if self.initial_properties is not None:
+                self.update_class_state_variables( \
+                    {'state': copy.deepcopy(self.initial_properties)})
+            self.state_automation_terminated = False
+            self.state_automation.restart()
+
+    def dispatch_pose_local(self, teleport = False):
         """
         Publishes the robot's current pose to the internal_pose_pub topic.
 
@@ -394,6 +416,10 @@ class BaseActor(BaseThing):
         - resolution: The resolution of the robot's position data.
         - name: The name of the robot.
 
+        Args:
+            teleport (bool): Whether the actor was moved at once, so that the jump is not
+                swept for collisions.
+
         Returns:
             None
         """
@@ -405,9 +431,15 @@ class BaseActor(BaseThing):
             "name": self.name, # is this needed?
             "raw_name": self.name,
         }
+        if teleport:
+            msg["teleport"] = True
         self.internal_pose_pub.publish(msg)
+        self.publish_pose()
 
-        # Publish a more generic PoseMessage
+    def publish_pose(self):
+        """
+        Publishes the actor's current pose as a generic PoseMsg, to the pose_pub topic.
+        """
         pose = PoseMsg(
             position=PositionMsg(x=self._x, y=self._y, z=0.0),
             orientation=RPYOrientationMsg(roll=0.0, pitch=0.0, yaw=self._theta)
@@ -475,6 +507,8 @@ class BaseActor(BaseThing):
         self.logger.warning("%s Trying to stop thread", self.name)
         self.stopped = True
         self.active = False
+        if self.state_automation is not None:
+            self.state_automation.stop()
         while not self.terminated and not self.state_automation_terminated and not self.pose_publishing_terminated:
             time.sleep(0.1)
         self.logger.warning("%s Human thread stopped", self.name)
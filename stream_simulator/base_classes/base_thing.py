@@ -5,9 +5,13 @@ File that contains the BaseThing class.
 # -*- coding: utf-8 -*-
 
 import logging
+import threading
 
 from stream_simulator.connectivity import CommlibFactory
 
+from .start_barrier import StartBarrier
+from .change_publisher import ChangePublisher
+
 class BaseThing:
     """
     Base class for things in the stream simulator.
@@ -16,12 +20,17 @@ class BaseThing:
         id (int): The ID of the thing.
         commlib_factory (CommlibFactory): The communication library factory.
         tf_declare_rpc (RPCClient): The RPC client for the tf_declare_rpc_topic.
+        tf_batch_declare (bool): Whether the TF declaration is submitted by the owner
+            (World / Robot) in a batch, instead of being declared directly.
+        tf_declaration (dict): The TF declaration, kept for the owner when batching.
         tf_affection_rpc (RPCClient): The RPC client for the tf_affection_rpc_topic.
-        publisher (Publisher): The publisher for publishing data.
+        publisher (Publisher): The publisher for publishing data, a ChangePublisher if
+            the configuration sets publish_on_change.
         publisher_triggers (Publisher): The publisher for publishing triggers.
     """
 
     id = 0
+    _id_lock = threading.Lock()
 
     def __init__(self, _name, auto_start=True):
         """
@@ -30,13 +39,18 @@ class BaseThing:
         Args:
             _name (str): The name of the thing.
         """
-        BaseThing.id += 1
+        # Things may be constructed in parallel
+        with BaseThing._id_lock:
+            BaseThing.id += 1
+            self.thing_id = BaseThing.id
 
         self.commlib_factory = None
         self.name = _name
         self.base_topic = None
         self.namespace = None
         self.tf_declare_rpc = None
+        self.tf_batch_declare = False
+        self.tf_declaration = None
         self.tf_affection_rpc = None
         self.tf_distance_calculator_rpc = None
         self.publisher = None
@@ -72,6 +86,9 @@ class BaseThing:
         }
 
         self.tf_declare_pub = None
+        # Set by the things with goals or with an automation program
+        self.goal_queue = None
+        self.automation_program = None
 
         self.commlib_factory = CommlibFactory(node_name=self.name)
         if auto_start:
@@ -211,12 +228,22 @@ class BaseThing:
 
     def simulation_started_cb(self, _):
         """
-        Callback function for the simulation_started topic.
+        Callback function for the simulation_started topic. The simulator signals
+        the start barrier in-process; this covers a start triggered remotely.
 
         Args:
             msg (str): The message received on the topic.
         """
         self.simulator_started = True
+        StartBarrier.signal(self.namespace)
+
+    def wait_simulation_started(self):
+        """
+        Blocks until the simulation starts, i.e. until the start barrier of the
+        namespace is signaled.
+        """
+        StartBarrier.event(self.namespace).wait()
+        self.simulator_started = True
 
     def set_tf_communication(self, package):
         """
@@ -225,14 +252,30 @@ class BaseThing:
         Args:
             package (dict): The package containing the TF communication details.
         """
-        self.tf_declare_rpc = self.commlib_factory.get_rpc_client(
-            rpc_name=package["tf_declare_rpc_topic"]
-        )
+        self.tf_batch_declare = package.get("tf_batch_declare", False)
+        if not self.tf_batch_declare:
+            self.tf_declare_rpc = self.commlib_factory.get_rpc_client(
+                rpc_name=package["tf_declare_rpc_topic"]
+            )
 
         self.tf_affection_rpc = self.commlib_factory.get_rpc_client(
             rpc_name=package["tf_affection_rpc_topic"]
         )
 
+    def declare_tf(self, tf_package):
+        """
+        Declares the thing to the TF controller. If the owner batches the declarations,
+        the declaration is only kept, and the owner submits it along with the rest in
+        a single `declare_batch` call.
+
+        Args:
+            tf_package (dict): The TF declaration of the thing.
+        """
+        if self.tf_batch_declare:
+            self.tf_declaration = tf_package
+        else:
+            self.tf_declare_rpc.call(tf_package)
+
     def set_tf_distance_calculator_rpc(self, package):
         """
         Sets the TensorFlow distance calculator RPC client.
@@ -257,8 +300,22 @@ class BaseThing:
         Args:
             base_topic (str): The base topic for the data publisher.
         """
-        self.publisher = self.commlib_factory.get_publisher(
-            topic=base_topic + ".data"
+        self.publisher = self.get_data_publisher(base_topic + ".data", self.conf)
+
+    def get_data_publisher(self, topic, conf):
+        """
+        Creates a data publisher, which publishes only the changed values if the
+        configuration sets publish_on_change.
+
+        Args:
+            topic (str): The topic of the data.
+            conf (dict): The configuration of the thing, may be None.
+
+        Returns:
+            Publisher: The publisher.
+        """
+        return ChangePublisher.from_conf(
+            self.commlib_factory.get_publisher(topic=topic), conf
         )
 
     def set_state_publisher(self, base_topic):
@@ -326,6 +383,17 @@ class BaseThing:
                 rpc_name=base_topic + ".get"
             )
 
+    def reset(self):
+        """
+        Restores the initial state of the thing, for the in-place reset of the
+        simulation. The goals of the thing are cancelled and its automation program
+        starts over. The things with a state of their own restore it on top.
+        """
+        if self.goal_queue is not None:
+            self.goal_queue.cancel_all()
+        if self.automation_program is not None:
+            self.automation_program.restart()
+
     def stop(self):
         """
         Stops the communication for the thing.
@@ -6,13 +6,11 @@ File that contains the BasicSensor class.
 # -*- coding: utf-8 -*-
 
 import time
-import math
 import logging
 import threading
-import random
 import abc
 
-from stream_simulator.base_classes import BaseThing
+from stream_simulator.base_classes import BaseThing, MockSignals
 
 class BasicSensor(BaseThing):
     """
@@ -30,9 +28,8 @@ class BasicSensor(BaseThing):
         place (str): Location of the sensor.
         pose (dict): Pose information of the sensor.
         derp_data_key (str): Key for raw data communication.
-        prev (float): Previous value for certain operations.
-        way (int): Direction for the triangle operation.
-        sensor_read_thread (threading.Thread): Thread for reading sensor data.
+        sensor_read_thread (threading.Thread): Thread for reading simulated sensor data.
+        signal (int): The id of the mock signal of the sensor in the shared MockSignals.
     Methods:
         __init__(conf, package, _type, _category, _class, _subclass):
             Initializes the BasicSensor with the given configuration and package.
@@ -41,7 +38,9 @@ class BasicSensor(BaseThing):
         set_mode_callback(message):
             Callback to set the mode and parameters of the sensor.
         sensor_read():
-            Reads sensor data based on the current mode and operation.
+            Reads simulated sensor data.
+        start_reading():
+            Starts the mock signal or the sensor read thread.
         get_simulation_value():
             Abstract method to get the simulation value for the sensor.
         enable_callback(message):
@@ -114,7 +113,7 @@ class BasicSensor(BaseThing):
         self.pose = info["conf"]["pose"]
         self.derp_data_key = info["base_topic"] + ".raw"
 
-        self.mock_parameters = {}
+        self.signal = None
 
         # Communication
         self.set_data_publisher(self.base_topic)
@@ -126,14 +125,6 @@ class BasicSensor(BaseThing):
                 raise Exception( # pylint: disable=broad-exception-raised
                     f"Operation parameters missing from {self.name}: {self.operation}")
 
-            if self.operation == "triangle":
-                self.prev = self.operation_parameters["triangle"]['min']
-                self.way = 1
-            elif self.operation == "sinus":
-                self.prev = 0
-            else:
-                self.prev = None
-
         self.sensor_read_thread = None
         self.stopped = False
         self.state = conf['state'] if 'state' in conf else 'on'
@@ -167,117 +158,75 @@ class BasicSensor(BaseThing):
         Returns:
         dict: An empty dictionary.
         Behavior:
-        - If the mode is "triangle", sets self.prev to the minimum value of the 
-            "triangle" operation parameters and self.way to 1.
-        - If the mode is "sinus", sets self.prev to 0.
-        - For any other mode, sets self.prev to None.
         - Updates self.operation to the provided mode.
+        - Restarts the mock signal of the sensor with the new operation, the
+            triangles from their min and the sinuses from phase 0.
         """
-        if message["mode"] == "triangle":
-            self.prev = self.operation_parameters["triangle"]['min']
-            self.way = 1
-        elif message["mode"] == "sinus":
-            self.prev = 0
-        else:
-            self.prev = None
-
         self.operation = message["mode"]
+        if self.signal is not None:
+            MockSignals.shared().set_operation(
+                self.signal, self.operation, self.operation_parameters[self.operation])
         return {}
 
     def sensor_read(self):
         """
-        Reads sensor data based on the specified operation mode and parameters, and 
-        publishes the value at a specified frequency.
-        The method supports different operation modes such as "mock" and "simulation". 
-        In "mock" mode, it generates values based on predefined operations like "constant", 
-        "random", "normal", "triangle", and "sinus". In "simulation" mode, it retrieves 
-        values from a simulation function.
-        The method logs the start of the sensor read thread and any missing operation 
-        parameters. It continuously reads and publishes sensor values while the sensor is 
-        enabled.
-        Raises:
-            Exception: If there are missing operation parameters.
-        Operations:
-            - constant: Publishes a constant value.
-            - random: Publishes a random value within a specified range.
-            - normal: Publishes a value based on a normal distribution.
-            - triangle: Publishes a value that oscillates in a triangular wave pattern.
-            - sinus: Publishes a value based on a sinusoidal wave pattern.
+        Reads the simulated values of the sensor and publishes them at its frequency,
+        while the sensor is enabled. The mock values are published from the shared
+        MockSignals instead, see start_reading.
         Logs:
-            - Info: Start of the sensor read thread and published values.
-            - Warning: Missing operation parameters or unsupported operations.
+            - Info: Start of the sensor read thread.
         Publishes:
             - A dictionary containing the sensor value and the current timestamp.
         """
         self.logger.info("Sensor %s read thread started", self.name)
-        # Operation parameters
-
-        if self.mode == "mock":
-            try:
-                self.mock_parameters = {
-                    "constant_value": self.operation_parameters["constant"]['value'],
-                    "random_min": self.operation_parameters["random"]['min'],
-                    "random_max": self.operation_parameters["random"]['max'],
-                    "triangle_min": self.operation_parameters["triangle"]['min'],
-                    "triangle_max": self.operation_parameters["triangle"]['max'],
-                    "triangle_step": self.operation_parameters["triangle"]['step'],
-                    "normal_std": self.operation_parameters["normal"]['std'],
-                    "normal_mean": self.operation_parameters["normal"]['mean'],
-                    "sinus_dc": self.operation_parameters["sinus"]['dc'],
-                    "sinus_amp": self.operation_parameters["sinus"]['amplitude'],
-                    "sinus_step": self.operation_parameters["sinus"]['step']
-                }
-            except Exception as e: # pylint: disable=broad-exception-caught
-                self.logger.warning(
-                    "Missing operation parameters for %s: %s. Change operation with caution!", 
-                    self.name, str(e))
 
         while self.info["enabled"]:
             time.sleep(1.0 / self.hz)
-            # print("Sensor read", self.state)
-
-            if self.state is None or self.state == "off":
-                continue
-
             val = None
-            if self.mode in ["mock"]:
-                if self.operation == "constant":
-                    val = self.mock_parameters['constant_value']
-                elif self.operation == "random":
-                    val = random.uniform(
-                        self.mock_parameters['random_min'],
-                        self.mock_parameters['random_max']
-                    )
-                elif self.operation == "normal":
-                    val = random.gauss(
-                        self.mock_parameters['normal_mean'],
-                        self.mock_parameters['normal_std']
-                    )
-                elif self.operation == "triangle":
-                    val = self.prev + self.way * self.mock_parameters['triangle_step']
-                    if val >= self.mock_parameters['triangle_max'] or \
-                        val <= self.mock_parameters['triangle_min']:
-                        self.way *= -1
-                    self.prev = val
-                elif self.operation == "sinus":
-                    val = self.mock_parameters['sinus_dc'] + \
-                        self.mock_parameters['sinus_amp'] * math.sin(self.prev)
-                    self.prev += self.mock_parameters['sinus_step']
-                else:
-                    self.logger.warning("Unsupported operation: %s", self.operation)
-
-                # Add noise:
-                val += random.gauss(0, 0.1)
-            elif self.mode == "simulation":
+            if self.mode == "simulation":
                 val = self.get_simulation_value()
+            self.publish_value(val)
 
-            self.publisher.publish({
-                "value": val,
-                "timestamp": time.time()
-            })
+        self.stopped = True
+
+    def start_reading(self):
+        """
+        Starts producing the values of the sensor: the mock values come from the shared
+        MockSignals, with a gaussian noise, the simulated ones from the sensor read thread.
+        """
+        if self.mode == "mock":
+            if self.signal is None:
+                self.stopped = False
+                self.signal = MockSignals.shared().add(
+                    self.operation, self.operation_parameters[self.operation], self.hz, \
+                    self.publish_value, noise = 0.1)
+            return
+        self.sensor_read_thread = threading.Thread(target = self.sensor_read)
+        self.sensor_read_thread.start()
 
+    def stop_mock_signal(self):
+        """
+        Stops the mock values of the sensor.
+        """
+        if self.signal is not None:
+            MockSignals.shared().remove(self.signal)
+            self.signal = None
         self.stopped = True
 
+    def publish_value(self, value):
+        """
+        Publishes a value of the sensor, unless the sensor is off.
+
+        Args:
+            value (float): The value.
+        """
+        if self.state is None or self.state == "off":
+            return
+        self.publisher.publish({
+            "value": value,
+            "timestamp": time.time()
+        })
+
     @abc.abstractmethod
     def get_simulation_value(self):
         """
@@ -300,10 +249,7 @@ class BasicSensor(BaseThing):
             the key "enabled" set to True.
         """
         self.info["enabled"] = True
-
-        self.sensor_read_thread = threading.Thread(target = self.sensor_read)
-        self.sensor_read_thread.start()
-
+        self.start_reading()
         return {"enabled": True}
 
     def disable_callback(self, _):
@@ -317,6 +263,8 @@ class BasicSensor(BaseThing):
             dict: A dictionary with the key "enabled" set to False.
         """
         self.info["enabled"] = False
+        if self.mode == "mock":
+            self.stop_mock_signal()
         return {"enabled": False}
 
     def start(self):
@@ -334,12 +282,10 @@ class BasicSensor(BaseThing):
                          whether the sensor is enabled.
         """
         self.logger.info("Sensor %s waiting to start", self.name)
-        while not self.simulator_started:
-            time.sleep(1)
+        self.wait_simulation_started()
 
         if self.info["enabled"]:
-            self.sensor_read_thread = threading.Thread(target = self.sensor_read)
-            self.sensor_read_thread.start()
+            self.start_reading()
 
         self.logger.info("Sensor %s started", self.name)
 
@@ -355,6 +301,8 @@ class BasicSensor(BaseThing):
         """
         self.logger.warning("Stopping sensor %s", self.name)
         self.info["enabled"] = False
+        if self.mode == "mock":
+            self.stop_mock_signal()
         while not self.stopped:
             time.sleep(0.1)
         self.logger.warning("Sensor %s stopped", self.name)
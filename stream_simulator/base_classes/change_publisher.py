@@ -0,0 +1,117 @@
+"""
+File that contains the ChangePublisher class.
+"""
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import time
+import threading
+
+class ChangePublisher:
+    """
+    Wraps the data publisher of a device, so that a message is published only when
+    it differs from the last published one, or when the heartbeat interval expired.
+
+    Two messages differ if any of their numeric values changed by more than the
+    deadband, or any of their other values changed at all. The timestamps are not
+    compared. The devices enable it in their configuration:
+
+        publish_on_change:
+            deadband: 0.05 # in the units of the values, 0 by default
+            heartbeat: 5 # in seconds, 1 by default
+
+    Attributes:
+        publisher (Publisher): The wrapped publisher.
+        deadband (float): The largest change of a numeric value that is suppressed.
+        heartbeat (float): The longest interval without publishing, in seconds.
+        last (dict): The last published message.
+        last_time (float): The time (time.time()) the last message was published.
+        published (int): The number of messages published.
+        suppressed (int): The number of messages suppressed.
+    """
+    HEARTBEAT = 1.0
+    IGNORED = ("timestamp",)
+
+    def __init__(self, publisher, deadband = 0.0, heartbeat = HEARTBEAT):
+        self.publisher = publisher
+        self.deadband = float(deadband)
+        self.heartbeat = float(heartbeat)
+        self.last = None
+        self.last_time = 0
+        self.published = 0
+        self.suppressed = 0
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_conf(cls, publisher, conf):
+        """
+        Wraps a publisher if the configuration of its device enables it.
+
+        Args:
+            publisher (Publisher): The data publisher of the device.
+            conf (dict): The configuration of the device, may be None.
+
+        Returns:
+            Publisher: The wrapped publisher, or the publisher itself.
+        """
+        options = None if conf is None else conf.get("publish_on_change", False)
+        if options is None or options is False:
+            return publisher
+        if options is True:
+            options = {}
+        return cls(
+            publisher,
+            deadband = options.get("deadband", 0.0),
+            heartbeat = options.get("heartbeat", cls.HEARTBEAT)
+        )
+
+    def changed(self, a, b):
+        """
+        Checks if two values differ by more than the deadband.
+
+        Args:
+            a: The new value.
+            b: The previous value.
+
+        Returns:
+            bool: True if they differ.
+        """
+        if isinstance(a, bool) or isinstance(b, bool):
+            return a != b
+        if isinstance(a, (int, float)) and isinstance(b, (int, float)):
+            return abs(a - b) > self.deadband
+        if isinstance(a, dict) and isinstance(b, dict):
+            if a.keys() != b.keys():
+                return True
+            return any(self.changed(a[k], b[k]) for k in a if k not in self.IGNORED)
+        if isinstance(a, (list, tuple)) and isinstance(b, (list, tuple)):
+            return len(a) != len(b) or any(self.changed(x, y) for x, y in zip(a, b))
+        return a != b
+
+    def publish(self, msg, *args, **kwargs):
+        """
+        Publishes a message if it changed or the heartbeat interval expired.
+
+        Args:
+            msg (dict): The message.
+
+        Returns:
+            bool: True if the message was published.
+        """
+        now = time.time()
+        with self.lock:
+            if self.last is not None and now - self.last_time < self.heartbeat and \
+                    not self.changed(msg, self.last):
+                self.suppressed += 1
+                return False
+            self.last = msg
+            self.last_time = now
+            self.published += 1
+        self.publisher.publish(msg, *args, **kwargs)
+        return True
+
+    def __getattr__(self, name):
+        # The rest of the interface is the one of the wrapped publisher
+        if name == "publisher":
+            raise AttributeError(name)
+        return getattr(self.publisher, name)
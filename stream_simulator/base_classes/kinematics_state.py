@@ -0,0 +1,106 @@
+"""
+File that contains the KinematicsState class.
+"""
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import math
+import threading
+import time
+
+class KinematicsState:
+    """
+    The motion of a robot, derived from the poses its kinematics loop integrates.
+
+    The loop records the pose it reached at every step, and the velocities and the
+    accelerations are the finite differences of the recorded poses. The sensors of
+    the robot (the IMU) read them whenever they sample, at any rate, without a pose
+    subscription of their own.
+
+    Attributes:
+        pose (tuple): (t, x, y, theta) of the last step, t is None before the first one.
+        velocity (tuple): The (vx, vy) velocity in the world frame, in m/s.
+        linear (float): The forward speed, in m/s.
+        angular (float): The angular velocity, in rad/s.
+        acceleration (tuple): The (forward, left) acceleration in the robot frame,
+            in m/s^2, the centripetal one included.
+    """
+    # The motion is considered stopped if the loop did not step for this long, in seconds
+    STALE = 1.0
+
+    def __init__(self, x = 0.0, y = 0.0, theta = 0.0):
+        self.lock = threading.Lock()
+        self.pose = (None, x, y, theta)
+        self.velocity = (0.0, 0.0)
+        self.linear = 0.0
+        self.angular = 0.0
+        self.acceleration = (0.0, 0.0)
+
+    def reset(self, x, y, theta):
+        """
+        Places the robot at a pose at rest, on teleports and resets.
+
+        Args:
+            x (float): The x coordinate, in meters.
+            y (float): The y coordinate, in meters.
+            theta (float): The orientation, in radians.
+        """
+        with self.lock:
+            self.pose = (None, x, y, theta)
+            self.velocity = (0.0, 0.0)
+            self.linear = 0.0
+            self.angular = 0.0
+            self.acceleration = (0.0, 0.0)
+
+    def record(self, t, x, y, theta):
+        """
+        Records the pose reached by a step of the kinematics loop.
+
+        Args:
+            t (float): The time (time.time()) of the step.
+            x (float): The x coordinate, in meters.
+            y (float): The y coordinate, in meters.
+            theta (float): The orientation, in radians.
+        """
+        with self.lock:
+            t0, x0, y0, theta0 = self.pose
+            self.pose = (t, x, y, theta)
+            if t0 is None or t <= t0:
+                return
+            dt = t - t0
+            # The velocity of a step is along its chord, at the mean heading
+            vx, vy = (x - x0) / dt, (y - y0) / dt
+            heading = (theta0 + theta) / 2
+            self.linear = vx * math.cos(heading) + vy * math.sin(heading)
+            # The velocities of two steps differ around the heading between them
+            ax = (vx - self.velocity[0]) / dt
+            ay = (vy - self.velocity[1]) / dt
+            c, s = math.cos(theta0), math.sin(theta0)
+            self.acceleration = (c * ax + s * ay, -s * ax + c * ay)
+            self.velocity = (vx, vy)
+            self.angular = (theta - theta0) / dt
+
+    def reading(self, now = None):
+        """
+        The motion of the robot, as an inertial sensor on it measures it.
+
+        Args:
+            now (float): The time (time.time()) of the reading.
+
+        Returns:
+            dict: The forward speed ("linear", m/s), the angular velocity ("angular",
+                rad/s), the (forward, left) "acceleration" (m/s^2) and the "theta"
+                (rad) of the robot.
+        """
+        now = time.time() if now is None else now
+        with self.lock:
+            t, _, _, theta = self.pose
+            if t is None or now - t > self.STALE:
+                return {"linear": 0.0, "angular": 0.0, "acceleration": (0.0, 0.0), \
+                    "theta": theta}
+            return {
+                "linear": self.linear,
+                "angular": self.angular,
+                "acceleration": self.acceleration,
+                "theta": theta,
+            }
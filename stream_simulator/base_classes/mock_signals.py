@@ -0,0 +1,256 @@
+"""
+File that contains the MockSignals class.
+"""
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import logging
+import threading
+import time
+
+import numpy as np
+
+from .scheduler import Scheduler
+
+class MockSignals:
+    """
+    A bank of mock signals, the values of the sensors and of the environment
+    properties in mock mode.
+
+    The operation, the parameters and the phase of every signal are kept in arrays,
+    and the next values of many signals are computed together in one vectorized call.
+    The signals with a rate are driven by the Scheduler: at every tick the values of
+    all the due signals are computed at once and handed to their callbacks, so the
+    mock sensors need no thread of their own.
+
+    The operations and their parameters are:
+        - constant: value
+        - random: min, max (uniform)
+        - normal: mean, std
+        - triangle: min, max, step (a ramp between min and max)
+        - sinus: dc, amplitude, step (the phase advances by step per value)
+
+    Attributes:
+        size (int): The number of slots in use, free ones included.
+        op (numpy.ndarray): The operation of every signal, an index of OPERATIONS.
+        params (numpy.ndarray): (n, 3) The parameters, in the order listed above.
+        prev (numpy.ndarray): The previous value of the triangles, the phase of the sinuses.
+        way (numpy.ndarray): The direction of the triangles, 1 or -1.
+        noise (numpy.ndarray): The standard deviation of the gaussian noise added.
+        jitter (numpy.ndarray): The half width of the uniform noise added.
+        period (numpy.ndarray): The period of the scheduled signals, inf otherwise.
+        due (numpy.ndarray): The time (time.time()) the next value is due, inf if not scheduled.
+        callbacks (list): The callback of every signal, called with its values.
+    """
+    OPERATIONS = ("constant", "random", "normal", "triangle", "sinus")
+    PARAMETERS = {
+        "constant": ("value",),
+        "random": ("min", "max"),
+        "normal": ("mean", "std"),
+        "triangle": ("min", "max", "step"),
+        "sinus": ("dc", "amplitude", "step"),
+    }
+    # The signals due within this time are computed in the same tick, in seconds
+    TOLERANCE = 0.002
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, capacity = 16):
+        self.logger = logging.getLogger(__name__)
+        self.lock = threading.Lock()
+        self.rng = np.random.default_rng()
+        self.size = 0
+        self.free = []
+        self.op = np.zeros(capacity, np.int8)
+        self.params = np.zeros((capacity, 3))
+        self.prev = np.zeros(capacity)
+        self.way = np.ones(capacity)
+        self.noise = np.zeros(capacity)
+        self.jitter = np.zeros(capacity)
+        self.period = np.full(capacity, np.inf)
+        self.due = np.full(capacity, np.inf)
+        self.callbacks = [None] * capacity
+        self.timer = None
+
+    @classmethod
+    def shared(cls):
+        """
+        Returns:
+            MockSignals: The bank of the mock sensors of the process.
+        """
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def _grow(self):
+        capacity = 2 * len(self.op)
+        extra = capacity - len(self.op)
+        self.op = np.concatenate([self.op, np.zeros(extra, np.int8)])
+        self.params = np.concatenate([self.params, np.zeros((extra, 3))])
+        self.prev = np.concatenate([self.prev, np.zeros(extra)])
+        self.way = np.concatenate([self.way, np.ones(extra)])
+        self.noise = np.concatenate([self.noise, np.zeros(extra)])
+        self.jitter = np.concatenate([self.jitter, np.zeros(extra)])
+        self.period = np.concatenate([self.period, np.full(extra, np.inf)])
+        self.due = np.concatenate([self.due, np.full(extra, np.inf)])
+        self.callbacks.extend([None] * extra)
+
+    def _set_operation(self, sid, operation, parameters):
+        if operation not in self.PARAMETERS:
+            raise ValueError(f"Unsupported operation: {operation}")
+        values = [float(parameters[key]) for key in self.PARAMETERS[operation]]
+        self.op[sid] = self.OPERATIONS.index(operation)
+        self.params[sid] = values + [0.0] * (3 - len(values))
+        # The triangles start from their min, the sinuses from phase 0
+        self.prev[sid] = values[0] if operation == "triangle" else 0.0
+        self.way[sid] = 1.0
+
+    def add(self, operation, parameters, hz = None, callback = None, noise = 0.0, \
+        jitter = 0.0):
+        """
+        Adds a signal.
+
+        Args:
+            operation (str): One of OPERATIONS.
+            parameters (dict): The parameters of the operation.
+            hz (float): The rate of the values, if they are handed to the callback.
+            callback (callable): Called with every value, from the Scheduler.
+            noise (float): The standard deviation of the gaussian noise added.
+            jitter (float): The half width of the uniform noise added.
+
+        Returns:
+            int: The id of the signal.
+
+        Raises:
+            ValueError: If the operation is not supported.
+            KeyError: If a parameter of the operation is missing.
+        """
+        with self.lock:
+            if self.free:
+                sid = self.free.pop()
+            else:
+                if self.size == len(self.op):
+                    self._grow()
+                sid = self.size
+                self.size += 1
+            try:
+                self._set_operation(sid, operation, parameters)
+            except (ValueError, KeyError):
+                self.free.append(sid)
+                raise
+            self.noise[sid] = noise
+            self.jitter[sid] = jitter
+            self.callbacks[sid] = callback
+            if hz is not None and callback is not None:
+                self.period[sid] = 1.0 / hz
+                self.due[sid] = time.time() + self.period[sid]
+                self._schedule()
+        return sid
+
+    def set_operation(self, sid, operation, parameters):
+        """
+        Changes the operation of a signal, which starts over.
+
+        Args:
+            sid (int): The id of the signal.
+            operation (str): One of OPERATIONS.
+            parameters (dict): The parameters of the operation.
+        """
+        with self.lock:
+            self._set_operation(sid, operation, parameters)
+
+    def remove(self, sid):
+        """
+        Removes a signal, no more values are handed to its callback.
+
+        Args:
+            sid (int): The id of the signal.
+        """
+        with self.lock:
+            self.period[sid] = np.inf
+            self.due[sid] = np.inf
+            self.callbacks[sid] = None
+            self.free.append(sid)
+
+    def values(self, ids):
+        """
+        Computes the next values of signals.
+
+        Args:
+            ids (list): The ids of the signals.
+
+        Returns:
+            numpy.ndarray: The values, in the order of the ids.
+        """
+        with self.lock:
+            return self._values(np.asarray(ids, dtype = int))
+
+    def _values(self, ids):
+        op = self.op[ids]
+        a, b, c = self.params[ids].T
+        val = np.empty(len(ids))
+
+        sel = op == 0
+        val[sel] = a[sel]
+        sel = op == 1
+        val[sel] = self.rng.uniform(a[sel], b[sel])
+        sel = op == 2
+        val[sel] = self.rng.normal(a[sel], b[sel])
+
+        sel = op == 3
+        if sel.any():
+            tri = ids[sel]
+            v = self.prev[tri] + self.way[tri] * c[sel]
+            bounce = (v >= b[sel]) | (v <= a[sel])
+            self.way[tri[bounce]] *= -1
+            self.prev[tri] = v
+            val[sel] = v
+
+        sel = op == 4
+        if sel.any():
+            sin = ids[sel]
+            val[sel] = a[sel] + b[sel] * np.sin(self.prev[sin])
+            self.prev[sin] += c[sel]
+
+        noise = self.noise[ids]
+        if noise.any():
+            val += self.rng.normal(0.0, 1.0, len(ids)) * noise
+        jitter = self.jitter[ids]
+        if jitter.any():
+            val += self.rng.uniform(-1.0, 1.0, len(ids)) * jitter
+        return val
+
+    def _schedule(self):
+        # Called with the lock held: keeps one timer, at the earliest due signal
+        if self.size == 0:
+            return
+        nxt = float(self.due[:self.size].min())
+        if nxt == np.inf:
+            return
+        if self.timer is not None:
+            if self.timer.when <= nxt:
+                return
+            self.timer.cancel()
+        self.timer = Scheduler.call_at(nxt, self._tick)
+
+    def _tick(self):
+        with self.lock:
+            self.timer = None
+            now = time.time()
+            ids = np.flatnonzero(self.due[:self.size] <= now + self.TOLERANCE)
+            vals = self._values(ids)
+            due = self.due[ids] + self.period[ids]
+            # A late signal is not caught up, its next value is a period away
+            late = due < now
+            due[late] = now + self.period[ids[late]]
+            self.due[ids] = due
+            callbacks = [self.callbacks[i] for i in ids.tolist()]
+            self._schedule()
+        for callback, val in zip(callbacks, vals.tolist()):
+            if callback is None:
+                continue
+            try:
+                callback(val)
+            except Exception as e: # pylint: disable=broad-except
+                self.logger.error("Mock signal callback %s failed: %s", callback, e)
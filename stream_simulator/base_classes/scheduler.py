@@ -0,0 +1,186 @@
+"""
+File that contains the Scheduler class.
+"""
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from stream_simulator.connectivity import CommlibFactory
+
+class Timer:
+    """
+    A callback scheduled on the Scheduler.
+
+    Attributes:
+        when (float): The time (time.time()) the callback is due.
+        callback (callable): The callback.
+        args (tuple): The arguments of the callback.
+        cancelled (bool): True if the timer was cancelled before firing.
+    """
+    def __init__(self, when, callback, args):
+        self.when = when
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        """
+        Cancels the timer. It has no effect if the callback already runs.
+        """
+        self.cancelled = True
+
+class Scheduler:
+    """
+    Process-wide timer scheduler of the simulation.
+
+    A single thread keeps the timers in a heap and hands the due callbacks to a small
+    shared worker pool, so that the long running actions of the controllers (speaking,
+    recording, moving for a while) are chains of short timed steps instead of a
+    thread each, sleeping until they are done. The callbacks must not block.
+
+    Attributes:
+        WORKERS (int): The size of the worker pool running the callbacks.
+        lock (threading.Condition): Protects the heap and wakes up the timer thread.
+        heap (list): (when, sequence, Timer) entries.
+        thread (threading.Thread): The timer thread, started with the first timer.
+        executor (ThreadPoolExecutor): The worker pool.
+    """
+    WORKERS = 4
+
+    lock = threading.Condition()
+    heap = []
+    counter = itertools.count()
+    thread = None
+    executor = None
+
+    @classmethod
+    def call_at(cls, when, callback, *args):
+        """
+        Schedules a callback at an absolute time.
+
+        Args:
+            when (float): The time (time.time()) to run the callback at.
+            callback (callable): The callback.
+            *args: The arguments of the callback.
+
+        Returns:
+            Timer: The timer, that can be cancelled.
+        """
+        timer = Timer(when, callback, args)
+        with cls.lock:
+            if cls.thread is None:
+                cls.executor = ThreadPoolExecutor(
+                    max_workers = cls.WORKERS, thread_name_prefix = "scheduler")
+                CommlibFactory.traffic.register_executor(cls.executor)
+                cls.thread = threading.Thread(target = cls._run, daemon = True)
+                cls.thread.start()
+            heapq.heappush(cls.heap, (when, next(cls.counter), timer))
+            if cls.heap[0][2] is timer:
+                cls.lock.notify()
+        return timer
+
+    @classmethod
+    def call_later(cls, delay, callback, *args):
+        """
+        Schedules a callback after a delay.
+
+        Args:
+            delay (float): The delay in seconds.
+            callback (callable): The callback.
+            *args: The arguments of the callback.
+
+        Returns:
+            Timer: The timer, that can be cancelled.
+        """
+        return cls.call_at(time.time() + max(0.0, delay), callback, *args)
+
+    @classmethod
+    def call_soon(cls, callback, *args):
+        """
+        Runs a callback in the worker pool as soon as possible.
+
+        Returns:
+            Timer: The timer, that can be cancelled.
+        """
+        return cls.call_at(0.0, callback, *args)
+
+    @classmethod
+    def run_goal(cls, goalh, times, step = None, result = None):
+        """
+        Drives a goal of a GoalQueue (see connectivity.scheduled_actions) without a thread:
+        calls step(i) at each of the times, then finishes the goal with the value of
+        result(). A cancellation skips the remaining steps and finishes the goal at once.
+
+        Args:
+            goalh (ScheduledGoalHandler): The goal.
+            times (list): The absolute times (time.time()) of the steps.
+            step (callable): Called with the index of the step.
+            result (callable): Returns the result of the goal, called once at the end.
+        """
+        lock = threading.Lock()
+        state = {"timer": None, "done": False}
+
+        def _finish():
+            with lock:
+                if state["done"]:
+                    return
+                state["done"] = True
+                if state["timer"] is not None:
+                    state["timer"].cancel()
+            goalh.finish(result() if result is not None else {})
+
+        def _step(i):
+            if goalh.cancel_event.is_set():
+                return
+            if step is not None:
+                step(i)
+            if i + 1 == len(times):
+                _finish()
+                return
+            with lock:
+                if not state["done"]:
+                    state["timer"] = cls.call_at(times[i + 1], _step, i + 1)
+
+        goalh.on_cancel = _finish
+        if len(times) == 0:
+            _finish()
+            return
+        with lock:
+            state["timer"] = cls.call_at(times[0], _step, 0)
+
+    @classmethod
+    def pending(cls):
+        """
+        Returns:
+            int: The number of timers waiting in the heap, cancelled ones included.
+        """
+        with cls.lock:
+            return len(cls.heap)
+
+    @classmethod
+    def _run(cls):
+        while True:
+            with cls.lock:
+                while not cls.heap or cls.heap[0][0] > time.time():
+                    timeout = cls.heap[0][0] - time.time() if cls.heap else None
+                    cls.lock.wait(timeout)
+                _, _, timer = heapq.heappop(cls.heap)
+            if not timer.cancelled:
+                cls.executor.submit(cls._fire, timer)
+
+    @staticmethod
+    def _fire(timer):
+        if timer.cancelled:
+            return
+        try:
+            timer.callback(*timer.args)
+        except Exception as e: # pylint: disable=broad-except
+            # The scheduler must survive the errors of the callbacks
+            logging.getLogger(__name__).error("Scheduled callback %s failed: %s", \
+                timer.callback, e, exc_info = True)
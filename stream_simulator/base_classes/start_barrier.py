@@ -0,0 +1,76 @@
+"""
+File that contains the StartBarrier class.
+"""
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import threading
+
+class StartBarrier:
+    """
+    Process-wide start barrier, one per simulation namespace.
+
+    Controllers registered before the simulation starts are kept pending, and all of
+    them are started together (each in its own thread) when the simulator signals the
+    barrier, instead of each one polling for the `simulation_started` message in a
+    thread of its own.
+
+    Attributes:
+        events (dict): Namespace -> threading.Event, set when the simulation starts.
+        pending (dict): Namespace -> list of callables to run when the simulation starts.
+    """
+    lock = threading.Lock()
+    events = {}
+    pending = {}
+
+    @classmethod
+    def event(cls, namespace):
+        """
+        Returns the start event of a namespace, creating it if needed.
+        """
+        with cls.lock:
+            return cls.events.setdefault(namespace, threading.Event())
+
+    @classmethod
+    def start_when_ready(cls, namespace, target):
+        """
+        Runs target in a new thread as soon as the simulation of the namespace starts
+        (immediately if it has already started).
+
+        Args:
+            namespace (str): The simulation namespace.
+            target (callable): Typically the start method of a controller.
+        """
+        with cls.lock:
+            event = cls.events.setdefault(namespace, threading.Event())
+            if not event.is_set():
+                cls.pending.setdefault(namespace, []).append(target)
+                return
+        threading.Thread(target = target).start()
+
+    @classmethod
+    def signal(cls, namespace):
+        """
+        Signals the start of the simulation of a namespace, releasing all the
+        pending controllers at once.
+
+        Returns:
+            int: The number of controllers released.
+        """
+        with cls.lock:
+            event = cls.events.setdefault(namespace, threading.Event())
+            event.set()
+            targets = cls.pending.pop(namespace, [])
+        for target in targets:
+            threading.Thread(target = target).start()
+        return len(targets)
+
+    @classmethod
+    def reset(cls, namespace):
+        """
+        Forgets the namespace, so that a new simulation with the same namespace
+        waits for a new signal.
+        """
+        with cls.lock:
+            cls.events.pop(namespace, None)
+            cls.pending.pop(namespace, None)
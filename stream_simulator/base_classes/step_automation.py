@@ -0,0 +1,137 @@
+"""
+File that contains the StepAutomation class.
+"""
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import logging
+import threading
+import time
+
+from .scheduler import Scheduler
+
+class StepAutomation:
+    """
+    The step program of an automated device or actor, run on the Scheduler.
+
+    Every step applies a state and holds it for its duration. The next step is due at
+    the boundary of the previous one (start time plus the durations so far), so the
+    program does not drift and needs no thread of its own. When the last step is
+    done, the steps are walked back if `reverse` is set (once, or forever with
+    `loop`), or started over if only `loop` is set.
+
+    Attributes:
+        name (str): The name of the device or actor, for logging.
+        steps (list): The steps, each one a dict with a 'duration' in seconds.
+        reverse (bool): Walk the steps back after the last one.
+        loop (bool): Repeat the program forever.
+        apply (callable): Called with each step when it starts.
+        on_end (callable): Called once when the program ends or is stopped.
+        index (int): The index of the current step.
+        due (float): The time (time.time()) the next step is due at.
+    """
+    def __init__(self, name, automation, apply, on_end = None):
+        self.logger = logging.getLogger(__name__)
+        self.name = name
+        # A copy, the steps are reversed in place
+        self.steps = list(automation.get("steps", []))
+        self.reverse = automation.get("reverse", False)
+        self.loop = automation.get("loop", False)
+        self.apply = apply
+        self.on_end = on_end
+        self.index = -1
+        self.reversed = False
+        self.due = None
+        self.timer = None
+        self.lock = threading.Lock()
+        self.active = False
+        # The steps scheduled before a restart are ignored
+        self.generation = 0
+
+    def start(self, when = None):
+        """
+        Starts the program.
+
+        Args:
+            when (float): The time (time.time()) of the first step, now by default.
+        """
+        with self.lock:
+            self.active = True
+            self.due = time.time() if when is None else when
+            self.timer = Scheduler.call_at(self.due, self._step, self.generation)
+        self.logger.warning("%s automation starts", self.name)
+
+    def restart(self, when = None):
+        """
+        Starts the program over from its first step, whether it runs or it ended.
+
+        Args:
+            when (float): The time (time.time()) of the first step, now by default.
+        """
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+            if self.reversed:
+                self.steps.reverse()
+                self.reversed = False
+            self.index = -1
+            self.generation += 1
+            self.active = True
+            self.due = time.time() if when is None else when
+            self.timer = Scheduler.call_at(self.due, self._step, self.generation)
+        self.logger.warning("%s automation starts over", self.name)
+
+    def _next(self):
+        """
+        Moves to the next step.
+
+        Returns:
+            dict: The step, or None if the program ended.
+        """
+        self.index += 1
+        if self.index >= len(self.steps):
+            if self.reverse and (not self.reversed or self.loop):
+                self.steps.reverse()
+                self.reversed = not self.reversed
+                # The last step is not repeated
+                self.index = min(1, len(self.steps) - 1)
+            elif self.loop and not self.reverse:
+                self.index = 0
+            else:
+                return None
+        return self.steps[self.index] if self.steps else None
+
+    def _step(self, generation):
+        with self.lock:
+            if not self.active or generation != self.generation:
+                return
+            step = self._next()
+            if step is None:
+                self.active = False
+            else:
+                self.due += step['duration']
+                self.timer = Scheduler.call_at(self.due, self._step, generation)
+        if step is None:
+            self._end()
+            return
+        try:
+            self.apply(step)
+        except Exception as e: # pylint: disable=broad-except
+            self.logger.error("%s automation step failed: %s", self.name, e)
+
+    def _end(self):
+        self.logger.warning("%s automation stops", self.name)
+        if self.on_end is not None:
+            self.on_end()
+
+    def stop(self):
+        """
+        Stops the program. The step being applied, if any, is completed.
+        """
+        with self.lock:
+            if not self.active:
+                return
+            self.active = False
+            if self.timer is not None:
+                self.timer.cancel()
+        self._end()
@@ -10,3 +10,7 @@ library objects required for the simulator.
 from __future__ import absolute_import
 
 from .commlib_factory import CommlibFactory
+from .traffic_stats import TrafficStats, LatencyHistogram
+from .inmemory_transport import reset_bus
+from .frame_ring import FrameRing, FrameRingReader, ring_name
+from .scheduled_actions import GoalQueue, ScheduledGoalHandler, schedule_action_server
@@ -5,8 +5,8 @@ File that contains the CommlibFactory class.
 # -*- coding: utf-8 -*-
 
 import logging
-import inspect
 import os
+import sys
 from typing import Union
 from dotenv import load_dotenv
 
@@ -15,6 +15,44 @@ from commlib.transports.mqtt import ConnectionParameters as MQTTConnectionParame
 from commlib.transports.redis import ConnectionParameters as RedisConnectionParameters
 from commlib.msg import PubSubMessage
 
+from . import inmemory_transport
+from .inmemory_transport import ConnectionParameters as InMemoryConnectionParameters
+from .scheduled_actions import schedule_action_server
+from .traffic_stats import TrafficStats, InstrumentedPublisher, InstrumentedRPCClient, \
+    instrument_subscriber_callback, instrument_rpc_callback
+
+_ENV = {"loaded": False}
+
+def load_environment():
+    """
+    Loads the `.env` file of the repository into the environment, once per process.
+    """
+    if not _ENV["loaded"]:
+        curr_dir = os.path.dirname(os.path.realpath(__file__))
+        load_dotenv(os.path.join(curr_dir, '../../.env'))
+        _ENV["loaded"] = True
+
+def caller_location(depth = 2):
+    """
+    Captures the location of a caller cheaply, i.e. without building frame info
+    or reading source lines. Only the code object and line number are kept, so
+    the frame itself (and its locals) are not retained.
+
+    Args:
+        depth (int): How many frames up to look, 1 being the caller of this function.
+    Returns:
+        tuple: (code object, line number), resolved with `format_location`.
+    """
+    frame = sys._getframe(depth) # pylint: disable=protected-access
+    return (frame.f_code, frame.f_lineno)
+
+def format_location(location):
+    """
+    Resolves a location captured by `caller_location` to `file:line`.
+    """
+    code, lineno = location
+    return f"{os.path.basename(code.co_filename)}:{lineno}"
+
 
 class CommlibFactory(Node):
     """
@@ -25,6 +63,8 @@ class CommlibFactory(Node):
     Attributes:
         stats (dict): A dictionary to keep track of the number of publishers, subscribers, 
         RPC servers, RPC clients, action servers, and action clients for different brokers.
+        traffic (TrafficStats): Process-wide runtime statistics (per-topic rates, bytes/s,
+        publish latency, RPC round-trip histograms and RPC worker queue depth).
     Methods:
         __init__(*args, **kwargs):
             Initializes the CommlibFactory instance, sets up logging, and initializes 
@@ -75,9 +115,10 @@ class CommlibFactory(Node):
     action_server_topics = {}
     action_client_topics = {}
 
+    traffic = TrafficStats()
+
     def __init__(self, *args, **kwargs): # pylint: disable=unused-argument
-        curframe = inspect.currentframe()
-        calframe = inspect.getouterframes(curframe, 2)
+        caller = caller_location()
         self._logger = logging.getLogger(__name__)
         self.interface = None
 
@@ -91,17 +132,19 @@ class CommlibFactory(Node):
         self.get_tf_affection = None
         self.get_tf = None
 
-        # get the current directory
-        curr_dir = os.path.dirname(os.path.realpath(__file__))
-        env_file = os.path.join(curr_dir, '../../.env')
-        load_dotenv(env_file)
+        load_environment()
         self._logger.info("Broker: %s @ %s with SSL %s",
                         os.getenv('BROKER_HOST', 'broker.emqx.io'),
                         os.getenv('BROKER_PORT', '8883'),
                         os.getenv('BROKER_SSL', 'True'))
         self.use_redis = os.getenv('USE_REDIS', "False")
+        self.use_inmemory = os.getenv('USE_INMEMORY_BROKER', "False") in ('True', 'true', '1')
         try:
-            if self.use_redis == "False" or self.interface == "mqtt":
+            if self.use_inmemory:
+                # Everything, including the "mqtt" interface, stays in this process
+                self.conn_params = InMemoryConnectionParameters()
+                self._logger.info("Using in-memory broker")
+            elif self.use_redis == "False" or self.interface == "mqtt":
                 broker_host = os.getenv('BROKER_HOST', 'broker.emqx.io')
                 broker_port = int(os.getenv('BROKER_PORT', "8883"))
                 broker_ssl = bool(os.getenv('BROKER_SSL', "True") in ('True', 'true'))
@@ -140,34 +183,36 @@ class CommlibFactory(Node):
         self.mpub = self.create_mpublisher()
         # self.mrpcserv = self.create_rpc()
 
-        self._logger.info('[*] Commlib factory initiated from %s:%s',
-                          calframe[1][1].split('/')[-1], calframe[1][2])
+        self._logger.info('[*] Commlib factory initiated from %s', format_location(caller))
+
+    def _select_transport(self):
+        """
+        Selects the commlib transport module from the connection parameters,
+        adding the in-memory transport to the ones commlib knows about.
+        """
+        if isinstance(self._conn_params, InMemoryConnectionParameters):
+            self._transport_module = inmemory_transport
+            return
+        super()._select_transport()
 
     def print_topics(self):
         """
         Print the topics for publishers, subscribers, RPC servers, and RPC clients.
+        The source locations of the registrations are only resolved here.
 
         Returns:
             None
         """
-        self._logger.warning("\nPublisher topics:")
-        for topic, place in CommlibFactory.publisher_topics.items():
-            self._logger.info("- %s @ %s", topic, place)
-        self._logger.warning("Subscriber topics:")
-        for topic, place in CommlibFactory.subscriber_topics.items():
-            self._logger.info("- %s @ %s", topic, place)
-        self._logger.warning("RPC server topics:")
-        for topic, place in CommlibFactory.rpc_server_topics.items():
-            self._logger.info("- %s @ %s", topic, place)
-        self._logger.warning("RPC client topics:")
-        for topic, place in CommlibFactory.rpc_client_topics.items():
-            self._logger.info("- %s @ %s", topic, place)
-        self._logger.warning("Action server topics:")
-        for topic, place in CommlibFactory.action_server_topics.items():
-            self._logger.info("- %s @ %s", topic, place)
-        self._logger.warning("Action client topics:")
-        for topic, place in CommlibFactory.action_client_topics.items():
-            self._logger.info("- %s @ %s", topic, place)
+        for title, topics in (
+                ("\nPublisher topics:", CommlibFactory.publisher_topics),
+                ("Subscriber topics:", CommlibFactory.subscriber_topics),
+                ("RPC server topics:", CommlibFactory.rpc_server_topics),
+                ("RPC client topics:", CommlibFactory.rpc_client_topics),
+                ("Action server topics:", CommlibFactory.action_server_topics),
+                ("Action client topics:", CommlibFactory.action_client_topics)):
+            self._logger.warning(title)
+            for topic, places in topics.items():
+                self._logger.info("- %s @ %s", topic, [format_location(p) for p in places])
         self._logger.info("")
 
     def inform(self, broker, topic, type_, extras = ""):
@@ -187,7 +232,7 @@ class CommlibFactory(Node):
             "%s::%s <%s> @ %s", broker, type_, topic, extras if extras != '' else '-'
         )
 
-    def internal_handle(self, auto_run, comm_entity, comm_lst, name, calframe, broker, _type):
+    def internal_handle(self, auto_run, comm_entity, comm_lst, name, caller, broker, _type):
         """
         Handles the internal communication setup and updates statistics.
         Parameters:
@@ -195,7 +240,7 @@ class CommlibFactory(Node):
         comm_entity (object): The communication entity that may be run.
         comm_lst (dict): A dictionary to store communication details.
         name (str): The name key to update in the comm_lst dictionary.
-        calframe (list): A list containing call frame information.
+        caller (tuple): The location of the registration, from `caller_location`.
         broker (str): The broker name used to update statistics.
         Returns:
         None
@@ -209,12 +254,7 @@ class CommlibFactory(Node):
                 self._logger.warning("CommlibFactory: Error in running %s", name)
 
         CommlibFactory.stats[broker][_type] += 1 # NOTE: Fix this
-        if name in comm_lst:
-            comm_lst[name].append(\
-                f"{calframe[1][1].split('/')[-1]}:{calframe[1][2]}")
-        else:
-            comm_lst[name] = \
-                [f"{calframe[1][1].split('/')[-1]}:{calframe[1][2]}"]
+        comm_lst.setdefault(name, []).append(caller)
 
     def get_publisher(self, broker: str = "mqtt", topic: str = None,
                       auto_run: bool = True, msg_type: Union[PubSubMessage, None] = None):
@@ -236,13 +276,17 @@ class CommlibFactory(Node):
         # )
 
         # NOTE: Check if this works
-        ret = self.create_wpublisher(self.mpub, topic, msg_type=msg_type)
-        calframe = inspect.getouterframes(inspect.currentframe(), 2)
+        ret = InstrumentedPublisher(
+            self.create_wpublisher(self.mpub, topic, msg_type=msg_type),
+            topic,
+            CommlibFactory.traffic
+        )
+        caller = caller_location()
         self.internal_handle(
             auto_run, ret,
             CommlibFactory.publisher_topics,
             topic,
-            calframe,
+            caller,
             broker,
             "publishers"
         )
@@ -268,6 +312,7 @@ class CommlibFactory(Node):
             - Logs the creation of the subscriber.
             - Increments the subscriber count in CommlibFactory.stats for the specified broker.
         """
+        callback = instrument_subscriber_callback(callback, topic, CommlibFactory.traffic)
         # NOTE: Old way
         if old_way:
             ret = self.create_subscriber(
@@ -279,8 +324,8 @@ class CommlibFactory(Node):
             self.wsub.subscribe(topic, callback)
             ret = None
 
-        calframe = inspect.getouterframes(inspect.currentframe(), 2)
-        self.internal_handle(auto_run, ret, CommlibFactory.subscriber_topics, topic, calframe, \
+        caller = caller_location()
+        self.internal_handle(auto_run, ret, CommlibFactory.subscriber_topics, topic, caller, \
             broker, "subscribers")
         return ret
 
@@ -298,11 +343,12 @@ class CommlibFactory(Node):
             RPCService: The created and running RPC service instance.
         """
         ret = self.create_rpc(
-            on_request = callback,
+            on_request = instrument_rpc_callback(callback, rpc_name, CommlibFactory.traffic),
             rpc_name = rpc_name
         )
-        calframe = inspect.getouterframes(inspect.currentframe(), 2)
-        self.internal_handle(auto_run, ret, CommlibFactory.rpc_server_topics, rpc_name, calframe, \
+        CommlibFactory.traffic.register_executor(getattr(ret, '_executor', None))
+        caller = caller_location()
+        self.internal_handle(auto_run, ret, CommlibFactory.rpc_server_topics, rpc_name, caller, \
             broker, "rpc servers")
         return ret
 
@@ -317,11 +363,13 @@ class CommlibFactory(Node):
         Returns:
             object: The created and running RPC client instance.
         """
-        ret = self.create_rpc_client(
-            rpc_name = rpc_name
+        ret = InstrumentedRPCClient(
+            self.create_rpc_client(rpc_name = rpc_name),
+            rpc_name,
+            CommlibFactory.traffic
         )
-        calframe = inspect.getouterframes(inspect.currentframe(), 2)
-        self.internal_handle(auto_run, ret, CommlibFactory.rpc_client_topics, rpc_name, calframe, \
+        caller = caller_location()
+        self.internal_handle(auto_run, ret, CommlibFactory.rpc_client_topics, rpc_name, caller, \
             broker, "rpc clients")
         return ret
 
@@ -330,7 +378,8 @@ class CommlibFactory(Node):
         broker = "mqtt",
         action_name = None,
         callback = None,
-        auto_run = True
+        auto_run = True,
+        goal_queue = None
     ):
         """
         Creates and runs an action server, and logs its creation.
@@ -339,6 +388,10 @@ class CommlibFactory(Node):
         broker (str): The type of broker to use (default is "mqtt").
         action_name (str): The name of the action (default is None).
         callback (function): The callback function to be called on goal (default is None).
+        goal_queue (GoalQueue): If given, the goals are queued on it and the callback
+            must not block: it schedules the work, which completes the goal with
+            `goalh.finish(result)` (see scheduled_actions). Otherwise the callback runs
+            in a thread of its own and its return value is the result.
 
         Returns:
         ActionServer: The created and running action server instance.
@@ -347,9 +400,11 @@ class CommlibFactory(Node):
             on_goal = callback,
             action_name = action_name
         )
-        calframe = inspect.getouterframes(inspect.currentframe(), 2)
+        if goal_queue is not None:
+            schedule_action_server(ret, callback, goal_queue)
+        caller = caller_location()
         self.internal_handle(auto_run, ret, CommlibFactory.action_server_topics, action_name, \
-            calframe, broker, "action servers")
+            caller, broker, "action servers")
         return ret
 
     def get_action_client(self, broker = "mqtt", action_name = None, auto_run = True):
@@ -370,7 +425,7 @@ class CommlibFactory(Node):
         ret = self.create_action_client(
             action_name = action_name
         )
-        calframe = inspect.getouterframes(inspect.currentframe(), 2)
+        caller = caller_location()
         self.internal_handle(auto_run, ret, CommlibFactory.action_client_topics, action_name, \
-            calframe, broker, "action clients")
+            caller, broker, "action clients")
         return ret
@@ -0,0 +1,191 @@
+"""
+File that contains the shared memory ring buffer used to hand raw frames to consumers
+running on the same host.
+
+The producer writes raw uint8 frames (height x width x channels) in the slots of a
+shared memory block and publishes only a small descriptor over the broker:
+
+    {"name": <shared memory name>, "slot": int, "seq": int, "shape": [h, w, c],
+     "timestamp": float}
+
+Every slot starts with a header holding the sequence number of the frame it contains.
+The producer zeroes it while a frame is being written (seqlock), so a consumer can tell
+if a frame was overwritten while it was reading it. Frames are mapped zero-copy by the
+consumers, which should check `valid()` after using a frame they did not copy.
+
+Layout: a 32 bytes header (magic, version, slots, slot size), then per slot a 32 bytes
+header (seq, height, width, channels, timestamp) followed by the frame data.
+"""
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import hashlib
+import struct
+import threading
+import time
+from multiprocessing import shared_memory, resource_tracker
+
+import numpy as np
+
+MAGIC = b"SSFR"
+VERSION = 1
+HEADER = struct.Struct("<4sIIQ8x")
+SLOT_HEADER = struct.Struct("<QIII4xd")
+
+# The rings created by this process
+_OWNED = set()
+
+
+def ring_name(topic):
+    """
+    Returns a short shared memory name for a topic, as some platforms limit
+    the length of the names.
+
+    Args:
+        topic (str): The topic the descriptors are published on.
+    Returns:
+        str: The shared memory name.
+    """
+    return "ssfr_" + hashlib.sha1(topic.encode()).hexdigest()[:16]
+
+
+class FrameRing:
+    """
+    The producer side of the ring. Not meant to be shared between producers.
+
+    Attributes:
+        name (str): The name of the shared memory block.
+        slots (int): The number of frames kept.
+        slot_bytes (int): The maximum size of a frame in bytes.
+        seq (int): The sequence number of the last written frame (starts at 1).
+    """
+    def __init__(self, name, slot_bytes, slots = 4):
+        self.name = name
+        self.slots = int(slots)
+        self.slot_bytes = int(slot_bytes)
+        self.slot_stride = SLOT_HEADER.size + self.slot_bytes
+        size = HEADER.size + self.slots * self.slot_stride
+        try:
+            self.shm = shared_memory.SharedMemory(name = name, create = True, size = size)
+        except FileExistsError:
+            # Left behind by a previous run that did not stop cleanly
+            stale = shared_memory.SharedMemory(name = name)
+            stale.close()
+            stale.unlink()
+            self.shm = shared_memory.SharedMemory(name = name, create = True, size = size)
+        _OWNED.add(name)
+        self.shm.buf[:size] = bytes(size)
+        HEADER.pack_into(self.shm.buf, 0, MAGIC, VERSION, self.slots, self.slot_bytes)
+        self.seq = 0
+        self.lock = threading.Lock()
+
+    def write(self, image, timestamp = None):
+        """
+        Copies a frame in the next slot.
+
+        Args:
+            image (numpy.ndarray): A uint8 frame, height x width (x channels).
+            timestamp (float): The time of the frame, now if None.
+        Returns:
+            dict: The descriptor of the frame.
+        Raises:
+            ValueError: If the frame does not fit in a slot.
+        """
+        image = np.ascontiguousarray(image, dtype = np.uint8)
+        if image.nbytes > self.slot_bytes:
+            raise ValueError(f"Frame of {image.nbytes} bytes does not fit in "
+                             f"{self.slot_bytes} bytes slots")
+        shape = image.shape if image.ndim == 3 else image.shape + (1,)
+        timestamp = time.time() if timestamp is None else timestamp
+        with self.lock:
+            self.seq += 1
+            slot = self.seq % self.slots
+            offset = HEADER.size + slot * self.slot_stride
+            SLOT_HEADER.pack_into(self.shm.buf, offset, 0, 0, 0, 0, 0.0)
+            data = offset + SLOT_HEADER.size
+            self.shm.buf[data:data + image.nbytes] = image.reshape(-1).data
+            SLOT_HEADER.pack_into(self.shm.buf, offset, self.seq, *shape, timestamp)
+            return {
+                "name": self.name,
+                "slot": slot,
+                "seq": self.seq,
+                "shape": list(shape),
+                "timestamp": timestamp,
+            }
+
+    def close(self):
+        """
+        Releases and removes the shared memory block.
+        """
+        _OWNED.discard(self.name)
+        try:
+            self.shm.close()
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class FrameRingReader:
+    """
+    The consumer side of a ring, attached by name.
+
+    Attributes:
+        name (str): The name of the shared memory block.
+        slots (int): The number of frames kept.
+        slot_bytes (int): The maximum size of a frame in bytes.
+    """
+    def __init__(self, name):
+        self.name = name
+        self.shm = shared_memory.SharedMemory(name = name)
+        # Attaching registers the block to the resource tracker, which would remove
+        # it when this process exits, although the producer owns it
+        if name not in _OWNED:
+            resource_tracker.unregister(self.shm._name, "shared_memory") # pylint: disable=protected-access
+        magic, version, self.slots, self.slot_bytes = HEADER.unpack_from(self.shm.buf, 0)
+        if magic != MAGIC or version != VERSION:
+            self.shm.close()
+            raise ValueError(f"{name} is not a frame ring")
+        self.slot_stride = SLOT_HEADER.size + self.slot_bytes
+
+    def _seq(self, slot):
+        return SLOT_HEADER.unpack_from(self.shm.buf, HEADER.size + slot * self.slot_stride)[0]
+
+    def valid(self, descriptor):
+        """
+        Checks that the frame of a descriptor has not been overwritten.
+
+        Args:
+            descriptor (dict): The descriptor published by the producer.
+        Returns:
+            bool: True if the slot still holds the frame.
+        """
+        return self._seq(descriptor["slot"]) == descriptor["seq"]
+
+    def frame(self, descriptor, copy = False):
+        """
+        Returns the frame of a descriptor.
+
+        Args:
+            descriptor (dict): The descriptor published by the producer.
+            copy (bool): If False the returned array maps the shared memory, and is only
+                valid while `valid(descriptor)` is True.
+        Returns:
+            numpy.ndarray: The frame, or None if it has already been overwritten.
+        """
+        if not self.valid(descriptor):
+            return None
+        offset = HEADER.size + descriptor["slot"] * self.slot_stride + SLOT_HEADER.size
+        shape = tuple(descriptor["shape"])
+        image = np.ndarray(shape, dtype = np.uint8, buffer = self.shm.buf, offset = offset)
+        if copy:
+            image = image.copy()
+            if not self.valid(descriptor):
+                return None
+        return image
+
+    def close(self):
+        """
+        Detaches from the shared memory block. Frames mapped zero-copy must
+        have been released before.
+        """
+        self.shm.close()
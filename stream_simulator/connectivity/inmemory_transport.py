@@ -0,0 +1,580 @@
+"""
+File that contains the in-memory commlib transport.
+
+It implements the commlib endpoints (publishers, subscribers, pattern subscribers,
+RPC services / clients and action services / clients) on top of a process-wide
+message bus, so that the simulator and its clients can run in a single process
+without an external Redis or MQTT broker. Payloads are serialized exactly as
+the Redis transport does, so subscribers never share mutable objects with the
+publisher and message semantics stay the same.
+"""
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import fnmatch
+import queue
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Union
+
+from commlib.action import (
+    BaseActionClient,
+    BaseActionService,
+    _ActionCancelMessage,
+    _ActionFeedbackMessage,
+    _ActionGoalMessage,
+    _ActionResultMessage,
+    _ActionStatusMessage,
+)
+from commlib.connection import BaseConnectionParameters
+from commlib.msg import PubSubMessage, RPCMessage
+from commlib.pubsub import (
+    BasePublisher,
+    BaseSubscriber,
+    validate_pubsub_topic,
+    validate_pubsub_topic_strict,
+)
+from commlib.rpc import BaseRPCClient, BaseRPCService, CommRPCHeader, CommRPCMessage
+from commlib.serializer import JSONSerializer
+from commlib.transports.base_transport import BaseTransport
+from commlib.utils import gen_timestamp
+
+_WAKEUP = object()
+
+
+class ConnectionParameters(BaseConnectionParameters):
+    """
+    Connection parameters of the in-memory transport. There is nothing to
+    connect to, the host and port are only kept for compatibility.
+    """
+    host: str = "inmemory"
+    port: int = 0
+
+
+class _Bus:
+    """
+    The process-wide message bus.
+
+    Attributes:
+        subs (dict): Subscription pattern -> list of (transport, callback).
+        regex (dict): Compiled glob of every wildcard pattern.
+        routes_cache (dict): Topic -> list of (pattern, transport, callback),
+            invalidated on every (un)subscription.
+        queues (dict): Named FIFO queues used by RPCs.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subs = {}
+        self.regex = {}
+        self.routes_cache = {}
+        self.queues = {}
+
+    def subscribe(self, pattern, transport, callback):
+        """
+        Registers a subscription. Patterns follow the Redis psubscribe glob
+        semantics (`*` matches any sequence of characters, dots included).
+        """
+        with self.lock:
+            self.subs.setdefault(pattern, []).append((transport, callback))
+            if any(c in pattern for c in "*?["):
+                self.regex[pattern] = re.compile(fnmatch.translate(pattern))
+            self.routes_cache = {}
+
+    def unsubscribe(self, transport):
+        """
+        Removes all the subscriptions of a transport.
+        """
+        with self.lock:
+            for pattern in list(self.subs.keys()):
+                entries = [e for e in self.subs[pattern] if e[0] is not transport]
+                if entries:
+                    self.subs[pattern] = entries
+                else:
+                    del self.subs[pattern]
+                    self.regex.pop(pattern, None)
+            self.routes_cache = {}
+
+    def routes(self, topic):
+        """
+        Returns the subscriptions matching a topic.
+        """
+        routes = self.routes_cache.get(topic)
+        if routes is not None:
+            return routes
+        with self.lock:
+            routes = []
+            for pattern, entries in self.subs.items():
+                rx = self.regex.get(pattern)
+                if (rx is None and pattern == topic) or \
+                        (rx is not None and rx.match(topic) is not None):
+                    routes.extend((pattern, t, c) for t, c in entries)
+            self.routes_cache[topic] = routes
+        return routes
+
+    def publish(self, topic, payload):
+        """
+        Delivers a serialized payload to all matching subscriptions.
+
+        Returns:
+            int: The number of subscriptions the message was delivered to.
+        """
+        routes = self.routes(topic)
+        channel = topic.encode("utf-8")
+        for pattern, transport, callback in routes:
+            transport.deliver(callback, {
+                "type": "pmessage",
+                "pattern": pattern.encode("utf-8"),
+                "channel": channel,
+                "data": payload,
+            })
+        return len(routes)
+
+    def queue(self, name):
+        """
+        Returns the named queue, creating it if needed.
+        """
+        q = self.queues.get(name)
+        if q is None:
+            with self.lock:
+                q = self.queues.setdefault(name, queue.SimpleQueue())
+        return q
+
+    def delete_queue(self, name):
+        """
+        Deletes the named queue.
+        """
+        with self.lock:
+            return self.queues.pop(name, None) is not None
+
+    def reset(self):
+        """
+        Drops all subscriptions and queues.
+        """
+        with self.lock:
+            self.subs = {}
+            self.regex = {}
+            self.routes_cache = {}
+            self.queues = {}
+
+
+_BUS = _Bus()
+
+
+def reset_bus():
+    """
+    Drops all the subscriptions and queues of the in-memory bus.
+    """
+    _BUS.reset()
+
+
+class InMemoryTransport(BaseTransport):
+    """
+    Transport that exchanges messages through the process-wide bus.
+
+    Incoming messages are queued in the transport inbox and dispatched by the
+    thread of the owning endpoint (see `loop_forever`), so callbacks never run
+    on the publisher's thread, as with a real broker.
+    """
+    def __init__(self, *args, serializer = None, compression = None, **kwargs): # pylint: disable=unused-argument
+        super().__init__(*args, **kwargs)
+        self._serializer = serializer if serializer is not None else JSONSerializer
+        self._inbox = queue.SimpleQueue()
+
+    def connect(self):
+        """Connect."""
+        self._stopped = False
+        self._set_connected(True)
+
+    def start(self):
+        """Start."""
+        if not self.is_connected:
+            self.connect()
+
+    def stop(self):
+        """Stop."""
+        self._stopped = True
+        _BUS.unsubscribe(self)
+        self._inbox.put(_WAKEUP)
+        self._set_connected(False)
+
+    def publish(self, topic: str, data: Dict[str, Any]):
+        """Publish."""
+        return _BUS.publish(topic, self._serializer.serialize(data))
+
+    def subscribe(self, topic: str, callback: Callable):
+        """Subscribe (glob patterns allowed)."""
+        if topic in (None, ""):
+            self.log.warning("Attempt to subscribe to empty topic - %s", topic)
+            return
+        _BUS.subscribe(topic, self, callback)
+
+    def msubscribe(self, topics: Dict[str, Callable]):
+        """Msubscribe."""
+        for topic, callback in topics.items():
+            self.subscribe(topic, callback)
+
+    def deliver(self, callback: Callable, msg: Dict[str, Any]):
+        """Called by the bus to enqueue a message for this transport."""
+        if not self._stopped:
+            self._inbox.put((callback, msg))
+
+    def loop_forever(self, stop_event: threading.Event):
+        """
+        Dispatches the incoming messages until the stop event is set.
+        """
+        while not stop_event.is_set():
+            item = self._inbox.get()
+            if item is _WAKEUP:
+                continue
+            callback, msg = item
+            callback(msg)
+
+    def push_msg_to_queue(self, queue_name: str, data: Dict[str, Any]):
+        """Push msg to queue."""
+        _BUS.queue(queue_name).put(self._serializer.serialize(data))
+
+    def wait_for_msg(self, queue_name: str, timeout = 10):
+        """Wait for msg."""
+        try:
+            return queue_name, _BUS.queue(queue_name).get(timeout = timeout)
+        except queue.Empty:
+            return "", None
+
+    def delete_queue(self, queue_name: str) -> bool:
+        """Delete queue."""
+        return _BUS.delete_queue(queue_name)
+
+    def queue_exists(self, queue_name: str) -> bool:
+        """Queue exists."""
+        return queue_name in _BUS.queues
+
+    def create_queue(self, queue_name: str) -> bool:
+        """Create queue."""
+        _BUS.queue(queue_name)
+        return True
+
+
+class Publisher(BasePublisher):
+    """Publisher.
+    In-memory Publisher (Single Topic).
+    """
+    def __init__(self, *args, **kwargs):
+        self._msg_seq = 0
+        super().__init__(*args, **kwargs)
+        self._transport = InMemoryTransport(
+            conn_params = self._conn_params,
+            serializer = self._serializer,
+        )
+
+    def publish(self, msg: PubSubMessage, topic: str = "", key: str = "") -> None: # pylint: disable=unused-argument
+        """Publish."""
+        data = self._prepare_msg(msg)
+        self._transport.publish(topic if topic else self._topic, data)
+        self._msg_seq += 1
+
+
+class MPublisher(Publisher):
+    """MPublisher.
+    Multi-Topic in-memory Publisher.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(topic = None, *args, **kwargs)
+
+    def publish(self, msg: PubSubMessage, topic: str = "", key: str = "") -> None:
+        """Publish."""
+        validate_pubsub_topic_strict(topic)
+        super().publish(msg, topic, key)
+
+
+class WPublisher:
+    """WPublisher.
+    Wrapped-Publisher over an MPublisher.
+    """
+    def __init__(
+        self,
+        mpub: MPublisher,
+        topic: str,
+        msg_type: Union[PubSubMessage, None] = None,
+    ):
+        self._mpub = mpub
+        self._topic = topic
+        self._msg_type = msg_type
+        validate_pubsub_topic_strict(self._topic)
+
+    @property
+    def connected(self):
+        """Connected."""
+        return self._mpub.connected
+
+    def publish(self, msg: Union[PubSubMessage, None]) -> None:
+        """Publish."""
+        if self._msg_type is not None and not isinstance(msg, PubSubMessage):
+            raise ValueError(f'Argument "msg" must be of type {self._msg_type}')
+        assert msg is not None
+        self._mpub.publish(msg, self._topic)
+
+
+class _BusSubscriber(BaseSubscriber):
+    """
+    Common run loop of the in-memory subscribers.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._transport = InMemoryTransport(
+            conn_params = self._conn_params,
+            serializer = self._serializer,
+        )
+
+    def _subscriptions(self) -> Dict[str, Callable]:
+        raise NotImplementedError()
+
+    def run_forever(self, *args, **kwargs): # pylint: disable=unused-argument
+        """
+        Registers the subscriptions, then dispatches messages until stopped.
+        """
+        self._transport.msubscribe(self._subscriptions())
+        self._transport.start()
+        self._transport.loop_forever(self._t_stop_event)
+
+    def _deserialize(self, payload: Dict[str, Any]):
+        return self._serializer.deserialize(payload["data"])
+
+    def _invoke(self, callback: Optional[Callable], data: Any, *args):
+        if callback is None:
+            return
+        try:
+            if self._msg_type is None:
+                callback(data, *args)
+            else:
+                callback(self._msg_type(**data), *args)
+        except Exception: # pylint: disable=broad-except
+            self.log.error("Exception caught in _on_message", exc_info=True)
+
+
+class Subscriber(_BusSubscriber):
+    """Subscriber.
+    In-memory Subscriber
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        validate_pubsub_topic_strict(self._topic)
+
+    def _subscriptions(self):
+        return {self._topic: self._on_message}
+
+    def _on_message(self, payload: Dict[str, Any]):
+        self._invoke(self.onmessage, self._deserialize(payload))
+
+
+class PSubscriber(_BusSubscriber):
+    """PSubscriber.
+    In-memory Pattern-based Subscriber. The callback receives (msg, topic).
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        validate_pubsub_topic(self._topic)
+
+    def _subscriptions(self):
+        return {self._topic: self._on_message}
+
+    def _on_message(self, payload: Dict[str, Any]):
+        self._invoke(self.onmessage, self._deserialize(payload),
+                     payload["channel"].decode("utf-8"))
+
+
+class WSubscriber(_BusSubscriber):
+    """WSubscriber.
+    Multi-topic in-memory subscriber sharing one dispatch thread. Unlike the
+    broker-backed ones, topics subscribed after `run` are picked up as well.
+    """
+    def __init__(self, *args, **kwargs): # pylint: disable=unused-argument
+        super().__init__(topic = None, **kwargs)
+        self._subs: Dict[str, Callable] = {}
+
+    def subscribe(self, topic, callback: Callable) -> None:
+        """
+        Subscribe to a given topic with a callback function.
+        """
+        validate_pubsub_topic_strict(topic)
+        self._subs[topic] = callback
+        if self._transport.is_connected:
+            self._transport.subscribe(topic, self._make_handler(callback))
+
+    def _make_handler(self, callback):
+        def _handler(payload):
+            self._invoke(callback, self._deserialize(payload))
+        return _handler
+
+    def _subscriptions(self):
+        return {t: self._make_handler(c) for t, c in self._subs.items()}
+
+
+class RPCService(BaseRPCService):
+    """RPCService.
+    In-memory RPC Service class
+
+    Each service gets its own (lazily grown) pool of `workers` threads, so that
+    handlers calling other RPCs cannot starve the whole process, as they would
+    on a single shared pool.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._executor = ThreadPoolExecutor(max_workers = self._max_workers)
+        self._owns_executor = True
+        self._transport = InMemoryTransport(
+            conn_params = self._conn_params,
+            serializer = self._serializer,
+        )
+
+    def _send_response(self, data: Dict[str, Any], reply_to: str):
+        resp = CommRPCMessage(header = CommRPCHeader(timestamp = gen_timestamp()), data = data)
+        self._transport.push_msg_to_queue(reply_to, resp.model_dump())
+
+    def _on_request_internal(self, req_msg: CommRPCMessage):
+        try:
+            if self._msg_type is None:
+                resp = self.on_request(req_msg.data)
+            else:
+                resp = self.on_request(self._msg_type.Request(**req_msg.data))
+                resp = resp.model_dump()
+        except Exception as exc: # pylint: disable=broad-except
+            self.log.error(str(exc), exc_info=False)
+            resp = {}
+        self._send_response(resp, req_msg.header.reply_to)
+
+    def run_forever(self):
+        """
+        Waits for requests on the RPC queue and serves them in the worker pool.
+        """
+        self._transport.start()
+        self._t_stop_event.clear()
+        while not self._t_stop_event.is_set():
+            _, payload = self._transport.wait_for_msg(self._rpc_name, timeout = 0.5)
+            if payload is None:
+                continue
+            try:
+                req_msg, _ = self._unpack_comm_msg(payload)
+                self._executor.submit(self._on_request_internal, req_msg)
+            except (ValueError, RuntimeError) as exc:
+                self.log.error(str(exc), exc_info=False)
+
+    def stop(self, wait: bool = True) -> None:
+        """
+        Stops the service. Unlike the base class, the worker pool is only shut
+        down if it is owned by this service and not the shared I/O pool.
+        """
+        self._t_stop_event.set()
+        if self._transport.is_connected:
+            self._transport.stop()
+        if self._owns_executor:
+            self._executor.shutdown(wait = wait, cancel_futures = True)
+
+
+class RPCClient(BaseRPCClient):
+    """RPCClient.
+    In-memory RPC Client class
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._transport = InMemoryTransport(
+            conn_params = self._conn_params,
+            serializer = self._serializer,
+        )
+
+    def call(self, msg: RPCMessage.Request, timeout: float = 10) -> RPCMessage.Response:
+        """
+        Sends an RPC request message and waits for a response.
+
+        Returns:
+            The response, or None if the timeout is reached.
+        """
+        data = self._prepare_call_data(msg)
+        reply_to = self._gen_queue_name()
+        req = CommRPCMessage(
+            header = CommRPCHeader(reply_to = reply_to, timestamp = gen_timestamp()),
+            data = data
+        )
+        self._transport.push_msg_to_queue(self._rpc_name, req.model_dump())
+        _, payload = self._transport.wait_for_msg(reply_to, timeout = timeout)
+        self._transport.delete_queue(reply_to)
+        if payload is None:
+            return None
+        data, _, _ = self._unpack_comm_msg(payload)
+        if self._msg_type is None:
+            return data
+        return self._msg_type.Response(**data)
+
+
+class ActionService(BaseActionService):
+    """ActionService.
+    In-memory Action Server class
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._goal_rpc = RPCService(
+            msg_type = _ActionGoalMessage,
+            rpc_name = self._goal_rpc_uri,
+            conn_params = self._conn_params,
+            on_request = self._handle_send_goal,
+            debug = self.debug,
+        )
+        self._cancel_rpc = RPCService(
+            msg_type = _ActionCancelMessage,
+            rpc_name = self._cancel_rpc_uri,
+            conn_params = self._conn_params,
+            on_request = self._handle_cancel_goal,
+            debug = self.debug,
+        )
+        self._result_rpc = RPCService(
+            msg_type = _ActionResultMessage,
+            rpc_name = self._result_rpc_uri,
+            conn_params = self._conn_params,
+            on_request = self._handle_get_result,
+            debug = self.debug,
+        )
+        self._mpublisher = MPublisher(
+            conn_params = self._conn_params,
+            debug = self.debug,
+        )
+        self._feedback_pub = WPublisher(self._mpublisher, self._feedback_topic)
+        self._status_pub = WPublisher(self._mpublisher, self._status_topic)
+        self._notify_pub = WPublisher(self._mpublisher, self._notify_topic)
+
+
+class ActionClient(BaseActionClient):
+    """ActionClient.
+    In-memory Action Client class
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._goal_client = RPCClient(
+            msg_type = _ActionGoalMessage,
+            rpc_name = self._goal_rpc_uri,
+            conn_params = self._conn_params,
+            debug = self.debug,
+        )
+        self._cancel_client = RPCClient(
+            msg_type = _ActionCancelMessage,
+            rpc_name = self._cancel_rpc_uri,
+            conn_params = self._conn_params,
+            debug = self.debug,
+        )
+        self._result_client = RPCClient(
+            msg_type = _ActionResultMessage,
+            rpc_name = self._result_rpc_uri,
+            conn_params = self._conn_params,
+            debug = self.debug,
+        )
+        self._status_sub = Subscriber(
+            msg_type = _ActionStatusMessage,
+            conn_params = self._conn_params,
+            topic = self._status_topic,
+            on_message = self._on_status,
+        )
+        self._feedback_sub = Subscriber(
+            msg_type = _ActionFeedbackMessage,
+            conn_params = self._conn_params,
+            topic = self._feedback_topic,
+            on_message = self._on_feedback,
+        )
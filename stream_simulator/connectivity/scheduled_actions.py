@@ -0,0 +1,223 @@
+"""
+File that contains the non-blocking action goals and the per-device goal queues.
+"""
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import logging
+import threading
+from collections import OrderedDict, deque
+
+from commlib.action import GoalHandler, GoalStatus, _ActionGoalMessage, \
+    _ActionCancelMessage, _ActionResultMessage
+
+_TERMINAL = (GoalStatus.SUCCEDED, GoalStatus.CANCELED, GoalStatus.ABORTED)
+
+class ScheduledGoalHandler(GoalHandler):
+    """
+    A goal handler that does not own a thread.
+
+    The goal callback is called when the goal reaches the head of its queue and must
+    return immediately, after scheduling its work (see the Scheduler). The work then
+    completes the goal with `finish`. Cancellation sets the cancel event and calls
+    the `on_cancel` hook installed by the running work, so that it stops early.
+
+    Attributes:
+        queue (GoalQueue): The queue of the device executing the goal.
+        on_cancel (callable): Called when the running goal is cancelled.
+    """
+    def __init__(self, msg_type, status_publisher, feedback_publisher, on_goal, queue):
+        super().__init__(msg_type, status_publisher, feedback_publisher, on_goal, None)
+        self.queue = queue
+        self.on_cancel = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """
+        Runs the goal callback, which schedules the work of the goal.
+        """
+        self.set_status(GoalStatus.RUNNING)
+        try:
+            self._on_goal(self)
+        except Exception as e: # pylint: disable=broad-except
+            self.log.error("Goal %s failed to start: %s", self.id, e)
+            self.finish({}, GoalStatus.ABORTED)
+
+    def finish(self, result, status = None):
+        """
+        Completes the goal and lets the queue start the next one.
+
+        Args:
+            result (dict): The result of the goal.
+            status (GoalStatus): The final status. By default SUCCEDED, or CANCELED
+                if the goal was cancelled.
+
+        Returns:
+            bool: False if the goal was already finished.
+        """
+        with self._lock:
+            if self.is_finished():
+                return False
+            if status is None:
+                status = GoalStatus.CANCELED if self.cancel_event.is_set() \
+                    else GoalStatus.SUCCEDED
+            self.result = result
+            self.set_status(status)
+        self.queue.done(self)
+        return True
+
+    def cancel(self):
+        """
+        Cancels the goal, whether it is queued or running.
+
+        Returns:
+            int: 1 if the goal is being cancelled, 0 if it had already finished.
+        """
+        with self._lock:
+            if self.is_finished() or self.status == GoalStatus.CANCELING:
+                return 0
+            self.set_status(GoalStatus.CANCELING)
+            self._cancel_event.set()
+        self.queue.cancel(self)
+        return 1
+
+class GoalQueue:
+    """
+    The goals of a device, executed one at a time in arrival order.
+
+    It replaces the `while self.blocked: time.sleep()` spin locks: a goal arriving
+    while the device is busy waits in the queue without holding a thread.
+
+    Attributes:
+        name (str): The name of the device, for logging.
+        pending (deque): The goals waiting for the device.
+        current (ScheduledGoalHandler): The running goal.
+    """
+    def __init__(self, name):
+        self.name = name
+        self.logger = logging.getLogger(__name__)
+        self.lock = threading.Lock()
+        self.pending = deque()
+        self.current = None
+        self._starting = False
+
+    def __len__(self):
+        with self.lock:
+            return len(self.pending) + (self.current is not None)
+
+    def submit(self, goalh):
+        """
+        Queues a goal and starts it if the device is idle.
+        """
+        with self.lock:
+            self.pending.append(goalh)
+            if self.current is not None:
+                self.logger.info("%s busy, goal %s queued (%s waiting)", \
+                    self.name, goalh.id, len(self.pending))
+        self._advance()
+
+    def done(self, goalh):
+        """
+        Called when a goal finishes, starts the next one.
+        """
+        with self.lock:
+            if self.current is not goalh:
+                return
+            self.current = None
+        self._advance()
+
+    def cancel(self, goalh):
+        """
+        Cancels a goal: a queued one is dropped, a running one is asked to stop.
+        """
+        with self.lock:
+            queued = goalh in self.pending
+            if queued:
+                self.pending.remove(goalh)
+        if queued:
+            goalh.finish({})
+        elif goalh.on_cancel is not None:
+            goalh.on_cancel()
+
+    def cancel_all(self):
+        """
+        Cancels the queued goals and then the running one, so that none is started.
+        """
+        with self.lock:
+            goals = list(self.pending)
+            if self.current is not None:
+                goals.append(self.current)
+        for goalh in goals:
+            goalh.cancel()
+
+    def _advance(self):
+        # Goals finishing synchronously in start() come back through done(), so the
+        # next ones are started in this loop instead of recursively
+        while True:
+            with self.lock:
+                if self._starting or self.current is not None or not self.pending:
+                    return
+                goalh = self.current = self.pending.popleft()
+                self._starting = True
+            try:
+                goalh.start()
+            finally:
+                with self.lock:
+                    self._starting = False
+
+def schedule_action_server(server, on_goal, queue, keep = 100):
+    """
+    Makes an action server execute its goals through a goal queue with
+    ScheduledGoalHandlers, instead of one commlib GoalHandler (and thread) per goal.
+
+    Goals sent while another one is running are accepted and queued. The results and
+    the cancellation are looked up by goal id.
+
+    Args:
+        server (BaseActionService): The action server, not yet running.
+        on_goal (callable): The non-blocking goal callback.
+        queue (GoalQueue): The queue of the device, possibly shared by several actions.
+        keep (int): How many finished goals are kept for their results to be fetched.
+    """
+    goals = OrderedDict()
+    lock = threading.Lock()
+    # pylint: disable=protected-access
+
+    def send_goal(msg):
+        goalh = ScheduledGoalHandler(
+            server._msg_type, server._status_pub, server._feedback_pub, on_goal, queue)
+        if server._msg_type is not None:
+            goalh.data = server._msg_type.Goal(**msg.goal_data)
+        else:
+            goalh.data = msg.goal_data
+        with lock:
+            goals[goalh.id] = goalh
+            finished = [k for k, g in goals.items() if g.status in _TERMINAL]
+            for k in finished[:max(0, len(finished) - keep)]:
+                del goals[k]
+        queue.submit(goalh)
+        return _ActionGoalMessage.Response(status = 1, goal_id = goalh.id)
+
+    def cancel_goal(msg):
+        goalh = goals.get(msg.goal_id)
+        resp = _ActionCancelMessage.Response()
+        if goalh is not None:
+            resp.status = goalh.cancel()
+        return resp
+
+    def get_result(msg):
+        goalh = goals.get(msg.goal_id)
+        resp = _ActionResultMessage.Response()
+        if goalh is None:
+            return resp
+        resp.status = int(goalh.status) if goalh.status is not None else 0
+        if goalh.status in _TERMINAL:
+            if server._msg_type is not None and goalh.result is not None:
+                resp.result = goalh.result.model_dump()
+            else:
+                resp.result = goalh.result
+        return resp
+
+    server._goal_rpc.on_request = send_goal
+    server._cancel_rpc.on_request = cancel_goal
+    server._result_rpc.on_request = get_result
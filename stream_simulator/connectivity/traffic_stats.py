@@ -0,0 +1,568 @@
+"""
+File that contains the runtime traffic statistics used by the CommlibFactory.
+"""
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import json
+import threading
+import time
+
+
+def payload_size(msg):
+    """
+    Estimates the size in bytes of a message as it will go on the wire.
+
+    Args:
+        msg (Any): The message (dict, PubSubMessage, str or bytes).
+
+    Returns:
+        int: The size of the serialized message, or 0 if it cannot be serialized.
+    """
+    try:
+        if msg is None:
+            return 0
+        if isinstance(msg, (bytes, bytearray)):
+            return len(msg)
+        if isinstance(msg, str):
+            return len(msg)
+        if hasattr(msg, "model_dump_json"):
+            return len(msg.model_dump_json())
+        return len(json.dumps(msg, default=str))
+    except Exception: # pylint: disable=broad-except
+        return 0
+
+
+class LatencyHistogram:
+    """
+    A fixed-bucket latency histogram (milliseconds).
+
+    Attributes:
+        BUCKETS_MS (tuple): Upper bounds of the buckets. An implicit "+Inf" bucket
+            holds everything above the last bound.
+        counts (list): Number of samples per bucket.
+        count (int): Total number of samples.
+        total (float): Sum of all samples in ms.
+        max (float): Largest sample in ms.
+    """
+    BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value_ms):
+        """
+        Adds a sample to the histogram.
+
+        Args:
+            value_ms (float): The sample in milliseconds.
+        """
+        idx = len(self.BUCKETS_MS)
+        for i, bound in enumerate(self.BUCKETS_MS):
+            if value_ms <= bound:
+                idx = i
+                break
+        self.counts[idx] += 1
+        self.count += 1
+        self.total += value_ms
+        self.max = max(self.max, value_ms)
+
+    def percentile(self, q):
+        """
+        Approximates a percentile using the bucket upper bounds.
+
+        Args:
+            q (float): The percentile in [0, 1].
+
+        Returns:
+            float: The upper bound of the bucket holding the percentile, or the
+                max sample if it falls in the "+Inf" bucket.
+        """
+        if self.count == 0:
+            return 0.0
+        target = q * self.count
+        acc = 0
+        for i, c in enumerate(self.counts):
+            acc += c
+            if acc >= target:
+                if i < len(self.BUCKETS_MS):
+                    return float(min(self.BUCKETS_MS[i], self.max))
+                return self.max
+        return self.max
+
+    def to_dict(self):
+        """
+        Returns:
+            dict: A JSON-serializable representation of the histogram.
+        """
+        buckets = {}
+        for i, bound in enumerate(self.BUCKETS_MS):
+            buckets[f"le_{bound}"] = self.counts[i]
+        buckets["inf"] = self.counts[-1]
+        return {
+            "count": self.count,
+            "avg_ms": self.total / self.count if self.count else 0.0,
+            "p50_ms": self.percentile(0.5),
+            "p99_ms": self.percentile(0.99),
+            "max_ms": self.max,
+            "buckets": buckets,
+        }
+
+
+class _RateCounter:
+    """
+    Message and byte counters with a tumbling window for rate estimation.
+    """
+    def __init__(self, window):
+        self.window = window
+        self.count = 0
+        self.bytes = 0
+        self.win_start = time.time()
+        self.win_count = 0
+        self.win_bytes = 0
+        self.rate = 0.0
+        self.bps = 0.0
+
+    def add(self, size, now):
+        """
+        Accounts for one message.
+
+        Args:
+            size (int): The message size in bytes.
+            now (float): The current time.
+        """
+        self.count += 1
+        self.bytes += size
+        elapsed = now - self.win_start
+        if elapsed >= self.window:
+            self.rate = self.win_count / elapsed
+            self.bps = self.win_bytes / elapsed
+            self.win_start = now
+            self.win_count = 0
+            self.win_bytes = 0
+        self.win_count += 1
+        self.win_bytes += size
+
+    def rates(self, now):
+        """
+        Returns the rates of the last complete window, decayed to zero if
+        the topic went quiet.
+
+        Args:
+            now (float): The current time.
+
+        Returns:
+            tuple: (messages per second, bytes per second)
+        """
+        elapsed = now - self.win_start
+        if elapsed >= 2 * self.window:
+            return 0.0, 0.0
+        if elapsed >= self.window or (self.count == self.win_count and elapsed > 0):
+            # The current window is over, or it is the first one
+            return self.win_count / elapsed, self.win_bytes / elapsed
+        return self.rate, self.bps
+
+
+class TrafficStats:
+    """
+    Process-wide runtime statistics of the communication endpoints created by
+    the CommlibFactory. All methods are thread safe.
+
+    Attributes:
+        window (float): The window (in seconds) used to compute rates.
+        published (dict): Per-topic publish counters.
+        publish_latency (dict): Per-topic publish latency histograms.
+        received (dict): Per-topic receive counters.
+        rpc_calls (dict): Per-RPC client round-trip histograms.
+        rpc_errors (dict): Per-RPC client number of failed calls.
+        rpc_handled (dict): Per-RPC service handler time histograms.
+        rpc_in_flight (dict): Per-RPC service number of requests being served.
+        executors (dict): Worker pools whose queue depth is reported.
+        first_published (dict): Per-topic time of the first publish.
+        delivery (dict): Per-topic end-to-end delivery latency histograms, for the
+            messages that carry the time they were produced.
+    """
+    def __init__(self, window = 5.0):
+        self.window = window
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.published = {}
+        self.publish_latency = {}
+        self.received = {}
+        self.rpc_calls = {}
+        self.rpc_errors = {}
+        self.rpc_handled = {}
+        self.rpc_in_flight = {}
+        self.executors = {}
+        self.first_published = {}
+        self.delivery = {}
+        self.first_publish_cond = threading.Condition(self.lock)
+
+    def record_publish(self, topic, size, duration):
+        """
+        Accounts for a published message.
+
+        Args:
+            topic (str): The topic.
+            size (int): The payload size in bytes.
+            duration (float): The time spent in publish, in seconds.
+        """
+        now = time.time()
+        with self.lock:
+            if topic not in self.published:
+                self.published[topic] = _RateCounter(self.window)
+                self.publish_latency[topic] = LatencyHistogram()
+                self.first_published[topic] = now
+                self.first_publish_cond.notify_all()
+            self.published[topic].add(size, now)
+            self.publish_latency[topic].add(duration * 1000.0)
+
+    def wait_first_publish(self, suffix, since, timeout = None):
+        """
+        Waits until a topic ending with `suffix` is published for the first time
+        after `since`.
+
+        Args:
+            suffix (str): The topic suffix, e.g. ".data" for sensor data.
+            since (float): Timestamp (time.time()) after which to look.
+            timeout (float): Maximum time to wait, in seconds.
+        Returns:
+            float: The time of that first publish, or None on timeout.
+        """
+        def _first():
+            times = [t for topic, t in self.first_published.items() \
+                if topic.endswith(suffix) and t >= since]
+            return min(times) if len(times) > 0 else None
+
+        with self.first_publish_cond:
+            self.first_publish_cond.wait_for(lambda: _first() is not None, timeout)
+            return _first()
+
+    def record_receive(self, topic):
+        """
+        Accounts for a received message.
+
+        Args:
+            topic (str): The topic the subscription was made on.
+        """
+        now = time.time()
+        with self.lock:
+            if topic not in self.received:
+                self.received[topic] = _RateCounter(self.window)
+            self.received[topic].add(0, now)
+
+    def record_delivery(self, topic, sent):
+        """
+        Accounts for the end-to-end latency of a message, from the time it was
+        produced to now.
+
+        Args:
+            topic (str): The topic the message was delivered on.
+            sent (float): The time (time.time()) the message was produced.
+        """
+        latency = max(0.0, time.time() - sent)
+        with self.lock:
+            if topic not in self.delivery:
+                self.delivery[topic] = LatencyHistogram()
+            self.delivery[topic].add(latency * 1000.0)
+
+    def record_rpc_call(self, rpc_name, duration, ok = True):
+        """
+        Accounts for an RPC client round-trip.
+
+        Args:
+            rpc_name (str): The RPC name.
+            duration (float): The round-trip time in seconds.
+            ok (bool): False if the call raised or timed out.
+        """
+        with self.lock:
+            if rpc_name not in self.rpc_calls:
+                self.rpc_calls[rpc_name] = LatencyHistogram()
+                self.rpc_errors[rpc_name] = 0
+            self.rpc_calls[rpc_name].add(duration * 1000.0)
+            if not ok:
+                self.rpc_errors[rpc_name] += 1
+
+    def rpc_enter(self, rpc_name):
+        """
+        Marks the start of serving an RPC request.
+
+        Args:
+            rpc_name (str): The RPC name.
+        """
+        with self.lock:
+            self.rpc_in_flight[rpc_name] = self.rpc_in_flight.get(rpc_name, 0) + 1
+
+    def rpc_exit(self, rpc_name, duration):
+        """
+        Marks the end of serving an RPC request.
+
+        Args:
+            rpc_name (str): The RPC name.
+            duration (float): The handler time in seconds.
+        """
+        with self.lock:
+            self.rpc_in_flight[rpc_name] = self.rpc_in_flight.get(rpc_name, 1) - 1
+            if rpc_name not in self.rpc_handled:
+                self.rpc_handled[rpc_name] = LatencyHistogram()
+            self.rpc_handled[rpc_name].add(duration * 1000.0)
+
+    def register_executor(self, executor):
+        """
+        Registers a worker pool so that its queue depth is reported.
+
+        Args:
+            executor (concurrent.futures.ThreadPoolExecutor): The pool.
+        """
+        if executor is None:
+            return
+        with self.lock:
+            self.executors[id(executor)] = executor
+
+    def worker_queues(self):
+        """
+        Returns:
+            list: One dict per registered worker pool with its size and the
+                number of queued (not yet running) jobs.
+        """
+        ret = []
+        with self.lock:
+            executors = list(self.executors.values())
+        for ex in executors:
+            queue = getattr(ex, "_work_queue", None)
+            ret.append({
+                "workers": getattr(ex, "_max_workers", None),
+                "threads": len(getattr(ex, "_threads", [])),
+                "queued": queue.qsize() if queue is not None else None,
+            })
+        return ret
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: A JSON-serializable snapshot of all the statistics.
+        """
+        now = time.time()
+        with self.lock:
+            published = {}
+            for topic, c in self.published.items():
+                rate, bps = c.rates(now)
+                published[topic] = {
+                    "count": c.count,
+                    "bytes": c.bytes,
+                    "rate": rate,
+                    "bytes_per_sec": bps,
+                    "latency": self.publish_latency[topic].to_dict(),
+                }
+            received = {}
+            for topic, c in self.received.items():
+                rate, _ = c.rates(now)
+                received[topic] = {
+                    "count": c.count,
+                    "rate": rate,
+                }
+            rpc_clients = {}
+            for name, h in self.rpc_calls.items():
+                rpc_clients[name] = h.to_dict()
+                rpc_clients[name]["errors"] = self.rpc_errors[name]
+            rpc_services = {}
+            for name, h in self.rpc_handled.items():
+                rpc_services[name] = h.to_dict()
+                rpc_services[name]["in_flight"] = self.rpc_in_flight.get(name, 0)
+            delivery = {topic: h.to_dict() for topic, h in self.delivery.items()}
+        return {
+            "uptime": now - self.started,
+            "published": published,
+            "received": received,
+            "rpc_clients": rpc_clients,
+            "rpc_services": rpc_services,
+            "delivery": delivery,
+            "worker_queues": self.worker_queues(),
+        }
+
+    def summary(self, top = 10):
+        """
+        Produces a short human readable summary of the busiest endpoints.
+
+        Args:
+            top (int): How many topics / RPCs to include.
+
+        Returns:
+            list: Lines of text.
+        """
+        snap = self.snapshot()
+        lines = []
+        pubs = sorted(snap["published"].items(),
+                      key = lambda x: x[1]["bytes_per_sec"], reverse = True)
+        total_rate = sum(p["rate"] for _, p in pubs)
+        total_bps = sum(p["bytes_per_sec"] for _, p in pubs)
+        lines.append(
+            f"Publish: {len(pubs)} topics, {total_rate:.1f} msg/s, {total_bps / 1024.0:.1f} KB/s"
+        )
+        for topic, p in pubs[:top]:
+            lines.append(
+                f"  {topic}: {p['rate']:.1f} msg/s, {p['bytes_per_sec'] / 1024.0:.1f} KB/s, "
+                f"p99 {p['latency']['p99_ms']:.1f} ms"
+            )
+        rpcs = sorted(snap["rpc_clients"].items(),
+                      key = lambda x: x[1]["count"], reverse = True)
+        for name, r in rpcs[:top]:
+            lines.append(
+                f"  rpc {name}: {r['count']} calls, avg {r['avg_ms']:.1f} ms, "
+                f"p99 {r['p99_ms']:.1f} ms, max {r['max_ms']:.1f} ms, errors {r['errors']}"
+            )
+        pools = snap["worker_queues"]
+        if pools:
+            queued = [q["queued"] or 0 for q in pools]
+            lines.append(
+                f"  workers: {len(pools)} pools, {sum(q['threads'] for q in pools)} threads, "
+                f"{sum(queued)} queued (max {max(queued)} in one pool)"
+            )
+        return lines
+
+
+class InstrumentedPublisher:
+    """
+    Transparent wrapper around a commlib publisher that accounts the
+    published traffic in a TrafficStats instance.
+
+    Serializing a message only to measure it costs as much as publishing it on
+    the hot topics (e.g. the base64 camera frames), so the size of the structured
+    messages is measured once every SIZE_SAMPLING publishes and the last measured
+    size is accounted for the others. Strings and bytes are measured every time.
+    """
+    SIZE_SAMPLING = 16
+
+    def __init__(self, publisher, topic, stats):
+        self._publisher = publisher
+        self._topic = topic
+        self._stats = stats
+        self._published = 0
+        self._size = 0
+
+    def publish(self, msg, *args, **kwargs):
+        """
+        Publishes the message through the wrapped publisher.
+
+        Args:
+            msg (Any): The message to be published.
+        """
+        start = time.time()
+        ret = self._publisher.publish(msg, *args, **kwargs)
+        duration = time.time() - start
+        if isinstance(msg, (bytes, bytearray, str)):
+            size = len(msg)
+        else:
+            if self._published % self.SIZE_SAMPLING == 0:
+                self._size = payload_size(msg)
+            size = self._size
+        self._published += 1
+        self._stats.record_publish(self._topic, size, duration)
+        return ret
+
+    def __getattr__(self, name):
+        return getattr(self._publisher, name)
+
+
+class InstrumentedRPCClient:
+    """
+    Transparent wrapper around a commlib RPC client that records the
+    round-trip time of every call in a TrafficStats instance.
+    """
+    def __init__(self, client, rpc_name, stats):
+        self._client = client
+        self._rpc_name = rpc_name
+        self._stats = stats
+
+    def call(self, msg, *args, **kwargs):
+        """
+        Calls the RPC through the wrapped client.
+
+        Args:
+            msg (Any): The request.
+
+        Returns:
+            Any: The response of the RPC.
+        """
+        start = time.time()
+        ok = False
+        try:
+            ret = self._client.call(msg, *args, **kwargs)
+            ok = ret is not None
+            return ret
+        finally:
+            self._stats.record_rpc_call(self._rpc_name, time.time() - start, ok)
+
+    def call_async(self, msg, *args, **kwargs):
+        """
+        Calls the RPC through the wrapped client, without waiting for the response.
+
+        Args:
+            msg (Any): The request.
+
+        Returns:
+            Future: The response of the RPC.
+        """
+        start = time.time()
+
+        def _record(future):
+            ok = not future.cancelled() and future.exception() is None \
+                and future.result() is not None
+            self._stats.record_rpc_call(self._rpc_name, time.time() - start, ok)
+
+        future = self._client.call_async(msg, *args, **kwargs)
+        future.add_done_callback(_record)
+        return future
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+def instrument_subscriber_callback(callback, topic, stats):
+    """
+    Wraps a subscriber callback so that every received message is counted.
+
+    Args:
+        callback (callable): The original callback.
+        topic (str): The topic of the subscription.
+        stats (TrafficStats): Where to account the traffic.
+
+    Returns:
+        callable: The wrapped callback.
+    """
+    if callback is None:
+        return None
+
+    def _callback(*args, **kwargs):
+        stats.record_receive(topic)
+        return callback(*args, **kwargs)
+    return _callback
+
+
+def instrument_rpc_callback(callback, rpc_name, stats):
+    """
+    Wraps an RPC service callback so that in-flight requests and the
+    handler time are recorded.
+
+    Args:
+        callback (callable): The original callback.
+        rpc_name (str): The RPC name.
+        stats (TrafficStats): Where to account the traffic.
+
+    Returns:
+        callable: The wrapped callback.
+    """
+    if callback is None:
+        return None
+
+    def _callback(*args, **kwargs):
+        stats.rpc_enter(rpc_name)
+        start = time.time()
+        try:
+            return callback(*args, **kwargs)
+        finally:
+            stats.rpc_exit(rpc_name, time.time() - start)
+    return _callback
@@ -51,4 +51,5 @@ from .env_actors import \
     TextActor, \
     RfidTagActor, \
     FireActor, \
-    WaterActor
+    WaterActor, \
+    CrowdEngine
@@ -0,0 +1,373 @@
+"""
+File that contains the audio pipeline of the microphones.
+
+The WAV resources are decoded once into cached, read-only NumPy buffers (mono, float32,
+resampled to SAMPLE_RATE), concatenated in a clip bank. A microphone mixes the clips of
+all the sound sources and speaking humans in its range in a single gather and matrix
+product per chunk, each scaled by a distance attenuation and by the number of wall cells
+of the map between the source and the microphone, and streams the result in fixed-size
+chunks of 16 bits PCM, so the memory used does not depend on the duration of the recording.
+"""
+
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import base64
+import functools
+import os
+import threading
+import wave
+
+import numpy as np
+from commlib.action import _ActionFeedbackMessage
+
+from stream_simulator.base_classes import Scheduler
+
+RESOURCES_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "resources")
+SAMPLE_RATE = 16000
+SAMPLE_FORMAT = "S16LE"
+SILENT_CLIP = "Silent.wav"
+
+@functools.lru_cache(maxsize = 16)
+def load_clip(name):
+    """
+    Decodes a WAV file of the resources, once.
+
+    Args:
+        name (str): The name of the file in the resources directory.
+    Returns:
+        numpy.ndarray: Read-only mono float32 samples in [-1, 1] at SAMPLE_RATE.
+    """
+    with wave.open(os.path.join(RESOURCES_DIR, name), 'rb') as f:
+        channels = f.getnchannels()
+        width = f.getsampwidth()
+        rate = f.getframerate()
+        raw = f.readframes(f.getnframes())
+
+    if width == 1:
+        samples = (np.frombuffer(raw, np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif width == 2:
+        samples = np.frombuffer(raw, "<i2").astype(np.float32) / 32768.0
+    elif width == 4:
+        samples = np.frombuffer(raw, "<i4").astype(np.float32) / 2147483648.0
+    else:
+        raise ValueError(f"Unsupported sample width {width} in {name}")
+    samples = samples.reshape(-1, channels).mean(axis = 1)
+
+    if rate != SAMPLE_RATE and len(samples) > 1:
+        n = int(round(len(samples) * SAMPLE_RATE / rate))
+        samples = np.interp(np.arange(n) * (rate / SAMPLE_RATE),
+                            np.arange(len(samples)), samples).astype(np.float32)
+    samples.flags.writeable = False
+    return samples
+
+def affection_clip(affection):
+    """
+    Returns the clip heard from an affection of a microphone, or None if it is silent.
+
+    Args:
+        affection (dict): An affection of the microphone, as returned by tf.
+    Returns:
+        str: The name of the clip in the resources directory.
+    """
+    info = affection.get('info') or {}
+    if affection.get('type') == 'human' and info.get('sound') != 1:
+        return None
+    if affection.get('type') not in ['human', 'sound_source']:
+        return None
+    if info.get('language') == 'EL':
+        return "greek_sentence.wav"
+    return "english_sentence.wav"
+
+def attenuation(distance, range_):
+    """
+    The gain of a source at a distance: inverse distance (no gain below 1m), fading
+    out to 0 at the range of the source.
+
+    Args:
+        distance (float): The distance of the source in meters.
+        range_ (float): The range of the source in meters.
+    Returns:
+        float: The gain in [0, 1].
+    """
+    if range_ is None or range_ <= 0:
+        return 0.0
+    fade = max(0.0, 1.0 - distance / range_)
+    return min(1.0, 1.0 / max(distance, 1e-6)) * fade
+
+class ClipBank:
+    """
+    All the decoded clips concatenated in a single buffer, so that the samples of any
+    number of sources are gathered with one indexing operation.
+
+    Attributes:
+        samples (numpy.ndarray): The concatenated clips.
+        clips (dict): Clip name -> (offset, length) in samples.
+    """
+    samples = np.zeros(0, np.float32)
+    clips = {}
+    lock = threading.Lock()
+
+    @classmethod
+    def get(cls, name):
+        """
+        Returns the position of a clip in the bank, adding it if needed.
+
+        Args:
+            name (str): The name of the clip in the resources directory.
+        Returns:
+            tuple: (offset, length) in samples.
+        """
+        with cls.lock:
+            if name not in cls.clips:
+                clip = load_clip(name)
+                cls.clips[name] = (len(cls.samples), len(clip))
+                cls.samples = np.concatenate([cls.samples, clip])
+                cls.samples.flags.writeable = False
+            return cls.clips[name]
+
+class AcousticMap:
+    """
+    Counts the wall cells of the map crossed by the sound, from a microphone to its sources.
+
+    Attributes:
+        walls (numpy.ndarray): Boolean occupancy of the map, indexed [x, y], or None.
+        resolution (float): The resolution of the map in meters per cell.
+    """
+    # Gain of the sound per wall cell crossed
+    WALL_LOSS = 0.5
+
+    def __init__(self, map_ = None, resolution = None):
+        self.walls = None if map_ is None else np.asarray(map_) == 1
+        self.resolution = float(resolution) if resolution else 1.0
+
+    def wall_cells(self, origin, targets):
+        """
+        Counts the wall cells crossed by the segments from origin to every target, vectorized
+        over the targets.
+
+        Args:
+            origin (tuple): (x, y) in meters.
+            targets (numpy.ndarray): S x 2 positions in meters.
+        Returns:
+            numpy.ndarray: The number of wall cells crossed per target.
+        """
+        targets = np.asarray(targets, np.float64).reshape(-1, 2)
+        if self.walls is None or len(targets) == 0:
+            return np.zeros(len(targets), np.int64)
+        delta = targets - np.asarray(origin, np.float64)
+        # Two samples per cell, so that no cell is skipped
+        steps = np.ceil(np.hypot(delta[:, 0], delta[:, 1]) / (self.resolution / 2.0)) \
+            .astype(np.int64) + 1
+        k = np.arange(steps.max())
+        valid = k[None, :] < steps[:, None]
+        t = np.minimum(k[None, :] / np.maximum(steps - 1, 1)[:, None], 1.0)
+        ix = np.floor((origin[0] + t * delta[:, 0:1]) / self.resolution).astype(np.int64)
+        iy = np.floor((origin[1] + t * delta[:, 1:2]) / self.resolution).astype(np.int64)
+        inside = valid & (ix >= 0) & (iy >= 0) & \
+            (ix < self.walls.shape[0]) & (iy < self.walls.shape[1])
+        wall = np.zeros(ix.shape, bool)
+        wall[inside] = self.walls[ix[inside], iy[inside]]
+        # Count every cell once, although it is sampled more than once
+        cell = ix * self.walls.shape[1] + iy
+        new = np.ones(cell.shape, bool)
+        new[:, 1:] = cell[:, 1:] != cell[:, :-1]
+        return (wall & new).sum(axis = 1)
+
+class AudioMixer:
+    """
+    Mixes the clips heard by a microphone, all the sources in a single NumPy pass.
+
+    The clips play in loop, each from its own position, which is kept while the source
+    stays in range, so the affections can be updated between chunks. The gain of a source
+    comes from its distance and from the walls between it and the microphone. When nothing
+    is heard, the silent clip is played as the noise floor.
+
+    Attributes:
+        acoustic_map (AcousticMap): The walls, None to ignore them.
+        names (list): The names of the heard sources.
+        offsets (numpy.ndarray): The offsets of their clips in the ClipBank.
+        lengths (numpy.ndarray): The lengths of their clips.
+        gains (numpy.ndarray): Their gains.
+        positions (numpy.ndarray): Their positions in their clips.
+        peak (float): The peak absolute amplitude mixed so far.
+    """
+    def __init__(self, acoustic_map = None):
+        self.acoustic_map = acoustic_map
+        self.names = []
+        self.clips = []
+        self.offsets = np.zeros(0, np.int64)
+        self.lengths = np.ones(0, np.int64)
+        self.gains = np.zeros(0, np.float32)
+        self.positions = np.zeros(0, np.int64)
+        self.peak = 0.0
+        self.lock = threading.Lock()
+        self.update({})
+
+    @property
+    def sources(self):
+        """
+        The heard sources: name -> {'clip', 'gain', 'position'}.
+        """
+        with self.lock:
+            return {n: {'clip': c, 'gain': float(g), 'position': int(p)} \
+                for n, c, g, p in zip(self.names, self.clips, self.gains, self.positions)}
+
+    def update(self, affections, pose = None):
+        """
+        Sets the heard sources from the affections of the microphone.
+
+        Args:
+            affections (dict): The affections of the microphone, as returned by tf.
+            pose (dict): The absolute pose of the microphone, needed for the walls.
+        """
+        names = []
+        clips = []
+        gains = []
+        targets = []
+        for name, aff in affections.items():
+            clip = affection_clip(aff)
+            gain = attenuation(aff.get('distance', 0.0), aff.get('range'))
+            if clip is None or gain <= 0.0:
+                continue
+            names.append(name)
+            clips.append(clip)
+            gains.append(gain)
+            position = aff.get('position')
+            targets.append((position['x'], position['y']) if position else (np.nan, np.nan))
+
+        gains = np.asarray(gains, np.float32)
+        if self.acoustic_map is not None and pose and names:
+            targets = np.asarray(targets, np.float64)
+            known = ~np.isnan(targets[:, 0])
+            cells = np.zeros(len(names), np.int64)
+            cells[known] = self.acoustic_map.wall_cells((pose['x'], pose['y']), targets[known])
+            gains = gains * np.power(AcousticMap.WALL_LOSS, cells).astype(np.float32)
+
+        if not names:
+            names = [SILENT_CLIP]
+            clips = [SILENT_CLIP]
+            gains = np.ones(1, np.float32)
+
+        banked = [ClipBank.get(clip) for clip in clips]
+        with self.lock:
+            previous = dict(zip(zip(self.names, self.clips), self.positions))
+            self.names = names
+            self.clips = clips
+            self.offsets = np.array([b[0] for b in banked], np.int64)
+            self.lengths = np.array([max(b[1], 1) for b in banked], np.int64)
+            self.gains = gains
+            self.positions = np.array([previous.get(key, 0) for key in zip(names, clips)],
+                                      np.int64)
+
+    def mix(self, samples):
+        """
+        Mixes the next samples of the heard sources.
+
+        Args:
+            samples (int): The number of samples.
+        Returns:
+            numpy.ndarray: The mixed float32 samples, clipped to [-1, 1].
+        """
+        with self.lock:
+            # sources x samples indices in the bank, the clips wrap around their end
+            idx = self.offsets[:, None] + \
+                (self.positions[:, None] + np.arange(samples)[None, :]) % self.lengths[:, None]
+            out = self.gains @ ClipBank.samples[idx]
+            self.positions = (self.positions + samples) % self.lengths
+        out = np.clip(out, -1.0, 1.0).astype(np.float32)
+        if samples:
+            self.peak = max(self.peak, float(np.abs(out).max()))
+        return out
+
+    def chunk(self, samples):
+        """
+        Mixes the next samples as 16 bits little endian PCM.
+        """
+        return (self.mix(samples) * 32767.0).astype("<i2").tobytes()
+
+def chunk_plan(duration, chunk_duration, start):
+    """
+    Splits a recording in fixed-size chunks.
+
+    Args:
+        duration (float): The duration of the recording in seconds.
+        chunk_duration (float): The duration of a chunk in seconds (the last one may be shorter).
+        start (float): The time (time.time()) the recording starts.
+    Returns:
+        list: (sequence number, timestamp of the chunk start, number of samples, time the
+        chunk has been "heard" and can be sent) tuples.
+    """
+    total = int(round(duration * SAMPLE_RATE))
+    per_chunk = max(1, int(round(chunk_duration * SAMPLE_RATE)))
+    plan = []
+    done = 0
+    while done < total:
+        n = min(per_chunk, total - done)
+        chunk_start = start + done / SAMPLE_RATE
+        plan.append((len(plan), chunk_start, n, chunk_start + n / SAMPLE_RATE))
+        done += n
+    return plan
+
+def record_goal(goalh, mixer, plan, request = None, result = None):
+    """
+    Streams a recording as feedback of a goal, driven by the Scheduler so no thread is
+    held while recording: each chunk of the plan is mixed and sent once it has been "heard".
+    The heard sources are asked for without blocking the Scheduler callbacks: a chunk is
+    mixed with the latest answer, while the next one is on its way.
+
+    Args:
+        goalh (ScheduledGoalHandler): The goal of the record action.
+        mixer (AudioMixer): The mixer of the microphone.
+        plan (list): The chunks of the recording (see chunk_plan).
+        request (callable): Asks for the heard sources, returns a Future of a dictionary
+            with the affections and the pose of the microphone (see RPC call_async).
+        result (callable): Returns the result of the goal, called once at the end.
+    """
+    pending = threading.Event()
+
+    def _answered(future):
+        pending.clear()
+        if future.cancelled() or future.exception() is not None:
+            return
+        res = future.result()
+        if res is not None:
+            mixer.update(res['affections'], res.get('pose'))
+
+    def _request():
+        # One request at a time, a slow tf is not flooded
+        if request is None or pending.is_set():
+            return
+        pending.set()
+        request().add_done_callback(_answered)
+
+    def _step(i):
+        seq, chunk_start, n, _ = plan[i]
+        send_chunk(goalh, seq, chunk_start, mixer.chunk(n))
+        if i + 1 < len(plan):
+            _request()
+
+    _request()
+    Scheduler.run_goal(goalh, [due for _, _, _, due in plan], step = _step, result = result)
+
+def send_chunk(goalh, seq, timestamp, pcm):
+    """
+    Streams a chunk of a recording as feedback of the record action.
+
+    Args:
+        goalh (GoalHandler): The goal handler of the record action.
+        seq (int): The sequence number of the chunk.
+        timestamp (float): The time of the first sample of the chunk.
+        pcm (bytes): The samples, 16 bits little endian PCM.
+    """
+    goalh.send_feedback(_ActionFeedbackMessage(
+        feedback_data = {
+            "seq": seq,
+            "timestamp": timestamp,
+            "sample_rate": SAMPLE_RATE,
+            "channels": 1,
+            "format": SAMPLE_FORMAT,
+            "chunk": base64.b64encode(pcm).decode("ascii")
+        },
+        goal_id = goalh.id
+    ))
@@ -0,0 +1,289 @@
+"""
+File that contains the in-memory frame generation of the camera controllers.
+
+Frames are generated and PNG / base64 encoded in memory, and the encoded payloads are
+kept in an LRU cache keyed by (affection type, content, width, height), so a camera
+looking at the same QR code, color or text costs a dictionary lookup per frame.
+The decoded actor sprites used by the camera renderers are cached the same way,
+per (type, content, size). Actors with a `video` property show the current frame of
+their video instead, decoded once for all the cameras (see video_sources).
+"""
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import base64
+import io
+import os
+import random
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import cv2
+import qrcode
+
+from stream_simulator.controllers.video_sources import VideoSources
+
+RESOURCES_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "resources")
+
+class FrameCache:
+    """
+    Thread safe LRU cache of base64 encoded frames.
+
+    Attributes:
+        maxsize (int): Maximum number of frames kept.
+        frames (OrderedDict): Key -> encoded frame, least recently used first.
+        hits (int): Number of lookups served from the cache.
+        misses (int): Number of frames generated.
+    """
+    def __init__(self, maxsize = 128):
+        self.maxsize = maxsize
+        self.frames = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, builder):
+        """
+        Returns the frame of a key, building it with builder() if not cached.
+
+        Args:
+            key (tuple): (affection type, content, width, height).
+            builder (callable): Returns the encoded frame.
+        Returns:
+            str: The base64 encoded frame.
+        """
+        with self.lock:
+            frame = self.frames.get(key)
+            if frame is not None:
+                self.frames.move_to_end(key)
+                self.hits += 1
+                return frame
+
+        # Built outside the lock, the worst case is building a frame twice
+        frame = builder()
+        with self.lock:
+            self.misses += 1
+            self.frames[key] = frame
+            self.frames.move_to_end(key)
+            while len(self.frames) > self.maxsize:
+                self.frames.popitem(last = False)
+        return frame
+
+    def clear(self):
+        """
+        Drops all the cached frames.
+        """
+        with self.lock:
+            self.frames.clear()
+
+FRAME_CACHE = FrameCache()
+
+def _b64(data):
+    return base64.b64encode(data).decode()
+
+def _encode_png(image):
+    ok, buf = cv2.imencode(".png", image) # pylint: disable=no-member
+    if not ok:
+        raise ValueError("Could not encode frame")
+    return _b64(buf.tobytes())
+
+def _file_frame(name):
+    with open(os.path.join(RESOURCES_DIR, name), "rb") as f:
+        return _b64(f.read())
+
+def _qr_frame(message):
+    buf = io.BytesIO()
+    qrcode.make(message).save(buf)
+    return _b64(buf.getvalue())
+
+def _color_frame(r, g, b, width, height):
+    image = np.zeros((height, width, 3), np.uint8)
+    image[:] = (b, g, r)
+    return _encode_png(image)
+
+def _text_image(text, width, height, color = (255, 255, 255), background = (0, 0, 0)):
+    image = np.zeros((height, width, 3), dtype=np.uint8)
+    image[:] = background
+    font = cv2.FONT_HERSHEY_SIMPLEX # pylint: disable=no-member
+    font_scale = 2
+    thickness = 3
+
+    # Center the text, shrinking it until it fits
+    x = -1
+    while x < 0 and font_scale > 0.2:
+        # pylint: disable=no-member
+        (text_width, text_height), _ = cv2.getTextSize(text, font, font_scale, thickness)
+        x = (width - text_width) // 2
+        y = (height + text_height) // 2
+        if x < 0:
+            font_scale -= 0.1
+            thickness = thickness - 1 if thickness > 1 else 1
+
+    cv2.putText(image, text, (max(x, 0), y), font, font_scale, color, \
+        thickness, lineType=cv2.LINE_AA) # pylint: disable=no-member
+    return image
+
+def _text_frame(text, width, height):
+    return _encode_png(_text_image(text, width, height))
+
+def video_source(video):
+    """
+    Returns the shared source of a video, relative paths being in the resources directory.
+    """
+    return VideoSources.get(os.path.join(RESOURCES_DIR, video))
+
+def file_frame(name):
+    """
+    Returns the base64 encoded content of an image of the resources directory.
+    """
+    return FRAME_CACHE.get(("file", name, None, None), lambda: _file_frame(name))
+
+def affection_frame(cl_type, info, width, height, default = "all.png"):
+    """
+    Returns the base64 encoded frame of a camera whose closest affection is of
+    type cl_type.
+
+    Args:
+        cl_type (str): The type of the closest affection (human, qr, barcode, color,
+            text, fire) or None if nothing is in sight.
+        info (dict): The info of the affection, as returned by tf. If it has a `video`,
+            the current frame of the video is returned.
+        width (int): The width of the generated frames.
+        height (int): The height of the generated frames.
+        default (str): The resource shown when nothing is in sight.
+    Returns:
+        str: The base64 encoded frame.
+    """
+    if cl_type is None:
+        return file_frame(default)
+    if info and info.get("video"):
+        return video_source(info["video"]).frame_encoded(width, height)
+    if cl_type == "human":
+        return file_frame(random.choice(["face.jpg", "face_inverted.jpg"]))
+    if cl_type == "barcode":
+        return file_frame("barcode.jpg")
+    if cl_type == "qr":
+        message = info["message"]
+        return FRAME_CACHE.get(("qr", message, None, None), lambda: _qr_frame(message))
+    if cl_type == "color":
+        rgb = (info["r"], info["g"], info["b"])
+        return FRAME_CACHE.get(("color", rgb, width, height), \
+            lambda: _color_frame(*rgb, width, height))
+    if cl_type == "text":
+        text = info["text"]
+        return FRAME_CACHE.get(("text", text, width, height), \
+            lambda: _text_frame(text, width, height))
+    return file_frame(default)
+
+SPRITE_CACHE = FrameCache(maxsize = 512)
+
+def _resource_image(name):
+    image = cv2.imread(os.path.join(RESOURCES_DIR, name)) # pylint: disable=no-member
+    if image is None:
+        raise ValueError(f"Could not read {name}")
+    return image
+
+def _qr_image(message):
+    image = np.array(qrcode.make(message).convert("RGB"))
+    return cv2.cvtColor(image, cv2.COLOR_RGB2BGR) # pylint: disable=no-member
+
+def _sprite_content(cl_type, info):
+    info = info or {}
+    if cl_type == "qr":
+        return info.get("message")
+    if cl_type == "color":
+        return (info.get("r", 0), info.get("g", 0), info.get("b", 0))
+    if cl_type == "text":
+        return info.get("text")
+    return None
+
+def _build_sprite(cl_type, content, size):
+    if cl_type == "human":
+        base = SPRITE_CACHE.get(("resource", "face.jpg", None, None),
+                                lambda: _resource_image("face.jpg"))
+    elif cl_type == "barcode":
+        base = SPRITE_CACHE.get(("resource", "barcode.jpg", None, None),
+                                lambda: _resource_image("barcode.jpg"))
+    elif cl_type == "qr":
+        base = SPRITE_CACHE.get(("qr", content, None, None), lambda: _qr_image(content))
+    elif cl_type == "color":
+        image = np.zeros((size, size, 3), np.uint8)
+        image[:] = (content[2], content[1], content[0])
+        return image
+    elif cl_type == "text":
+        return _text_image(str(content), 2 * size, size, color = (0, 0, 0),
+                           background = (255, 255, 255))
+    else:
+        image = np.zeros((size, size, 3), np.uint8)
+        image[:] = (128, 128, 128)
+        return image
+    return cv2.resize(base, (size, size), interpolation = cv2.INTER_AREA) # pylint: disable=no-member
+
+def sprite(cl_type, info, size):
+    """
+    Returns the BGR image of an actor, as drawn by the camera renderers.
+
+    Sprites are square, except the text ones which are twice as wide, and are
+    cached per (type, content, size), so callers should quantize the sizes they ask for.
+    The sprites of the actors with a `video` are the current frame of the video.
+
+    Args:
+        cl_type (str): The type of the actor (human, qr, barcode, color, text).
+        info (dict): The info of the actor, as returned by tf.
+        size (int): The height of the sprite in pixels.
+    Returns:
+        numpy.ndarray: The sprite, which must not be modified.
+    """
+    if info and info.get("video"):
+        return video_source(info["video"]).frame_resized(size, size)
+    content = _sprite_content(cl_type, info)
+    return SPRITE_CACHE.get((cl_type, content, size),
+                            lambda: _build_sprite(cl_type, content, size))
+
+RAW_CACHE = FrameCache(maxsize = 32)
+
+def _decode_frame(frame, width, height):
+    data = np.frombuffer(base64.b64decode(frame), np.uint8)
+    image = cv2.imdecode(data, cv2.IMREAD_COLOR) # pylint: disable=no-member
+    if image is None:
+        raise ValueError("Could not decode frame")
+    if image.shape[:2] != (height, width):
+        image = cv2.resize(image, (width, height)) # pylint: disable=no-member
+    return image
+
+def frame_image(frame, width, height):
+    """
+    Returns the raw BGR image of an encoded frame, resized to width x height, as
+    written to the shared memory frame transport.
+
+    Args:
+        frame (str): A base64 encoded frame, as returned by affection_frame or file_frame.
+        width (int): The width of the image.
+        height (int): The height of the image.
+    Returns:
+        numpy.ndarray: The image, which must not be modified.
+    """
+    # The encoded frames come from FRAME_CACHE, so their hash is computed once
+    return RAW_CACHE.get((frame, width, height), lambda: _decode_frame(frame, width, height))
+
+def affection_image(cl_type, info, width, height, default = "all.png"):
+    """
+    Returns the raw BGR image of a camera whose closest affection is of type cl_type,
+    as written to the shared memory frame transport.
+
+    The frames of the videos change all the time, so they are taken resized from
+    their source, instead of being encoded and decoded again through RAW_CACHE.
+
+    Args:
+        cl_type (str): The type of the closest affection, None if nothing is in sight.
+        info (dict): The info of the affection, as returned by tf.
+        width (int): The width of the image.
+        height (int): The height of the image.
+        default (str): The resource shown when nothing is in sight.
+    Returns:
+        numpy.ndarray: The image, which must not be modified.
+    """
+    if cl_type is not None and info and info.get("video"):
+        return video_source(info["video"]).frame_resized(width, height)
+    return frame_image(affection_frame(cl_type, info, width, height, default), width, height)
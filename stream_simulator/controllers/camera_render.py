@@ -0,0 +1,245 @@
+"""
+File that contains the procedural rendering of the camera frames from the world state.
+
+Two modes are supported:
+- perspective: the walls of the map are ray cast in the field of view of the camera and
+  drawn as shaded columns, and the actors in sight are drawn as sprites at their bearing,
+  scaled by their distance and hidden behind walls.
+- topdown: the map is cropped and rotated around the camera so that it looks upwards,
+  the area outside the field of view is darkened and the actors are drawn at their positions.
+
+Everything that only depends on the camera configuration (ray angles and samples, the
+backdrop, the map image, the field of view mask) is computed once per camera, and the
+sprites are cached per quantized size (see camera_frames.sprite), so the cost of a frame
+is bounded by the image size and the number of actors in sight.
+"""
+
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import math
+import base64
+
+import numpy as np
+import cv2
+
+from stream_simulator.controllers.camera_frames import sprite
+
+RENDER_MODES = ["perspective", "topdown"]
+
+class CameraRenderer:
+    """
+    Renders the frames of a camera from the map and the actors in its field of view.
+
+    Attributes:
+        mode (str): One of RENDER_MODES.
+        width (int): The width of the frames.
+        height (int): The height of the frames.
+        fov (float): The horizontal field of view in radians.
+        range (float): The range of the camera in meters.
+        resolution (float): The resolution of the map in meters per cell.
+        walls (numpy.ndarray): Boolean occupancy of the map, indexed [x, y].
+        focal (float): The focal length in pixels.
+    """
+    # Ray cast columns of the perspective mode, stretched to the frame width
+    MAX_COLUMNS = 160
+    # Ray samples per column
+    MAX_SAMPLES = 400
+    # Sprite sizes are rounded to multiples of this, to keep the sprite cache small
+    SPRITE_STEP = 8
+    WALL_HEIGHT = 2.5 # meters
+    CAMERA_HEIGHT = 1.0 # meters
+    ACTOR_SIZE = 0.5 # meters
+    SKY = (235, 206, 135)
+    FLOOR = (90, 90, 90)
+    TOPDOWN_FLOOR = (230, 230, 230)
+    TOPDOWN_WALL = (40, 40, 40)
+
+    def __init__(self, mode, map_, resolution, width, height, fov, range_):
+        if mode not in RENDER_MODES:
+            raise ValueError(f"Unknown render mode {mode}, use one of {RENDER_MODES}")
+        self.mode = mode
+        self.width = int(width)
+        self.height = int(height)
+        self.fov = math.radians(fov)
+        self.range = float(range_)
+        self.resolution = float(resolution) if resolution else 1.0
+        if map_ is None:
+            map_ = np.zeros((1, 1))
+        self.walls = np.asarray(map_) == 1
+        self.focal = (self.width / 2.0) / math.tan(self.fov / 2.0)
+
+        if self.mode == "perspective":
+            self._setup_perspective()
+        else:
+            self._setup_topdown()
+
+    def _setup_perspective(self):
+        cols = min(self.width, self.MAX_COLUMNS)
+        # Column j looks through pixel x, angles grow to the left
+        x = (np.arange(cols) + 0.5) / cols * self.width - self.width / 2.0
+        self.offsets = -np.arctan(x / self.focal)
+        self.cos_offsets = np.cos(self.offsets)
+        step = max(self.resolution, self.range / self.MAX_SAMPLES)
+        self.samples = np.arange(step, self.range + step, step)
+        # Thicken the walls to the sampling step, so that rays cannot jump over them
+        cells = int(math.ceil(step / self.resolution)) + 1
+        self.ray_walls = cv2.dilate(self.walls.astype(np.uint8), # pylint: disable=no-member
+                                    np.ones((cells, cells), np.uint8)) > 0
+        self.rows = np.arange(self.height)[:, None]
+
+        self.backdrop = np.empty((self.height, cols, 3), np.uint8)
+        self.backdrop[:self.height // 2] = self.SKY
+        self.backdrop[self.height // 2:] = self.FLOOR
+
+    def _setup_topdown(self):
+        self.map_image = np.empty(self.walls.T.shape + (3,), np.uint8)
+        self.map_image[:] = self.TOPDOWN_FLOOR
+        self.map_image[self.walls.T] = self.TOPDOWN_WALL
+        # The camera sits at the bottom center, its range spans most of the height
+        self.origin = np.array([self.width / 2.0, self.height * 0.95])
+        self.scale = self.height * 0.9 / (self.range / self.resolution) # pixels per cell
+
+        ys, xs = np.mgrid[0:self.height, 0:self.width]
+        ang = np.arctan2(xs - self.origin[0], self.origin[1] - ys)
+        # Multiplier (/ 255) darkening the area outside the field of view
+        self.fov_weights = np.full((self.height, self.width, 3), 255, np.uint8)
+        self.fov_weights[np.abs(ang) > self.fov / 2.0] = 85
+
+    def depths(self, pose):
+        """
+        Ray casts the walls in the field of view.
+
+        Args:
+            pose (dict): The absolute pose of the camera (x, y in meters, theta in radians).
+        Returns:
+            numpy.ndarray: The perpendicular distance to the closest wall of each column,
+            inf where no wall is in range.
+        """
+        angles = pose['theta'] + self.offsets
+        xs = pose['x'] + np.outer(np.cos(angles), self.samples)
+        ys = pose['y'] + np.outer(np.sin(angles), self.samples)
+        ix = np.floor(xs / self.resolution).astype(np.int64)
+        iy = np.floor(ys / self.resolution).astype(np.int64)
+        walls = self.ray_walls
+        inside = (ix >= 0) & (iy >= 0) & (ix < walls.shape[0]) & (iy < walls.shape[1])
+        hits = np.ones(ix.shape, bool) # out of the map counts as wall
+        hits[inside] = walls[ix[inside], iy[inside]]
+        first = hits.argmax(axis = 1)
+        found = hits[np.arange(len(first)), first]
+        return np.where(found, self.samples[first] * self.cos_offsets, np.inf)
+
+    def _sprite_size(self, size):
+        size = int(round(size / self.SPRITE_STEP)) * self.SPRITE_STEP
+        return max(self.SPRITE_STEP, min(size, self.height))
+
+    def _paste(self, image, spr, cx, cy):
+        h, w = spr.shape[:2]
+        x0 = int(cx - w / 2)
+        y0 = int(cy - h / 2)
+        x1 = max(x0, 0)
+        y1 = max(y0, 0)
+        x2 = min(x0 + w, self.width)
+        y2 = min(y0 + h, self.height)
+        if x1 >= x2 or y1 >= y2:
+            return
+        image[y1:y2, x1:x2] = spr[y1 - y0:y2 - y0, x1 - x0:x2 - x0]
+
+    def _actors(self, affections):
+        # Farthest first, so that the closest are drawn on top
+        actors = [a for a in affections.values() \
+            if a.get('actor_ang') is not None and a.get('type') != 'robot']
+        return sorted(actors, key = lambda a: a['distance'], reverse = True)
+
+    def render_perspective(self, pose, affections):
+        """
+        Renders a perspective frame.
+
+        Args:
+            pose (dict): The absolute pose of the camera.
+            affections (dict): The affections of the camera, as returned by tf.
+        Returns:
+            numpy.ndarray: The BGR frame.
+        """
+        depth = self.depths(pose)
+        horizon = self.height / 2.0
+        wall_top = horizon - self.focal * (self.WALL_HEIGHT - self.CAMERA_HEIGHT) / depth
+        wall_bottom = horizon + self.focal * self.CAMERA_HEIGHT / depth
+        columns = self.backdrop.copy()
+        mask = (self.rows >= wall_top[None, :]) & (self.rows <= wall_bottom[None, :]) \
+            & np.isfinite(depth)[None, :]
+        shade = np.clip(220.0 * (1.0 - depth / (self.range * 1.2)), 40, 220)
+        columns[mask] = np.broadcast_to(shade[None, :, None], columns.shape)[mask]
+        image = cv2.resize(columns, (self.width, self.height), # pylint: disable=no-member
+                           interpolation = cv2.INTER_NEAREST) # pylint: disable=no-member
+
+        cols = len(depth)
+        for actor in self._actors(affections):
+            rel = math.atan2(math.sin(actor['actor_ang'] - pose['theta']),
+                             math.cos(actor['actor_ang'] - pose['theta']))
+            if abs(rel) >= math.pi / 2:
+                continue
+            dist = max(actor['distance'] * math.cos(rel), 1e-3)
+            cx = self.width / 2.0 - self.focal * math.tan(rel)
+            col = int(cx / self.width * cols)
+            if 0 <= col < cols and depth[col] < dist:
+                continue # behind a wall
+            size = self._sprite_size(self.focal * self.ACTOR_SIZE / dist)
+            self._paste(image, sprite(actor['type'], actor.get('info'), size), cx, horizon)
+        return image
+
+    def render_topdown(self, pose, affections):
+        """
+        Renders a top-down frame, with the camera at the bottom looking upwards.
+
+        Args:
+            pose (dict): The absolute pose of the camera.
+            affections (dict): The affections of the camera, as returned by tf.
+        Returns:
+            numpy.ndarray: The BGR frame.
+        """
+        th = pose['theta']
+        rot = self.scale * np.array([[math.sin(th), -math.cos(th)],
+                                     [-math.cos(th), -math.sin(th)]])
+        cam = np.array([pose['x'], pose['y']]) / self.resolution
+        affine = np.hstack([rot, (self.origin - rot @ cam)[:, None]])
+        # pylint: disable=no-member
+        image = cv2.warpAffine(self.map_image, affine, (self.width, self.height),
+                               flags = cv2.INTER_NEAREST,
+                               borderMode = cv2.BORDER_CONSTANT,
+                               borderValue = self.TOPDOWN_WALL)
+        cv2.multiply(image, self.fov_weights, dst = image, scale = 1.0 / 255)
+
+        size = self._sprite_size(self.scale * self.ACTOR_SIZE / self.resolution)
+        for actor in self._actors(affections):
+            rel = actor['actor_ang'] - th
+            d = self.scale * actor['distance'] / self.resolution
+            cx = self.origin[0] - d * math.sin(rel)
+            cy = self.origin[1] - d * math.cos(rel)
+            self._paste(image, sprite(actor['type'], actor.get('info'), size), cx, cy)
+        return image
+
+    def render(self, pose, affections):
+        """
+        Renders a frame in the mode of the renderer.
+
+        Args:
+            pose (dict): The absolute pose of the camera (x, y in meters, theta in radians).
+            affections (dict): The affections of the camera, as returned by tf.
+        Returns:
+            numpy.ndarray: The BGR frame.
+        """
+        if self.mode == "perspective":
+            return self.render_perspective(pose, affections)
+        return self.render_topdown(pose, affections)
+
+    def render_encoded(self, pose, affections, quality = 80):
+        """
+        Renders a frame and returns it JPEG / base64 encoded, as published by the cameras.
+        """
+        image = self.render(pose, affections)
+        # pylint: disable=no-member
+        ok, buf = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if not ok:
+            raise ValueError("Could not encode frame")
+        return base64.b64encode(buf.tobytes()).decode()
@@ -4,7 +4,6 @@ File implementing the LedsController class.
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 
-import time
 import logging
 
 from stream_simulator.base_classes import BaseThing
@@ -105,7 +104,7 @@ class LedsController(BaseThing):
             tf_package['host'] = conf['host']
             tf_package['host_type'] = 'pan_tilt'
 
-        self.tf_declare_rpc.call(tf_package)
+        self.declare_tf(tf_package)
 
         self._color = {
                 'r': 0.0,
@@ -146,8 +145,7 @@ class LedsController(BaseThing):
         that the sensor has started.
         """
         self.logger.info("Sensor %s waiting to start", self.name)
-        while not self.simulator_started:
-            time.sleep(1)
+        self.wait_simulation_started()
         self.logger.info("Sensor %s started", self.name)
 
     def stop(self):
@@ -159,6 +157,13 @@ class LedsController(BaseThing):
         """
         self.commlib_factory.stop()
 
+    def reset(self):
+        """
+        Turns the LEDs off, their initial state.
+        """
+        self.leds_set_callback({'r': 0.0, 'g': 0.0, 'b': 0.0, 'luminosity': 0})
+        super().reset()
+
     def leds_set_callback(self, message):
         """
         Callback function to set the LED values based on the received message.
@@ -6,8 +6,10 @@ File that implements the MotionController class.
 
 import time
 import logging
+import threading
 
-from stream_simulator.base_classes import BaseThing
+from stream_simulator.base_classes import BaseThing, Scheduler
+from stream_simulator.connectivity import GoalQueue
 
 class MotionController(BaseThing):
     """
@@ -25,6 +27,9 @@ class MotionController(BaseThing):
         motion_duration_sub (RPCService): RPC service for handling movement duration commands.
         motion_distance_sub (RPCService): RPC service for handling movement distance commands.
         turn_sub (RPCService): RPC service for handling turn commands.
+        goal_queue (GoalQueue): The motion goals, executed one at a time.
+        odometry_target (dict): The distance or angle left to the running distance or
+            turn goal, consumed by the kinematics loop of the robot.
         enable_rpc_server (RPCService): RPC service for enabling the motion controller.
         disable_rpc_server (RPCService): RPC service for disabling the motion controller.
     Methods:
@@ -43,6 +48,12 @@ class MotionController(BaseThing):
             Callback function to handle movement distance messages.
         turn_callback(message):
             Callback function to handle turn messages.
+        stop_motion():
+            Zeroes the velocities at the end of a motion goal.
+        start_odometry_goal(goalh, kind, target, linear, angular):
+            Starts a motion ending after a distance or an angle.
+        odometry_step(linear, angular, dt):
+            Accounts for a kinematics step of the robot, cut when the target is reached.
         cmd_vel(message):
             Callback function to handle velocity commands.
     """
@@ -112,26 +123,34 @@ class MotionController(BaseThing):
         tf_package['host'] = package['device_name']
         tf_package['host_type'] = 'robot'
 
-        self.tf_declare_rpc.call(tf_package)
+        self.declare_tf(tf_package)
 
         self._linear = 0
         self._angular = 0
+        # The running distance or turn goal, see odometry_step
+        self.odometry_target = None
+        self.odometry_lock = threading.Lock()
 
         self.vel_sub = self.commlib_factory.get_subscriber(
             topic = self.base_topic + ".set",
             callback = self.cmd_vel
         )
+        # The motion goals are executed one at a time
+        self.goal_queue = GoalQueue(self.name)
         self.motion_duration_sub = self.commlib_factory.get_action_server(
             action_name = self.base_topic + ".move.duration",
-            callback = self.move_duration_callback
+            callback = self.move_duration_callback,
+            goal_queue = self.goal_queue
         )
         self.motion_distance_sub = self.commlib_factory.get_action_server(
             action_name = self.base_topic + ".move.distance",
-            callback = self.move_distance_callback
+            callback = self.move_distance_callback,
+            goal_queue = self.goal_queue
         )
         self.turn_sub = self.commlib_factory.get_action_server(
             action_name = self.base_topic + ".move.turn",
-            callback = self.turn_callback
+            callback = self.turn_callback,
+            goal_queue = self.goal_queue
         )
 
         self.commlib_factory.run()
@@ -166,13 +185,33 @@ class MotionController(BaseThing):
             None
         """
         self.logger.info("Sensor %s waiting to start", self.name)
-        while not self.simulator_started:
-            time.sleep(1)
+        self.wait_simulation_started()
         self.logger.info("Sensor %s started", self.name)
 
+    def stop_motion(self):
+        """
+        Zeroes the velocities at the end of a motion goal.
+
+        Returns:
+            dict: The result of the motion goal.
+        """
+        self._linear = 0
+        self._angular = 0
+        return {"status": "done"}
+
+    def reset(self):
+        """
+        Cancels the motion goals and stops the robot.
+        """
+        super().reset()
+        self.stop_motion()
+
     def move_duration_callback(self, goalh):
         """
         Callback function to handle movement duration messages.
+        The motion goals are queued and executed one at a time. The velocities are set
+        and the simulation scheduler stops the motion after the duration, or as soon as
+        the goal is cancelled, so no thread is held while moving.
         Args:
             message (dict): A dictionary containing movement parameters:
                 - 'linear' (float or str): Linear movement value.
@@ -202,28 +241,25 @@ class MotionController(BaseThing):
             self._linear = response['linear']
             self._angular = response['angular']
             motion_started = time.time()
-            while True and not goalh.cancel_event.is_set():
-                if time.time() - motion_started >= response["duration"]:
-                    self._linear = 0
-                    self._angular = 0
-                    break
-                time.sleep(0.05)
+            Scheduler.run_goal(goalh, [motion_started + float(response["duration"])], \
+                result = self.stop_motion)
         except Exception as e: # pylint: disable=broad-exception-caught
             self.logger.error("%s: move_duration is wrongly formatted: %s - %s", \
                 self.name, str(e.__class__), str(e))
-            return {"status": "failed"}
-
-        return {"status": "done"}
+            goalh.finish({"status": "failed"})
 
     def move_distance_callback(self, goalh):
         """
         Callback function to handle movement distance messages.
+        The motion goals are queued and executed one at a time. The linear velocity is set
+        and the goal completes when the distance integrated by the kinematics loop of the
+        robot reaches the requested one (see odometry_step), or as soon as it is cancelled.
         Args:
             message (dict): A dictionary containing movement parameters.
                 - 'linear' (float or str): The linear speed of the movement.
                 - 'distance' (float or str): The distance to be moved.
         Returns:
-            dict: A dictionary indicating the status of the operation.
+            None: The goal is finished with a dictionary indicating the status of the operation.
                 - 'status' (str): "done" if the operation was successful, "failed" otherwise.
         Raises:
             ValueError: If 'linear' or 'distance' are not valid float or integer values.
@@ -241,35 +277,26 @@ class MotionController(BaseThing):
                 if not response['distance'].isdigit():
                     raise ValueError("Distance is no integer nor float") from exe
 
-            self._linear = response['linear']
-            self._angular = 0
-            # print("time to sleep is: ", response["distance"] / response["linear"])
-            time_estimate = response["distance"] / response["linear"]
-            motion_started = time.time()
-            while True and not goalh.cancel_event.is_set():
-                if time.time() - motion_started >= time_estimate:
-                    self._linear = 0
-                    self._angular = 0
-                    break
-                time.sleep(0.05)
-            self._linear = 0
+            self.start_odometry_goal(goalh, "distance", float(response["distance"]), \
+                float(response['linear']), 0)
         except Exception as e: # pylint: disable=broad-exception-caught
             self.logger.error("%s: move_duration is wrongly formatted: %s - %s", \
                 self.name, str(e.__class__), str(e))
-            return {"status": "failed"}
-
-        return {"status": "done"}
+            goalh.finish({"status": "failed"})
 
     def turn_callback(self, goalh):
         """
         Callback function to handle turning motion based on the provided message.
+        The motion goals are queued and executed one at a time. The angular velocity is set
+        and the goal completes when the angle integrated by the kinematics loop of the
+        robot reaches the requested one (see odometry_step), or as soon as it is cancelled.
         Args:
             message (dict): A dictionary containing the keys 'angular' and 'angle'.
                             'angular' represents the angular velocity.
                             'angle' represents the angle to turn.
         Returns:
-            dict: A dictionary with the status of the operation. 
-                  Returns {"status": "done"} if successful, otherwise {"status": "failed"}.
+            None: The goal is finished with a dictionary with the status of the operation. 
+                  {"status": "done"} if successful, otherwise {"status": "failed"}.
         Raises:
             ValueError: If 'angular' or 'angle' in the message are not valid numbers.
         """
@@ -289,27 +316,86 @@ class MotionController(BaseThing):
                 if not response['angle'].isdigit():
                     raise ValueError("Angle is no integer nor float") from exe
 
-            self._linear = 0
-            self._angular = _angular * _angle / abs(_angle) # Trick to get the sign
             self.logger.info("Angular speed is: %s", _angular)
-            # print("time to sleep is: ", response["angle"] / response["angular"])
-            
-            time_estimate = abs(_angle) / abs(_angular)
-            self.logger.info("Time estimate: %s", time_estimate)
-            motion_started = time.time()
-            while True and not goalh.cancel_event.is_set():
-                if time.time() - motion_started >= time_estimate:
-                    self._linear = 0
-                    self._angular = 0
-                    break
-                time.sleep(0.05)
-            self._angular = 0
+            self.start_odometry_goal(goalh, "angle", abs(_angle), 0, \
+                _angular * _angle / abs(_angle)) # Trick to get the sign
         except Exception as e: # pylint: disable=broad-exception-caught
             self.logger.error("%s: turn is wrongly formatted: %s - %s", \
                 self.name, str(e.__class__), str(e))
-            return {"status": "failed"}
+            goalh.finish({"status": "failed"})
 
-        return {"status": "done"}
+    def start_odometry_goal(self, goalh, kind, target, linear, angular):
+        """
+        Starts a motion that ends after a distance or an angle, as integrated by the
+        kinematics loop of the robot.
+
+        Args:
+            goalh (ScheduledGoalHandler): The goal, finished when the target is reached.
+            kind (str): "distance" (meters, from the linear velocity) or "angle" (radians,
+                from the angular velocity).
+            target (float): The distance or angle to cover, positive.
+            linear (float): The linear velocity.
+            angular (float): The angular velocity.
+        """
+        velocity = linear if kind == "distance" else angular
+        if velocity == 0 or target == 0:
+            self.logger.warning("%s: nothing to do for %s %s at %s", \
+                self.name, kind, target, velocity)
+            goalh.finish(self.stop_motion())
+            return
+
+        def finish():
+            goalh.finish(self.stop_motion())
+
+        def cancel():
+            with self.odometry_lock:
+                if self.odometry_target is None or self.odometry_target['goal'] is not goalh:
+                    return
+                self.odometry_target = None
+            finish()
+
+        with self.odometry_lock:
+            self.odometry_target = {
+                'goal': goalh,
+                'kind': kind,
+                'remaining': target,
+                'finish': finish,
+            }
+            goalh.on_cancel = cancel
+            self._linear = linear
+            self._angular = angular
+
+    def odometry_step(self, linear, angular, dt):
+        """
+        Called by the kinematics loop of the robot with the velocities and the time step
+        it is about to integrate. While a distance or turn goal runs, the covered distance
+        or angle is accounted for, and the step is cut at the instant the target is reached
+        (sub-tick interpolation): the motion then stops and the goal is finished, so the
+        result does not depend on the jitter of the loop.
+
+        Args:
+            linear (float): The linear velocity of the step.
+            angular (float): The angular velocity of the step.
+            dt (float): The duration of the step, in seconds.
+
+        Returns:
+            float: The part of the step to integrate with these velocities.
+        """
+        with self.odometry_lock:
+            target = self.odometry_target
+            if target is None:
+                return dt
+            rate = abs(float(linear if target['kind'] == "distance" else angular))
+            if rate == 0 or rate * dt < target['remaining']:
+                target['remaining'] -= rate * dt
+                return dt
+            step = target['remaining'] / rate
+            self.odometry_target = None
+            self._linear = 0
+            self._angular = 0
+        # The goal is finished out of the kinematics loop
+        Scheduler.call_soon(target['finish'])
+        return step
 
     def cmd_vel(self, message):
         """
@@ -5,7 +5,6 @@ File that contains the PanTiltController class.
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 
-import time
 import logging
 
 from stream_simulator.base_classes import BaseThing
@@ -98,7 +97,7 @@ class PanTiltController(BaseThing):
             tf_package['host'] = conf['host']
             tf_package['host_type'] = 'pan_tilt'
 
-        self.tf_declare_rpc.call(tf_package)
+        self.declare_tf(tf_package)
         # self.tf_declare_pub.publish(tf_package)
 
         # init values
@@ -133,8 +132,7 @@ class PanTiltController(BaseThing):
             None
         """
         self.logger.info("Sensor %s waiting to start", self.name)
-        while not self.simulator_started:
-            time.sleep(1)
+        self.wait_simulation_started()
         self.logger.info("Sensor %s started", self.name)
 
     def stop(self):
@@ -145,6 +143,13 @@ class PanTiltController(BaseThing):
         """
         self.commlib_factory.stop()
 
+    def reset(self):
+        """
+        Turns the pan-tilt back to its initial pan and tilt.
+        """
+        self.pan_tilt_set_callback({'pan': 0.0, 'tilt': 0.0})
+        super().reset()
+
     def pan_tilt_set_callback(self, message):
         """
         Callback function to handle incoming pan and tilt commands.
@@ -8,7 +8,8 @@ File that exposes the speaker controller.
 import time
 import logging
 
-from stream_simulator.base_classes import BaseThing
+from stream_simulator.base_classes import BaseThing, Scheduler
+from stream_simulator.connectivity import GoalQueue
 
 class SpeakerController(BaseThing):
     """
@@ -22,7 +23,7 @@ class SpeakerController(BaseThing):
         name (str): Name of the speaker.
         base_topic (str): Base topic for communication.
         global_volume (float): Global volume setting for the speaker.
-        blocked (bool): Flag indicating if the speaker is currently blocked.
+        goal_queue (GoalQueue): The play and speak goals, executed one at a time.
         play_action_server (ActionServer): Action server for handling play actions.
         speak_action_server (ActionServer): Action server for handling speak actions.
         enable_rpc_server (RPCService): RPC server for enabling the speaker.
@@ -105,18 +106,21 @@ class SpeakerController(BaseThing):
             tf_package['host'] = conf['host']
             tf_package['host_type'] = 'pan_tilt'
 
-        self.tf_declare_rpc.call(tf_package)
+        self.declare_tf(tf_package)
 
         self.global_volume = None
-        self.blocked = False
+        # The play and speak goals are executed one at a time
+        self.goal_queue = GoalQueue(self.name)
 
         self.play_action_server = self.commlib_factory.get_action_server(
             callback = self.on_goal_play,
-            action_name = self.base_topic + ".play"
+            action_name = self.base_topic + ".play",
+            goal_queue = self.goal_queue
         )
         self.speak_action_server = self.commlib_factory.get_action_server(
             callback = self.on_goal_speak,
-            action_name = self.base_topic + ".speak"
+            action_name = self.base_topic + ".speak",
+            goal_queue = self.goal_queue
         )
 
         self.play_pub = self.commlib_factory.get_publisher(
@@ -134,30 +138,27 @@ class SpeakerController(BaseThing):
     def on_goal_speak(self, goalh):
         """
         Handles the goal to make the speaker speak.
+        The goals of the speaker are queued and executed one at a time. This method does
+        not block: it runs when the goal reaches the head of the queue and schedules its
+        completion on the simulation scheduler.
         This method performs the following steps:
         1. Logs the start of the speak action.
-        2. Checks if the speaker is enabled; if not, returns an empty dictionary.
-        3. Waits until the speaker is not blocked.
-        4. Notifies the UI about the effector command.
-        5. Extracts text, volume, and language from the goal handle.
-        6. Publishes the speak command with the extracted parameters.
-        7. Generates a timestamp for the response header.
-        8. Simulates speaking for 5 seconds, checking for cancellation events.
-        9. Logs the completion of the speak action and unblocks the speaker.
+        2. Checks if the speaker is enabled; if not, finishes the goal with an empty result.
+        3. Extracts text, volume, and language from the goal handle.
+        4. Publishes the speak command with the extracted parameters.
+        5. Generates a timestamp for the response header.
+        6. Finishes the goal after the speaking time (5 seconds in mock mode, 0.1 seconds
+           per character in simulation mode), or as soon as it is cancelled.
         Args:
             goalh: The goal handle containing the data for the speak action.
         Returns:
-            dict: A dictionary containing the header with the timestamp.
+            None: The goal is finished with a dictionary containing the header with the
+            timestamp.
         """
         self.logger.info("%s speak started", self.name)
         if self.info["enabled"] is False:
-            return {}
-
-        # Concurrent speaker calls handling
-        while self.blocked:
-            time.sleep(0.1)
-        self.logger.info("Speaker unlocked")
-        self.blocked = True
+            goalh.finish({})
+            return
 
         try:
             texts = goalh.data["text"]
@@ -173,7 +174,8 @@ class SpeakerController(BaseThing):
             "text": texts,
             "volume": volume,
             "language": language,
-            "speaker": self.name
+            "speaker": self.name,
+            "timestamp": time.time(),
         })
 
         self.state_publisher_internal.publish({
@@ -196,57 +198,41 @@ class SpeakerController(BaseThing):
                 }
             }
         }
+        duration = 0
         if self.info["mode"] == "mock":
-            now = time.time()
-            self.logger.info("Speaking...")
-            while time.time() - now < 5:
-                if goalh.cancel_event.is_set():
-                    self.logger.info("Cancel got")
-                    self.blocked = False
-                    return ret
-                time.sleep(0.1)
-            self.logger.info("Speaking done")
-
+            duration = 5
         elif self.info["mode"] == "simulation":
-            now = time.time()
-            self.logger.info("Speaking...")
-            while time.time() - now < len(texts) * 0.1:
-                if goalh.cancel_event.is_set():
-                    self.logger.info("Cancel got")
-                    self.blocked = False
-                    return ret
-                time.sleep(0.1)
-            self.logger.info("Speaking done")
+            duration = len(texts) * 0.1
+        self.logger.info("Speaking...")
+
+        def done():
+            if goalh.cancel_event.is_set():
+                self.logger.info("Cancel got")
+            self.logger.info("%s Speak finished", self.name)
+            return ret
 
-        self.logger.info("%s Speak finished", self.name)
-        self.blocked = False
-        return ret
+        Scheduler.run_goal(goalh, [timestamp + duration], result = done)
 
     def on_goal_play(self, goalh):
         """
         Handles the goal to play a string with a specified volume.
-        This method manages concurrent speaker calls, checks if the speaker is enabled,
-        and publishes the play command with the provided string and volume. It also
-        handles different modes of operation ("mock" and "simulation") and supports
-        cancellation of the play action.
+        The goals of the speaker are queued and executed one at a time. This method does
+        not block: it publishes the play command with the provided string and volume and
+        schedules the completion of the goal after 5 seconds in "mock" and "simulation"
+        modes, or as soon as it is cancelled.
         Args:
             goalh: An object containing the goal data with the following attributes:
                 - data: A dictionary with keys "string" (the text to play) and "volume" 
                     (the volume level).
-                - cancel_event: An event object that can be set to cancel the play action.
+                - cancel_event: An event object that is set when the play action is cancelled.
         Returns:
-            dict: A dictionary containing a header with a timestamp of when the play action was 
-                initiated.
+            None: The goal is finished with a dictionary containing a header with a timestamp
+                of when the play action was initiated.
         """
         self.logger.info("%s play started", self.name)
         if self.info["enabled"] is False:
-            return {}
-
-        # Concurrent speaker calls handling
-        while self.blocked:
-            time.sleep(0.1)
-        self.logger.info("Speaker unlocked")
-        self.blocked = True
+            goalh.finish({})
+            return
 
         try:
             string = goalh.data["string"]
@@ -273,31 +259,16 @@ class SpeakerController(BaseThing):
                 }
             }
         }
-        if self.info["mode"] == "mock":
-            now = time.time()
-            self.logger.info("Playing...")
-            while time.time() - now < 5:
-                if goalh.cancel_event.is_set():
-                    self.logger.info("Cancel got")
-                    self.blocked = False
-                    return ret
-                time.sleep(0.1)
-            self.logger.info("Playing done")
+        duration = 5 if self.info["mode"] in ["mock", "simulation"] else 0
+        self.logger.info("Playing...")
 
-        elif self.info["mode"] == "simulation":
-            now = time.time()
-            self.logger.info("Playing...")
-            while time.time() - now < 5:
-                if goalh.cancel_event.is_set():
-                    self.logger.info("Cancel got")
-                    self.blocked = False
-                    return ret
-                time.sleep(0.1)
-            self.logger.info("Playing done")
+        def done():
+            if goalh.cancel_event.is_set():
+                self.logger.info("Cancel got")
+            self.logger.info("%s Playing finished", self.name)
+            return ret
 
-        self.logger.info("%s Playing finished", self.name)
-        self.blocked = False
-        return ret
+        Scheduler.run_goal(goalh, [timestamp + duration], result = done)
 
     def start(self):
         """
@@ -308,8 +279,7 @@ class SpeakerController(BaseThing):
         Once the simulator has started, it logs a message indicating that the sensor has started.
         """
         self.logger.info("Sensor %s waiting to start", self.name)
-        while not self.simulator_started:
-            time.sleep(1)
+        self.wait_simulation_started()
         self.logger.info("Sensor %s started", self.name)
 
     def stop(self):
@@ -17,3 +17,4 @@ from .text import TextActor
 from .rfid_tag import RfidTagActor
 from .fire import FireActor
 from .water import WaterActor
+from .crowd import CrowdEngine
@@ -25,7 +25,7 @@ class ColorActor(BaseThing):
         host (str, optional): Host information if available in the configuration.
     Methods:
         set_tf_communication(package): Sets up the communication for the actor.
-        tf_declare_rpc.call(tf_package): Declares the actor's properties to the tf system.
+        declare_tf(tf_package): Declares the actor's properties to the tf system.
         commlib_factory.run(): Runs the communication library factory.
     Args:
         conf (dict, optional): Configuration dictionary for the actor.
@@ -39,7 +39,7 @@ class ColorActor(BaseThing):
             self.logger = package["logger"]
 
         super().__init__(conf['name'], auto_start=False)
-        id_ = BaseThing.id
+        id_ = self.thing_id
 
         self.set_tf_communication(package)
 
@@ -84,6 +84,6 @@ class ColorActor(BaseThing):
             # No other host type is available for env_devices
             tf_package['host_type'] = 'pan_tilt'
 
-        self.tf_declare_rpc.call(tf_package)
+        self.declare_tf(tf_package)
 
         self.commlib_factory.run()
@@ -0,0 +1,316 @@
+"""
+File that contains the crowd engine, which walks all the automated humans together.
+
+The humans follow their points with a social force model: every human is pulled
+towards its next point at its own speed, and pushed away from the nearby humans
+and from the walls of the map. All the humans are integrated together with NumPy
+once per tick and their poses are published in one message per tick, on the
+{namespace}.actor.crowd.poses.internal topic, which tf, the collision service and the
+UI notifier consume instead of the .pose.internal topics of the humans. Every human
+still publishes its PoseMsg on its own .pose topic.
+"""
+
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import time
+import logging
+import threading
+
+import numpy as np
+
+from stream_simulator.connectivity import CommlibFactory
+from stream_simulator.transformations import DistanceField
+
+class CrowdEngine:
+    """
+    Simulates the walking humans with a social force model.
+
+    Attributes:
+        namespace (str): The namespace of the simulation.
+        tick (float): The period of the simulation steps, in seconds.
+        distance_field (DistanceField): The distances to the walls, None without a map.
+        names (list): The names of the humans.
+        actors (list): The actors of the humans, updated with their poses (or None).
+        routes (list): The route of every human: points, index, reverse and loop flags.
+        pos (numpy.ndarray): (N, 2) positions, in meters.
+        vel (numpy.ndarray): (N, 2) velocities, in m/s.
+        theta (numpy.ndarray): (N,) orientations, in radians.
+        speed (numpy.ndarray): (N,) desired speeds, in m/s.
+        goal (numpy.ndarray): (N, 2) the points the humans walk to.
+        walking (numpy.ndarray): (N,) False for the humans that reached their last point.
+        initial (list): The initial position and points of every human, for reset.
+    """
+    RADIUS = 0.25 # meters
+    # Relaxation time of the velocity to the desired one, in seconds
+    TAU = 0.5
+    # Strength (m/s^2) and range (m) of the repulsion between humans
+    REPULSION = 2.0
+    REPULSION_RANGE = 0.3
+    # Strength (m/s^2) and range (m) of the repulsion of the walls
+    WALL_REPULSION = 5.0
+    WALL_RANGE = 0.2
+    # Humans further than this do not interact, in meters
+    CUTOFF = 2.0
+    # A point is reached within this distance, in meters
+    REACHED = 0.3
+    MAX_SPEED_FACTOR = 1.3
+    # Rows of humans whose interactions are computed together
+    BLOCK = 32
+
+    def __init__(self, namespace, map_ = None, resolution = None, precision_mode = False):
+        self.logger = logging.getLogger(__name__)
+        self.namespace = namespace
+        self.tick = 0.1 if precision_mode is False else 0.01
+        self.distance_field = None
+        if map_ is not None:
+            self.distance_field = DistanceField.for_map(map_, resolution)
+
+        self.names = []
+        self.actors = []
+        self.routes = []
+        self.pos = np.zeros((0, 2))
+        self.vel = np.zeros((0, 2))
+        self.theta = np.zeros(0)
+        self.speed = np.zeros(0)
+        self.goal = np.zeros((0, 2))
+        self.walking = np.zeros(0, bool)
+        self.initial = []
+
+        self.resolution = resolution
+        self.lock = threading.Lock()
+        self.running = False
+        self.thread = None
+
+        self.commlib_factory = CommlibFactory(node_name = "Crowd")
+        self.poses_pub = self.commlib_factory.get_publisher(
+            topic = f"{self.namespace}.actor.crowd.poses.internal"
+        )
+
+    def add(self, actor):
+        """
+        Walks an automated actor with the crowd, instead of its own thread.
+
+        Args:
+            actor (BaseActor): The actor, with its automation points already in meters.
+        """
+        self.add_walker(actor.name, actor._x, actor._y, actor.automation['points'], \
+            actor.automation['linear'], actor.automation.get('reverse', False), \
+            actor.automation.get('loop', False), actor = actor)
+
+    def add_walker(self, name, x, y, points, speed, reverse = False, loop = False, \
+        actor = None):
+        """
+        Adds a human to the crowd.
+
+        Args:
+            name (str): The name of the human.
+            x (float): The x coordinate, in meters.
+            y (float): The y coordinate, in meters.
+            points (list): The {'x', 'y'} points to walk through, in meters.
+            speed (float): The desired speed, in m/s.
+            reverse (bool): Walk the points back when the last one is reached.
+            loop (bool): Start over when the route ends.
+            actor (BaseActor): The actor to update with the poses, if any.
+        """
+        with self.lock:
+            self.names.append(name)
+            self.actors.append(actor)
+            self.routes.append({
+                'points': list(points), 'index': 0, 'reverse': reverse,
+                'loop': loop, 'reversed': False
+            })
+            first = points[0] if points else {'x': x, 'y': y}
+            self.pos = np.vstack([self.pos, [x, y]])
+            self.vel = np.vstack([self.vel, [0.0, 0.0]])
+            self.theta = np.append(self.theta, 0.0)
+            self.speed = np.append(self.speed, float(speed))
+            self.goal = np.vstack([self.goal, [first['x'], first['y']]])
+            self.walking = np.append(self.walking, len(points) > 0)
+            self.initial.append((x, y, list(points)))
+
+    def reset(self):
+        """
+        Puts the humans back at their initial positions, at the start of their routes.
+        """
+        with self.lock:
+            for k, (x, y, points) in enumerate(self.initial):
+                self.routes[k].update({'points': list(points), 'index': 0, 'reversed': False})
+                first = points[0] if points else {'x': x, 'y': y}
+                self.pos[k] = (x, y)
+                self.goal[k] = (first['x'], first['y'])
+                self.walking[k] = len(points) > 0
+            self.vel[:] = 0.0
+            self.theta[:] = 0.0
+        self.publish(teleport = True)
+
+    def __len__(self):
+        return len(self.names)
+
+    def _next_point(self, k):
+        """
+        Moves the route of a human to its next point, the same way the actors do.
+
+        Returns:
+            dict: The next point, or None if the route ended.
+        """
+        route = self.routes[k]
+        points = route['points']
+        if route['index'] < len(points) - 1:
+            route['index'] += 1
+            return points[route['index']]
+        if route['reverse'] and (not route['reversed'] or route['loop']):
+            points.reverse()
+            route['reversed'] = not route['reversed']
+        elif not route['loop']:
+            return None
+        route['index'] = 0
+        return points[0]
+
+    def _repulsion(self, pos):
+        """
+        The repulsion of the nearby humans, computed per block of humans against the
+        humans within the cutoff in x.
+        """
+        force = np.zeros_like(pos)
+        order = np.argsort(pos[:, 0], kind = "stable")
+        xs = pos[order, 0]
+        for start in range(0, len(pos), self.BLOCK):
+            rows = order[start:start + self.BLOCK]
+            lo = np.searchsorted(xs, xs[start] - self.CUTOFF)
+            hi = np.searchsorted(xs, xs[min(start + self.BLOCK, len(pos)) - 1] + self.CUTOFF, \
+                side = "right")
+            cols = order[lo:hi]
+            diff = pos[rows, None, :] - pos[None, cols, :]
+            dist = np.hypot(diff[..., 0], diff[..., 1])
+            near = (dist < self.CUTOFF) & (dist > 1e-9)
+            magnitude = np.where(near, self.REPULSION * \
+                np.exp((2 * self.RADIUS - dist) / self.REPULSION_RANGE), 0.0)
+            force[rows] = (magnitude[..., None] * diff / np.maximum(dist, 1e-9)[..., None]) \
+                .sum(axis = 1)
+        return force
+
+    def _wall_repulsion(self, pos):
+        """
+        The repulsion of the walls, along the gradient of the distance field.
+        """
+        if self.distance_field is None or len(pos) == 0:
+            return np.zeros_like(pos)
+        field = self.distance_field
+        width, height = field.map.shape
+        cx = np.clip((pos[:, 0] / field.resolution).astype(int), 1, width - 2)
+        cy = np.clip((pos[:, 1] / field.resolution).astype(int), 1, height - 2)
+        dist = field.distances(cx, cy) * field.resolution
+        grad = np.stack([
+            field.distances(cx + 1, cy) - field.distances(cx - 1, cy),
+            field.distances(cx, cy + 1) - field.distances(cx, cy - 1),
+        ], axis = 1)
+        norm = np.hypot(grad[:, 0], grad[:, 1])
+        magnitude = np.where(norm > 0, self.WALL_REPULSION * \
+            np.exp((self.RADIUS - dist) / self.WALL_RANGE), 0.0)
+        return magnitude[:, None] * grad / np.maximum(norm, 1e-9)[:, None]
+
+    def step(self, dt):
+        """
+        Advances all the humans by a time step.
+
+        Args:
+            dt (float): The time step, in seconds.
+
+        Returns:
+            bool: True if any human moved.
+        """
+        with self.lock:
+            if len(self.names) == 0 or not self.walking.any():
+                return False
+            # Goal attraction at the desired speed
+            to_goal = self.goal - self.pos
+            dist = np.hypot(to_goal[:, 0], to_goal[:, 1])
+            desired = self.speed[:, None] * to_goal / np.maximum(dist, 1e-9)[:, None]
+            desired[~self.walking] = 0.0
+            force = (desired - self.vel) / self.TAU
+            force += self._repulsion(self.pos)
+            force += self._wall_repulsion(self.pos)
+
+            self.vel += force * dt
+            speed = np.hypot(self.vel[:, 0], self.vel[:, 1])
+            limit = self.MAX_SPEED_FACTOR * self.speed
+            over = speed > limit
+            self.vel[over] *= (limit[over] / speed[over])[:, None]
+            self.vel[~self.walking] = 0.0
+            self.pos += self.vel * dt
+            moving = np.hypot(self.vel[:, 0], self.vel[:, 1]) > 1e-3
+            self.theta[moving] = np.arctan2(self.vel[moving, 1], self.vel[moving, 0])
+
+            # The humans that reached their point go on with their route
+            reached = self.walking & \
+                (np.hypot(*(self.goal - self.pos).T) < self.REACHED)
+            for k in np.flatnonzero(reached).tolist():
+                point = self._next_point(k)
+                if point is None:
+                    self.walking[k] = False
+                else:
+                    self.goal[k] = (point['x'], point['y'])
+            return True
+
+    def publish(self, teleport = False):
+        """
+        Publishes the poses of all the humans in one message, and updates the actors,
+        which publish their own PoseMsg.
+
+        Args:
+            teleport (bool): Whether the humans were moved at once, not walked.
+        """
+        with self.lock:
+            xs = self.pos[:, 0].tolist()
+            ys = self.pos[:, 1].tolist()
+            thetas = self.theta.tolist()
+            names = list(self.names)
+            actors = list(self.actors)
+        for actor, x, y, theta in zip(actors, xs, ys, thetas):
+            if actor is not None:
+                actor._x, actor._y, actor._theta = x, y, theta # pylint: disable=protected-access
+                actor.publish_pose()
+        msg = {
+            "poses": [
+                {"name": n, "raw_name": n, "x": x, "y": y, "theta": t}
+                for n, x, y, t in zip(names, xs, ys, thetas)
+            ],
+            "resolution": self.resolution,
+            "timestamp": time.time(),
+        }
+        if teleport:
+            msg["teleport"] = True
+        self.poses_pub.publish(msg)
+
+    def start(self):
+        """
+        Starts walking the crowd.
+        """
+        self.commlib_factory.run()
+        self.running = True
+        self.thread = threading.Thread(target = self.crowd_thread, daemon = True)
+        self.thread.start()
+        self.logger.info("Crowd of %s humans started", len(self.names))
+
+    def crowd_thread(self):
+        """
+        Steps and publishes the crowd once per tick, in real time.
+        """
+        t = time.time()
+        while self.running:
+            dt = min(time.time() - t, 5 * self.tick)
+            t = time.time()
+            try:
+                if self.step(dt):
+                    self.publish()
+            except Exception as e: # pylint: disable=broad-exception-caught
+                self.logger.error("Crowd step failed: %s", str(e))
+            time.sleep(max(0, self.tick - (time.time() - t)))
+
+    def stop(self):
+        """
+        Stops the crowd.
+        """
+        self.running = False
+        self.commlib_factory.stop()
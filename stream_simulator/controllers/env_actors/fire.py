@@ -20,6 +20,8 @@ class FireActor(BaseThing):
         temperature (int): Temperature of the fire actor. Defaults to 150 if not 
             specified in the configuration.
         range (int): Range of the fire actor. Defaults to 100 if not specified in the configuration.
+        video (str): Optional video file (absolute or in the resources) streamed by the
+            cameras that see the fire.
         host (str): Host information if available in the configuration.
     Methods:
         __init__(conf=None, package=None): Initializes the FireActor instance with 
@@ -32,7 +34,7 @@ class FireActor(BaseThing):
             self.logger = package["logger"]
 
         super().__init__(conf['name'], auto_start=False)
-        id_ = BaseThing.id
+        id_ = self.thing_id
 
         self.set_tf_communication(package)
 
@@ -54,6 +56,7 @@ class FireActor(BaseThing):
 
         self.temperature = 150 if 'temperature' not in conf else conf['temperature']
         self.range = 100 if 'range' not in conf else conf['range']
+        self.video = conf.get('video', None)
 
         # tf handling
         tf_package = {
@@ -64,7 +67,8 @@ class FireActor(BaseThing):
             "range": self.range,
             "id": self.id,
             "properties": {
-                "temperature": self.temperature
+                "temperature": self.temperature,
+                "video": self.video
             }
         }
 
@@ -75,6 +79,6 @@ class FireActor(BaseThing):
             # No other host type is available for env_devices
             tf_package['host_type'] = 'pan_tilt'
 
-        self.tf_declare_rpc.call(tf_package)
+        self.declare_tf(tf_package)
 
         self.commlib_factory.run()
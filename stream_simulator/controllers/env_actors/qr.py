@@ -31,7 +31,7 @@ class QrActor(BaseThing):
             self.logger = package["logger"]
 
         super().__init__(conf['name'], auto_start=False)
-        id_ = BaseThing.id
+        id_ = self.thing_id
 
         self.set_tf_communication(package)
 
@@ -71,6 +71,6 @@ class QrActor(BaseThing):
             # No other host type is available for env_devices
             tf_package['host_type'] = 'pan_tilt'
 
-        self.tf_declare_rpc.call(tf_package)
+        self.declare_tf(tf_package)
 
         self.commlib_factory.run()
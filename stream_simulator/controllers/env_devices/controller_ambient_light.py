@@ -6,12 +6,11 @@ File that contains the ambient light controller.
 # -*- coding: utf-8 -*-
 
 import time
-import math
 import logging
 import threading
 import random
 
-from stream_simulator.base_classes import BaseThing
+from stream_simulator.base_classes import BaseThing, MockSignals
 
 class EnvAmbientLightController(BaseThing):
     """
@@ -32,7 +31,8 @@ class EnvAmbientLightController(BaseThing):
         host (str): Host information.
         prev (float): Previous value for certain operations.
         way (int): Direction for triangle operation.
-        sensor_read_thread (threading.Thread): Thread for reading sensor data.
+        sensor_read_thread (threading.Thread): Thread for reading simulated sensor data.
+        signal (int): The id of the mock signal of the sensor in the shared MockSignals.
     Methods:
         __init__(conf=None, package=None): Initializes the controller with 
             configuration and package.
@@ -79,7 +79,6 @@ class EnvAmbientLightController(BaseThing):
         self.derp_data_key = info["base_topic"] + ".raw"
         self.env_properties = package["env"]
 
-        self.mock_parameters = {}
 
         self.tf_luminosity_rpc = None
         self.set_communication_layer(package)
@@ -105,17 +104,10 @@ class EnvAmbientLightController(BaseThing):
             tf_package['host_type'] = 'pan_tilt'
 
 
-        self.tf_declare_rpc.call(tf_package)
-
-        if self.operation == "triangle":
-            self.prev = self.operation_parameters["triangle"]['min']
-            self.way = 1
-        elif self.operation == "sinus":
-            self.prev = 0
-        else:
-            self.prev = None
+        self.declare_tf(tf_package)
 
         self.sensor_read_thread = None
+        self.signal = None
         self.stopped = False
         self.state = conf['state'] if 'state' in conf else 'on'
 
@@ -144,101 +136,37 @@ class EnvAmbientLightController(BaseThing):
 
     def sensor_read(self):
         """
-        Reads sensor data and publishes the value at a specified frequency.
-        This method operates in two modes: "mock" and "simulation". In "mock" mode, it generates
-        sensor values based on predefined operation parameters such as constant, random, normal,
-        triangle, and sinusoidal values. In "simulation" mode, it interacts with an external
-        service to get environmental data and adjusts the luminosity based on the response.
-        The method runs in a loop, reading sensor data and publishing it until the 
-        sensor is disabled.
-        Attributes:
-            self.constant_value (float): Constant value for the sensor in "mock" mode.
-            self.random_min (float): Minimum value for random generation in "mock" mode.
-            self.random_max (float): Maximum value for random generation in "mock" mode.
-            self.triangle_min (float): Minimum value for triangle wave generation in "mock" mode.
-            self.triangle_max (float): Maximum value for triangle wave generation in "mock" mode.
-            self.triangle_step (float): Step value for triangle wave generation in "mock" mode.
-            self.normal_std (float): Standard deviation for normal distribution in "mock" mode.
-            self.normal_mean (float): Mean value for normal distribution in "mock" mode.
-            self.sinus_dc (float): DC offset for sinusoidal wave in "mock" mode.
-            self.sinus_amp (float): Amplitude for sinusoidal wave in "mock" mode.
-            self.sinus_step (float): Step value for sinusoidal wave in "mock" mode.
-            self.hz (float): Frequency at which the sensor reads data.
-            self.mode (str): Mode of operation, either "mock" or "simulation".
-            self.operation (str): Type of operation for generating sensor values in "mock" mode.
-            self.info (dict): Dictionary containing sensor status information.
-            self.env_properties (dict): Dictionary containing environmental properties.
-            self.publisher (object): Publisher object for publishing sensor data.
-            self.logger (object): Logger object for logging information.
-        Raises:
-            Warning: If an unsupported operation is specified in "mock" mode.
+        Reads the simulated luminosity and publishes it at the frequency of the sensor,
+        until the sensor is disabled. The luminosity is the one of the environment at
+        the place of the sensor, with a small noise. In "mock" mode the values come from
+        the shared MockSignals instead, see start.
         """
         self.logger.info("Sensor %s read thread started", self.name)
 
-        # Operation parameters
-        if self.mode == "mock":
-            self.mock_parameters = {
-                "constant_value": self.operation_parameters["constant"]['value'],
-                "random_min": self.operation_parameters["random"]['min'],
-                "random_max": self.operation_parameters["random"]['max'],
-                "triangle_min": self.operation_parameters["triangle"]['min'],
-                "triangle_max": self.operation_parameters["triangle"]['max'],
-                "triangle_step": self.operation_parameters["triangle"]['step'],
-                "normal_std": self.operation_parameters["normal"]['std'],
-                "normal_mean": self.operation_parameters["normal"]['mean'],
-                "sinus_dc": self.operation_parameters["sinus"]['dc'],
-                "sinus_amp": self.operation_parameters["sinus"]['amplitude'],
-                "sinus_step": self.operation_parameters["sinus"]['step']
-            }
-
-        val = None
         while self.info["enabled"]:
             time.sleep(1.0 / self.hz)
-
-            if self.state is None or self.state == "off":
-                continue
-
-            if self.mode in ["mock"]:
-                if self.operation == "constant":
-                    val = self.mock_parameters['constant_value']
-                elif self.operation == "random":
-                    val = random.uniform(
-                        self.mock_parameters['random_min'],
-                        self.mock_parameters['random_max']
-                    )
-                elif self.operation == "normal":
-                    val = random.gauss(
-                        self.mock_parameters['normal_mean'],
-                        self.mock_parameters['normal_std']
-                    )
-                elif self.operation == "triangle":
-                    val = self.prev + self.way * self.mock_parameters['triangle_step']
-                    if val >= self.mock_parameters['triangle_max'] or \
-                        val <= self.mock_parameters['triangle_min']:
-                        self.way *= -1
-                    self.prev = val
-                elif self.operation == "sinus":
-                    val = self.mock_parameters['sinus_dc'] + \
-                        self.mock_parameters['sinus_amp'] * math.sin(self.prev)
-                    self.prev += self.mock_parameters['sinus_step']
-                else:
-                    self.logger.warning("Unsupported operation: %s", self.operation)
-
-            elif self.mode == "simulation":
+            if self.mode == "simulation":
                 res = self.tf_luminosity_rpc.call({
                     'name': self.name
                 })
-                val = res["luminosity"] + random.uniform(-0.25, 0.25)
-                # print(val)
-
-            # Publishing value:
-            self.publisher.publish({
-                "value": val,
-                "timestamp": time.time()
-            })
+                self.publish_value(res["luminosity"] + random.uniform(-0.25, 0.25))
 
         self.stopped = True
 
+    def publish_value(self, value):
+        """
+        Publishes a value of the sensor, unless the sensor is off.
+
+        Args:
+            value (float): The value.
+        """
+        if self.state is None or self.state == "off":
+            return
+        self.publisher.publish({
+            "value": value,
+            "timestamp": time.time()
+        })
+
     def get_callback(self, _):
         """
         Callback function to retrieve the current state.
@@ -270,13 +198,18 @@ class EnvAmbientLightController(BaseThing):
                 from the ambient light sensor.
         """
         self.logger.info("Sensor %s waiting to start", self.name)
-        while not self.simulator_started:
-            time.sleep(1)
+        self.wait_simulation_started()
         self.logger.info("Sensor %s started", self.name)
 
         if self.info["enabled"]:
-            self.sensor_read_thread = threading.Thread(target = self.sensor_read)
-            self.sensor_read_thread.start()
+            if self.mode == "mock":
+                # The mock values come from the shared bank, without a thread
+                self.signal = MockSignals.shared().add(
+                    self.operation, self.operation_parameters[self.operation], self.hz, \
+                    self.publish_value)
+            else:
+                self.sensor_read_thread = threading.Thread(target = self.sensor_read)
+                self.sensor_read_thread.start()
 
     def stop(self):
         """
@@ -291,6 +224,10 @@ class EnvAmbientLightController(BaseThing):
         - Stops the `set_mode_rpc_server`.
         """
         self.info["enabled"] = False
+        if self.signal is not None:
+            MockSignals.shared().remove(self.signal)
+            self.signal = None
+            self.stopped = True
         while not self.stopped:
             time.sleep(0.1)
         super().stop()
@@ -99,10 +99,12 @@ class EnvAreaAlarmController(BaseThing):
         self.set_communication_layer(package)
         self.commlib_factory.run()
 
-        self.tf_declare_rpc.call(tf_package)
+        self.declare_tf(tf_package)
 
         self.sensor_read_thread = None
         self.stopped = False
+        # The number of triggers since the start or the last reset
+        self.triggers = 0
 
         self.state = conf['state'] if 'state' in conf else 'on'
 
@@ -153,7 +155,6 @@ class EnvAreaAlarmController(BaseThing):
         """
         self.logger.info("Sensor %s read thread started", self.name)
         prev = []
-        triggers = 0
 
         while self.info["enabled"]:
             time.sleep(1.0 / self.hz)
@@ -177,9 +178,9 @@ class EnvAreaAlarmController(BaseThing):
                 "timestamp": time.time()
             })
             if not prev and val not in [None, []]:
-                triggers += 1
+                self.triggers += 1
                 self.publisher_triggers.publish({
-                    "value": triggers,
+                    "value": self.triggers,
                     "timestamp": time.time(),
                     "trigger": val,
                     "name": self.name,
@@ -189,6 +190,13 @@ class EnvAreaAlarmController(BaseThing):
 
         self.stopped = True
 
+    def reset(self):
+        """
+        Zeroes the trigger count of the alarm.
+        """
+        self.triggers = 0
+        super().reset()
+
     def start(self):
         """
         Starts the sensor and its associated processes.
@@ -203,8 +211,7 @@ class EnvAreaAlarmController(BaseThing):
             sensor_read_thread (threading.Thread): Thread for reading sensor data.
         """
         self.logger.info("Sensor %s waiting to start", self.name)
-        while not self.simulator_started:
-            time.sleep(1)
+        self.wait_simulation_started()
         self.logger.info("Sensor %s started", self.name)
 
         if self.info["enabled"]:
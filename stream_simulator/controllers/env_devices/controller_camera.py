@@ -8,14 +8,12 @@ File that contains the camera controller.
 import time
 import logging
 import threading
-import random
-import os
-import base64
-import numpy as np
-import qrcode
-import cv2
 
 from stream_simulator.base_classes import BaseThing
+from stream_simulator.controllers.camera_frames import affection_frame, affection_image, \
+    file_frame, frame_image
+from stream_simulator.controllers.camera_render import CameraRenderer
+from stream_simulator.connectivity.frame_ring import FrameRing, ring_name
 
 class EnvCameraController(BaseThing):
     """
@@ -38,6 +36,10 @@ class EnvCameraController(BaseThing):
         env_properties (dict): Environmental properties.
         host (str): Host information.
         images (dict): Dictionary of image resources.
+        renderer (CameraRenderer): Renders the frames from the world state if the `render`
+            option (perspective or topdown) is set, None otherwise.
+        frame_ring (FrameRing): If the `frame_transport` option is `shm`, the raw frames are
+            written in this shared memory ring and only their descriptors are published.
     Methods:
         __init__(conf=None, package=None):
             Initializes the EnvCameraController with the given configuration and package.
@@ -88,6 +90,16 @@ class EnvCameraController(BaseThing):
         self.env_properties = package['env']
         self.generating_images = False
 
+        self.renderer = None
+        if conf.get('render') is not None and self.mode == "simulation":
+            self.renderer = CameraRenderer(conf['render'], package["map"], \
+                package["resolution"], self.width, self.height, self.fov, self.range)
+
+        self.frame_ring = None
+        if conf.get('frame_transport', 'json') == 'shm':
+            self.frame_ring = FrameRing(ring_name(self.base_topic), \
+                self.width * self.height * 3, conf.get('shm_slots', 4))
+
         tf_package = {
             "type": "env",
             "subtype": {
@@ -128,7 +140,7 @@ class EnvCameraController(BaseThing):
 
         self.commlib_factory.run()
 
-        self.tf_declare_rpc.call(tf_package)
+        self.declare_tf(tf_package)
 
         # The images
         self.images = {
@@ -199,7 +211,7 @@ class EnvCameraController(BaseThing):
         he behavior of the method
         depends on the mode of the sensor, which can be either "mock" or "simulation".
         In "mock" mode:
-            - Reads a predefined image file and encodes it in base64 format.
+            - Publishes a predefined image file, encoded in base64 format.
         In "simulation" mode:
             - Calls a remote procedure to get information about nearby objects.
             - Determines the closest object and its type (e.g., human, QR code, 
@@ -210,14 +222,13 @@ class EnvCameraController(BaseThing):
                 - For barcodes, uses a predefined barcode image.
                 - For colors, creates an image filled with the specified color.
                 - For text, generates an image with the specified text centered.
-            - Encodes the generated image in base64 format.
+            - Encodes the generated image in base64 format. Generation and encoding
+            happen in memory and the encoded frames are cached (see camera_frames).
         The method publishes the encoded image data along with metadata such as 
         timestamp, format, width, and height.
-        Raises:
-            Exception: If there is an error generating the text image in "simulation" mode.
         Logs:
             - Information about the start of the sensor read thread.
-            - Errors related to QR code generation and text image generation.
+            - Errors related to the image generation, in which case the frame is skipped.
         """
         self.logger.info("Sensor %s read thread started", self.name)
         width = self.width
@@ -229,14 +240,11 @@ class EnvCameraController(BaseThing):
             if self.state is None or self.state == "off":
                 continue
             
-            dirname = os.path.dirname(__file__) + "/../.."
-            data = None
+            data = None # base64 encoded frame
+            image = None # raw frame
 
             if self.mode == "mock":
-                with open(dirname + '/resources/all.png', "rb") as f:
-                    fdata = f.read()
-                    b64 = base64.b64encode(fdata)
-                    data = b64.decode()
+                data = file_frame("all.png")
             elif self.mode == "simulation":
                 # Ask tf for proximity sound sources or humans
                 res = self.tf_affection_rpc.call({
@@ -254,91 +262,58 @@ class EnvCameraController(BaseThing):
 
                 if clos is None:
                     cl_type = None
+                    info = None
                 else:
                     cl_type = affections[clos]['type']
-
-                # print("Closest: ", clos, clos_d, cl_type)
+                    info = affections[clos]['info']
 
                 # types: qr, barcode, color, text, human
-                if cl_type is None:
-                    img = "all.jpg"
-                elif cl_type == "human":
-                    img = random.choice(["face.jpg", "face_inverted.jpg"])
-                elif cl_type == "qr":
-                    try:
-                        im = qrcode.make(affections[clos]["info"]["message"])
-                    except: # pylint: disable=bare-except
-                        self.logger.error(\
-                            "QR creator could not produce string or qrcode \
-                                library is not installed")
-                    im.save(dirname + "/resources/qr_tmp.png")
-                    img = "qr_tmp.png"
-                elif cl_type == "barcode":
-                    img = "barcode.jpg"
-                elif cl_type == 'color':
-                    img = 'col_tmp.png'
-                    tmp = np.zeros((height, width, 3), np.uint8)
-                    tmp[:] = (
-                        affections[clos]['info']["b"],
-                        affections[clos]['info']["g"],
-                        affections[clos]['info']["r"]
-                    )
-                    cv2.imwrite(dirname + "/resources/" + img, tmp) # pylint: disable=no-member
-                elif cl_type == "text":
-                    img = 'txt_temp.png'
-                    try:
-                        image = np.zeros((height, width, 3), dtype=np.uint8)
-                        # Define the text and its properties
-                        final_text = affections[clos]['info']["text"]
-                        font = cv2.FONT_HERSHEY_SIMPLEX # pylint: disable=no-member
-                        font_scale = 2
-                        color = (255, 255, 255)  # White color
-                        thickness = 3
-
-                        # Calculate text size and position to center it
-                        # Also adjust to text size
-                        x = -1
-                        while x < 0:
-                            # pylint: disable=no-member
-                            (text_width, text_height), _ = \
-                                cv2.getTextSize(final_text, font, font_scale, thickness)
-                            x = (width - text_width) // 2
-                            y = (height + text_height) // 2
-                            if x < 0:
-                                font_scale -= 0.1
-                                thickness = thickness - 1 if thickness > 1 else 1
-
-                        # Draw the text on the image
-                        # pylint: disable=no-member
-                        cv2.putText(image, final_text, (x, y), font, \
-                            font_scale, color, thickness, lineType=cv2.LINE_AA)
-
-                        # Save the image to a file
-                        cv2.imwrite(dirname + "/resources/" + img, image) # pylint: disable=no-member
-
-                    except Exception as e: # pylint: disable=broad-except
-                        self.logger.error("CameraController: Error with \
-                            text image generation: %s", str(e))
-
-                # print("Image: ", img)
-
-                with open(dirname + "/resources/" + img, "rb") as f:
-                    fdata = f.read()
-                    b64 = base64.b64encode(fdata)
-                    data = b64.decode()
-
-                    # Publishing value:
-                    self.publisher.publish({
-                        "value": {
-                            "timestamp": time.time(),
-                            "format": "RGB",
-                            "per_rows": True,
-                            "width": width,
-                            "height": height,
-                            "image": str(data)
-                        },
-                        "timestamp": time.time()
-                    })
+                try:
+                    if self.renderer is not None and res.get('pose'):
+                        if self.frame_ring is not None:
+                            image = self.renderer.render(res['pose'], affections)
+                        else:
+                            data = self.renderer.render_encoded(res['pose'], affections)
+                    elif self.frame_ring is not None:
+                        image = affection_image(cl_type, info, width, height, \
+                            default = "all.jpg")
+                    else:
+                        data = affection_frame(cl_type, info, width, height, \
+                            default = "all.jpg")
+                except Exception as e: # pylint: disable=broad-except
+                    self.logger.error("CameraController: Error with %s image generation: %s",
+                                      cl_type, str(e))
+                    continue
+
+            if self.frame_ring is not None and (data is not None or image is not None):
+                if image is None:
+                    image = frame_image(data, width, height)
+                descriptor = self.frame_ring.write(image)
+                # Only the descriptor of the raw frame goes over the broker
+                self.publisher.publish({
+                    "value": {
+                        "timestamp": descriptor["timestamp"],
+                        "format": "BGR",
+                        "per_rows": True,
+                        "width": width,
+                        "height": height,
+                        "shm": descriptor
+                    },
+                    "timestamp": time.time()
+                })
+            elif data is not None:
+                # Publishing value:
+                self.publisher.publish({
+                    "value": {
+                        "timestamp": time.time(),
+                        "format": "RGB",
+                        "per_rows": True,
+                        "width": width,
+                        "height": height,
+                        "image": data
+                    },
+                    "timestamp": time.time()
+                })
 
         self.stopped = True
 
@@ -356,11 +331,11 @@ class EnvCameraController(BaseThing):
             sensor_read_thread (threading.Thread): Thread for reading sensor data.
         """
         self.logger.info("Sensor %s waiting to start", self.name)
-        while not self.simulator_started:
-            time.sleep(1)
+        self.wait_simulation_started()
         self.logger.info("Sensor %s started", self.name)
 
-        if self.info["enabled"] and "generate_images" in self.info and self.info["generate_images"]:
+        if self.info["enabled"] and (self.info.get("generate_images") or \
+                self.renderer is not None):
             self.generating_images = True
             self.sensor_read_thread = threading.Thread(target = self.sensor_read)
             self.sensor_read_thread.start()
@@ -377,5 +352,7 @@ class EnvCameraController(BaseThing):
         self.logger.warning("Sensor %s stopping", self.name)
         while not self.stopped and self.generating_images:
             time.sleep(0.1)
+        if self.frame_ring is not None:
+            self.frame_ring.close()
         super().stop()
         self.logger.warning("Sensor %s stopped", self.name)
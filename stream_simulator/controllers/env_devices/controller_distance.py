@@ -11,7 +11,7 @@ import logging
 import threading
 import random
 
-from stream_simulator.base_classes import BaseThing
+from stream_simulator.base_classes import BaseThing, MockSignals
 
 class EnvDistanceController(BaseThing):
     """
@@ -36,7 +36,8 @@ class EnvDistanceController(BaseThing):
         get_device_groups_rpc_topic (str): RPC topic to get device groups.
         host (str): Host of the sensor.
         get_tf (RPCClient): RPC client to get the transform.
-        sensor_read_thread (threading.Thread): Thread for reading sensor data.
+        sensor_read_thread (threading.Thread): Thread for reading simulated sensor data.
+        signal (int): The id of the mock signal of the sensor in the shared MockSignals.
     Methods:
         __init__(conf=None, package=None): Initializes the EnvDistanceController.
         set_communication_layer(package): Sets up the communication layer.
@@ -117,20 +118,12 @@ class EnvDistanceController(BaseThing):
 
         self.commlib_factory.run()
 
-        self.tf_declare_rpc.call(tf_package)
-
-        if self.operation == "triangle":
-            self.prev = self.operation_parameters["triangle"]['min']
-            self.way = 1
-        elif self.operation == "sinus":
-            self.prev = 0
-        else:
-            self.prev = None
+        self.declare_tf(tf_package)
 
         self.sensor_read_thread = None
+        self.signal = None
         self.stopped = False
         self.state = conf['state'] if 'state' in conf else 'on'
-        self.mock_parameters = {}
 
     def set_communication_layer(self, package):
         """
@@ -195,14 +188,11 @@ class EnvDistanceController(BaseThing):
         1. Retrieves all devices and checks if pan-tilts exist.
         2. Creates subscribers for each robot to get their poses.
         3. Logs the start of the sensor read thread.
-        4. Initializes operation parameters for different modes of operation.
-        5. Continuously reads sensor data at the specified frequency (`self.hz`).
-        Depending on the mode (`self.mode`), the sensor data is generated differently:
-        - "mock": Generates sensor data based on the specified operation type 
-          (constant, random, normal, triangle, sinus).
-        - "simulation": Simulates sensor data based on the sensor's pose and the 
-          positions of robots and obstacles in the map.
+        4. Continuously reads sensor data at the specified frequency (`self.hz`),
+           simulated from the sensor's pose and the positions of robots and obstacles
+           in the map.
         The generated sensor data is then published with a small random noise added.
+        In "mock" mode the values come from the shared MockSignals instead, see start.
         Parameters:
         None
         Returns:
@@ -225,22 +215,6 @@ class EnvDistanceController(BaseThing):
 
         self.logger.info("Sensor %s read thread started", self.name)
 
-        # Operation parameters
-        if self.mode == "mock":
-            self.mock_parameters = {
-                "constant_value": self.operation_parameters["constant"]['value'],
-                "random_min": self.operation_parameters["random"]['min'],
-                "random_max": self.operation_parameters["random"]['max'],
-                "triangle_min": self.operation_parameters["triangle"]['min'],
-                "triangle_max": self.operation_parameters["triangle"]['max'],
-                "triangle_step": self.operation_parameters["triangle"]['step'],
-                "normal_std": self.operation_parameters["normal"]['std'],
-                "normal_mean": self.operation_parameters["normal"]['mean'],
-                "sinus_dc": self.operation_parameters["sinus"]['dc'],
-                "sinus_amp": self.operation_parameters["sinus"]['amplitude'],
-                "sinus_step": self.operation_parameters["sinus"]['step']
-            }
-
         while self.info["enabled"]:
             time.sleep(1.0 / self.hz)
 
@@ -248,33 +222,7 @@ class EnvDistanceController(BaseThing):
                 continue
 
             val = None
-            if self.mode in ["mock"]:
-                if self.operation == "constant":
-                    val = self.mock_parameters['constant_value']
-                elif self.operation == "random":
-                    val = random.uniform(
-                        self.mock_parameters['random_min'],
-                        self.mock_parameters['random_max']
-                    )
-                elif self.operation == "normal":
-                    val = random.gauss(
-                        self.mock_parameters['normal_mean'],
-                        self.mock_parameters['normal_std']
-                    )
-                elif self.operation == "triangle":
-                    val = self.prev + self.way * self.mock_parameters['triangle_step']
-                    if val >= self.mock_parameters['triangle_max'] or \
-                        val <= self.mock_parameters['triangle_min']:
-                        self.way *= -1
-                    self.prev = val
-                elif self.operation == "sinus":
-                    val = self.mock_parameters['sinus_dc'] + \
-                        self.mock_parameters['sinus_amp'] * math.sin(self.prev)
-                    self.prev += self.mock_parameters['sinus_step']
-                else:
-                    self.logger.warning("Unsupported operation: %s", self.operation)
-
-            elif self.mode == "simulation":
+            if self.mode == "simulation":
                 # Get pose of the sensor (in case it is on a pan-tilt)
                 pp = self.get_tf.call({
                     "name": self.name
@@ -313,14 +261,24 @@ class EnvDistanceController(BaseThing):
                 val = d * self.resolution
 
             val += random.uniform(-0.02, 0.02)
-            # Publishing value:
-            self.publisher.publish({
-                "value": val,
-                "timestamp": time.time()
-            })
+            self.publish_value(val)
 
         self.stopped = True
 
+    def publish_value(self, value):
+        """
+        Publishes a value of the sensor, unless the sensor is off.
+
+        Args:
+            value (float): The value.
+        """
+        if self.state is None or self.state == "off":
+            return
+        self.publisher.publish({
+            "value": value,
+            "timestamp": time.time()
+        })
+
     def get_callback(self, _):
         """
         Callback function to handle incoming messages.
@@ -349,13 +307,18 @@ class EnvDistanceController(BaseThing):
             self.sensor_read_thread (Thread): Thread for reading sensor data.
         """
         self.logger.info("Sensor %s waiting to start", self.name)
-        while not self.simulator_started:
-            time.sleep(1)
+        self.wait_simulation_started()
         self.logger.info("Sensor %s started", self.name)
 
         if self.info["enabled"]:
-            self.sensor_read_thread = threading.Thread(target = self.sensor_read)
-            self.sensor_read_thread.start()
+            if self.mode == "mock":
+                # The mock values come from the shared bank, without a thread
+                self.signal = MockSignals.shared().add(
+                    self.operation, self.operation_parameters[self.operation], self.hz, \
+                    self.publish_value, jitter = 0.02)
+            else:
+                self.sensor_read_thread = threading.Thread(target = self.sensor_read)
+                self.sensor_read_thread.start()
 
     def stop(self):
         """
@@ -368,6 +331,10 @@ class EnvDistanceController(BaseThing):
         - set_mode_rpc_server
         """
         self.info["enabled"] = False
+        if self.signal is not None:
+            MockSignals.shared().remove(self.signal)
+            self.signal = None
+            self.stopped = True
         while not self.stopped:
             time.sleep(0.1)
         super().stop()
@@ -60,7 +60,7 @@ class EnvGasSensorController(BasicSensor):
             # No other host type is available for env_devices
             tf_package['host_type'] = 'pan_tilt'
 
-        self.tf_declare_rpc.call(tf_package)
+        self.declare_tf(tf_package)
 
         self.dynamic_value = None
 
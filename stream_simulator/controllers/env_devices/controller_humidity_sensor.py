@@ -61,7 +61,7 @@ class EnvHumiditySensorController(BasicSensor):
             # No other host type is available for env_devices
             tf_package['host_type'] = 'pan_tilt'
 
-        self.tf_declare_rpc.call(tf_package)
+        self.declare_tf(tf_package)
 
         self.dynamic_value = None
 
@@ -95,10 +95,12 @@ class EnvLinearAlarmController(BaseThing):
         self.set_communication_layer(package)
         self.commlib_factory.run()
 
-        self.tf_declare_rpc.call(tf_package)
+        self.declare_tf(tf_package)
 
         self.sensor_read_thread = None
         self.stopped = False
+        # The number of triggers since the start or the last reset
+        self.triggers = 0
         self.state = conf['state'] if 'state' in conf else 'on'
 
     def set_communication_layer(self, package):
@@ -139,7 +141,6 @@ class EnvLinearAlarmController(BaseThing):
         """
         self.logger.info("Sensor %s read thread started", self.name)
         prev = 0
-        triggers = 0
         while self.info["enabled"]:
             time.sleep(1.0 / self.hz)
 
@@ -166,9 +167,9 @@ class EnvLinearAlarmController(BaseThing):
             # print(f"Sensor {self.name} value: {val}")
 
             if prev is not None and val not in [None, []]:
-                triggers += 1
+                self.triggers += 1
                 self.publisher_triggers.publish({
-                    "value": triggers,
+                    "value": self.triggers,
                     "timestamp": time.time(),
                     "trigger": val,
                     "name": self.name,
@@ -178,6 +179,13 @@ class EnvLinearAlarmController(BaseThing):
 
         self.stopped = True
 
+    def reset(self):
+        """
+        Zeroes the trigger count of the alarm.
+        """
+        self.triggers = 0
+        super().reset()
+
     def start(self):
         """
         Starts the sensor and waits for the simulator to start.
@@ -190,8 +198,7 @@ class EnvLinearAlarmController(BaseThing):
             sensor_read_thread (threading.Thread): Thread for reading sensor data.
         """
         self.logger.info("Sensor %s waiting to start", self.name)
-        while not self.simulator_started:
-            time.sleep(1)
+        self.wait_simulation_started()
         self.logger.info("Sensor %s started", self.name)
 
         if self.info["enabled"]:
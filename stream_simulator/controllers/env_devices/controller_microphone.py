@@ -7,11 +7,12 @@ File that contains the microphone controller.
 
 import time
 import logging
-from pathlib import Path
 import base64
-# import wave
 
-from stream_simulator.base_classes import BaseThing
+from stream_simulator.base_classes import BaseThing, Scheduler
+from stream_simulator.connectivity import CommlibFactory, GoalQueue
+from stream_simulator.controllers.audio_pipeline import AudioMixer, AcousticMap, chunk_plan, \
+    record_goal, SAMPLE_RATE, SAMPLE_FORMAT
 
 class EnvMicrophoneController(BaseThing):
     """
@@ -25,7 +26,12 @@ class EnvMicrophoneController(BaseThing):
         place (str): Place where the microphone sensor is located.
         pose (dict): Pose information of the microphone sensor.
         host (str): Host information if available.
-        blocked (bool): Flag to indicate if the microphone is blocked.
+        goal_queue (GoalQueue): The record goals, executed one at a time.
+        chunk_duration (float): Duration in seconds of the audio chunks streamed while
+            recording (`chunk_duration` option, default 0.25).
+        acoustic_map (AcousticMap): The walls attenuating the sound heard.
+        range (float): The distance in meters up to which speech is detected (`range`
+            option, default 4.0).
     Methods:
         __init__(conf=None, package=None):
             Initializes the EnvMicrophoneController with configuration and package information.
@@ -43,8 +49,6 @@ class EnvMicrophoneController(BaseThing):
             Stops the microphone sensor.
         on_goal_record(goalh):
             Handles the goal for recording audio.
-        load_wav(path):
-            Loads a WAV file and returns its base64 encoded content.
     """
     def __init__(self,
                  conf = None,
@@ -74,6 +78,9 @@ class EnvMicrophoneController(BaseThing):
         self.pose = info["conf"]["pose"]
 
         self.state = conf['state'] if 'state' in conf else 'on'
+        self.chunk_duration = float(conf.get('chunk_duration', 0.25))
+        self.acoustic_map = AcousticMap(package.get("map"), package["resolution"])
+        self.range = float(conf.get('range', 4.0))
 
         # tf handling
         tf_package = {
@@ -86,7 +93,8 @@ class EnvMicrophoneController(BaseThing):
             "pose": self.pose,
             "base_topic": self.base_topic,
             "name": self.name,
-            "namespace": package["namespace"]
+            "namespace": package["namespace"],
+            "range": self.range
         }
 
         self.host = None
@@ -96,6 +104,9 @@ class EnvMicrophoneController(BaseThing):
             # No other host type is available for env_devices
             tf_package['host_type'] = 'pan_tilt'
 
+        # The record goals are executed one at a time
+        self.goal_queue = GoalQueue(self.name)
+
         self.set_communication_layer(package)
 
         self.detection_subscriber = self.commlib_factory.get_subscriber(
@@ -112,9 +123,7 @@ class EnvMicrophoneController(BaseThing):
 
         self.commlib_factory.run()
 
-        self.tf_declare_rpc.call(tf_package)
-
-        self.blocked = False
+        self.declare_tf(tf_package)
 
     def detection_callback(self, message):
         """
@@ -161,7 +170,8 @@ class EnvMicrophoneController(BaseThing):
 
         self.record_action_server = self.commlib_factory.get_action_server(
             callback = self.on_goal_record,
-            action_name = self.base_topic + ".record"
+            action_name = self.base_topic + ".record",
+            goal_queue = self.goal_queue
         )
         self.record_pub = self.commlib_factory.get_publisher(
             topic = self.base_topic + ".record.notify"
@@ -180,13 +190,19 @@ class EnvMicrophoneController(BaseThing):
                 - "speaker" (str): The source of the speech.
                 - "text" (str): The detected speech text.
                 - "language" (str): The language of the detected speech.
+                - "timestamp" (float): The time the speaker published the speech, if known.
 
         Logs:
             Logs the detected speech information including the source, language, and text.
+            The latency from the speaker to the microphone is accounted for in the traffic
+            statistics (`delivery`).
         """
         source = message["speaker"]
         text = message["text"]
         language = message["language"]
+        if message.get("timestamp") is not None:
+            CommlibFactory.traffic.record_delivery(
+                self.base_topic + ".speech_detected", message["timestamp"])
         self.logger.info("Speech detected from %s [%s]: %s", source, language, text)
 
     def start(self):
@@ -199,8 +215,7 @@ class EnvMicrophoneController(BaseThing):
         Note: The RPC server actions (enable, disable, record) are currently commented out.
         """
         self.logger.info("Sensor %s waiting to start", self.name)
-        while not self.simulator_started:
-            time.sleep(1)
+        self.wait_simulation_started()
         self.logger.info("Sensor %s started", self.name)
 
     def stop(self):
@@ -221,36 +236,36 @@ class EnvMicrophoneController(BaseThing):
     def on_goal_record(self, goalh):
         """
         Handles the goal to start recording from the microphone.
+        The goals are queued and executed one at a time, and the recording is driven by
+        the simulation scheduler, so no thread is held while recording.
         Args:
             goalh (GoalHandle): The goal handle containing the recording parameters.
         Returns:
-            dict: A dictionary containing the timestamp of the recording and, if applicable, the 
-            recorded data and volume.
+            None: The goal is finished with a dictionary containing the timestamp of the
+            recording and, if applicable, the recorded data and volume.
         Behavior:
             - Logs the start of the recording.
-            - Checks if the microphone is enabled. If not, returns an empty dictionary.
-            - Waits if the microphone is currently blocked by another process.
+            - Checks if the microphone is enabled. If not, finishes with an empty dictionary.
             - Extracts the duration from the goal handle.
             - Publishes the recording duration.
             - Depending on the mode ("mock" or "simulation"), handles the recording process:
                 - In "mock" mode, simulates a recording for the specified duration.
-                - In "simulation" mode, interacts with a tf_affection_rpc service to determine 
-                the closest sound source or human and simulates recording based on the proximity.
-            - Handles cancellation events during the recording process.
-            - Logs the completion of the recording and unblocks the microphone.
+                - In "simulation" mode, mixes the clips of the sound sources and speaking
+                humans in range, attenuated by their distance and the walls in between
+                (see audio_pipeline), and streams
+                the audio in real time as feedback of the action, in chunks of
+                `chunk_duration` seconds.
+            - Handles the cancellation of the recording.
+            - Logs the completion of the recording.
         """
         self.logger.info("%s recording started", self.name)
         if self.info["enabled"] is False:
-            return {}
+            goalh.finish({})
+            return
 
         if self.state is None or self.state == "off":
-            return {}
-
-        # Concurrent speaker calls handling
-        while self.blocked:
-            time.sleep(0.1)
-        self.logger.info("Microphone unlocked")
-        self.blocked = True
+            goalh.finish({})
+            return
 
         try:
             duration = goalh.data["duration"]
@@ -264,94 +279,43 @@ class EnvMicrophoneController(BaseThing):
         ret = {
             'timestamp': time.time()
         }
+
+        def done():
+            if goalh.cancel_event.is_set():
+                self.logger.info("Cancel got")
+                return ret
+            if self.info["mode"] == "mock":
+                ret["record"] = base64.b64encode(b'0x55').decode("ascii")
+                ret["volume"] = 100
+            self.logger.info("%s recording finished", self.name)
+            return ret
+
         if self.info["mode"] == "mock":
-            now = time.time()
             self.logger.info("Recording...")
-            while time.time() - now < duration:
-                if goalh.cancel_event.is_set():
-                    self.logger.info("Cancel got")
-                    self.blocked = False
-                    return ret
-                time.sleep(0.1)
-
-            ret["record"] = base64.b64encode(b'0x55').decode("ascii")
-            ret["volume"] = 100
+            Scheduler.run_goal(goalh, [ret['timestamp'] + duration], result = done)
 
         elif self.info["mode"] == "simulation":
-            # Ask tf for proximity sound sources or humans
-            res = self.tf_affection_rpc.call({
-                'name': self.name
-            })
-            affections = res['affections']
-            # Get the closest:
-            clos = None
-            clos_type = None
-            clos_info = None
-            clos_d = 100000.0
-            for x in affections:
-                if affections[x]['distance'] < clos_d:
-                    clos = x
-                    clos_d = affections[x]['distance']
-
-            wav = "Silent.wav"
-            if clos is None:
-                pass
-            elif affections[clos]['type'] == 'sound_source':
-                clos_type = 'sound_source'
-                clos_info = affections[clos]['info']
-                if affections[clos]['info']['language'] == 'EL':
-                    wav = "greek_sentence.wav"
-                else:
-                    wav = "english_sentence.wav"
-            elif affections[clos]['type'] == "human":
-                clos_type = 'human'
-                clos_info = affections[clos]['info']
-                if affections[clos]['info']["sound"] == 1:
-                    if affections[clos]['info']["language"] == "EL":
-                        wav = "greek_sentence.wav"
-                    else:
-                        wav = "english_sentence.wav"
-
-            now = time.time()
-            self.logger.info("Recording... %s, %s", clos_type, clos_info)
-            while time.time() - now < duration:
-                if goalh.cancel_event.is_set():
-                    self.logger.info("Cancel got")
-                    self.blocked = False
-                    return ret
-                time.sleep(0.1)
-            self.logger.info("Recording done")
-
-            ret["record"] = self.load_wav(wav)
-            ret["volume"] = 100
-
-        self.logger.info("%s recording finished", self.name)
-        self.blocked = False
-        return ret
-
-    def load_wav(self, path):
-        """
-        Load a WAV file, read its contents, and encode it in base64.
+            mixer = AudioMixer(self.acoustic_map)
+            plan = chunk_plan(duration, self.chunk_duration, ret['timestamp'])
+
+            def request():
+                # Ask tf for the sound sources and speaking humans in range
+                return self.tf_affection_rpc.call_async({
+                    'name': self.name
+                })
+
+            def recorded():
+                if not goalh.cancel_event.is_set():
+                    self.logger.info("Recording done, %s chunks", len(plan))
+                    # The audio has been streamed as feedback, in chunks
+                    ret["chunks"] = len(plan)
+                    ret["sample_rate"] = SAMPLE_RATE
+                    ret["format"] = SAMPLE_FORMAT
+                    ret["volume"] = int(round(100 * mixer.peak))
+                return done()
 
-        Args:
-            path (str): The relative path to the WAV file within the resources directory.
+            self.logger.info("Recording...")
+            record_goal(goalh, mixer, plan, request = request, result = recorded)
 
-        Returns:
-            str: The base64 encoded string of the WAV file's binary data.
-        """
-        # Read from file
-        dirname = Path(__file__).resolve().parent
-        fil = str(dirname) + '/../../resources/' + path
-        self.logger.info("Reading sound from %s", fil)
-        # NOTE: Wave is broken
-        # f = wave.open(fil, 'rb')
-        # data = bytearray()
-        # sample = f.readframes(256)
-        # while sample:
-        #     for s in sample:
-        #         data.append(s)
-        #     sample = f.readframes(256)
-        # f.close()
-        # source = base64.b64encode(data).decode("ascii")
-        source = ""
-        return source
+        else:
+            goalh.finish(done())
@@ -107,7 +107,7 @@ class EnvPanTiltController(BaseThing):
         self.set_communication_layer(package)
         self.commlib_factory.run()
 
-        self.tf_declare_rpc.call(tf_package)
+        self.declare_tf(tf_package)
 
         self.operation = info['conf']['operation']
         self.operation_parameters = info['conf']['operation_parameters']
@@ -208,6 +208,13 @@ class EnvPanTiltController(BaseThing):
         print("Set: ", self.pan, self.tilt)
         return {}
 
+    def reset(self):
+        """
+        Turns the pan-tilt back to its initial pan and tilt.
+        """
+        self.set_callback({'pan': 0, 'tilt': 0})
+        super().reset()
+
     def start(self):
         """
         Starts the sensor and initializes the data thread if in mock mode.
@@ -225,8 +232,7 @@ class EnvPanTiltController(BaseThing):
             self.data_thread (Thread): Thread instance for handling data processing.
         """
         self.logger.info("Sensor %s waiting to start", self.name)
-        while not self.simulator_started:
-            time.sleep(1)
+        self.wait_simulation_started()
         self.logger.info("Sensor %s started", self.name)
 
         if self.mode == "mock":
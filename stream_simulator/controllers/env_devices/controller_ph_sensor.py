@@ -57,7 +57,7 @@ class EnvPhSensorController(BasicSensor):
             # No other host type is available for env_devices
             tf_package['host_type'] = 'pan_tilt'
 
-        self.tf_declare_rpc.call(tf_package)
+        self.declare_tf(tf_package)
 
         # Default value management
         if "env" not in package or "ph" not in package['env']:
@@ -6,10 +6,8 @@ This file contains the controller class for an environmental relay.
 # -*- coding: utf-8 -*-
 
 import logging
-import time
-import threading
 
-from stream_simulator.base_classes import BaseThing
+from stream_simulator.base_classes import BaseThing, StepAutomation
 
 class EnvRelayController(BaseThing):
     """
@@ -94,56 +92,13 @@ class EnvRelayController(BaseThing):
         self.set_communication_layer(package)
         self.commlib_factory.run()
 
-        self.tf_declare_rpc.call(tf_package)
+        self.declare_tf(tf_package)
 
         if self.automation is not None:
             self.logger.warning("Relay %s is automated", self.name)
-            self.stopped = False
-            self.active = True
-            self.automation_thread = threading.Thread(target = self.automation_thread_loop)
-            self.automation_thread.start()
-
-    def automation_thread_loop(self):
-        """
-        Manages the automation loop for the relay device.
-        This method runs in a separate thread and controls the relay based on the 
-        predefined automation steps. It supports reversing the steps and looping 
-        through them based on the configuration.
-        """
-        self.logger.warning("Relay %s automation starts", self.name)
-        self.stopped = False
-        automation_steps = self.automation["steps"]
-        step_index = -1
-        reverse_mode = False
-        while self.active:
-            step_index += 1
-            if step_index >= len(automation_steps):
-                if self.automation["reverse"] and reverse_mode is False:
-                    automation_steps.reverse()
-                    step_index = 1
-                    reverse_mode = True
-                elif self.automation["reverse"] and reverse_mode is True:
-                    if self.automation["loop"]:
-                        automation_steps.reverse()
-                        step_index = 1
-                        reverse_mode = False
-                    else:
-                        self.active = False
-                        break
-                elif self.automation["reverse"] is False and self.automation["loop"]:
-                    step_index = 0
-                else:
-                    self.active = False
-                    break
-            step = automation_steps[step_index]
-            self.set_value(step['state']['state'])
-            sleep = step['duration']
-            while sleep > 0 and self.active: # to be preemptable
-                time.sleep(0.1)
-                sleep -= 0.1
-
-        self.stopped = True
-        self.logger.warning("Relay %s automation stops", self.name)
+            self.automation_program = StepAutomation(self.name, self.automation, \
+                lambda step: self.set_value(step['state']['state']))
+            self.automation_program.start()
 
     def set_communication_layer(self, package):
         """
@@ -223,6 +178,15 @@ class EnvRelayController(BaseThing):
             self.state = value
             self.logger.info("Relay %s set to %s", self.name, value)
 
+    def reset(self):
+        """
+        Restores the initial state of the relay and starts its automation over.
+        """
+        self.set_value(self.info["conf"]["initial_state"])
+        self.state_publisher.publish({"state": self.state})
+        self.state_publisher_internal.publish({"state": {"state": self.state}, 'origin': self.name})
+        super().reset()
+
     def start(self):
         """
         Starts the sensor and waits for the simulator to start.
@@ -233,8 +197,7 @@ class EnvRelayController(BaseThing):
         Note: The RPC server related lines are currently commented out.
         """
         self.logger.info("Sensor %s waiting to start", self.name)
-        while not self.simulator_started:
-            time.sleep(1)
+        self.wait_simulation_started()
         self.logger.info("Sensor %s started", self.name)
 
     def stop(self):
@@ -249,10 +212,8 @@ class EnvRelayController(BaseThing):
         5. Stops the set RPC server.
         """
         self.info["enabled"] = False
-        # Stopping the thread
+        # Stopping the automation
         if self.automation is not None:
-            self.active = False
-            while not self.stopped:
-                time.sleep(0.1)
+            self.automation_program.stop()
         self.commlib_factory.stop()
         self.logger.info("Relay %s stopped", self.name)
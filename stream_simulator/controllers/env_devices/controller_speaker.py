@@ -7,9 +7,9 @@ File that contains the EnvSpeakerController class.
 
 import time
 import logging
-import threading
 
-from stream_simulator.base_classes import BaseThing
+from stream_simulator.base_classes import BaseThing, Scheduler, StepAutomation
+from stream_simulator.connectivity import GoalQueue
 
 class EnvSpeakerController(BaseThing):
     """
@@ -24,7 +24,7 @@ class EnvSpeakerController(BaseThing):
         place (str): Place where the speaker is located.
         pose (dict): Pose information of the speaker.
         host (str): Host information if available.
-        blocked (bool): Flag to handle concurrent speaker calls.
+        goal_queue (GoalQueue): The play and speak goals, executed one at a time.
     Methods:
         __init__(conf=None, package=None):
             Initializes the EnvSpeakerController with configuration and package information.
@@ -90,68 +90,35 @@ class EnvSpeakerController(BaseThing):
             # No other host type is available for env_devices
             tf_package['host_type'] = 'pan_tilt'
 
+        # The play and speak goals are executed one at a time
+        self.goal_queue = GoalQueue(self.name)
+
         self.set_communication_layer(package)
         self.commlib_factory.run()
 
-        self.tf_declare_rpc.call(tf_package)
-
-        self.blocked = False
+        self.declare_tf(tf_package)
 
         if self.automation is not None:
             self.logger.warning("Relay %s is automated", self.name)
-            self.stopped = False
-            self.active = True
-            self.automation_thread = threading.Thread(target = self.automation_thread_loop)
-            self.automation_thread.start()
+            self.automation_program = StepAutomation(self.name, self.automation, \
+                self.automation_say)
+            self.automation_program.start()
 
-    def automation_thread_loop(self):
+    def automation_say(self, step):
         """
-        Manages the automation loop for the device.
-        This method runs in a separate thread and controls the device based on the 
-        predefined automation steps. It supports reversing the steps and looping 
-        through them based on the configuration.
+        Says the text of an automation step.
+
+        Args:
+            step (dict): The step, with the 'text', 'volume' and 'language' of its 'state'.
         """
-        self.logger.warning("Speaker %s automation starts", self.name)
-        self.stopped = False
-        automation_steps = self.automation["steps"]
-        step_index = -1
-        reverse_mode = False
-        while self.active:
-            step_index += 1
-            if step_index >= len(automation_steps):
-                if self.automation["reverse"] and reverse_mode is False:
-                    automation_steps.reverse()
-                    step_index = 1
-                    reverse_mode = True
-                elif self.automation["reverse"] and reverse_mode is True:
-                    if self.automation["loop"]:
-                        automation_steps.reverse()
-                        step_index = 1
-                        reverse_mode = False
-                    else:
-                        self.active = False
-                        break
-                elif self.automation["reverse"] is False and self.automation["loop"]:
-                    step_index = 0
-                else:
-                    self.active = False
-                    break
-            step = automation_steps[step_index]
-            self.speak_pub.publish({
-                "text": automation_steps[step_index]['state']['text'],
-                "volume": automation_steps[step_index]['state']['volume'],
-                "language": automation_steps[step_index]['state']['language'],
-                "speaker": self.name
-            })
-            self.logger.info("Speaker %s says: %s", self.name, \
-                automation_steps[step_index]['state']['text'])
-            sleep = step['duration']
-            while sleep > 0 and self.active: # to be preemptable
-                time.sleep(0.1)
-                sleep -= 0.1
-
-        self.stopped = True
-        self.logger.warning("Relay %s automation stops", self.name)
+        self.speak_pub.publish({
+            "text": step['state']['text'],
+            "volume": step['state']['volume'],
+            "language": step['state']['language'],
+            "speaker": self.name,
+            "timestamp": time.time(),
+        })
+        self.logger.info("Speaker %s says: %s", self.name, step['state']['text'])
 
     def set_communication_layer(self, package):
         """
@@ -172,11 +139,13 @@ class EnvSpeakerController(BaseThing):
 
         self.play_action_server = self.commlib_factory.get_action_server(
             callback = self.on_goal_play,
-            action_name = self.base_topic + ".play"
+            action_name = self.base_topic + ".play",
+            goal_queue = self.goal_queue
         )
         self.speak_action_server = self.commlib_factory.get_action_server(
             callback = self.on_goal_speak,
-            action_name = self.base_topic + ".speak"
+            action_name = self.base_topic + ".speak",
+            goal_queue = self.goal_queue
         )
 
         self.play_pub = self.commlib_factory.get_publisher(
@@ -197,8 +166,7 @@ class EnvSpeakerController(BaseThing):
         servers and running play and speak action servers, which are not executed.
         """
         self.logger.info("Sensor %s waiting to start", self.name)
-        while not self.simulator_started:
-            time.sleep(1)
+        self.wait_simulation_started()
         self.logger.info("Sensor %s started", self.name)
 
     def stop(self):
@@ -211,42 +179,38 @@ class EnvSpeakerController(BaseThing):
         """
         self.info["enabled"] = False
         if self.automation is not None:
-            self.active = False
-            while not self.stopped:
-                time.sleep(0.1)
+            self.automation_program.stop()
         self.play_action_server.stop()
         self.commlib_factory.stop()
 
     def on_goal_play(self, goalh):
         """
         Handles the goal to play a string with a specified volume.
-        This method logs the start of the play action, checks if the speaker is enabled,
-        handles concurrent speaker calls, and publishes the play action with the given
-        string and volume. If the mode is "mock" or "simulation", it simulates the play
-        action for 5 seconds or until a cancel event is set.
+        The goals of the speaker are queued and executed one at a time. This method logs
+        the start of the play action, checks if the speaker is enabled and publishes the
+        play action with the given string and volume. If the mode is "mock" or "simulation",
+        the goal is finished after 5 seconds, or as soon as it is cancelled, by the
+        simulation scheduler: no thread is held meanwhile.
         Args:
             goalh (object): An object containing the play goal data with the following attributes:
                 - data (dict): A dictionary containing:
                     - "string" (str): The string to be played.
                     - "volume" (int): The volume at which the string should be played.
-                - cancel_event (threading.Event): An event that can be set to cancel the play 
-                    action.
+                - cancel_event (threading.Event): An event that is set when the play 
+                    action is cancelled.
         Returns:
-            dict: A dictionary containing the timestamp of when the play action finished.
+            None: The goal is finished with a dictionary containing the timestamp of when
+            the play action finished.
         """
         if self.automation is not None:
             self.logger.info("Speaker %s is automated, ignoring play command", self.name)
-            return {}
+            goalh.finish({})
+            return
 
         self.logger.info("%s play started", self.name)
         if self.info["enabled"] is False:
-            return {}
-
-        # Concurrent speaker calls handling
-        while self.blocked:
-            time.sleep(0.1)
-        self.logger.info("Speaker unlocked")
-        self.blocked = True
+            goalh.finish({})
+            return
 
         try:
             string = goalh.data["string"]
@@ -259,52 +223,46 @@ class EnvSpeakerController(BaseThing):
             "volume": volume
         })
 
-        if self.info["mode"] in ["mock", "simulation"]:
-            now = time.time()
-            self.logger.info("Playing...")
-            while time.time() - now < 5:
-                if goalh.cancel_event.is_set():
-                    self.logger.info("Cancel got")
-                    self.blocked = False
-                    return
-                time.sleep(0.1)
-            self.logger.info("Playing done")
-
-        self.logger.info("%s Playing finished", self.name)
-        self.blocked = False
-        return {
-            "timestamp": time.time()
-        }
+        duration = 5 if self.info["mode"] in ["mock", "simulation"] else 0
+        self.logger.info("Playing...")
+
+        def done():
+            if goalh.cancel_event.is_set():
+                self.logger.info("Cancel got")
+                return {}
+            self.logger.info("%s Playing finished", self.name)
+            return {
+                "timestamp": time.time()
+            }
+
+        Scheduler.run_goal(goalh, [time.time() + duration], result = done)
 
     def on_goal_speak(self, goalh):
         """
         Handles the goal to make the speaker speak.
         This method processes the goal to make the speaker speak the provided text with the 
             specified volume and language.
-        It ensures that concurrent speaker calls are handled properly and notifies the UI about 
-            the effector command.
-        If the speaker is in "mock" or "simulation" mode, it simulates the speaking process for 
-            5 seconds.
+        The goals of the speaker are queued and executed one at a time, and the UI is
+            notified about the effector command.
+        If the speaker is in "mock" or "simulation" mode, the goal is finished after 5
+            seconds, or as soon as it is cancelled, by the simulation scheduler.
         Args:
             goalh (GoalHandle): The goal handle containing the data for the speak command.
         Returns:
-            dict: A dictionary containing the timestamp of when the speaking finished.
+            None: The goal is finished with a dictionary containing the timestamp of when
+            the speaking finished.
         Raises:
             Exception: If there are wrong parameters in the goal handle data.
         """
         if self.automation is not None:
             self.logger.info("Speaker %s is automated, ignoring speak command", self.name)
-            return {}
+            goalh.finish({})
+            return
 
         self.logger.info("%s speak started", self.name)
         if self.info["enabled"] is False:
-            return {}
-
-        # Concurrent speaker calls handling
-        while self.blocked:
-            time.sleep(0.1)
-        self.logger.info("Speaker unlocked")
-        self.blocked = True
+            goalh.finish({})
+            return
 
         try:
             texts = goalh.data["text"]
@@ -317,7 +275,8 @@ class EnvSpeakerController(BaseThing):
             "text": texts,
             "volume": volume,
             "language": language,
-            "speaker": self.name
+            "speaker": self.name,
+            "timestamp": time.time(),
         })
         self.state_publisher_internal.publish({
             "state": {
@@ -327,20 +286,17 @@ class EnvSpeakerController(BaseThing):
             },
             'origin': self.name
         })
-        
-        if self.info["mode"] in ["mock", "simulation"]:
-            now = time.time()
-            self.logger.info("Speaking...")
-            while time.time() - now < 5:
-                if goalh.cancel_event.is_set():
-                    self.logger.info("Cancel got")
-                    self.blocked = False
-                    return
-                time.sleep(0.1)
-            self.logger.info("Speaking done")
-
-        self.logger.info("%s Speak finished", self.name)
-        self.blocked = False
-        return {
-            'timestamp': time.time()
-        }
+
+        duration = 5 if self.info["mode"] in ["mock", "simulation"] else 0
+        self.logger.info("Speaking...")
+
+        def done():
+            if goalh.cancel_event.is_set():
+                self.logger.info("Cancel got")
+                return {}
+            self.logger.info("%s Speak finished", self.name)
+            return {
+                'timestamp': time.time()
+            }
+
+        Scheduler.run_goal(goalh, [time.time() + duration], result = done)
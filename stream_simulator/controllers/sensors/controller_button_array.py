@@ -208,8 +208,7 @@ class ButtonArrayController(BaseThing):
             sensor_read_thread (threading.Thread): The thread responsible for reading sensor data.
         """
         self.logger.info("Sensor %s waiting to start", self.name)
-        while not self.simulator_started:
-            time.sleep(1)
+        self.wait_simulation_started()
         self.logger.info("Sensor %s started", self.name)
 
         if self.info["mode"] == "mock":
@@ -5,17 +5,15 @@ File that contains the camera controller.
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 
-import os
-import base64
 import time
 import logging
 import threading
-import random
-import numpy as np
-import cv2
-import qrcode
 
 from stream_simulator.base_classes import BaseThing
+from stream_simulator.controllers.camera_frames import affection_frame, affection_image, \
+    file_frame, frame_image
+from stream_simulator.controllers.camera_render import CameraRenderer
+from stream_simulator.connectivity.frame_ring import FrameRing, ring_name
 
 class CameraController(BaseThing):
     """
@@ -40,6 +38,10 @@ class CameraController(BaseThing):
         enable_rpc_server (RPCService): RPC service for enabling the camera.
         disable_rpc_server (RPCService): RPC service for disabling the camera.
         images (dict): Dictionary of image resources for different scenarios.
+        renderer (CameraRenderer): Renders the frames from the world state if the `render`
+            option (perspective or topdown) is set, None otherwise.
+        frame_ring (FrameRing): If the `frame_transport` option is `shm`, the raw frames are
+            written in this shared memory ring and only their descriptors are published.
     Methods:
         robot_pose_update(message): Updates the robot pose based on the received message.
         enable_callback(_): Enables the camera sensor and starts the sensor read thread.
@@ -103,6 +105,16 @@ class CameraController(BaseThing):
         self.fov = 60 if 'fov' not in conf else conf['fov']
         self.env_properties = package["env_properties"]
 
+        self.renderer = None
+        if conf.get('render') is not None and info["mode"] == "simulation":
+            self.renderer = CameraRenderer(conf['render'], package["map"], \
+                package.get("resolution"), self.width, self.height, self.fov, self.range)
+
+        self.frame_ring = None
+        if conf.get('frame_transport', 'json') == 'shm':
+            self.frame_ring = FrameRing(ring_name(self.base_topic), \
+                self.width * self.height * 3, conf.get('shm_slots', 4))
+
         self.set_tf_communication(package)
 
         # tf handling
@@ -162,7 +174,7 @@ class CameraController(BaseThing):
 
         self.commlib_factory.run()
 
-        self.tf_declare_rpc.call(tf_package)
+        self.declare_tf(tf_package)
 
         # The images
         self.images = {
@@ -228,11 +240,11 @@ class CameraController(BaseThing):
             self.sensor_read_thread (Thread): Thread instance for reading sensor data.
         """
         self.logger.info("Sensor %s waiting to start", self.name)
-        while not self.simulator_started:
-            time.sleep(1)
+        self.wait_simulation_started()
         self.logger.info("Sensor %s started", self.name)
 
-        if self.info["enabled"] and "generate_images" in self.info and self.info["generate_images"]:
+        if self.info["enabled"] and (self.info.get("generate_images") or \
+                self.renderer is not None):
             self.sensor_read_thread = threading.Thread(target = self.sensor_read)
             self.sensor_read_thread.start()
             self.logger.info("Camera %s reads with %s Hz", self.info['id'], self.info['hz'])
@@ -247,6 +259,8 @@ class CameraController(BaseThing):
         self.info["enabled"] = False
         while not self.stopped and self.sensor_read_thread is not None:
             time.sleep(0.1)
+        if self.frame_ring is not None:
+            self.frame_ring.close()
         self.logger.warning("Sensor %s stopped", self.name)
         self.commlib_factory.stop()
 
@@ -260,10 +274,10 @@ class CameraController(BaseThing):
         In "simulation" mode, it interacts with a TensorFlow service to get proximity information 
         about sound sources or humans, and generates corresponding images (e.g., QR codes, barcodes, 
         colored images, or text images).
-        The generated or read image is then encoded in base64 and published with metadata including 
-        timestamp, format, width, and height.
-        Raises:
-            Exception: If there is an error generating a text image in "simulation" mode.
+        The image is generated and encoded in base64 in memory (see camera_frames, which caches
+        the encoded frames) and published with metadata including timestamp, format, width,
+        and height.
+        If the image generation fails, the error is logged and the frame is skipped.
         Note:
             This method runs in a loop until the sensor is disabled.
         """
@@ -273,14 +287,11 @@ class CameraController(BaseThing):
 
         while self.info["enabled"]:
             time.sleep(1.0 / self.info["hz"])
-            dirname = os.path.dirname(__file__) + "/../.."
-            data = None
+            data = None # base64 encoded frame
+            image = None # raw frame
 
             if self.info["mode"] == "mock":
-                with open(dirname + '/resources/all.png', "rb") as f:
-                    fdata = f.read()
-                    b64 = base64.b64encode(fdata)
-                    data = b64.decode()
+                data = file_frame("all.png")
 
             elif self.info["mode"] == "simulation":
                 # Ask tf for proximity sound sources or humans
@@ -299,88 +310,57 @@ class CameraController(BaseThing):
 
                 if clos is None:
                     cl_type = None
+                    info = None
                 else:
                     cl_type = affections[clos]['type']
-
-                # print(self.name, cl_type)
-
-                if cl_type is None:
-                    img = "all.png"
-                elif cl_type == "human":
-                    img = random.choice(["face.jpg", "face_inverted.jpg"])
-                elif cl_type == "qr":
-                    try:
-                        im = qrcode.make(affections[clos]["info"]["message"])
-                    except: # pylint: disable=bare-except
-                        self.logger.error("QR creator could not produce string or qrcode library \
-                            is not installed")
-                    im.save(dirname + "/resources/qr_tmp.png")
-                    img = "qr_tmp.png"
-                elif cl_type == "barcode":
-                    img = "barcode.jpg"
-                elif cl_type == 'color':
-                    img = 'col_tmp.png'
-                    tmp = np.zeros((height, width, 3), np.uint8)
-                    tmp[:] = (
-                        affections[clos]['info']["b"],
-                        affections[clos]['info']["g"],
-                        affections[clos]['info']["r"]
-                    )
-                    cv2.imwrite(dirname + "/resources/" + img, tmp) # pylint: disable=no-member
-                elif cl_type == "text":
-                    img = 'txt_temp.png'
-                    try:
-                        image = np.zeros((height, width, 3), dtype=np.uint8)
-                        # Define the text and its properties
-                        final_text = affections[clos]['info']["text"]
-                        font = cv2.FONT_HERSHEY_SIMPLEX # pylint: disable=no-member
-                        font_scale = 2
-                        color = (255, 255, 255)  # White color
-                        thickness = 3
-
-                        # Calculate text size and position to center it
-                        # Also adjust to text size
-                        x = -1
-                        while x < 0:
-                            # pylint: disable=no-member
-                            (text_width, text_height), _ = cv2.getTextSize(final_text, font, \
-                                font_scale, thickness)
-                            x = (width - text_width) // 2
-                            y = (height + text_height) // 2
-                            if x < 0:
-                                font_scale -= 0.1
-                                thickness = thickness - 1 if thickness > 1 else 1
-
-                        # Draw the text on the image # pylint: disable=no-member
-                        cv2.putText(image, final_text, (x, y), font, font_scale, color, \
-                            thickness, lineType=cv2.LINE_AA)
-
-                        # Save the image to a file # pylint: disable=no-member
-                        cv2.imwrite(dirname + "/resources/" + img, image)
-                    except Exception as e: # pylint: disable=broad-except
-                        self.logger.error("CameraController: Error with text image generation: %s",
-                                          str(e))
-
-                # print(f"CameraController: Published image {cl_type}")
-
-                with open(dirname + "/resources/" + img, "rb") as f:
-                    fdata = f.read()
-                    b64 = base64.b64encode(fdata)
-                    data = b64.decode()
-
-                    # Publishing value:
-                    self.publisher.publish({
-                        "value": {
-                            "timestamp": time.time(),
-                            "format": "RGB",
-                            "per_rows": True,
-                            "width": width,
-                            "height": height,
-                            "image": str(data)
-                        },
-                        "timestamp": time.time()
-                    })
-                    # print(f"CameraController: Published image {cl_type}")
+                    info = affections[clos]['info']
+
+                try:
+                    if self.renderer is not None and res.get('pose'):
+                        if self.frame_ring is not None:
+                            image = self.renderer.render(res['pose'], affections)
+                        else:
+                            data = self.renderer.render_encoded(res['pose'], affections)
+                    elif self.frame_ring is not None:
+                        image = affection_image(cl_type, info, width, height, \
+                            default = "all.png")
+                    else:
+                        data = affection_frame(cl_type, info, width, height, \
+                            default = "all.png")
+                except Exception as e: # pylint: disable=broad-except
+                    self.logger.error("CameraController: Error with %s image generation: %s",
+                                      cl_type, str(e))
+                    continue
+
+            if self.frame_ring is not None and (data is not None or image is not None):
+                if image is None:
+                    image = frame_image(data, width, height)
+                descriptor = self.frame_ring.write(image)
+                # Only the descriptor of the raw frame goes over the broker
+                self.publisher.publish({
+                    "value": {
+                        "timestamp": descriptor["timestamp"],
+                        "format": "BGR",
+                        "per_rows": True,
+                        "width": width,
+                        "height": height,
+                        "shm": descriptor
+                    },
+                    "timestamp": time.time()
+                })
+            elif data is not None:
+                # Publishing value:
+                self.publisher.publish({
+                    "value": {
+                        "timestamp": time.time(),
+                        "format": "RGB",
+                        "per_rows": True,
+                        "width": width,
+                        "height": height,
+                        "image": data
+                    },
+                    "timestamp": time.time()
+                })
 
         self.stopped = True
         self.logger.info("camera %s sensor read thread stopped", self.info["id"])
@@ -6,11 +6,12 @@ This file contains the controller class for an IMU sensor.
 # -*- coding: utf-8 -*-
 
 import time
+import math
 import logging
-import threading
-import random
 
-from stream_simulator.base_classes import BaseThing
+import numpy as np
+
+from stream_simulator.base_classes import BaseThing, Scheduler
 
 class ImuController(BaseThing):
     """
@@ -22,21 +23,35 @@ class ImuController(BaseThing):
         base_topic (str): Base topic for communication.
         derp_data_key (str): Key for raw data communication.
         robot (str): Name of the robot.
-        prev_robot_pose (dict): Previous pose of the robot.
         publisher (Publisher): Publisher for sensor data.
-        robot_pose_sub (Subscriber): Subscriber for robot pose updates.
-        enable_rpc_server (RPCService): RPC service to enable the sensor.
-        disable_rpc_server (RPCService): RPC service to disable the sensor.
+        kinematics (KinematicsState): The motion of the robot (simulation mode).
+        gravity (float): The gravity the accelerometer measures on z, in m/s^2.
+        std (numpy.ndarray): The standard deviation of the noise of the 9 axes.
+        bias (numpy.ndarray): The bias of the 9 axes.
+        bias_walk (numpy.ndarray): The random walk of the biases, per sqrt(second).
+        timer (Timer): The next scheduled reading.
     Methods:
         __init__(conf=None, package=None): Initializes the IMU controller with configuration and 
         package details.
-        robot_pose_update(message): Updates the robot pose based on incoming messages.
-        sensor_read(): Reads sensor data and publishes it at a specified frequency.
-        enable_callback(message): Callback to enable the sensor and start reading data.
-        disable_callback(message): Callback to disable the sensor and stop reading data.
+        noise_model(conf): Reads the noise model of the sensor from its configuration.
+        measurement(): The acceleration, angular velocity and orientation of the robot.
+        sensor_read(): Reads sensor data and publishes it, once per period.
         start(): Starts the sensor and begins reading data if enabled.
         stop(): Stops the sensor and communication.
+
+    The acceleration, the gyroscope and the magnetometer readings are ordered as
+    x, y, z and yaw, pitch, roll. Their noise is set per group in the configuration,
+    where bias can also be a list of the 3 per axis values:
+
+        noise:
+            acceleration: {std: 0.03, bias: 0, bias_walk: 0}
+            gyroscope: {std: 0.01, bias: [0.002, 0, 0]}
+            magnetometer: {std: 0.03}
     """
+    GROUPS = ("acceleration", "gyroscope", "magnetometer")
+    DEFAULT_STD = 0.03
+    GRAVITY = 9.81
+
     def __init__(self, conf = None, package = None):
         if package["logger"] is None:
             self.logger = logging.getLogger(conf["name"])
@@ -85,7 +100,13 @@ class ImuController(BaseThing):
         self.base_topic = info["base_topic"]
         self.derp_data_key = info["base_topic"] + ".raw"
         self.robot = _pack.split(".")[-1]
-        self.prev_robot_pose = None
+        self.kinematics = package.get("kinematics")
+        self.gravity = float(conf.get("gravity", self.GRAVITY))
+        self.std, self.bias, self.bias_walk = self.noise_model(conf.get("noise", {}))
+        self.rng = np.random.default_rng()
+        self.timer = None
+        self.due = None
+        self.last_read = None
 
         self.set_tf_communication(package)
 
@@ -108,150 +129,106 @@ class ImuController(BaseThing):
             tf_package['host'] = conf['host']
             tf_package['host_type'] = 'pan_tilt'
 
-        self.tf_declare_rpc.call(tf_package)
-
-        self.publisher = self.commlib_factory.get_publisher(
-            topic = self.base_topic + ".data"
-        )
+        self.declare_tf(tf_package)
 
-        if self.info["mode"] == "simulation":
-            self.robot_pose_sub = self.commlib_factory.get_subscriber(
-                topic = self.info['namespace'] + '.' + self.info['device_name'] + ".pose.internal",
-                callback = self.robot_pose_update
-            )
-            # self.robot_pose_sub.run()
+        self.publisher = self.get_data_publisher(self.base_topic + ".data", conf)
 
-            self.robot_pose = {
-                "x": 0,
-                "y": 0,
-                "theta": 0
-            }
-
-        # Start commlib factory due to robot subscriptions (msub)
         self.commlib_factory.run()
 
-        self.sensor_read_thread = None
         self.stopped = False
 
-    def robot_pose_update(self, message):
-        """
-        Updates the robot's pose with the given message.
-        If this is the first update, the previous robot pose is set to the current message
-        and a timestamp is added. For subsequent updates, the previous robot pose is updated
-        to the current robot pose before setting the new pose and timestamp.
-        Args:
-            message (dict): A dictionary containing the robot's pose information.
+    def noise_model(self, conf):
         """
-        if self.prev_robot_pose is None:
-            self.prev_robot_pose = message
-            self.prev_robot_pose['timestamp'] = time.time()
-        else:
-            self.prev_robot_pose = self.robot_pose
+        Reads the noise model of the sensor from its configuration.
 
-        self.robot_pose = message
-        self.robot_pose['timestamp'] = time.time()
+        Args:
+            conf (dict): group -> {"std", "bias", "bias_walk"}, the groups being
+                acceleration, gyroscope and magnetometer.
 
-    def sensor_read(self):
-        """
-        Reads sensor data at a specified frequency and publishes it to a sensor stream.
-        This method runs in a loop while the sensor is enabled. Depending on the mode specified 
-        in the sensor's configuration, it either generates mock data or simulates sensor data based 
-        on the robot's pose.
-        Mock mode:
-            Generates constant acceleration values and random gyroscope and magnetometer values.
-        Simulation mode:
-            Generates random acceleration, gyroscope, and magnetometer values. If the robot is 
-            moving, the acceleration values are adjusted accordingly.
-        The generated sensor data is published to a sensor stream with a timestamp.
-        Raises:
-            None
-        Logs:
-            - Info: When the sensor read thread starts and stops.
-            - Warning: If the robot's pose is not available in simulation mode.
         Returns:
-            None
+            tuple: The std, the bias and the bias walk of the 9 axes (numpy.ndarray).
+        """
+        std, bias, walk = [], [], []
+        for group in self.GROUPS:
+            model = conf.get(group, {})
+            std.append(np.broadcast_to(float(model.get("std", self.DEFAULT_STD)), 3))
+            bias.append(np.broadcast_to(np.asarray(model.get("bias", 0.0), float), 3))
+            walk.append(np.broadcast_to(float(model.get("bias_walk", 0.0)), 3))
+        return np.concatenate(std), np.concatenate(bias), np.concatenate(walk)
+
+    def measurement(self):
         """
-        self.logger.info("IMU %s sensor read thread started", self.info["id"])
-        while self.info["enabled"]:
-            time.sleep(1.0 / self.info["hz"])
-            val = {}
+        The true values of the 9 axes: the acceleration of the robot in its frame,
+        gravity included, its angular velocity and its orientation.
 
-            if self.info["mode"] == "mock":
-                val = {
-                    "acceleration": {
-                        "x": 1,
-                        "y": 1,
-                        "z": 1
-                    },
-                    "gyroscope": {
-                        "yaw": random.uniform(0.3, -0.3),
-                        "pitch": random.uniform(0.3, -0.3),
-                        "roll": random.uniform(0.3, -0.3)
-                    },
-                    "magnetometer": {
-                        "yaw": random.uniform(0.3, -0.3),
-                        "pitch": random.uniform(0.3, -0.3),
-                        "roll": random.uniform(0.3, -0.3)
-                    }
-                }
+        Returns:
+            numpy.ndarray: The acceleration x, y, z, the gyroscope and the magnetometer
+                yaw, pitch, roll.
+        """
+        if self.info["mode"] == "mock":
+            return np.array([1.0, 1.0, 1.0, 0, 0, 0, 0, 0, 0])
+        motion = self.kinematics.reading()
+        ax, ay = motion["acceleration"]
+        # The magnetometer yaw is in (-pi, pi]
+        yaw = math.atan2(math.sin(motion["theta"]), math.cos(motion["theta"]))
+        return np.array([ax, ay, self.gravity, motion["angular"], 0, 0, yaw, 0, 0])
 
-            elif self.info["mode"] == "simulation":
-                try:
-                    moving = 0
-                    if time.time() - self.robot_pose['timestamp'] < 1.5:
-                        # this means the pose is old and the robot has stopped
-                        # print("moving")
-                        moving = 1
-                    val = {
-                        "acceleration": {
-                            "x": random.uniform(0.03, -0.03) + moving * 0.1,
-                            "y": random.uniform(0.03, -0.03),
-                            "z": random.uniform(0.03, -0.03)
-                        },
-                        "gyroscope": {
-                            "yaw": random.uniform(0.03, -0.03),
-                            "pitch": random.uniform(0.03, -0.03),
-                            "roll": random.uniform(0.03, -0.03)
-                        },
-                        "magnetometer": {
-                            "yaw": self.robot_pose["theta"] + random.uniform(0.03, -0.03),
-                            "pitch": random.uniform(0.03, -0.03),
-                            "roll": random.uniform(0.03, -0.03)
-                        }
-                    }
-                except: # pylint: disable=bare-except
-                    self.logger.warning("Pose not got yet..")
+    def sensor_read(self):
+        """
+        Reads the sensor and publishes the values, then schedules the next reading.
 
-            # Publish data to sensor stream
-            self.publisher.publish({
-                "data": val,
-                "timestamp": time.time()
-            })
+        In simulation mode the values are derived from the motion the kinematics
+        loop of the robot integrates, in mock mode the robot is at rest. The noise
+        and the bias of the configured noise model are added to them.
+        """
+        self.timer = None
+        if not self.info["enabled"]:
+            self.stopped = True
+            return
+        now = time.time()
+        if self.last_read is not None:
+            dt = now - self.last_read
+            self.bias = self.bias + self.bias_walk * math.sqrt(dt) * \
+                self.rng.standard_normal(9)
+        self.last_read = now
+
+        values = (self.measurement() + self.bias + \
+            self.std * self.rng.standard_normal(9)).tolist()
+        self.publisher.publish({
+            "data": {
+                "acceleration": dict(zip(("x", "y", "z"), values[0:3])),
+                "gyroscope": dict(zip(("yaw", "pitch", "roll"), values[3:6])),
+                "magnetometer": dict(zip(("yaw", "pitch", "roll"), values[6:9])),
+            },
+            "timestamp": now
+        })
 
-        self.stopped = True
-        self.logger.info("IMU %s sensor read thread stopped", self.info["id"])
+        # The readings keep their rate, the missed ones are skipped
+        period = 1.0 / self.info["hz"]
+        self.due = max(self.due + period, now)
+        self.timer = Scheduler.call_at(self.due, self.sensor_read)
 
     def start(self):
         """
         Starts the IMU sensor.
         This method logs the initial state of the sensor and waits for the simulator to start.
-        Once the simulator has started, it checks if the sensor is enabled. If enabled, it starts
-        a new thread to read sensor data at the specified frequency.
+        Once the simulator has started, it checks if the sensor is enabled. If enabled, it
+        schedules the readings at the specified frequency.
         Logging:
             Logs the waiting state of the sensor.
             Logs when the sensor has started.
             Logs the sensor's reading frequency if enabled.
-        Threading:
-            Starts a new thread to read sensor data if the sensor is enabled.
         """
         self.logger.info("Sensor %s waiting to start", self.name)
-        while not self.simulator_started:
-            time.sleep(1)
+        self.wait_simulation_started()
         self.logger.info("Sensor %s started", self.name)
 
         if self.info["enabled"]:
-            self.sensor_read_thread = threading.Thread(target = self.sensor_read)
-            self.sensor_read_thread.start()
+            if self.info["mode"] == "simulation" and self.kinematics is None:
+                self.logger.warning("IMU %s has no robot kinematics", self.info["id"])
+                return
+            self.due = time.time()
+            self.timer = Scheduler.call_at(self.due, self.sensor_read)
             self.logger.info("IMU %s reads with %s Hz", self.info["id"], self.info["hz"])
 
     def stop(self):
@@ -259,11 +236,13 @@ class ImuController(BaseThing):
         Stops the IMU controller by disabling it and stopping the communication library.
 
         This method sets the "enabled" flag in the info dictionary to False, indicating
-        that the IMU controller is no longer active. It also stops the communication
-        library factory to cease any ongoing communication processes.
+        that the IMU controller is no longer active, and cancels the next reading. It
+        also stops the communication library factory to cease any ongoing communication
+        processes.
         """
         self.info["enabled"] = False
-        while not self.stopped:
-            time.sleep(0.1)
+        if self.timer is not None:
+            self.timer.cancel()
+        self.stopped = True
         self.logger.warning("Sensor %s stopped", self.name)
         self.commlib_factory.stop()
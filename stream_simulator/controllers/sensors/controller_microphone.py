@@ -8,10 +8,11 @@ File that contains the microphone controller.
 import time
 import logging
 import base64
-# import wave
-from pathlib import Path
 
-from stream_simulator.base_classes import BaseThing
+from stream_simulator.base_classes import BaseThing, Scheduler
+from stream_simulator.connectivity import CommlibFactory, GoalQueue
+from stream_simulator.controllers.audio_pipeline import AudioMixer, AcousticMap, chunk_plan, \
+    record_goal, SAMPLE_RATE, SAMPLE_FORMAT
 
 class MicrophoneController(BaseThing):
     """
@@ -21,7 +22,7 @@ class MicrophoneController(BaseThing):
         name (str): Name of the microphone controller.
         info (dict): Dictionary containing microphone information and configuration.
         base_topic (str): Base topic for communication.
-        blocked (bool): Flag indicating if the microphone is currently blocked.
+        goal_queue (GoalQueue): The record and listen goals, executed one at a time.
         actors (list): List of actors associated with the microphone.
         record_action_server (ActionServer): Action server for recording actions.
         listen_action_server (ActionServer): Action server for listening actions.
@@ -29,12 +30,13 @@ class MicrophoneController(BaseThing):
         disable_rpc_server (RPCService): RPC service for disabling the microphone.
         record_pub (Publisher): Publisher for recording notifications.
         detect_speech_sub (Subscriber): Subscriber for speech detection notifications.
+        chunk_duration (float): Duration in seconds of the audio chunks streamed while
+            recording (`chunk_duration` option, default 0.25).
+        acoustic_map (AcousticMap): The walls attenuating the sound heard.
     Methods:
         __init__(conf=None, package=None): Initializes the MicrophoneController with the 
         given configuration and package.
         speech_detected(message): Callback function for handling detected speech messages.
-        load_wav(path): Loads a WAV file from the specified path and returns its base64 
-        encoded content.
         on_goal(goalh): Callback function for handling recording goals.
         on_goal_listen(goalh): Callback function for handling listening goals.
         enable_callback(message): Callback function for enabling the microphone.
@@ -105,7 +107,8 @@ class MicrophoneController(BaseThing):
             "pose": conf["pose"],
             "base_topic": info['base_topic'],
             "name": self.name,
-            "namespace": _namespace
+            "namespace": _namespace,
+            "range": float(conf.get('range', 4.0))
         }
         tf_package['host'] = package['device_name']
         tf_package['host_type'] = 'robot'
@@ -113,7 +116,10 @@ class MicrophoneController(BaseThing):
             tf_package['host'] = conf['host']
             tf_package['host_type'] = 'pan_tilt'
 
-        self.blocked = False
+        # The record and listen goals are executed one at a time
+        self.goal_queue = GoalQueue(self.name)
+        self.chunk_duration = float(conf.get('chunk_duration', 0.25))
+        self.acoustic_map = AcousticMap(package.get("map"), package.get("resolution"))
 
         # merge actors
         self.actors = []
@@ -125,11 +131,13 @@ class MicrophoneController(BaseThing):
 
         self.record_action_server = self.commlib_factory.get_action_server(
             callback = self.on_goal,
-            action_name = self.base_topic + ".record"
+            action_name = self.base_topic + ".record",
+            goal_queue = self.goal_queue
         )
         self.listen_action_server = self.commlib_factory.get_action_server(
             callback = self.on_goal_listen,
-            action_name = self.base_topic  + ".listen"
+            action_name = self.base_topic  + ".listen",
+            goal_queue = self.goal_queue
         )
 
         self.record_pub = self.commlib_factory.get_publisher(
@@ -155,7 +163,7 @@ class MicrophoneController(BaseThing):
 
         self.commlib_factory.run()
 
-        self.tf_declare_rpc.call(tf_package)
+        self.declare_tf(tf_package)
 
     def detection_callback(self, message):
         """
@@ -189,71 +197,49 @@ class MicrophoneController(BaseThing):
                 - speaker (str): The source of the speech.
                 - text (str): The detected speech text.
                 - language (str): The language of the detected speech.
+                - timestamp (float): The time the speaker published the speech, if known.
 
         Logs:
             Logs the detected speech information including the source, language, and text.
+            The latency from the speaker to the microphone is accounted for in the traffic
+            statistics (`delivery`).
         """
         source = message["speaker"]
         text = message["text"]
         language = message["language"]
+        if message.get("timestamp") is not None:
+            CommlibFactory.traffic.record_delivery(
+                self.base_topic + ".speech_detected", message["timestamp"])
         self.logger.info("Speech detected from %s [%s]: %s", source, language, text)
 
-    def load_wav(self, path):
-        """
-        Loads a WAV file from the specified path, reads its contents, and encodes it in base64.
-
-        Args:
-            path (str): The relative path to the WAV file within the resources directory.
-
-        Returns:
-            str: The base64 encoded string of the WAV file's binary data.
-
-        Raises:
-            FileNotFoundError: If the specified file does not exist.
-            wave.Error: If there is an error reading the WAV file.
-        """
-        # Read from file
-        dirname = Path(__file__).resolve().parent
-        fil = str(dirname) + '/../../resources/' + path
-        self.logger.info("Reading sound from %s", fil)
-        # NOTE: Wave is broken
-        # f = wave.open(fil, 'rb')
-        # data = bytearray()
-        # sample = f.readframes(256)
-        # while sample:
-        #     for s in sample:
-        #         data.append(s)
-        #     sample = f.readframes(256)
-        # f.close()
-        # source = base64.b64encode(data).decode("ascii")
-        source = ""
-        return source
-
     def on_goal(self, goalh):
         """
         Handles the goal event for the microphone controller.
-        This method starts the recording process based on the provided goal, handles concurrent 
-        speaker calls, and simulates or mocks the recording process depending on the mode specified 
-        in the `info` attribute.
+        The record and listen goals are queued and executed one at a time. This method
+        starts the recording process based on the provided goal and lets the simulation
+        scheduler drive it, mocked or simulated depending on the mode specified in the
+        `info` attribute, so no thread is held while recording.
+        In simulation mode the clips of the sound sources and speaking humans in range are
+        mixed (see audio_pipeline) and streamed in real time as feedback of the action, in
+        chunks of `chunk_duration` seconds with keys seq, timestamp, sample_rate, channels,
+        format (S16LE) and chunk (base64 PCM).
         Args:
             goalh: The goal handle containing the recording parameters.
         Returns:
-            dict: A dictionary containing the recording result with the following keys:
+            None: The goal is finished with a dictionary containing the recording result
+            with the following keys:
                 - header: A dictionary with timestamp information.
-                - record: The base64 encoded recording data.
+                - record: The base64 encoded recording data in mock mode, empty in
+                  simulation mode where the audio is streamed.
+                - chunks, sample_rate, format: The streamed audio, in simulation mode.
                 - volume: The volume level of the recording.
         Raises:
             Exception: If the goal does not contain a duration parameter.
         """
         self.logger.info("%s recording started", self.name)
         if self.info["enabled"] is False:
-            return {}
-
-        # Concurrent speaker calls handling
-        while self.blocked:
-            time.sleep(0.1)
-        self.logger.info("Microphone unlocked")
-        self.blocked = True
+            goalh.finish({})
+            return
 
         try:
             duration = goalh.data["duration"]
@@ -277,104 +263,75 @@ class MicrophoneController(BaseThing):
             "record": "",
             "volume": 0
         }
+
+        def done():
+            if goalh.cancel_event.is_set():
+                self.logger.info("Cancel got")
+                return ret
+            if self.info["mode"] == "mock":
+                ret["record"] = base64.b64encode(b'0x55').decode("ascii")
+                ret["volume"] = 100
+            self.logger.info("%s recording finished", self.name)
+            return ret
+
         if self.info["mode"] == "mock":
-            now = time.time()
             self.logger.info("Recording...")
-            while time.time() - now < duration:
-                if goalh.cancel_event.is_set():
-                    self.logger.info("Cancel got")
-                    self.blocked = False
-                    return ret
-                time.sleep(0.1)
-
-            ret["record"] = base64.b64encode(b'0x55').decode("ascii")
-            ret["volume"] = 100
+            Scheduler.run_goal(goalh, [timestamp + duration], result = done)
 
         elif self.info["mode"] == "simulation":
-            # Ask tf for proximity sound sources or humans
-            res = self.tf_affection_rpc.call({
-                'name': self.name
-            })
-            affections = res['affections']
-            # Get the closest:
-            clos = None
-            clos_type = None
-            clos_info = None
-            clos_d = 100000.0
-            for x in affections:
-                if affections[x]['distance'] < clos_d:
-                    clos = x
-                    clos_d = affections[x]['distance']
-
-            wav = "Silent.wav"
-            if clos is None:
-                pass
-            elif affections[clos]['type'] == 'sound_source':
-                clos_type = 'sound_source'
-                clos_info = affections[clos]['info']
-                if affections[clos]['info']['language'] == 'EL':
-                    wav = "greek_sentence.wav"
-                else:
-                    wav = "english_sentence.wav"
-            elif affections[clos]['type'] == "human":
-                clos_type = 'human'
-                clos_info = affections[clos]['info']
-                if affections[clos]['info']["sound"] == 1:
-                    if affections[clos]['info']["language"] == "EL":
-                        wav = "greek_sentence.wav"
-                    else:
-                        wav = "english_sentence.wav"
-
-            now = time.time()
-            self.logger.info("Recording... %s, %s", clos_type, clos_info)
-            while time.time() - now < duration:
-                if goalh.cancel_event.is_set():
-                    self.logger.info("Cancel got")
-                    self.blocked = False
-                    return ret
-                time.sleep(0.1)
-            self.logger.info("Recording done")
-
-            ret["record"] = self.load_wav(wav)
-            ret["volume"] = 100
-
-        self.logger.info("%s recording finished", self.name)
-        self.blocked = False
-        return ret
+            mixer = AudioMixer(self.acoustic_map)
+            plan = chunk_plan(duration, self.chunk_duration, timestamp)
+
+            def request():
+                # Ask tf for the sound sources and speaking humans in range
+                return self.tf_affection_rpc.call_async({
+                    'name': self.name
+                })
+
+            def recorded():
+                if not goalh.cancel_event.is_set():
+                    self.logger.info("Recording done, %s chunks", len(plan))
+                    # The audio has been streamed as feedback, in chunks
+                    ret["chunks"] = len(plan)
+                    ret["sample_rate"] = SAMPLE_RATE
+                    ret["format"] = SAMPLE_FORMAT
+                    ret["volume"] = int(round(100 * mixer.peak))
+                return done()
+
+            self.logger.info("Recording...")
+            record_goal(goalh, mixer, plan, request = request, result = recorded)
+
+        else:
+            goalh.finish(done())
 
     def on_goal_listen(self, goalh):
         """
         Handles the goal to listen for a specified duration and language.
-        This function starts the listening process, checks if the microphone is enabled,
-        and handles concurrent speaker calls. It then attempts to retrieve the duration
-        and language from the goal data and logs the listening process.
+        This function starts the listening process once the previous goals of the
+        microphone are done, and checks if the microphone is enabled. It then attempts to
+        retrieve the duration and language from the goal data and logs the listening process.
         Args:
             goalh (object): An object containing the goal data with 'duration' and 'language' 
             parameters.
         Returns:
-            dict: A dictionary containing the transcribed text. Currently, this is a dummy 
-            implementation and returns a placeholder text.
+            None: The goal is finished with a dictionary containing the transcribed text.
+            Currently, this is a dummy implementation and returns a placeholder text.
         """
         self.logger.info("%s listening started", self.name)
         if self.info["enabled"] is False:
-            return {}
-
-        # Concurrent speaker calls handling
-        while self.blocked:
-            time.sleep(0.1)
-        self.logger.info("Microphone unlocked")
-        self.blocked = True
+            goalh.finish({})
+            return
 
         # NOTE!!! This is a dummy implementation
         text = "IMPLEMENT THIS FUNCTIONALITY!"
 
         if "duration" not in goalh.data or "language" not in goalh.data:
             self.logger.error("%s goal had no duration and language as parameter", self.name)
-            return {'text': "ERROR"}
+            goalh.finish({'text': "ERROR"})
+            return
 
         self.logger.info("Listening finished: %s", )
-        self.blocked = False
-        return {'text': text}
+        goalh.finish({'text': text})
 
     def start(self):
         """
@@ -386,8 +343,7 @@ class MicrophoneController(BaseThing):
         that the sensor has started.
         """
         self.logger.info("Sensor %s waiting to start", self.name)
-        while not self.simulator_started:
-            time.sleep(1)
+        self.wait_simulation_started()
         self.logger.info("Sensor %s started", self.name)
 
     def stop(self):
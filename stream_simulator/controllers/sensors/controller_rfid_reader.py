@@ -109,13 +109,11 @@ class RfidReaderController(BaseThing):
             tf_package['host'] = conf['host']
             tf_package['host_type'] = 'pan_tilt'
 
-        self.publisher = self.commlib_factory.get_publisher(
-            topic = self.base_topic + ".data"
-        )
+        self.publisher = self.get_data_publisher(self.base_topic + ".data", conf)
 
         self.commlib_factory.run()
 
-        self.tf_declare_rpc.call(tf_package)
+        self.declare_tf(tf_package)
 
         self.sensor_read_thread = None
         self.stopped = False
@@ -181,8 +179,7 @@ class RfidReaderController(BaseThing):
             self.sensor_read_thread (Thread): Thread instance for reading sensor data.
         """
         self.logger.info("Sensor %s waiting to start", self.name)
-        while not self.simulator_started:
-            time.sleep(1)
+        self.wait_simulation_started()
         self.logger.info("Sensor %s started", self.name)
 
         if self.info["enabled"]:
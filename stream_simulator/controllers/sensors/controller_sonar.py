@@ -114,11 +114,9 @@ class SonarController(BaseThing):
             tf_package['host'] = conf['host']
             tf_package['host_type'] = 'pan_tilt'
 
-        self.tf_declare_rpc.call(tf_package)
+        self.declare_tf(tf_package)
 
-        self.publisher = self.commlib_factory.get_publisher(
-            topic = self.base_topic + ".data"
-        )
+        self.publisher = self.get_data_publisher(self.base_topic + ".data", conf)
 
         # print(self.info)
 
@@ -241,8 +239,7 @@ class SonarController(BaseThing):
             self.sensor_read_thread (Thread): Thread instance for reading sensor data.
         """
         self.logger.info("Sensor %s waiting to start", self.name)
-        while not self.simulator_started:
-            time.sleep(1)
+        self.wait_simulation_started()
         self.logger.info("Sensor %s started", self.name)
 
         if self.info["enabled"]:
@@ -0,0 +1,205 @@
+"""
+File that contains the video sources, which stream the frames of video files to the
+cameras looking at actors with a `video` property.
+
+A video is decoded once, on a background thread, whatever the number of cameras that
+look at it: the sources are shared through a registry keyed by the video path. The
+decoder keeps a bounded buffer of frames ahead of the playback clock (the video plays
+in loop at its own frame rate) and stops by itself when no camera asked for a frame
+for a while. The resized and encoded versions of the current frame are cached per size,
+so the cameras of the same size share them too.
+"""
+
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import base64
+import logging
+import threading
+import time
+from collections import deque
+
+import cv2
+
+class VideoSource:
+    """
+    Decodes a video file in loop on a background thread.
+
+    Attributes:
+        path (str): The path of the video.
+        fps (float): The frame rate of the playback.
+        buffer (deque): (frame number, BGR frame) decoded ahead of the playback clock.
+        last_access (float): The last time a frame was asked for.
+    """
+    BUFFER_SIZE = 8
+    IDLE_TIMEOUT = 5.0 # seconds
+
+    def __init__(self, path, on_idle = None):
+        self.path = path
+        self.logger = logging.getLogger("video_source")
+        self.capture = cv2.VideoCapture(path) # pylint: disable=no-member
+        if not self.capture.isOpened():
+            raise ValueError(f"Could not open video {path}")
+        fps = self.capture.get(cv2.CAP_PROP_FPS) # pylint: disable=no-member
+        self.fps = fps if fps and fps > 0 else 25.0
+        self.buffer = deque()
+        self.cond = threading.Condition()
+        self.decoded = 0 # frames decoded, not wrapped at the end of the video
+        self.current = None
+        self.resized = {}
+        self.encoded = {}
+        self.started_at = time.time()
+        self.last_access = self.started_at
+        self.running = True
+        self.on_idle = on_idle
+        self.thread = threading.Thread(target = self.decode, daemon = True)
+        self.thread.start()
+
+    def playback_frame(self):
+        """
+        Returns the number of the frame to show now.
+        """
+        return int((time.time() - self.started_at) * self.fps)
+
+    def decode(self):
+        """
+        Decodes frames ahead of the playback clock, until the source is idle.
+        """
+        while self.running:
+            with self.cond:
+                while self.running and len(self.buffer) >= self.BUFFER_SIZE and \
+                        self.buffer[0][0] >= self.playback_frame():
+                    self.cond.wait(1.0 / self.fps)
+                if time.time() - self.last_access > self.IDLE_TIMEOUT:
+                    self.running = False
+                if not self.running:
+                    break
+
+            ok, frame = self.capture.read()
+            if not ok:
+                # Loop the video
+                self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0) # pylint: disable=no-member
+                ok, frame = self.capture.read()
+                if not ok:
+                    self.logger.error("Could not decode %s", self.path)
+                    self.running = False
+                    break
+
+            with self.cond:
+                self.buffer.append((self.decoded, frame))
+                self.decoded += 1
+                # Drop the frames the playback is already past, keep one to show
+                while len(self.buffer) > 1 and self.buffer[1][0] <= self.playback_frame():
+                    self.buffer.popleft()
+                if len(self.buffer) > self.BUFFER_SIZE:
+                    self.buffer.popleft()
+                self.cond.notify_all()
+
+        self.capture.release()
+        if self.on_idle is not None:
+            self.on_idle(self)
+
+    def frame(self):
+        """
+        Returns the frame to show now.
+
+        Returns:
+            tuple: (frame number, BGR frame), the frame must not be modified.
+        """
+        with self.cond:
+            self.last_access = time.time()
+            now = self.playback_frame()
+            while len(self.buffer) > 1 and self.buffer[1][0] <= now:
+                self.buffer.popleft()
+            if not self.buffer and self.running:
+                # Only at the start, or if the decoding is slower than the playback
+                self.cond.wait(1.0)
+            if self.buffer:
+                self.current = self.buffer[0]
+            self.cond.notify_all()
+            if self.current is None:
+                raise ValueError(f"No frame decoded from {self.path}")
+            return self.current
+
+    def frame_resized(self, width, height):
+        """
+        Returns the frame to show now, resized. The resized frames are shared by all
+        the cameras asking for the same size.
+        """
+        index, frame = self.frame()
+        with self.cond:
+            cached = self.resized.get((width, height))
+            if cached is not None and cached[0] == index:
+                return cached[1]
+        image = cv2.resize(frame, (width, height)) # pylint: disable=no-member
+        with self.cond:
+            self.resized[(width, height)] = (index, image)
+        return image
+
+    def frame_encoded(self, width, height):
+        """
+        Returns the frame to show now, resized and JPEG / base64 encoded. The encoded frames
+        are shared by all the cameras asking for the same size.
+        """
+        index, _ = self.frame()
+        with self.cond:
+            cached = self.encoded.get((width, height))
+            if cached is not None and cached[0] == index:
+                return cached[1]
+        image = self.frame_resized(width, height)
+        ok, buf = cv2.imencode(".jpg", image) # pylint: disable=no-member
+        if not ok:
+            raise ValueError(f"Could not encode frame of {self.path}")
+        data = base64.b64encode(buf.tobytes()).decode()
+        with self.cond:
+            self.encoded[(width, height)] = (index, data)
+        return data
+
+    def stop(self):
+        """
+        Stops the decoding thread.
+        """
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+
+class VideoSources:
+    """
+    Registry of the running video sources, one per video file.
+    """
+    sources = {}
+    lock = threading.Lock()
+
+    @classmethod
+    def get(cls, path):
+        """
+        Returns the running source of a video, starting it if needed.
+
+        Args:
+            path (str): The path of the video file.
+        Returns:
+            VideoSource: The source.
+        """
+        with cls.lock:
+            source = cls.sources.get(path)
+            if source is None or not source.running:
+                source = VideoSource(path, on_idle = cls._remove)
+                cls.sources[path] = source
+            return source
+
+    @classmethod
+    def _remove(cls, source):
+        with cls.lock:
+            if cls.sources.get(source.path) is source:
+                del cls.sources[source.path]
+
+    @classmethod
+    def stop_all(cls):
+        """
+        Stops all the video sources.
+        """
+        with cls.lock:
+            sources = list(cls.sources.values())
+            cls.sources.clear()
+        for source in sources:
+            source.stop()
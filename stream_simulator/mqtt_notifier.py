@@ -80,6 +80,11 @@ class MQTTNotifier:
             on_message = self.actor_pose_callback,
         )
 
+        self.crowd_poses_sub = self.local_commlib.create_psubscriber(
+            topic = "streamsim.*.actor.crowd.poses.internal",
+            on_message = self.crowd_poses_callback,
+        )
+
         self.robot_crash_sub = self.local_commlib.create_psubscriber(
             topic = "streamsim.*.*.crash",
             on_message = self.robot_crash_callback,
@@ -144,6 +149,19 @@ class MQTTNotifier:
         if self.prints:
             self.logger.info("UI inform %s: %s", "actor_pose", payload)
 
+    def crowd_poses_callback(self, message, _):
+        """
+        Callback function to handle the poses of the humans of the crowd.
+
+        The pose of every human is forwarded to the UI as an actor_pose message, as the
+        poses of the actors walking on their own.
+
+        Args:
+            message (dict): The 'poses' of the humans and their 'resolution'.
+        """
+        for pose in message['poses']:
+            self.actor_pose_callback({**pose, 'resolution': message['resolution']}, None)
+
     def robot_crash_callback(self, message, origin):
         """
         Callback function to handle robot crash messages.
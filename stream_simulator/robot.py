@@ -4,12 +4,15 @@ File name: robot.py
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 
+import copy
 import time
 import math
 import logging
 import threading
 
 from stream_simulator.connectivity import CommlibFactory
+from stream_simulator.base_classes import StartBarrier, KinematicsState
+from stream_simulator.transformations import PathPlanner, DistanceField
 from commlib.msg import PubSubMessage
 
 
@@ -146,7 +149,6 @@ class Robot:
         self.namespace = namespace
         self.mqtt_notifier = mqtt_notifier
         self.blocking_crash = blocking_crash
-        self.other_robots_poses = {}
 
         # Create the CommlibFactory
         self.commlib_factory = CommlibFactory(node_name = self.configuration["name"])
@@ -155,6 +157,9 @@ class Robot:
         self.tf_declare_rpc = self.commlib_factory.get_rpc_client(
             rpc_name=self.tf_base + ".declare"
         )
+        self.tf_declare_batch_rpc = self.commlib_factory.get_rpc_client(
+            rpc_name=self.tf_base + ".declare_batch"
+        )
 
         self.common_logging = False
 
@@ -184,6 +189,8 @@ class Robot:
         self.crashed = False
         self.next_poi_from_callback = None
         self.target_to_reach = None
+        # The waypoints left to the POI, after target_to_reach
+        self.waypoints = []
         self.velocities_for_target = {'linear': 0, 'angular': 0}
 
         self.detection_threshold = 1
@@ -194,6 +201,12 @@ class Robot:
         self.width = self.map.shape[0]
         self.height = self.map.shape[1]
         self.resolution = self.world["map"]["resolution"]
+        # The radius of the footprint, the walls are inflated by it when planning paths.
+        # A polygon footprint, [[x, y], ...] in meters, is bounded by a disc.
+        self.radius = float(self.configuration.get("radius", 0.25))
+        if "footprint" in self.configuration:
+            self.radius = max(math.hypot(p[0], p[1]) for p in self.configuration["footprint"])
+        self.distance_field = DistanceField.for_map(self.map, self.resolution, self.radius)
         self.logger.info("Robot %s: map set", self.name)
 
         self._x = 0
@@ -211,9 +224,19 @@ class Robot:
             self._x = self._init_x
             self._y = self._init_y
             self._theta = self._init_theta
+        # The motion integrated by the kinematics loop, read by the IMUs
+        self.kinematics = KinematicsState(self._x, self._y, self._theta)
 
         self.automation = None
         self.pois_index = None
+        # The initial route, restored by reset
+        self.initial_points = None
+        self.route_reset = False
+        # Set by reset, the kinematics loop puts the robot back between two steps
+        self.pose_reset = False
+        # Set by reset_pose once the robot is back at its initial pose
+        self.pose_reset_done = threading.Event()
+        self.pose_reset_done.set()
         if "automation" in self.configuration:
             self.logger.critical("Robot %s is in mock mode and has automation", self.name)
             self.automation = self.configuration["automation"]
@@ -225,6 +248,7 @@ class Robot:
             for p in self.automation['points']:
                 p['x'] *= self.resolution
                 p['y'] *= self.resolution
+            self.initial_points = copy.deepcopy(self.automation['points'])
             self.logger.info("Robot %s: automation set", self.name)
             self.logger.info("Pois: %s", self.automation['points'])
 
@@ -272,15 +296,11 @@ class Robot:
         )
 
         if self.automation is None:
-            self.other_robots_pose_sub = self.commlib_factory.create_psubscriber(
-                topic = "streamsim.*.*.pose.internal",
-                on_message = self.others_robot_pose_callback,
-            )
-            self.other_humans_pose_sub = self.commlib_factory.create_psubscriber(
-                topic = "streamsim.*.actor.human.*.pose.internal",
-                on_message = self.humans_pose_callback,
+            # The contacts are detected by the collision service of the world
+            self.collisions_sub = self.commlib_factory.get_subscriber(
+                topic = self.name + ".collisions.internal",
+                callback = self.collisions_callback
             )
-            # print("IN ROBOT: ", self.name, self.name + ".pose.internal")
 
         # SIMULATOR ------------------------------------------------------------
         if self.configuration['remote_inform'] is True:
@@ -327,6 +347,8 @@ class Robot:
     def move_to_poi_callback(self, goalh): # message is the goalhandle
         """
         Callback function to move the robot to a point of interest (POI).
+        A path around the walls is planned on the map of the world and the robot
+        follows its waypoints.
 
         Args:
             goalh (GoalHandle): The goal handle containing the target POI and movement parameters.
@@ -336,94 +358,61 @@ class Robot:
             linear (float): The linear velocity for the movement.
             angular (float): The angular velocity for the movement.
             next_poi_from_callback (dict): The coordinates of the next POI.
-            target_to_reach (dict): The target coordinates to reach.
+            target_to_reach (dict): The next waypoint to reach.
+            waypoints (list): The waypoints left after target_to_reach.
             velocities_for_target (dict): The velocities for the movement.
         
         Returns:
-            dict: An empty dictionary upon completion.
+            dict: An empty dictionary upon completion, or {"status": "failed"} if
+                the POI cannot be reached.
         """
         # Find the poi with the same name
         poi_name = goalh.data['poi']
         linear = goalh.data['linear']
         angular = goalh.data['angular']
-        self.next_poi_from_callback = self.pois[poi_name]
-        self.target_to_reach = {
-            'x': self.next_poi_from_callback['x'],
-            'y': self.next_poi_from_callback['y']
-        }
-        self.logger.info("Moving to POI %s [%s]", goalh, self.target_to_reach)
+        poi = self.pois[poi_name]
+        # The costmap is built on the first call and shared by the robots of the map
+        planner = PathPlanner.for_map(self.map, self.resolution, self.radius)
+        waypoints = planner.plan((self._x, self._y), (poi['x'], poi['y']))
+        if waypoints is None:
+            self.logger.error("%s: no path to POI %s", self.name, poi_name)
+            return {"status": "failed"}
+
         self.velocities_for_target = {
             'linear': linear,
             'angular': angular
         }
+        self.waypoints = [{'x': x, 'y': y} for x, y in waypoints[1:]]
+        self.target_to_reach = {'x': waypoints[0][0], 'y': waypoints[0][1]}
+        self.next_poi_from_callback = poi
+        self.logger.info("Moving to POI %s [%s] through %s", goalh, poi, waypoints)
         while self.next_poi_from_callback is not None and \
             self.stopped is not True and self.terminated is not True \
                 and not goalh.cancel_event.is_set():
             time.sleep(0.1)
+        self.next_poi_from_callback = None
+        self.waypoints = []
         self.target_to_reach = None
         return {}
 
-    def check_collision_with_other_robots(self):
-        """
-        Check for collisions with other robots in the simulation.
-
-        This function checks if the robot has crashed with another robot based on their proximity.
-        If a collision is detected, it sets the `crashed_with_other_robot` attribute to True and
-        publishes a crash message containing the robot's current pose.
-        """
-        for name, pose in self.other_robots_poses.items():
-            if math.hypot(self._x - pose['x'], self._y - pose['y']) < 0.5:
-                self.crashed_with_other_robot = True
-                self.logger.error("Crashed with %s", name)
-                pose = PoseMsg(
-                    position=PositionMsg(x=self._x, y=self._y, z=0.0),
-                    orientation=RPYOrientationMsg(roll=0.0, pitch=0.0, yaw=self._theta)
-                )
-                self.crash_pub.publish(pose)
-
-    def others_robot_pose_callback(self, message, _):
+    def collisions_callback(self, message):
         """
-        Callback function to handle the pose of other robots.
+        Callback function to handle the contacts of the robot with other robots and
+        humans, as detected by the collision service of the world.
 
-        This function processes the incoming message containing the pose information
-        of other robots and checks if the current robot has crashed with another robot
-        based on their proximity.
+        Args:
+            message (dict): 'crashed' (bool) and the names of the robots and humans
+                the robot is in contact with ('with').
         """
-
-        payload = {
-            'x': message['x'],
-            'y': message['y'],
-            'theta': message['theta'],
-            'resolution': message['resolution'],
-            'name': message['raw_name'],
-        }
-        if self.pure_name == payload['name']:
+        self.crashed_with_other_robot = message['crashed']
+        if message['crashed'] is False:
             return
-
-        self.other_robots_poses[payload['name']] = payload
-
-        self.check_collision_with_other_robots()
-
-    def humans_pose_callback(self, message, _):
-        """
-        Callback function to handle the pose of human actors.
-        """
-        payload = {
-            'x': message['x'],
-            'y': message['y'],
-            'theta': message['theta'],
-            'resolution': message['resolution'],
-            'name': message['raw_name'],
-        }
-        # If the robot is in proximity of 0.5 meters, it crashes
-        if math.hypot(self._x - payload['x'], self._y - payload['y']) < 0.5:
-            self.crashed_with_other_robot = True
-            self.logger.error("Crashed with %s", payload['name'])
-            pose = PoseMsg(
-                position=PositionMsg(x=self._x, y=self._y, z=0.0),
-                orientation=RPYOrientationMsg(roll=0.0, pitch=0.0, yaw=self._theta)
-            )
-            self.crash_pub.publish(pose)
+        self.logger.error("Crashed with %s", ", ".join(message['with']))
+        pose = PoseMsg(
+            position=PositionMsg(x=self._x, y=self._y, z=0.0),
+            orientation=RPYOrientationMsg(roll=0.0, pitch=0.0, yaw=self._theta)
+        )
+        self.crash_pub.publish(pose)
 
     def register_controller(self, c):
         """
@@ -494,12 +483,15 @@ class Robot:
             "device_name": self.configuration["name"],
             "logger": self.logger,
             "map": self.map,
+            "resolution": self.resolution,
             "actors": actors,
             'tf_declare': self.tf_declare_rpc,
             "env_properties": self.env_properties,
             'tf_declare_rpc_topic': self.tf_base + '.declare',
+            'tf_batch_declare': True,
             'tf_affection_rpc_topic': self.tf_base + '.get_affections',
             'tf_detect_rpc_topic': self.tf_base + '.simulated_detection',
+            'kinematics': self.kinematics,
         }
         str_sim = __import__("stream_simulator")
         str_contro = getattr(str_sim, "controllers")
@@ -519,6 +511,7 @@ class Robot:
         }
         if "devices" not in self.configuration:
             return
+        declarations = []
         for s in self.configuration["devices"]:
             for m in self.configuration["devices"][s]:
                 # Handle pose
@@ -534,6 +527,18 @@ class Robot:
 
                 tmp_controller = map_[s](conf = m, package = p)
                 self.register_controller(tmp_controller)
+                if tmp_controller.tf_declaration is not None:
+                    declarations.append(tmp_controller.tf_declaration)
+
+        # Declare all devices to tf at once, in configuration order
+        if len(declarations) > 0:
+            res = self.tf_declare_batch_rpc.call(
+                {"declarations": declarations},
+                timeout = max(10, 0.1 * len(declarations))
+            )
+            if res is None:
+                self.logger.error("TF batch declaration of %s devices timed out", \
+                    len(declarations))
 
         # Handle the buttons
         self.button_configuration = {
@@ -625,7 +630,8 @@ class Robot:
         Starts the robot simulation by initializing and starting all controller threads
         and the main simulator thread.
         This method performs the following actions:
-        1. Iterates through all controllers and starts each one in a new thread.
+        1. Registers all controllers to the start barrier, so that each one is started
+        in a new thread when the simulation starts.
         2. Sets the `stopped` attribute to False.
         3. Starts the main simulator thread.
         Note:
@@ -634,7 +640,7 @@ class Robot:
             initialized thread object before calling this method.
         """
         for _, controller in self.controllers.items():
-            threading.Thread(target = controller.start).start()
+            StartBarrier.start_when_ready(self.namespace, controller.start)
 
         self.stopped = False
         self.simulator_thread.start()
@@ -666,6 +672,54 @@ class Robot:
         self.commlib_factory.stop()
         del self.commlib_factory
 
+    def reset(self):
+        """
+        Restores the initial state of the robot in place, for the in-place reset of the
+        simulation: its goals are cancelled, its devices are reset and it is put back
+        at its initial pose. The controllers and their connections are kept.
+        The pose is written by the kinematics loop, at the top of its next step, so
+        that a step in progress does not overwrite it: wait_reset waits for it.
+        """
+        for c, controller in self.controllers.items():
+            try:
+                controller.reset()
+            except Exception as e: # pylint: disable=broad-except
+                self.logger.error("Controller %s could not be reset: %s", c, str(e))
+        if self.automation is not None:
+            self.route_reset = True
+        if self.simulator_thread.is_alive():
+            self.pose_reset_done.clear()
+            self.pose_reset = True
+        else:
+            self.reset_pose()
+
+    def wait_reset(self, timeout):
+        """
+        Waits for the kinematics loop to put the robot back at its initial pose.
+
+        Args:
+            timeout (float): The maximum time to wait, in seconds.
+
+        Returns:
+            bool: True if the robot is at its initial pose.
+        """
+        return self.pose_reset_done.wait(max(0.0, timeout))
+
+    def reset_pose(self):
+        """
+        Puts the robot back at its initial pose, at rest, ending a move_to_poi goal.
+        Called by the kinematics loop, or by reset when the loop does not run.
+        """
+        self.next_poi_from_callback = None
+        self.waypoints = []
+        self._x = self._init_x
+        self._y = self._init_y
+        self._theta = self._init_theta
+        self.crashed = False
+        self.kinematics.reset(self._x, self._y, self._theta)
+        self.dispatch_pose_local(teleport = True)
+        self.pose_reset_done.set()
+
     def devices_callback(self, _):
         """
         Callback function to retrieve the current devices and timestamp.
@@ -701,6 +755,7 @@ class Robot:
         self._x = self._init_x
         self._y = self._init_y
         self._theta = self._init_theta
+        self.kinematics.reset(self._x, self._y, self._theta)
         self.dispatch_pose_local()
         return {}
 
@@ -725,6 +780,7 @@ class Robot:
         self._x = msg["x"]
         self._y = msg["y"]
         self._theta = msg["theta"]
+        self.kinematics.reset(self._x, self._y, self._theta)
         self.dispatch_pose_local()
         return {}
 
@@ -743,8 +799,9 @@ class Robot:
         Check if the given coordinates are valid and do not result in a collision.
         This method performs the following checks:
         1. Out of bounds check: Ensures that the coordinates (x, y) are within the valid range.
-        2. Collision check: Ensures that the path from (prev_x, prev_y) to (x, y) does not collide
-        with any obstacles.
+        2. Collision check: Ensures that the footprint of the robot (a disc of its radius) does
+        not hit any wall while moving from (prev_x, prev_y) to (x, y), using the distance
+        field of the map. A robot that already touches a wall may still move away from it.
         Args:
             x (float): The current x-coordinate.
             y (float): The current y-coordinate.
@@ -764,46 +821,15 @@ class Robot:
             self.logger.error("%s: %s", self.name, self.error_log_msg)
             return True
 
-        # Check collision to obstacles
-
-        x_i = int(x / self.resolution)
-        x_i_p = int(prev_x / self.resolution)
-        if x_i > x_i_p:
-            x_i, x_i_p = x_i_p, x_i
-
-        y_i = int(y / self.resolution)
-        y_i_p = int(prev_y / self.resolution)
-        if y_i > y_i_p:
-            y_i, y_i_p = y_i_p, y_i
-
-        if x_i == x_i_p:
-            for i in range(y_i, y_i_p):
-                if self.map[x_i, i] == 1:
-                    self.error_log_msg = "Crashed on a Wall"
-                    self.logger.error("%s: %s", self.name, self.error_log_msg)
-                    return True
-        elif y_i == y_i_p:
-            for i in range(x_i, x_i_p):
-                if self.map[i, y_i] == 1:
-                    self.error_log_msg = "Crashed on a Wall"
-                    self.logger.error("%s: %s", self.name, self.error_log_msg)
-                    return True
-        else: # we have a straight line
-            th = math.atan2(y_i_p - y_i, x_i_p - x_i)
-            dist = math.hypot(x_i_p - x_i, y_i_p - y_i)
-            d = 0
-            while d < dist:
-                xx = x_i + d * math.cos(th)
-                yy = y_i + d * math.sin(th)
-                if self.map[int(xx), int(yy)] == 1:
-                    self.error_log_msg = "Crashed on a Wall"
-                    self.logger.error("%s: %s", self.name, self.error_log_msg)
-                    return True
-                d += 1.0
+        # Check collision to obstacles, sweeping the footprint from the previous pose
+        if self.distance_field.sweep_collides(prev_x, prev_y, x, y, self.radius):
+            self.error_log_msg = "Crashed on a Wall"
+            self.logger.error("%s: %s", self.name, self.error_log_msg)
+            return True
 
         return False
 
-    def dispatch_pose_local(self):
+    def dispatch_pose_local(self, teleport = False):
         """
         Publishes the robot's current pose to the internal_pose_pub topic.
 
@@ -813,18 +839,27 @@ class Robot:
         - theta: The orientation of the robot in radians.
         - resolution: The resolution of the robot's position data.
         - name: The name of the robot.
+        - teleport: Set when the robot is put back by a reset, so that the jump is not
+          swept for alarms and collisions.
+
+        Args:
+            teleport (bool): Whether the robot was put back by a reset.
 
         Returns:
             None
         """
-        self.internal_pose_pub.publish({
+        msg = {
             "x": self._x,
             "y": self._y,
             "theta": self._theta,
             "resolution": self.resolution,
             "name": self.name, # is this needed?
-            "raw_name": self.raw_name
-        })
+            "raw_name": self.raw_name,
+            "timestamp": time.time()
+        }
+        if teleport:
+            msg["teleport"] = True
+        self.internal_pose_pub.publish(msg)
         # Publish a more generic PoseMessage
         pose = PoseMsg(
             position=PositionMsg(x=self._x, y=self._y, z=0.0),
@@ -916,6 +951,17 @@ class Robot:
         self.pois_index = -1
         self.dispatch_pose_local()
         while self.stopped is False:
+            if self.route_reset:
+                # The automation starts over from the first point
+                self.route_reset = False
+                self.automation['points'][:] = copy.deepcopy(self.initial_points)
+                self.pois_index = -1
+                has_target = False
+                reverse_mode = False
+            if self.pose_reset:
+                self.pose_reset = False
+                self.reset_pose()
+                t = time.time()
             if self.motion_controller is not None or self.automation is not None:
                 # update time interval
                 dt = time.time() - t
@@ -985,6 +1031,8 @@ class Robot:
                     # Get the velocities from the motion controller
                     lin_ = self.motion_controller.get_linear()
                     ang_ = self.motion_controller.get_angular()
+                    # Distance and turn goals end within the step
+                    dt = self.motion_controller.odometry_step(lin_, ang_, dt)
 
                 if ang_ == 0:
                     self._x += lin_ * dt * math.cos(self._theta)
@@ -1014,9 +1062,12 @@ class Robot:
                     if math.hypot(\
                         xx - self.target_to_reach['x'], \
                             yy - self.target_to_reach['y']) < 0.05:
-                        if self.automation is None:
-                            self.logger.warning("Reached POI %s", self.pois_index)
-                        self.next_poi_from_callback = None
+                        if self.waypoints:
+                            self.target_to_reach = self.waypoints.pop(0)
+                        else:
+                            if self.automation is None:
+                                self.logger.warning("Reached POI %s", self.pois_index)
+                            self.next_poi_from_callback = None
 
                 # Logging
                 if self.precision_mode is True and self.automation is None:
@@ -1028,8 +1079,6 @@ class Robot:
                                 f"[POI {self.pois_index} \
                                     {self.automation['points'][self.pois_index]}]"\
                                     if self.automation is not None else "")
-                            # Check for collision with other robots\
-                            self.check_collision_with_other_robots()
 
                 # Send internal pose
                 self.dispatch_pose_local()
@@ -1054,6 +1103,8 @@ class Robot:
                 else:
                     self.crashed = False
 
+                self.kinematics.record(t, self._x, self._y, self._theta)
+
             time.sleep(self.dt)
 
         self.logger.critical("Stopped %s simulation thread", self.name)
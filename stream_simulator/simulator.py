@@ -6,12 +6,15 @@ File that contains the Simulator class.
 # -*- coding: utf-8 -*-
 
 import logging
+import os
 import random
 import string
+import threading
 import time
 
 from stream_simulator.connectivity import CommlibFactory
-from stream_simulator.transformations import TfController
+from stream_simulator.base_classes import StartBarrier
+from stream_simulator.transformations import TfController, CollisionService
 from stream_simulator.controllers import SonarController # pylint: disable=unused-import
 
 from .robot import Robot
@@ -45,6 +48,8 @@ class Simulator:
         List of robots in the simulation.
     robot_names : list
         List of robot names in the simulation.
+    collisions : CollisionService
+        Detects the contacts of the robots with the other robots and the humans.
     Methods
     -------
     __init__(tick=0.1, conf_file=None, configuration=None, device=None):
@@ -62,6 +67,9 @@ class Simulator:
     start():
         Starts the simulation and all its components.
     """
+    # The time the in-place reset waits for the robots to be back at their poses
+    RESET_TIMEOUT = 2.0
+
     def __init__(self,
                  tick = 0.1,
                  uid = None,
@@ -86,6 +94,10 @@ class Simulator:
         # Wait for configuration from broker
         self.configuration = None
 
+        # Startup timings (configuration received -> start / first sensor data)
+        self.config_received_at = None
+        self.startup_times = {}
+
          # Create the CommlibFactory
         self.commlib_factory = CommlibFactory(node_name = "Simulator")
 
@@ -99,6 +111,17 @@ class Simulator:
             rpc_name = self.name + '.get_device_groups'
         )
 
+        self.stats_rpc_server = self.commlib_factory.get_rpc_service(
+            callback = self.stats_callback,
+            rpc_name = self.name + '.stats'
+        )
+
+        # Restores the initial state without restarting, unlike streamsim.{uid}.reset
+        self.reset_in_place_rpc_server = self.commlib_factory.get_rpc_service(
+            callback = self.reset_in_place_callback,
+            rpc_name = self.name + '.reset_in_place'
+        )
+
         # self.devices_rpc_server = self.commlib_factory.get_rpc_service(
         #     callback = self.reset,
         #     rpc_name = self.name + '.reset'
@@ -135,8 +158,15 @@ class Simulator:
         self.world_name = None
         self.robots = None
         self.robot_names = None
+        self.collisions = None
         self.logger.info("Simulator created. Waiting for configuration...")
 
+        # Periodic traffic summaries, STREAMSIM_STATS_PERIOD=0 disables them
+        self.stats_period = float(os.getenv('STREAMSIM_STATS_PERIOD', "60"))
+        self.stats_running = self.stats_period > 0
+        if self.stats_running:
+            threading.Thread(target = self.stats_thread, daemon = True).start()
+
         if message is not None:
             self.configuration_callback(message)
 
@@ -212,6 +242,82 @@ class Simulator:
             "world": self.world_name
         }
 
+    def stats_callback(self, _):
+        """
+        Callback function to retrieve the runtime communication statistics.
+
+        Args:
+            _ (Any): Placeholder argument, not used in the function.
+
+        Returns:
+            dict: The endpoint counts and the traffic snapshot (per-topic rates,
+                bytes/s, publish latency, RPC round-trip histograms and worker
+                queue depth).
+        """
+        return {
+            "endpoints": self.commlib_factory.stats,
+            "traffic": CommlibFactory.traffic.snapshot(),
+            "startup": self.startup_times,
+        }
+
+    def reset_in_place_callback(self, _):
+        """
+        Callback function to reset the simulation in place. The robots and the actors go
+        back to their initial poses, and the devices, the alarm counters and the
+        environmental properties to their initial states. The controllers and their
+        connections are kept, so the reset does not wait for a new simulator to start.
+
+        Args:
+            _ (Any): Placeholder argument, not used in the function.
+
+        Returns:
+            dict: "success", False if a robot was not back at its initial pose within
+                RESET_TIMEOUT, and the "duration" of the reset in seconds.
+        """
+        if self.world is None:
+            return {"success": False, "duration": 0}
+        started = time.time()
+        self.logger.warning("Resetting simulation in place...")
+        for robot in self.robots:
+            robot.reset()
+        self.world.reset()
+        self.tf.reset()
+        # The kinematics loops apply the poses between two steps
+        success = True
+        for robot in self.robots:
+            if not robot.wait_reset(started + self.RESET_TIMEOUT - time.time()):
+                self.logger.error("Robot %s was not reset in %s seconds", \
+                    robot.name, self.RESET_TIMEOUT)
+                success = False
+        duration = time.time() - started
+        self.logger.warning("Simulation reset in %.3f seconds", duration)
+        return {"success": success, "duration": duration}
+
+    def stats_thread(self):
+        """
+        Logs a summary of the busiest topics and RPCs every `stats_period` seconds.
+        """
+        while self.stats_running:
+            time.sleep(self.stats_period)
+            lines = CommlibFactory.traffic.summary()
+            self.logger.info("Traffic report:\n%s", "\n".join(lines))
+
+    def startup_report_thread(self):
+        """
+        Waits for the first sensor data after the configuration was received and
+        reports the startup timings.
+        """
+        first_data = CommlibFactory.traffic.wait_first_publish(
+            ".data", self.config_received_at, timeout = 60)
+        if first_data is None:
+            self.logger.warning("No sensor data within 60 seconds from the configuration")
+            return
+        self.startup_times["config_to_first_data_s"] = first_data - self.config_received_at
+        self.logger.warning("Startup: simulation started %.3f s and first sensor data " \
+            "arrived %.3f s after the configuration was received",
+            self.startup_times["config_to_start_s"],
+            self.startup_times["config_to_first_data_s"])
+
     def configuration_callback(self, message):
         """
         Callback function to handle the configuration message.
@@ -232,6 +338,8 @@ class Simulator:
             time.sleep(0.1)
 
         self.logger.info("Received configuration")
+        self.config_received_at = time.time()
+        self.startup_times = {}
         self.configuration = message
         self.configuration['tf_base'] = self.name + ".tf"
         self.configuration['simulation'] = {
@@ -279,6 +387,12 @@ class Simulator:
                 )
                 self.robot_names.append(r["name"])
 
+        # The contacts of all the robots are detected once per tick
+        self.collisions = CollisionService(namespace = self.name, tick = self.tick)
+        for _robot in self.robots:
+            self.collisions.add_robot(_robot.name, checked = _robot.automation is None, \
+                radius = _robot.radius)
+
         # Create robots
         for _, value in enumerate(self.robots):
             _robot = value
@@ -293,7 +407,12 @@ class Simulator:
         self.tf.setup()
         self.logger.info("Tf setup done")
 
-        # Start all devices NOTE: Should this be here???
+        # Start all devices together. The message is still published for
+        # the ones living in other processes.
+        released = StartBarrier.signal(self.name)
+        self.startup_times["config_to_start_s"] = time.time() - self.config_received_at
+        self.logger.info("Start barrier released %s controllers", released)
+        threading.Thread(target = self.startup_report_thread, daemon = True).start()
         self.simulation_start_pub.publish({
             "uid": self.uid
         })
@@ -308,13 +427,16 @@ class Simulator:
         simulation has been stopped.
         """
         self.logger.critical("Stopping simulation...")
+        self.stats_running = False
         for r in self.robots:
             self.logger.critical("Stopping robot %s", r.raw_name)
             r.stop()
             self.logger.critical("Robot %s stopped", r.raw_name)
         self.world.stop()
         self.tf.stop()
+        self.collisions.stop()
         self.commlib_factory.stop()
+        StartBarrier.reset(self.name)
         self.logger.warning("Simulation stopped")
 
     def start(self):
@@ -323,7 +445,7 @@ class Simulator:
         This method performs the following actions:
         1. Logs the start of the simulator.
         2. Logs a communications report, detailing the number of connections for each type.
-        3. Dispatches the local pose for each robot.
+        3. Starts the collision service and dispatches the local pose for each robot.
         4. Notifies the UI that the simulator has started.
         5. Logs a warning indicating that the simulation has started.
         """
@@ -342,6 +464,7 @@ class Simulator:
 
         self.commlib_factory.print_topics()
         # Just to be informed for pose
+        self.collisions.start()
         for _, robot in enumerate(self.robots):
             robot.dispatch_pose_local()
 
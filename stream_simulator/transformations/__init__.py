@@ -11,5 +11,10 @@ from .check_lines_orientation import check_lines_orientation
 from .check_lines_on_segment import check_lines_on_segment
 from .check_lines_intersection import check_lines_intersection
 from .calc_distance import calc_distance
+from .spatial_index import SpatialIndex, SegmentIndex
+from .path_planner import PathPlanner
+from .distance_field import DistanceField
+from .pose_history import PoseHistory
+from .collisions import CollisionService
 
 from .tf import TfController
@@ -0,0 +1,230 @@
+"""
+File that implements the world level collision service of the robots.
+"""
+
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import time
+import math
+import logging
+import threading
+
+import numpy as np
+
+from stream_simulator.connectivity import CommlibFactory
+from stream_simulator.transformations.spatial_index import SpatialIndex
+
+class CollisionService:
+    """
+    Detects the contacts of the robots with the other robots and the humans.
+
+    The poses of the robots and of the humans are kept in a spatial index, and the
+    contacts are computed once per tick for the whole world, instead of every robot
+    checking all the poses it receives. Every robot and human is a disc moving along
+    a segment during the tick (its swept footprint), and two of them are in contact
+    if the discs come closer than the sum of their radii at any instant of the tick.
+    The robots are informed on their own {robot}.collisions.internal topic when a
+    contact starts or ends.
+
+    Attributes:
+        namespace (str): The namespace of the simulation.
+        tick (float): The period of the checks, in seconds.
+        index (SpatialIndex): The positions of the robots and of the humans.
+        names (dict): index key -> the raw name reported in the events.
+        radii (dict): index key -> the radius of the footprint, in meters.
+        previous (dict): index key -> the (x, y) position at the previous check.
+        checked (dict): robot name -> publisher of its collision events.
+        contacts (dict): robot name -> the sorted names it is in contact with.
+    """
+    # The footprint radius of the humans, in meters
+    HUMAN_RADIUS = 0.25
+
+    def __init__(self, namespace, tick = 0.1):
+        self.logger = logging.getLogger(__name__)
+        self.namespace = namespace
+        self.tick = tick
+        self.index = SpatialIndex(4 * self.HUMAN_RADIUS)
+        self.names = {}
+        self.radii = {}
+        self.previous = {}
+        self.checked = {}
+        self.contacts = {}
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.running = False
+        self.thread = None
+
+        self.commlib_factory = CommlibFactory(node_name = "CollisionService")
+        self.humans_sub = self.commlib_factory.create_psubscriber(
+            topic = f"{self.namespace}.actor.human.*.pose.internal",
+            on_message = self.human_pose_callback,
+        )
+        self.crowd_sub = self.commlib_factory.get_subscriber(
+            topic = f"{self.namespace}.actor.crowd.poses.internal",
+            callback = self.crowd_poses_callback
+        )
+        self.subs = {}
+
+    def add_robot(self, name, checked = True, radius = 0.25):
+        """
+        Follows the pose of a robot.
+
+        Args:
+            name (str): The full name of the robot, the prefix of its topics.
+            checked (bool): Whether the contacts of the robot are reported. Otherwise it
+                is only an obstacle for the others, like the robots with automation.
+            radius (float): The radius of the footprint of the robot, in meters.
+        """
+        self.radii[name] = float(radius)
+        self.subs[name] = self.commlib_factory.get_subscriber(
+            topic = f"{name}.pose.internal",
+            callback = self.robot_pose_callback
+        )
+        if checked:
+            self.checked[name] = self.commlib_factory.get_publisher(
+                topic = f"{name}.collisions.internal"
+            )
+
+    def robot_pose_callback(self, message):
+        """
+        Callback function to handle the pose of a robot.
+        """
+        self.update(message['name'], message['raw_name'], message['x'], message['y'], \
+            message.get('teleport', False))
+
+    def human_pose_callback(self, message, _):
+        """
+        Callback function to handle the pose of a human actor.
+        """
+        key = f"{self.namespace}.actor.human.{message['raw_name']}"
+        self.radii.setdefault(key, self.HUMAN_RADIUS)
+        self.update(key, message['raw_name'], message['x'], message['y'], \
+            message.get('teleport', False))
+
+    def crowd_poses_callback(self, message):
+        """
+        Callback function to handle the poses of all the humans of the crowd.
+        """
+        with self.lock:
+            for pose in message['poses']:
+                key = f"{self.namespace}.actor.human.{pose['raw_name']}"
+                self.radii.setdefault(key, self.HUMAN_RADIUS)
+                self.names[key] = pose['raw_name']
+                self.index.update(key, pose['x'], pose['y'])
+                if message.get('teleport'):
+                    self.previous[key] = (pose['x'], pose['y'])
+            self.dirty = True
+
+    def update(self, key, name, x, y, teleport = False):
+        """
+        Moves a robot or a human in the index.
+
+        Args:
+            key (str): The unique key of the robot or the human.
+            name (str): The name reported in the collision events.
+            x (float): The x coordinate, in meters.
+            y (float): The y coordinate, in meters.
+            teleport (bool): Whether it was moved at once, the jump is not swept.
+        """
+        with self.lock:
+            self.names[key] = name
+            self.index.update(key, x, y)
+            if teleport:
+                self.previous[key] = (x, y)
+            self.dirty = True
+
+    def check(self):
+        """
+        Computes the contacts of the checked robots and informs the robots whose
+        contacts changed.
+
+        Returns:
+            dict: robot name -> the names it is in contact with, for the changed ones.
+        """
+        with self.lock:
+            if not self.dirty:
+                return {}
+            # The segments swept since the previous check
+            sweeps = {}
+            for key, (x, y, _) in self.index.points.items():
+                sweeps[key] = (self.previous.get(key, (x, y)), (x, y))
+                self.previous[key] = (x, y)
+            longest = max((math.dist(a, b) for a, b in sweeps.values()), default = 0)
+            # Once nothing moves, the contacts of the final poses are checked once more
+            self.dirty = longest > 0
+            largest = max(self.radii.values(), default = 0)
+
+            contacts = {}
+            for name in self.checked:
+                if name not in sweeps:
+                    continue
+                (ax, ay), (bx, by) = sweeps[name]
+                radius = self.radii.get(name, self.HUMAN_RADIUS)
+                # The others are at most 'longest' away from their swept segment
+                others = [other for other, _ in self.index.query((ax + bx) / 2, (ay + by) / 2, \
+                    math.dist((ax, ay), (bx, by)) / 2 + radius + largest + longest) \
+                    if other != name]
+                contacts[name] = sorted(self.names[other] for other in \
+                    self._touching(sweeps[name], radius, others, sweeps))
+
+        changed = {}
+        for name, others in contacts.items():
+            if others != self.contacts.get(name, []):
+                changed[name] = others
+                self.checked[name].publish({
+                    "crashed": len(others) > 0,
+                    "with": others,
+                })
+        self.contacts = contacts
+        return changed
+
+    def _touching(self, sweep, radius, others, sweeps):
+        """
+        The others whose swept footprint touches the swept footprint of a robot. The
+        closest approach of two points moving along segments during the same tick is
+        found in closed form, for all the others at once.
+        """
+        if not others:
+            return []
+        (ax, ay), (bx, by) = sweep
+        starts = np.array([sweeps[o][0] for o in others])
+        ends = np.array([sweeps[o][1] for o in others])
+        radii = np.array([self.radii.get(o, self.HUMAN_RADIUS) for o in others])
+        # Relative position at the start of the tick and relative motion
+        rel = np.array([ax, ay]) - starts
+        motion = np.array([bx - ax, by - ay]) - (ends - starts)
+        speed = (motion ** 2).sum(axis = 1)
+        t = np.where(speed > 0, -(rel * motion).sum(axis = 1) / np.maximum(speed, 1e-12), 0)
+        t = np.clip(t, 0, 1)
+        closest = np.hypot(*(rel + t[:, None] * motion).T)
+        return [o for o, hit in zip(others, closest < radius + radii) if hit]
+
+    def start(self):
+        """
+        Starts the periodic checks.
+        """
+        self.commlib_factory.run()
+        self.running = True
+        self.thread = threading.Thread(target = self.check_thread, daemon = True)
+        self.thread.start()
+        self.logger.info("Collision service started for %s robots", len(self.checked))
+
+    def check_thread(self):
+        """
+        Checks the contacts once per tick.
+        """
+        while self.running:
+            started = time.time()
+            try:
+                self.check()
+            except Exception as e: # pylint: disable=broad-exception-caught
+                self.logger.error("Collision check failed: %s", str(e))
+            time.sleep(max(0, self.tick - (time.time() - started)))
+
+    def stop(self):
+        """
+        Stops the periodic checks.
+        """
+        self.running = False
+        self.commlib_factory.stop()
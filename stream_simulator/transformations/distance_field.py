@@ -0,0 +1,166 @@
+"""
+File that implements the distance field of the walls of a map.
+"""
+
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import math
+import threading
+
+import numpy as np
+import cv2
+
+class DistanceField:
+    """
+    The distance of the map cells to the nearest wall, used to sweep the footprint of
+    the robots against the walls.
+
+    The field is computed per square tile of the map, the first time a tile is
+    visited, so that the cost and the memory stay bounded by the visited area even on
+    large maps. The distances are exact up to max_distance, which bounds the margin
+    of walls each tile is computed with.
+
+    Attributes:
+        map (numpy.ndarray): The occupancy map, 1 for walls.
+        resolution (float): The resolution of the map in meters per cell.
+        max_distance (float): The distances are exact up to this value, in meters.
+        margin (int): The cells around a tile its walls are looked for in.
+        tiles (dict): (i, j) -> the distances of the tile, in cells.
+    """
+    TILE = 256
+    # Sweeps of up to this many samples are looked up one by one
+    SHORT_SWEEP = 4
+    # The default clipping distance, in meters
+    MAX_DISTANCE = 1.0
+    # The fields shared by the robots of a map
+    fields = {}
+    fields_lock = threading.Lock()
+
+    def __init__(self, map_, resolution, max_distance = MAX_DISTANCE):
+        self.map = np.asarray(map_)
+        self.resolution = float(resolution)
+        self.max_distance = float(max_distance)
+        self.margin = int(math.ceil(self.max_distance / self.resolution)) + 1
+        self.tiles = {}
+
+    @classmethod
+    def for_map(cls, map_, resolution, max_distance = MAX_DISTANCE):
+        """
+        Returns the distance field of a map.
+
+        Args:
+            map_ (numpy.ndarray): The occupancy map of the world, 1 for walls.
+            resolution (float): The resolution of the map in meters per cell.
+            max_distance (float): The largest distance of interest, in meters.
+
+        Returns:
+            DistanceField: The field, shared by all the callers with the same map.
+        """
+        max_distance = max(float(max_distance), cls.MAX_DISTANCE)
+        key = (id(map_), float(resolution), max_distance)
+        with cls.fields_lock:
+            entry = cls.fields.get(key)
+            # The id of a freed map may be reused
+            if entry is None or entry[0] is not map_:
+                entry = (map_, cls(map_, resolution, max_distance))
+                cls.fields[key] = entry
+        return entry[1]
+
+    def _tile(self, i, j):
+        tile = self.tiles.get((i, j))
+        if tile is not None:
+            return tile
+        width, height = self.map.shape
+        x0, y0 = i * self.TILE, j * self.TILE
+        x1, y1 = min(x0 + self.TILE, width), min(y0 + self.TILE, height)
+        mx0, my0 = max(x0 - self.margin, 0), max(y0 - self.margin, 0)
+        mx1, my1 = min(x1 + self.margin, width), min(y1 + self.margin, height)
+        # The distance to the nearest zero cell, the walls
+        free = (self.map[mx0:mx1, my0:my1] != 1).astype(np.uint8)
+        if free.all():
+            tile = np.full((x1 - x0, y1 - y0), self.margin, np.float32)
+        else:
+            dist = cv2.distanceTransform( # pylint: disable=no-member
+                free, cv2.DIST_L2, cv2.DIST_MASK_PRECISE) # pylint: disable=no-member
+            tile = np.minimum(dist[x0 - mx0:x1 - mx0, y0 - my0:y1 - my0], self.margin)
+        self.tiles[(i, j)] = tile
+        return tile
+
+    def distances(self, cx, cy):
+        """
+        The distances of cells to the nearest wall.
+
+        Args:
+            cx (numpy.ndarray): The x indices of the cells, within the map.
+            cy (numpy.ndarray): The y indices of the cells, within the map.
+
+        Returns:
+            numpy.ndarray: The distances, in cells, clipped to the margin.
+        """
+        ti, tj = cx // self.TILE, cy // self.TILE
+        if ti.min() == ti.max() and tj.min() == tj.max():
+            tile = self._tile(int(ti[0]), int(tj[0]))
+            return tile[cx - ti[0] * self.TILE, cy - tj[0] * self.TILE]
+        ret = np.empty(len(cx), np.float32)
+        for i, j in set(zip(ti.tolist(), tj.tolist())):
+            sel = (ti == i) & (tj == j)
+            ret[sel] = self._tile(i, j)[cx[sel] - i * self.TILE, cy[sel] - j * self.TILE]
+        return ret
+
+    def clearance(self, x0, y0, x1, y1, start = True):
+        """
+        The smallest distance to the walls of a point moving along a segment, sampled
+        once per cell.
+
+        Args:
+            x0 (float): The x coordinate of the start, in meters.
+            y0 (float): The y coordinate of the start, in meters.
+            x1 (float): The x coordinate of the end, in meters.
+            y1 (float): The y coordinate of the end, in meters.
+            start (bool): Whether the start of the segment is sampled.
+
+        Returns:
+            float: The distance from the segment to the edge of the nearest wall cell,
+                in meters, negative inside a wall, more than max_distance when there
+                is no wall closer.
+        """
+        n = int(math.hypot(x1 - x0, y1 - y0) / self.resolution) + 2
+        width, height = self.map.shape
+        if n <= self.SHORT_SWEEP:
+            # The steps of a robot span a few cells, the arrays cost more than they save
+            dist = self.margin
+            for k in range(0 if start else 1, n):
+                t = k / (n - 1)
+                cx = min(max(int((x0 + t * (x1 - x0)) / self.resolution), 0), width - 1)
+                cy = min(max(int((y0 + t * (y1 - y0)) / self.resolution), 0), height - 1)
+                tile = self._tile(cx // self.TILE, cy // self.TILE)
+                dist = min(dist, tile[cx % self.TILE, cy % self.TILE])
+        else:
+            cx = np.clip((np.linspace(x0, x1, n) / self.resolution).astype(int), 0, width - 1)
+            cy = np.clip((np.linspace(y0, y1, n) / self.resolution).astype(int), 0, height - 1)
+            if not start:
+                cx, cy = cx[1:], cy[1:]
+            dist = self.distances(cx, cy).min()
+        return float(dist) * self.resolution - self.resolution / 2.0
+
+    def sweep_collides(self, x0, y0, x1, y1, radius):
+        """
+        Checks if a disc of a radius hits a wall while moving along a segment. A disc
+        that already reaches a wall at the start may still move along it or away from
+        it, it hits the wall only if it gets closer.
+
+        Args:
+            x0 (float): The x coordinate of the start, in meters.
+            y0 (float): The y coordinate of the start, in meters.
+            x1 (float): The x coordinate of the end, in meters.
+            y1 (float): The y coordinate of the end, in meters.
+            radius (float): The radius of the disc, in meters.
+
+        Returns:
+            bool: True if the disc hits a wall.
+        """
+        ahead = self.clearance(x0, y0, x1, y1, start = False)
+        if ahead >= radius:
+            return False
+        return ahead < self.clearance(x0, y0, x0, y0)
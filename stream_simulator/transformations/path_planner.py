@@ -0,0 +1,427 @@
+"""
+File that implements the global path planner of the robots.
+
+The walls of the map are inflated by the radius of the robot once per map (the
+costmap), and a coarse graph is laid over it: the nodes are the free cells of
+square blocks of cells nearest to their centers, and two neighbouring nodes are
+connected if the segment between them is free in the costmap. The A* search on the
+graph stays well under 100 ms even on large maps. The graph may still miss a narrow
+passage, so when it finds no path the search falls back to the cells of the costmap,
+if the goal is in the connected part of the start. The grid paths found are cached
+per start / goal node (or cell), and shortened with line of sight checks from the
+actual start of every plan.
+"""
+
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import math
+import time
+import heapq
+import logging
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import cv2
+
+class PathPlanner:
+    """
+    Plans collision free paths on the occupancy map of the world.
+
+    Attributes:
+        resolution (float): The resolution of the map in meters per cell.
+        radius (float): The radius the walls are inflated by, in meters.
+        walls (numpy.ndarray): The map of the walls.
+        inflated (numpy.ndarray): The map with the walls inflated by the radius.
+        block (int): The distance between the nodes of the graph, in map cells.
+        rows (int): The number of nodes along x.
+        cols (int): The number of nodes along y.
+        centers (tuple): (rows, cols) The x and the y map cells of the nodes.
+        nodes (bytearray): 1 for the free nodes, row major.
+        neighbours (list): The (node, distance) neighbours of every node.
+        components (list): The connected part of the graph every node belongs to.
+        labels (numpy.ndarray): The connected part of the costmap every cell belongs to.
+        paths (OrderedDict): (start node, goal node) or ("cells", start cell, goal cell)
+            -> the points of the grid path, the latest plans found.
+    """
+    # The graph has at most MAX_CELLS nodes per side
+    MAX_CELLS = 128
+    PATH_CACHE_SIZE = 256
+    # The heuristic of the search on the cells is weighted: the path found may be a
+    # little longer than the shortest one, _shorten straightens it anyway
+    CELLS_WEIGHT = 2.0
+    # The planners, and their costmaps, shared by the robots of a map
+    planners = {}
+    planners_lock = threading.Lock()
+
+    def __init__(self, map_, resolution, radius = 0.25):
+        self.logger = logging.getLogger(__name__)
+        self.resolution = float(resolution)
+        self.radius = float(radius)
+        self.walls = np.asarray(map_) == 1
+
+        cells = int(math.ceil(self.radius / self.resolution))
+        walls = self.walls.astype(np.uint8)
+        if cells > 0:
+            kernel = cv2.getStructuringElement( # pylint: disable=no-member
+                cv2.MORPH_ELLIPSE, (2 * cells + 1, 2 * cells + 1)) # pylint: disable=no-member
+            walls = cv2.dilate(walls, kernel) # pylint: disable=no-member
+        self.inflated = walls > 0
+
+        width, height = self.inflated.shape
+        self.block = max(1, int(math.ceil(max(width, height) / self.MAX_CELLS)))
+        self.rows = int(math.ceil(width / self.block))
+        self.cols = int(math.ceil(height / self.block))
+        self.centers, free = self._block_cells()
+
+        self.nodes = bytearray(free.astype(np.uint8).tobytes())
+        # The neighbours of every node and their distance
+        self.neighbours = [[] for _ in range(self.rows * self.cols)]
+        for di, dj in [(1, 0), (0, 1), (1, 1), (1, -1)]:
+            step = di * self.cols + dj
+            cost = math.hypot(di, dj)
+            for node in np.flatnonzero(self._edges(di, dj)).tolist():
+                self.neighbours[node].append((node + step, cost))
+                self.neighbours[node + step].append((node, cost))
+        self.components = self._components()
+        # 4-connected, as the search on the cells does not cut corners
+        _, self.labels = cv2.connectedComponents( # pylint: disable=no-member
+            (~self.inflated).astype(np.uint8), connectivity = 4)
+
+        self.paths = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _block_cells(self):
+        """
+        The free cell of every block nearest to its center, so that a block crossed by
+        a passage narrower than the block is still a node.
+
+        Returns:
+            tuple: The (x, y) cells of the blocks and whether the blocks have a free cell.
+        """
+        width, height = self.inflated.shape
+        b = self.block
+        padded = np.ones((self.rows * b, self.cols * b), bool)
+        padded[:width, :height] = self.inflated
+        # (rows, cols, b * b) the cells of every block
+        cells = padded.reshape(self.rows, b, self.cols, b).transpose(0, 2, 1, 3)
+        cells = cells.reshape(self.rows, self.cols, b * b)
+        offsets = np.arange(b) - b // 2
+        dist = (offsets[:, None] ** 2 + offsets[None, :] ** 2).ravel()
+        nearest = np.where(cells, np.iinfo(np.int64).max, dist[None, None, :]).argmin(axis = 2)
+        free = ~cells.all(axis = 2)
+        cx = np.arange(self.rows)[:, None] * b + nearest // b
+        cy = np.arange(self.cols)[None, :] * b + nearest % b
+        # The blocks without a free cell keep their center, they are not nodes
+        cx = np.minimum(np.where(free, cx, cx - nearest // b + b // 2), width - 1)
+        cy = np.minimum(np.where(free, cy, cy - nearest % b + b // 2), height - 1)
+        return (cx, cy), free
+
+    def _edges(self, di, dj):
+        """
+        Samples the costmap on the segments from every node to its (i + di, j + dj)
+        neighbour, at the same points as _visible does.
+        """
+        cx, cy = self.centers
+        free = np.zeros((self.rows, self.cols), bool)
+        i_from = slice(0, self.rows - di)
+        i_to = slice(di, self.rows)
+        j_from = slice(max(0, -dj), self.cols - max(0, dj))
+        j_to = slice(max(0, dj), self.cols - max(0, -dj))
+        x0, x1 = cx[i_from, j_from], cx[i_to, j_to]
+        y0, y1 = cy[i_from, j_from], cy[i_to, j_to]
+        blocked = np.zeros(x0.shape, bool)
+        samples = 4 * (np.maximum(np.abs(x1 - x0), np.abs(y1 - y0)) + 1)
+        for k in range(int(samples.max())):
+            t = np.minimum(k / (samples - 1), 1.0)
+            xs = (x0 + t * (x1 - x0) + 1e-6).astype(int)
+            ys = (y0 + t * (y1 - y0) + 1e-6).astype(int)
+            blocked |= self.inflated[xs, ys]
+        free[i_from, j_from] = ~blocked
+        return free.ravel()
+
+    def _components(self):
+        """
+        Labels the connected parts of the graph, so that unreachable goals are
+        known without a search.
+        """
+        components = [-1] * len(self.neighbours)
+        label = 0
+        for root in range(len(self.neighbours)):
+            if components[root] != -1 or not self.nodes[root]:
+                continue
+            components[root] = label
+            stack = [root]
+            while stack:
+                node = stack.pop()
+                for n, _ in self.neighbours[node]:
+                    if components[n] == -1:
+                        components[n] = label
+                        stack.append(n)
+            label += 1
+        return components
+
+    @classmethod
+    def for_map(cls, map_, resolution, radius = 0.25):
+        """
+        Returns the planner of a map, creating its costmap on the first call.
+
+        Args:
+            map_ (numpy.ndarray): The occupancy map of the world, 1 for walls.
+            resolution (float): The resolution of the map in meters per cell.
+            radius (float): The radius the walls are inflated by, in meters.
+
+        Returns:
+            PathPlanner: The planner, shared by all the callers with the same map.
+        """
+        key = (id(map_), float(resolution), float(radius))
+        with cls.planners_lock:
+            entry = cls.planners.get(key)
+            # The id of a freed map may be reused
+            if entry is None or entry[0] is not map_:
+                start = time.time()
+                entry = (map_, cls(map_, resolution, radius))
+                cls.planners[key] = entry
+                logging.getLogger(__name__).info("Costmap of %s cells built in %.3f sec", \
+                    entry[1].inflated.size, time.time() - start)
+        return entry[1]
+
+    def plan(self, start, goal):
+        """
+        Plans a path between two positions.
+
+        Args:
+            start (tuple): The (x, y) start position, in meters.
+            goal (tuple): The (x, y) goal position, in meters.
+
+        Returns:
+            list: The (x, y) waypoints to follow, in meters, ending at the goal, or
+                None if the goal cannot be reached.
+        """
+        width, height = self.walls.shape
+        start_cell = self._cell(start)
+        goal_cell = self._cell(goal)
+        for x, y in (start_cell, goal_cell):
+            if x < 0 or y < 0 or x >= width or y >= height:
+                return None
+
+        start_node = self._planning_cell(start)
+        goal_node = self._planning_cell(goal)
+        keys = [("cells", start_cell, goal_cell)]
+        if start_node is not None and goal_node is not None:
+            keys.insert(0, (start_node, goal_node))
+        points = None
+        with self.lock:
+            for key in keys:
+                if key in self.paths:
+                    self.paths.move_to_end(key)
+                    points = self.paths[key]
+                    break
+        if points is None:
+            key, points = self._grid_path(start_node, goal_node, start_cell, goal_cell)
+            if points is None:
+                # The failures are not cached
+                return None
+            with self.lock:
+                self.paths[key] = points
+                if len(self.paths) > self.PATH_CACHE_SIZE:
+                    self.paths.popitem(last = False)
+        return self._shorten(start, points, goal) + [tuple(goal)]
+
+    def _grid_path(self, start_node, goal_node, start_cell, goal_cell):
+        """
+        Searches the graph, then the cells of the costmap if the graph has no path.
+
+        Returns:
+            tuple: The cache key of the path and its (x, y) points in meters, or None.
+        """
+        if start_node is not None and goal_node is not None and \
+                self.components[start_node] == self.components[goal_node]:
+            nodes = self._astar(start_node, goal_node)
+            if nodes is not None:
+                # The nodes are not aligned, all of them are kept for _shorten; the
+                # start and goal nodes are in sight of the start and the goal
+                return (start_node, goal_node), [self._center(n) for n in nodes]
+        key = ("cells", start_cell, goal_cell)
+        cells = self._astar_cells(start_cell, goal_cell)
+        if cells is None:
+            return key, None
+        height = self.inflated.shape[1]
+        return key, [(float(c // height) * self.resolution, \
+            float(c % height) * self.resolution) for c in self._turns(cells)]
+
+    @staticmethod
+    def _turns(path):
+        """
+        The first, last and turning points of a path of row major indices, the
+        straight runs between them are in sight.
+        """
+        turns = [path[0]]
+        for k in range(1, len(path) - 1):
+            if path[k] - path[k - 1] != path[k + 1] - path[k]:
+                turns.append(path[k])
+        if len(path) > 1:
+            turns.append(path[-1])
+        return turns
+
+    def _cell(self, point):
+        # The epsilon keeps the cell centers (k * resolution) in their cell
+        return (int(point[0] / self.resolution + 1e-6), int(point[1] / self.resolution + 1e-6))
+
+    def _center(self, node):
+        i, j = divmod(node, self.cols)
+        return (float(self.centers[0][i, j]) * self.resolution, \
+            float(self.centers[1][i, j]) * self.resolution)
+
+    def _planning_cell(self, point):
+        """
+        The free node to enter the graph from a position: the nearest one in sight
+        among the nodes around it.
+        """
+        x, y = self._cell(point)
+        width, height = self.walls.shape
+        if x < 0 or y < 0 or x >= width or y >= height:
+            return None
+        i, j = x // self.block, y // self.block
+        candidates = []
+        for ii in range(i - 1, i + 2):
+            for jj in range(j - 1, j + 2):
+                if 0 <= ii < self.rows and 0 <= jj < self.cols and \
+                        self.nodes[ii * self.cols + jj]:
+                    center = self._center(ii * self.cols + jj)
+                    candidates.append((math.hypot(center[0] - point[0], \
+                        center[1] - point[1]), ii * self.cols + jj))
+        for _, node in sorted(candidates):
+            if self._visible(point, self._center(node), self.walls):
+                return node
+        return None
+
+    def _astar(self, start, goal):
+        """
+        A* search on the graph.
+
+        Returns:
+            list: The nodes from start to goal, or None.
+        """
+        neighbours = self.neighbours
+        # Octile distance of every node to the goal
+        goal_i, goal_j = divmod(goal, self.cols)
+        di = np.abs(np.arange(self.rows) - goal_i)[:, None]
+        dj = np.abs(np.arange(self.cols) - goal_j)[None, :]
+        heuristic = (di + dj + (math.sqrt(2) - 2) * np.minimum(di, dj)).ravel().tolist()
+
+        g = [math.inf] * len(neighbours)
+        g[start] = 0.0
+        parent = {start: -1}
+        closed = bytearray(len(neighbours))
+        heap = [(heuristic[start], start)]
+        while heap:
+            _, node = heapq.heappop(heap)
+            if node == goal:
+                path = []
+                while node != -1:
+                    path.append(node)
+                    node = parent[node]
+                return path[::-1]
+            if closed[node]:
+                continue
+            closed[node] = 1
+            g_node = g[node]
+            for n, cost in neighbours[node]:
+                g_n = g_node + cost
+                if g_n < g[n]:
+                    g[n] = g_n
+                    parent[n] = node
+                    heapq.heappush(heap, (g_n + heuristic[n], n))
+        return None
+
+    def _astar_cells(self, start, goal):
+        """
+        Weighted A* search on the free cells of the costmap, for the passages the graph
+        misses. The diagonal steps do not cut the corners of the inflated walls.
+
+        Args:
+            start (tuple): The start cell.
+            goal (tuple): The goal cell.
+
+        Returns:
+            list: The row major indices of the cells from start to goal, or None.
+        """
+        if self.inflated[start] or self.inflated[goal] or \
+                self.labels[start] != self.labels[goal]:
+            return None
+        width, height = self.inflated.shape
+        free = (~self.inflated).ravel()
+        start_index = start[0] * height + start[1]
+        goal_index = goal[0] * height + goal[1]
+        goal_x, goal_y = goal
+        diagonal = math.sqrt(2)
+        steps = [(1, 0, 1.0), (-1, 0, 1.0), (0, 1, 1.0), (0, -1, 1.0),
+                 (1, 1, diagonal), (1, -1, diagonal), (-1, 1, diagonal), (-1, -1, diagonal)]
+
+        g = {start_index: 0.0}
+        parent = {start_index: -1}
+        closed = set()
+        heap = [(0.0, start_index)]
+        while heap:
+            _, index = heapq.heappop(heap)
+            if index == goal_index:
+                path = []
+                while index != -1:
+                    path.append(index)
+                    index = parent[index]
+                return path[::-1]
+            if index in closed:
+                continue
+            closed.add(index)
+            x, y = divmod(index, height)
+            g_index = g[index]
+            for dx, dy, cost in steps:
+                nx, ny = x + dx, y + dy
+                if nx < 0 or ny < 0 or nx >= width or ny >= height:
+                    continue
+                n = nx * height + ny
+                if not free[n] or (dx and dy and \
+                        not (free[nx * height + y] and free[x * height + ny])):
+                    continue
+                g_n = g_index + cost
+                if g_n < g.get(n, math.inf):
+                    g[n] = g_n
+                    parent[n] = index
+                    ddx, ddy = abs(goal_x - nx), abs(goal_y - ny)
+                    h_n = ddx + ddy + (diagonal - 2) * min(ddx, ddy)
+                    heapq.heappush(heap, (g_n + self.CELLS_WEIGHT * h_n, n))
+        return None
+
+    def _visible(self, p, q, cells):
+        """
+        Checks that the segment between two positions crosses no set cell.
+        """
+        a = self._cell(p)
+        b = self._cell(q)
+        n = int(max(abs(b[0] - a[0]), abs(b[1] - a[1]))) + 1
+        xs = np.linspace(p[0], q[0], 4 * n) / self.resolution + 1e-6
+        ys = np.linspace(p[1], q[1], 4 * n) / self.resolution + 1e-6
+        xs = np.clip(xs.astype(int), 0, cells.shape[0] - 1)
+        ys = np.clip(ys.astype(int), 0, cells.shape[1] - 1)
+        return not cells[xs, ys].any()
+
+    def _shorten(self, start, points, goal):
+        """
+        Drops the waypoints that can be skipped in line of sight.
+        """
+        points = points + [tuple(goal)]
+        waypoints = []
+        anchor = tuple(start)
+        k = 0
+        while True:
+            # The furthest point in sight, the next one of the grid path at least
+            nxt = k
+            while nxt + 1 < len(points) and self._visible(anchor, points[nxt + 1], self.inflated):
+                nxt += 1
+            if nxt == len(points) - 1:
+                return waypoints
+            waypoints.append(points[nxt])
+            anchor = points[nxt]
+            k = nxt + 1
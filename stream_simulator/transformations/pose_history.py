@@ -0,0 +1,179 @@
+"""
+File that implements the pose history of the robots and the actors.
+"""
+
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import math
+import threading
+
+import numpy as np
+
+class PoseHistory:
+    """
+    The recent timestamped poses of the robots and the actors.
+
+    Every entity has a fixed size ring of samples in shared arrays, so the memory
+    stays bounded however long the simulation runs. A pose that does not change
+    only moves the timestamp of its last sample, so an entity at rest keeps its
+    history. The poses between the samples are interpolated linearly, and after
+    the last sample an entity stays at its last pose. A teleport starts a new
+    segment: the last pose is repeated at the time of the jump, so the poses are
+    not interpolated across it.
+
+    Attributes:
+        capacity (int): The number of samples kept per entity.
+        rows (dict): name -> the row of the entity in the arrays.
+        times (numpy.ndarray): (entities, capacity) The times of the samples.
+        poses (numpy.ndarray): (entities, capacity, 3) The x, y, theta of the samples.
+        heads (numpy.ndarray): The slot the next sample of every entity goes to.
+        counts (numpy.ndarray): The number of samples of every entity.
+    """
+    CAPACITY = 512
+
+    def __init__(self, capacity = CAPACITY):
+        self.capacity = int(capacity)
+        self.rows = {}
+        self.times = np.zeros((0, self.capacity))
+        self.poses = np.zeros((0, self.capacity, 3))
+        self.heads = np.zeros(0, int)
+        self.counts = np.zeros(0, int)
+        self.lock = threading.Lock()
+
+    def _row(self, name):
+        # Called with the lock held
+        row = self.rows.get(name)
+        if row is None:
+            row = len(self.rows)
+            if row == len(self.heads):
+                grow = max(8, row)
+                self.times = np.concatenate([self.times, np.zeros((grow, self.capacity))])
+                self.poses = np.concatenate([self.poses, np.zeros((grow, self.capacity, 3))])
+                self.heads = np.concatenate([self.heads, np.zeros(grow, int)])
+                self.counts = np.concatenate([self.counts, np.zeros(grow, int)])
+            self.rows[name] = row
+        return row
+
+    def _append(self, row, t, pose):
+        # Called with the lock held
+        head = self.heads[row]
+        self.times[row, head] = t
+        self.poses[row, head] = pose
+        self.heads[row] = (head + 1) % self.capacity
+        self.counts[row] = min(self.counts[row] + 1, self.capacity)
+
+    def record(self, name, t, x, y, theta, teleport = False):
+        """
+        Records the pose of an entity.
+
+        Args:
+            name (str): The name of the robot or the actor.
+            t (float): The time (time.time()) of the pose.
+            x (float): The x coordinate, in meters.
+            y (float): The y coordinate, in meters.
+            theta (float): The orientation, in radians.
+            teleport (bool): Whether the entity jumped to the pose, instead of moving.
+        """
+        with self.lock:
+            row = self._row(name)
+            count = self.counts[row]
+            last = (self.heads[row] - 1) % self.capacity
+            if count > 0 and t < self.times[row, last]:
+                return # Out of order
+            if teleport and count > 0 and t > self.times[row, last]:
+                # It stays at its last pose until the jump
+                self._append(row, t, self.poses[row, last].copy())
+                count = self.counts[row]
+                last = (self.heads[row] - 1) % self.capacity
+            if count > 1 and (self.poses[row, last] == (x, y, theta)).all() and \
+                    (self.poses[row, last - 1] == (x, y, theta)).all():
+                # At rest since the sample before, it lasts until now
+                self.times[row, last] = t
+                return
+            self._append(row, t, (x, y, theta))
+
+    def _samples(self, row):
+        # The samples of a row in time order, called with the lock held
+        count, head = self.counts[row], self.heads[row]
+        order = (np.arange(head - count, head)) % self.capacity
+        return self.times[row, order], self.poses[row, order]
+
+    @staticmethod
+    def _interpolate(times, poses, t):
+        k = int(np.searchsorted(times, t, side = "right"))
+        if k == 0:
+            return None # Not there yet
+        if k == len(times):
+            return poses[-1].tolist()
+        a, b = poses[k - 1], poses[k]
+        f = (t - times[k - 1]) / (times[k] - times[k - 1])
+        # The shortest turn between the orientations
+        turn = math.remainder(b[2] - a[2], 2 * math.pi)
+        return [a[0] + f * (b[0] - a[0]), a[1] + f * (b[1] - a[1]), a[2] + f * turn]
+
+    def pose_at(self, name, t):
+        """
+        The pose of an entity at a time.
+
+        Args:
+            name (str): The name of the robot or the actor.
+            t (float): The time (time.time()).
+
+        Returns:
+            dict: The interpolated x, y, theta, or None if the entity has no pose
+                at that time.
+        """
+        with self.lock:
+            row = self.rows.get(name)
+            if row is None:
+                return None
+            pose = self._interpolate(*self._samples(row), t)
+        return None if pose is None else dict(zip(("x", "y", "theta"), pose))
+
+    def poses_at(self, t):
+        """
+        The poses of all the entities at a time.
+
+        Args:
+            t (float): The time (time.time()).
+
+        Returns:
+            dict: name -> the interpolated x, y, theta, for the entities with a pose
+                at that time.
+        """
+        ret = {}
+        with self.lock:
+            for name, row in self.rows.items():
+                pose = self._interpolate(*self._samples(row), t)
+                if pose is not None:
+                    ret[name] = dict(zip(("x", "y", "theta"), pose))
+        return ret
+
+    def trajectory(self, name, t0, t1):
+        """
+        The poses of an entity during a time interval.
+
+        Args:
+            name (str): The name of the robot or the actor.
+            t0 (float): The start of the interval (time.time()).
+            t1 (float): The end of the interval.
+
+        Returns:
+            list: The t, x, y, theta of the samples within the interval, starting and
+                ending with the interpolated poses at its bounds.
+        """
+        with self.lock:
+            row = self.rows.get(name)
+            if row is None or t1 < t0:
+                return []
+            times, poses = self._samples(row)
+            start = self._interpolate(times, poses, t0)
+            end = self._interpolate(times, poses, t1)
+            inside = (times > t0) & (times < t1)
+            samples = np.column_stack([times[inside], poses[inside]]).tolist()
+        if start is not None:
+            samples.insert(0, [t0] + start)
+        if end is not None:
+            samples.append([t1] + end)
+        return [dict(zip(("t", "x", "y", "theta"), s)) for s in samples]
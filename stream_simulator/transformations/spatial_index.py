@@ -0,0 +1,171 @@
+"""
+File that implements uniform grid spatial indexes of named points and segments.
+"""
+
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import math
+
+class SpatialIndex:
+    """
+    A uniform grid (spatial hash) of named 2D points, used to find the points
+    around a position without scanning all of them.
+
+    Attributes:
+        cell_size (float): The side of the grid cells, in meters.
+        cells (dict): (i, j) cell -> set of the names in the cell.
+        points (dict): name -> (x, y, cell) of the indexed points.
+    """
+    def __init__(self, cell_size = 4.0):
+        self.cell_size = float(cell_size)
+        self.cells = {}
+        self.points = {}
+
+    def _cell(self, x, y):
+        return (math.floor(x / self.cell_size), math.floor(y / self.cell_size))
+
+    def update(self, name, x, y):
+        """
+        Inserts a point or moves it to a new position.
+
+        Args:
+            name (str): The name of the point.
+            x (float): The x coordinate, in meters.
+            y (float): The y coordinate, in meters.
+        """
+        cell = self._cell(x, y)
+        old = self.points.get(name)
+        if old is not None and old[2] != cell:
+            self._discard(name, old[2])
+        if old is None or old[2] != cell:
+            self.cells.setdefault(cell, set()).add(name)
+        self.points[name] = (x, y, cell)
+
+    def remove(self, name):
+        """
+        Removes a point from the index, if it exists.
+
+        Args:
+            name (str): The name of the point.
+        """
+        old = self.points.pop(name, None)
+        if old is not None:
+            self._discard(name, old[2])
+
+    def _discard(self, name, cell):
+        names = self.cells.get(cell)
+        if names is None:
+            return
+        names.discard(name)
+        if not names:
+            del self.cells[cell]
+
+    def query(self, x, y, radius):
+        """
+        Finds the points within a radius of a position.
+
+        Args:
+            x (float): The x coordinate, in meters.
+            y (float): The y coordinate, in meters.
+            radius (float): The radius, in meters.
+
+        Returns:
+            list: (name, distance) tuples of the points within the radius.
+        """
+        ret = []
+        i_min, j_min = self._cell(x - radius, y - radius)
+        i_max, j_max = self._cell(x + radius, y + radius)
+        for i in range(i_min, i_max + 1):
+            for j in range(j_min, j_max + 1):
+                for name in self.cells.get((i, j), ()):
+                    px, py, _ = self.points[name]
+                    d = math.hypot(px - x, py - y)
+                    if d <= radius:
+                        ret.append((name, d))
+        return ret
+
+    def clear(self):
+        """
+        Removes all the points.
+        """
+        self.cells = {}
+        self.points = {}
+
+    def __len__(self):
+        return len(self.points)
+
+class SegmentIndex:
+    """
+    A uniform grid of named 2D segments, used to find the segments a short motion
+    may cross without testing all of them. A segment is in every cell its bounding
+    box covers.
+
+    Attributes:
+        cell_size (float): The side of the grid cells, in meters.
+        cells (dict): (i, j) cell -> set of the names in the cell.
+        segments (dict): name -> ((x0, y0), (x1, y1)) of the indexed segments.
+    """
+    def __init__(self, cell_size = 4.0):
+        self.cell_size = float(cell_size)
+        self.cells = {}
+        self.segments = {}
+
+    def _cells(self, a, b):
+        i_min = math.floor(min(a[0], b[0]) / self.cell_size)
+        j_min = math.floor(min(a[1], b[1]) / self.cell_size)
+        i_max = math.floor(max(a[0], b[0]) / self.cell_size)
+        j_max = math.floor(max(a[1], b[1]) / self.cell_size)
+        for i in range(i_min, i_max + 1):
+            for j in range(j_min, j_max + 1):
+                yield (i, j)
+
+    def add(self, name, a, b):
+        """
+        Inserts a segment, replacing the one of the same name.
+
+        Args:
+            name (str): The name of the segment.
+            a (tuple): The (x, y) start, in meters.
+            b (tuple): The (x, y) end, in meters.
+        """
+        self.remove(name)
+        self.segments[name] = (tuple(a), tuple(b))
+        for cell in self._cells(a, b):
+            self.cells.setdefault(cell, set()).add(name)
+
+    def remove(self, name):
+        """
+        Removes a segment from the index, if it exists.
+
+        Args:
+            name (str): The name of the segment.
+        """
+        old = self.segments.pop(name, None)
+        if old is None:
+            return
+        for cell in self._cells(*old):
+            names = self.cells.get(cell)
+            if names is not None:
+                names.discard(name)
+                if not names:
+                    del self.cells[cell]
+
+    def query(self, a, b):
+        """
+        Finds the segments that may cross a segment.
+
+        Args:
+            a (tuple): The (x, y) start, in meters.
+            b (tuple): The (x, y) end, in meters.
+
+        Returns:
+            set: The names of the segments sharing a cell with it.
+        """
+        ret = set()
+        for cell in self._cells(a, b):
+            ret.update(self.cells.get(cell, ()))
+        return ret
+
+    def __len__(self):
+        return len(self.segments)
@@ -6,18 +6,25 @@ File that contains the TfController class.
 # -*- coding: utf-8 -*-
 
 import math
+import time
 import logging
+import threading
 import random
 import string
 
 from stream_simulator.connectivity import CommlibFactory
 from stream_simulator.transformations.check_lines_intersection import check_lines_intersection
 from stream_simulator.transformations.calc_distance import calc_distance
+from stream_simulator.transformations.spatial_index import SpatialIndex, SegmentIndex
+from stream_simulator.transformations.pose_history import PoseHistory
 
 class TfController:
     """
     A class to handle transformations for the simulator.
     """
+    # Default hearing range of the microphones, in meters
+    MICROPHONE_RANGE = 4.0
+
     def __init__(self, logger = None, mqtt_notifier = None):
         self.logger = logging.getLogger(__name__) if logger is None else logger
         self.base_topic = None
@@ -25,15 +32,22 @@ class TfController:
         self.resolution = None
         self.mqtt_notifier = mqtt_notifier
         self.commlib_factory = None
-        self.lin_alarms_robots = {}
+        # The linear alarms, and the robots that crossed them since their last check
+        self.lin_alarms_index = SegmentIndex()
+        self.lin_alarms_crossed = {}
+        self.lin_alarms_lock = threading.Lock()
+        self.pose_history = PoseHistory()
         self.env_properties = None
         self.declare_rpc_server = None
+        self.declare_batch_rpc_server = None
         self.get_declarations_rpc_server = None
         self.get_tf_rpc_server = None
         self.get_affectability_rpc_server = None
         self.get_sim_detection_rpc_server = None
         self.get_luminosity_rpc_server = None
         self.distance_calculator_rpc_server = None
+        self.get_poses_at_rpc_server = None
+        self.get_trajectory_rpc_server = None
         self.detections_publisher = None
         self.get_devices_rpc = None
         self.pan_tilts_rpc = None
@@ -61,6 +75,8 @@ class TfController:
 
         self.speaker_subs = {}
         self.microphone_pubs = {}
+        self.microphone_ranges = {}
+        self.microphone_index = SpatialIndex(self.MICROPHONE_RANGE)
 
         self.per_type = {
             'robot': {
@@ -139,7 +155,9 @@ class TfController:
 
         self.commlib_factory = CommlibFactory(node_name = "Tf")
 
-        self.lin_alarms_robots = {}
+        self.lin_alarms_index = SegmentIndex()
+        self.lin_alarms_crossed = {}
+        self.pose_history = PoseHistory()
         self.env_properties = env_properties
         self.logger.info("TF set environmental variables: %s", self.env_properties)
 
@@ -149,6 +167,12 @@ class TfController:
             auto_run = False,
         )
 
+        self.declare_batch_rpc_server = self.commlib_factory.get_rpc_service(
+            callback = self.declare_batch_callback,
+            rpc_name = self.base_topic + ".declare_batch",
+            auto_run = False,
+        )
+
         self.get_declarations_rpc_server = self.commlib_factory.get_rpc_service(
             callback = self.get_declarations_callback,
             rpc_name = self.base_topic + ".get_declarations",
@@ -190,6 +214,18 @@ class TfController:
             auto_run = False,
         )
 
+        self.get_poses_at_rpc_server = self.commlib_factory.get_rpc_service(
+            callback = self.get_poses_at_callback,
+            rpc_name = self.base_topic + ".get_poses_at",
+            auto_run = False,
+        )
+
+        self.get_trajectory_rpc_server = self.commlib_factory.get_rpc_service(
+            callback = self.get_trajectory_callback,
+            rpc_name = self.base_topic + ".get_trajectory",
+            auto_run = False,
+        )
+
         self.get_devices_rpc = self.commlib_factory.get_rpc_client(
             rpc_name = self.base + ".get_device_groups",
             auto_run = False,
@@ -200,6 +236,13 @@ class TfController:
             auto_run = False,
         )
 
+        # The poses of the humans walking in the crowd, all in one message
+        self.commlib_factory.get_subscriber(
+            topic = self.base + ".actor.crowd.poses.internal",
+            callback = self.crowd_poses_callback,
+            auto_run = False,
+        )
+
         # Start the CommlibFactory
         self.commlib_factory.run()
 
@@ -221,6 +264,8 @@ class TfController:
 
         self.speaker_subs = {}
         self.microphone_pubs = {}
+        self.microphone_ranges = {}
+        self.microphone_index = SpatialIndex(self.MICROPHONE_RANGE)
 
         self.per_type = {
             'robot': {
@@ -382,11 +427,12 @@ class TfController:
         if node not in tree:
             return visited
         tabs = "\t" * level
-        self.logger.info("%s%s @ %s:", tabs, node, self.places_absolute[node])
+        # Robots may not have published their first pose yet
+        self.logger.info("%s%s @ %s:", tabs, node, self.places_absolute.get(node))
         for c in tree[node]:
             tabs = "\t" * (level + 1)
             if c not in self.existing_hosts:
-                self.logger.info("%s%s @ %s", tabs, c, self.places_absolute[c])
+                self.logger.info("%s%s @ %s", tabs, c, self.places_absolute.get(c))
             visited = self.print_tf_tree_recursive(tree, c, level + 1, visited)
         return visited
 
@@ -448,6 +494,38 @@ class TfController:
         lum = self.compute_luminosity(message["name"], print_debug = False)
         return {"luminosity": lum}
 
+    def get_poses_at_callback(self, message):
+        """
+        Callback function to get the poses of the robots and the actors at a time.
+
+        Args:
+            message (dict): "t", the time (time.time()), now if missing.
+
+        Returns:
+            dict: "poses", name -> the x, y, theta interpolated from the pose history,
+                and "t".
+        """
+        t = message.get("t") or time.time()
+        return {"poses": self.pose_history.poses_at(t), "t": t}
+
+    def get_trajectory_callback(self, message):
+        """
+        Callback function to get the trajectory of a robot or an actor.
+
+        Args:
+            message (dict): The "name" of the robot or the actor, and the "t0" and "t1"
+                bounds of the time interval, t1 being now if missing.
+
+        Returns:
+            dict: "name" and "trajectory", the t, x, y, theta of its poses during the
+                interval, as much of it as the pose history keeps.
+        """
+        t1 = message.get("t1") or time.time()
+        return {
+            "name": message["name"],
+            "trajectory": self.pose_history.trajectory(message["name"], message["t0"], t1)
+        }
+
     def setup(self):
         """
         Sets up the transformation framework by initializing and updating various
@@ -515,8 +593,24 @@ class TfController:
                     self.logger.info("\tRelative: %s", self.places_relative[i])
                     self.logger.info("\tAbsolute: %s", self.places_absolute[i])
 
+        for m in self.microphone_ranges:
+            self.index_microphone(m)
+
         self.logger.info("*************** TF setup end ***************")
 
+    def index_microphone(self, name):
+        """
+        Updates the position of a microphone in the spatial index used to route the
+        speak events.
+
+        Args:
+            name (str): The name of the microphone.
+        """
+        pl = self.places_absolute.get(name)
+        if pl is None or pl.get('x') is None or pl.get('y') is None:
+            return
+        self.microphone_index.update(name, pl['x'], pl['y'])
+
     def speak_callback(self, message):
         """
         Handles the callback for when a speaker speaks. It processes the message and publishes 
@@ -530,36 +624,29 @@ class TfController:
             - 'speaker' (str): The identifier of the speaker.
         The function performs the following steps:
             1. Retrieves the speaker's name and position.
-            2. Iterates through all declared entities to find microphones.
-            3. Checks the distance between the speaker and each microphone.
-            4. If the distance is less than 4 meters, publishes the message to the microphone's 
-            topic.
+            - 'timestamp' (float): Optional, the time the speaker published the event.
+        The function performs the following steps:
+            1. Retrieves the speaker's name and position.
+            2. Looks up the microphones around the speaker in the spatial index, up to
+            the largest hearing range.
+            3. Publishes the message to the topic of every microphone whose own hearing
+            range covers the speaker, forwarding the timestamp for latency measurements.
         """
         # {'text': 'This is an example', 'volume': 100, 'language': 'el', 'speaker': 'speaker_X'}
         name = message['speaker']
         pose = self.places_absolute[name]
+        if not self.microphone_ranges:
+            return
 
-        # search all microphones:
-        for n, node in self.declarations_info.items():
-            if node['type'] == "actor":
-                continue
-            if "microphone" in node['subtype']['subclass']:
-                # check distance
-                m_name = n
-                m_pose = self.places_absolute[m_name]
-
-                xy = [pose['x'], pose['y']]
-                m_xy = [m_pose['x'], m_pose['y']]
-                d = calc_distance(xy, m_xy)
-                # print(d)
-
-                # lets say 4 meters
-                if d < 4.0:
-                    self.microphone_pubs[m_name].publish({
-                        'speaker': name,
-                        'text': message['text'],
-                        'language': message['language']
-                    })
+        max_range = max(self.microphone_ranges.values())
+        for m_name, d in self.microphone_index.query(pose['x'], pose['y'], max_range):
+            if d < self.microphone_ranges[m_name]:
+                self.microphone_pubs[m_name].publish({
+                    'speaker': name,
+                    'text': message['text'],
+                    'language': message['language'],
+                    'timestamp': message.get('timestamp'),
+                })
 
     def actor_pose_callback(self, message):
         """
@@ -585,8 +672,21 @@ class TfController:
         self.places_absolute[nm]['x'] = message['x']
         self.places_absolute[nm]['y'] = message['y']
         self.places_absolute[nm]['theta'] = message['theta']
+        self.pose_history.record(nm, message.get('timestamp') or time.time(), \
+            message['x'], message['y'], message['theta'], message.get('teleport', False))
         # self.logger.info("Updated %s: %s", nm, self.places_absolute[nm])
 
+    def crowd_poses_callback(self, message):
+        """
+        Callback function to update the absolute poses of the humans of the crowd.
+
+        Args:
+            message (dict): The 'poses' of the humans, each one as in actor_pose_callback.
+        """
+        for pose in message['poses']:
+            self.actor_pose_callback({**pose, 'timestamp': message.get('timestamp'), \
+                'teleport': message.get('teleport', False)})
+
     def actor_properties_callback(self, message):
         """
         Callback function to update actor properties.
@@ -626,6 +726,8 @@ class TfController:
             self.update_pan_tilt: Updates the angles of devices mounted on pan-tilt units.
         """
         nm = message['raw_name']
+        self.pose_history.record(nm, message.get('timestamp') or time.time(), \
+            message['x'], message['y'], message['theta'], message.get('teleport', False))
         if nm not in self.places_absolute:
             self.places_absolute[nm] = {'x': 0, 'y': 0, 'theta': 0}
         else:
@@ -633,6 +735,8 @@ class TfController:
                     message['y'] == self.places_absolute[nm]['y'] and \
                     message['theta'] == self.places_absolute[nm]['theta']:
                 return # To avoid unnecessary updates
+            if not message.get('teleport'):
+                self.sweep_linear_alarms(nm, self.places_absolute[nm], message)
 
         self.places_absolute[nm]['x'] = message['x']
         self.places_absolute[nm]['y'] = message['y']
@@ -666,6 +770,11 @@ class TfController:
                 pan_now = self.pantilts[d]['pan']
                 # self.logger.info(f"giving {pan_now}")
                 self.update_pan_tilt(d, pan_now)
+                for dev in pt_devs:
+                    if dev in self.microphone_ranges:
+                        self.index_microphone(dev)
+            elif d in self.microphone_ranges:
+                self.index_microphone(d)
 
         # self.print_tf_tree()
 
@@ -791,6 +900,22 @@ class TfController:
         self.logger.info("Declaration done for %s", temp['name'])
         return {}
 
+    def declare_batch_callback(self, message):
+        """
+        Handles a bulk declaration, i.e. the declarations of all the devices or actors
+        of a world / robot, submitted by their owner in a single call.
+        Args:
+            message (dict): {"declarations": [declaration, ...]}. The declarations are
+            processed in the given order, exactly as if declared one by one.
+        Returns:
+            dict: The number of declarations processed.
+        """
+        declarations = message['declarations']
+        for d in declarations:
+            self.declare_callback(d)
+        self.logger.info("Batch declaration done for %s items", len(declarations))
+        return {"declared": len(declarations)}
+
     def per_type_storage(self, d):
         """
         Organizes and stores data based on its type and subtype.
@@ -839,6 +964,12 @@ class TfController:
             category = sub['category']
             self.per_type[type_][category][subclass].append(d['name'])
 
+            if subclass == "linear_alarm":
+                start, end = d['pose']['start'], d['pose']['end']
+                with self.lin_alarms_lock:
+                    self.lin_alarms_index.add(d['name'], (start['x'], start['y']), \
+                        (end['x'], end['y']))
+
             if subclass in ["thermostat", "humidifier", "leds"]:
                 self.effectors_get_rpcs[d['name']] = self.commlib_factory.get_rpc_client(
                     rpc_name = d['base_topic'] + ".get"
@@ -899,6 +1030,8 @@ class TfController:
             self.microphone_pubs[d['name']] = self.commlib_factory.get_publisher(
                 topic = d["base_topic"] + ".speech_detected"
             )
+            self.microphone_ranges[d['name']] = \
+                float(d['range']) if d['range'] is not None else self.MICROPHONE_RANGE
 
     def get_affections_callback(self, message):
         """
@@ -1184,7 +1317,7 @@ class TfController:
             dict: A dictionary containing the affected human actors and sound sources
                   within the range of the microphone. The keys are the identifiers of
                   the actors or sound sources, and the values are the results of the
-                  affection handling.
+                  affection handling, with the absolute position of the source.
         Raises:
             Exception: If an error occurs during the processing, an exception is raised
                        and logged.
@@ -1205,6 +1338,12 @@ class TfController:
                 r = self.handle_affection_ranged(x_y, f, 'sound_source')
                 if r is not None:
                     ret[f] = r
+            # The positions of the sources, for the wall attenuation of the audio
+            for f, r in ret.items():
+                r['position'] = {
+                    'x': self.places_absolute[f]['x'],
+                    'y': self.places_absolute[f]['y']
+                }
         except Exception as e:
             self.logger.error(str(e))
             # pylint: disable=broad-exception-raised
@@ -1384,6 +1523,13 @@ class TfController:
                 r = self.handle_affection_arced(name, f, 'text')
                 if r is not None:
                     ret[f] = r
+            # - actor fire, only visible if it has a video to stream
+            for f in self.per_type['actor']['fire']:
+                if not self.declarations_info[f]['properties'].get('video'):
+                    continue
+                r = self.handle_affection_arced(name, f, 'fire')
+                if r is not None:
+                    ret[f] = r
 
             # check all robots
             if with_robots:
@@ -1514,70 +1660,46 @@ class TfController:
     # Affected by robots
     def handle_linear_alarm(self, name):
         """
-        Handles linear alarms for robots based on their positions and declared linear paths.
+        Handles linear alarms for robots based on the steps they made since the last check.
         Args:
             name (str): The name of the linear declaration to check against.
         Returns:
-            dict: A dictionary where keys are robot identifiers and values are True if an 
-            intersection with the linear path is detected.
-        Raises:
-            Exception: If any error occurs during the processing, it logs the error and raises 
-            an Exception.
-        This method performs the following steps:
-        1. Retrieves the start and end positions of the linear declaration.
-        2. Calculates the distance between the start and end positions.
-        3. Iterates through all robots to check if their current path intersects with the linear 
-            declaration.
-        4. Updates the robot's previous and current positions.
-        5. Checks for intersections between the robot's path and the linear declaration.
-        6. Logs and raises any exceptions encountered during processing.
-        """
-        try:
-            lin_start = self.declarations_info[name]['pose']['start']
-            lin_end = self.declarations_info[name]['pose']['end']
-            sta = [
-                lin_start['x'], #* self.resolution
-                lin_start['y'] #* self.resolution
-            ]
-            end = [
-                lin_end['x'], #* self.resolution
-                lin_end['y'] #* self.resolution
-            ]
-            ret = {}
-
-            if name not in self.lin_alarms_robots:
-                self.lin_alarms_robots[name] = {}
+            dict: A dictionary where keys are robot identifiers and values are True if the
+            robot crossed the linear path since the previous check.
 
-            # Check all robots
-            for r in self.robots:
-                pl_aff = self.places_absolute[r]
-                xyt = [pl_aff['x'], pl_aff['y']]
-
-                if r not in self.lin_alarms_robots[name]:
-                    self.lin_alarms_robots[name][r] = {
-                        "prev": xyt,
-                        "curr": xyt
-                    }
-
-                self.lin_alarms_robots[name][r]["prev"] = \
-                    self.lin_alarms_robots[name][r]["curr"]
-
-                self.lin_alarms_robots[name][r]["curr"] = xyt
-
-                intersection = check_lines_intersection(sta, end, \
-                    self.lin_alarms_robots[name][r]["curr"],
-                    self.lin_alarms_robots[name][r]["prev"]
-                )
+        The crossings are found as the robots move, by sweep_linear_alarms, so that the
+        crossings between two checks of a slow alarm, or of a fast robot, are not missed.
+        """
+        with self.lin_alarms_lock:
+            crossed = self.lin_alarms_crossed.pop(name, set())
+        return {r: True for r in sorted(crossed)}
 
-                if intersection is True:
-                    ret[r] = intersection
+    def sweep_linear_alarms(self, name, prev, curr):
+        """
+        Finds the linear alarms a robot crossed during a step of its kinematics.
 
-        except Exception as e:
-            self.logger.error(str(e))
-            # pylint: disable=broad-exception-raised
-            raise Exception(str(e)) from e
+        Args:
+            name (str): The name of the robot.
+            prev (dict): The x, y of the robot before the step.
+            curr (dict): The x, y of the robot after the step.
+        """
+        a = (prev['x'], prev['y'])
+        b = (curr['x'], curr['y'])
+        with self.lin_alarms_lock:
+            # Only the alarms near the swept segment are tested
+            for alarm in self.lin_alarms_index.query(a, b):
+                start, end = self.lin_alarms_index.segments[alarm]
+                if check_lines_intersection(start, end, b, a):
+                    self.lin_alarms_crossed.setdefault(alarm, set()).add(name)
 
-        return ret
+    def reset(self):
+        """
+        Forgets the linear alarm crossings, for the in-place reset of the simulation.
+        The declarations and the poses are kept, the poses are updated by the robots
+        and the actors as they are reset.
+        """
+        with self.lin_alarms_lock:
+            self.lin_alarms_crossed = {}
 
     def check_affectability(self, name):
         """
@@ -1643,6 +1765,8 @@ class TfController:
         return {
             "affections": ret,
             "env_properties": self.env_properties,
+            # Used by the cameras that render their frames from the world state
+            "pose": dict(self.places_absolute.get(name) or {}),
         }
 
     def get_sim_detection_callback(self, message):
@@ -1927,6 +2051,10 @@ class TfController:
 
         self.speaker_subs = {}
         self.microphone_pubs = {}
+        self.microphone_ranges = {}
+        self.microphone_index = SpatialIndex(self.MICROPHONE_RANGE)
+        self.lin_alarms_index = SegmentIndex()
+        self.lin_alarms_crossed = {}
 
         self.per_type = {
             'robot': {
@@ -12,10 +12,11 @@ import time
 import logging
 import math
 import threading
-import random
+from concurrent.futures import ThreadPoolExecutor
 import numpy
 
 from stream_simulator.connectivity import CommlibFactory
+from stream_simulator.base_classes import StartBarrier, MockSignals
 
 class World:
     """
@@ -27,6 +28,8 @@ class World:
         configuration (dict): Configuration settings for the environment.
         tf_base (str): Base topic for transformation.
         tf_declare_rpc (RPCClient): RPC client for declaring transformations.
+        tf_declare_batch_rpc (RPCClient): RPC client for declaring the transformations of
+            all the devices / actors in a single call.
         name (str): Name of the world.
         env_properties (dict): Environmental properties such as temperature, humidity, 
             luminosity, and pH.
@@ -60,6 +63,9 @@ class World:
         stop():
             Stops the communication library factory.
     """
+    # Threads used to construct the device / actor controllers
+    CONSTRUCTION_WORKERS = 8
+
     def __init__(self, uid, mqtt_notifier = None, tf = None, precision_mode = False):
         self.commlib_factory = CommlibFactory(node_name = "World")
         self.logger = logging.getLogger(__name__)
@@ -68,6 +74,7 @@ class World:
         self.configuration = None
         self.tf_base = None
         self.tf_declare_rpc = None
+        self.tf_declare_batch_rpc = None
         self.env_devices = None
         self.actors = None
         self.devices = None
@@ -78,6 +85,7 @@ class World:
         self.map = None
         self.resolution = None
         self.obstacles = None
+        self.crowd = None
         self.actors_configurations = None
         self.actors_controllers = None
         self.mqtt_notifier = mqtt_notifier
@@ -91,6 +99,8 @@ class World:
             'ph': None,
         }
         self.env_parameters = None
+        # The signal bank of the properties, the property keys and their signal ids
+        self.env_signals = None
 
         self.stopped = False
         self.active = False
@@ -125,6 +135,9 @@ class World:
         self.tf_declare_rpc = self.commlib_factory.get_rpc_client(
             rpc_name = self.tf_base + ".declare"
         )
+        self.tf_declare_batch_rpc = self.commlib_factory.get_rpc_client(
+            rpc_name = self.tf_base + ".declare_batch"
+        )
 
         if "world" in self.configuration:
             if 'properties' in self.configuration['world']:
@@ -158,10 +171,10 @@ class World:
         # All communications have been set up, start the factory
         self.commlib_factory.run()
 
-        # Start all controllers
+        # Start all controllers, together, when the simulation starts
         for c in self.controllers:
-            # start controllers in threads
-            threading.Thread(target = self.controllers[c].start).start()
+            StartBarrier.start_when_ready(
+                self.configuration["simulation"]["name"], self.controllers[c].start)
 
         self.stopped = False
         self.active = True
@@ -270,6 +283,34 @@ class World:
             self.devices.append(c.info)
             self.controllers[c.name] = c
 
+    def construct_controllers(self, builders):
+        """
+        Constructs controllers in parallel, since their construction (communication
+        setup) is independent, and submits their TF declarations in a single call.
+
+        Args:
+            builders (list): Callables that construct one controller each.
+        Returns:
+            list: The controllers, in the order of the builders, so that the TF
+            declarations are done in configuration order (e.g. pan-tilts before
+            the devices they host).
+        """
+        if len(builders) == 0:
+            return []
+        workers = min(World.CONSTRUCTION_WORKERS, len(builders))
+        with ThreadPoolExecutor(max_workers = workers) as executor:
+            controllers = list(executor.map(lambda build: build(), builders))
+
+        declarations = [c.tf_declaration for c in controllers if c.tf_declaration is not None]
+        if len(declarations) > 0:
+            res = self.tf_declare_batch_rpc.call(
+                {"declarations": declarations},
+                timeout = max(10, 0.1 * len(declarations))
+            )
+            if res is None:
+                self.logger.error("TF batch declaration of %s items timed out", len(declarations))
+        return controllers
+
     def device_lookup(self):
         """
         Registers controllers for various environmental devices based on the configuration.
@@ -300,6 +341,7 @@ class World:
             "logger": None,
             "namespace": self.configuration["simulation"]["name"],
             'tf_declare_rpc_topic': self.tf_base + '.declare',
+            'tf_batch_declare': True,
             'tf_distance_calculator_rpc_topic': self.tf_base + '.distance_calculator',
             'tf_affection_rpc_topic': self.tf_base + '.get_affections',
             'tf_detect_rpc_topic': self.tf_base + '.simulated_detection',
@@ -327,6 +369,7 @@ class World:
            "microphones": getattr(str_contro, "EnvMicrophoneController"),
            "humidifiers": getattr(str_contro, "EnvHumidifierController"),
         }
+        builders = []
         for d in self.env_devices:
             devices = self.env_devices[d]
             for dev in devices:
@@ -334,7 +377,10 @@ class World:
                 if 'theta' not in dev['pose']:
                     dev['pose']['theta'] = None
 
-                self.register_controller(mapping[d](conf = dev, package = p))
+                builders.append(lambda cls = mapping[d], dev = dev: cls(conf = dev, package = p))
+
+        for c in self.construct_controllers(builders):
+            self.register_controller(c)
 
     def actors_lookup(self):
         """
@@ -359,12 +405,18 @@ class World:
         p = {
             "logger": None,
             'tf_declare_rpc_topic': self.tf_base + '.declare',
+            'tf_batch_declare': True,
             'tf_distance_calculator_rpc_topic': self.tf_base + '.distance_calculator',
             'tf_affection_rpc_topic': self.tf_base + '.get_affections',
             'resolution': self.resolution,
         }
         str_sim = __import__("stream_simulator")
         str_contro = getattr(str_sim, "controllers")
+        # The automated humans walk together in the crowd
+        self.crowd = getattr(str_contro, "CrowdEngine")(
+            ".".join(self.tf_base.split(".")[:2]), self.map, self.resolution,
+            precision_mode = self.precision_mode)
+        p['crowd'] = self.crowd
         mapping = {
            "humans": getattr(str_contro, "HumanActor"),
            "superman": getattr(str_contro, "SupermanActor"),
@@ -377,19 +429,44 @@ class World:
            "fires": getattr(str_contro, "FireActor"),
            "waters": getattr(str_contro, "WaterActor"),
         }
+        builders = []
         for type_ in self.actors:
             actors = self.actors[type_]
             if type_ not in mapping:
                 self.logger.error("Actor type %s does not exist", type_)
                 continue
             for act in actors:
-                c = mapping[type_](conf = act, package = p, precision_mode = self.precision_mode)
-                if c.name in self.actors:
-                    self.logger.error("Device %s declared twice", c.name)
-                else:
-                    self.actors_configurations.append(c.info)
-                    self.actors_controllers[c.name] = c
-                    self.logger.info("Actor %s declared", c.name)
+                builders.append(lambda cls = mapping[type_], act = act: \
+                    cls(conf = act, package = p, precision_mode = self.precision_mode))
+
+        for c in self.construct_controllers(builders):
+            if c.name in self.actors:
+                self.logger.error("Device %s declared twice", c.name)
+            else:
+                self.actors_configurations.append(c.info)
+                self.actors_controllers[c.name] = c
+                self.logger.info("Actor %s declared", c.name)
+
+        if len(self.crowd) > 0:
+            self.crowd.start()
+
+    def reset(self):
+        """
+        Restores the initial state of the world in place: the poses and the properties
+        of the actors, the states of the devices and the environmental properties,
+        whose signals start over. The controllers and their connections are kept.
+        """
+        if self.crowd is not None and len(self.crowd) > 0:
+            self.crowd.reset()
+        for c in list(self.actors_controllers.values()) + list(self.controllers.values()):
+            try:
+                c.reset()
+            except Exception as e: # pylint: disable=broad-except
+                self.logger.error("World: %s could not be reset: %s", c.name, str(e))
+        if self.env_signals is not None:
+            self.env_signals = self.property_signals()
+            self.update_env_properties()
+        self.logger.warning("World: Reset")
 
     def stop(self):
         """
@@ -401,6 +478,8 @@ class World:
         """
         # Clean actors
         self.logger.critical("World: Cleaning actors")
+        if self.crowd is not None:
+            self.crowd.stop()
         for _, c in self.actors_controllers.items():
             c.stop()
             del c
@@ -451,6 +530,23 @@ class World:
         """
         self.logger.info("Environmental dynamic properties thread started")
 
+        # The first values are computed right away, so that they are available
+        # to the sensors as soon as the simulation starts
+        self.env_signals = self.property_signals()
+        while self.active:
+            self.update_env_properties()
+            time.sleep(1.0)
+
+        self.stopped = True
+        self.logger.warning("Environmental dynamic properties thread stopped")
+
+    def property_signals(self):
+        """
+        Builds the signals of the environmental properties.
+
+        Returns:
+            tuple: The MockSignals bank, the property keys and their signal ids.
+        """
         # Back-compatibility check
         for prop_key, prop in self.env_parameters.items():
             if isinstance(prop, (int, float)):
@@ -463,50 +559,27 @@ class World:
                     }
                 }
 
-        # Dynamic parameters
-        prev = {propkey : None for propkey, _ in self.env_parameters.items()}
-        way = {propkey : 1 for propkey, _ in self.env_parameters.items()}
+        # The properties are the signals of a bank of their own, computed together
+        signals = MockSignals()
+        keys = []
+        ids = []
         for prop_key, prop in self.env_parameters.items():
-            if prop['operation'] == "sinus":
-                prev[prop_key] = prop['operation_parameters']['sinus']['dc']
-            elif prop['operation'] == "triangle":
-                prev[prop_key] = prop['operation_parameters']['triangle']['min']
-
-        while self.active:
-            time.sleep(1.0)
-            for prop_key, prop in self.env_parameters.items():
-                if prop['operation'] == "constant":
-                    val = prop['operation_parameters']['constant']['value']
-                elif prop['operation'] == "random":
-                    val = random.uniform(
-                        prop['operation_parameters']['random']['min'],
-                        prop['operation_parameters']['random']['max'],
-                    )
-                elif prop['operation'] == "normal":
-                    val = random.gauss(
-                        prop['operation_parameters']['normal']['mean'],
-                        prop['operation_parameters']['normal']['std'],
-                    )
-                elif prop["operation"] == "triangle":
-                    val = prev[prop_key] + \
-                        way[prop_key] * prop['operation_parameters']['triangle']['step']
-                    if val >= prop['operation_parameters']['triangle']['max'] or \
-                        val <= prop['operation_parameters']['triangle']['min']:
-                        way[prop_key] *= -1
-                    prev[prop_key] = val
-                elif prop["operation"] == "sinus":
-                    val = prop['operation_parameters']['sinus']['dc'] + \
-                        prop['operation_parameters']['sinus']['amplitude'] * \
-                            math.sin(prev[prop_key])
-                    prev[prop_key] += prop['operation_parameters']['triangle']['step']
-                else:
-                    self.logger.warning("Unsupported operation: %s", prop["operation"])
-
-                self.env_properties[prop_key] = val
-
-            # Update tf
-            self.tf.set_env_properties(self.env_properties)
-            self.mqtt_notifier.dispatch_env_properties(self.env_properties)
+            try:
+                ids.append(signals.add(
+                    prop['operation'], prop['operation_parameters'][prop['operation']]))
+                keys.append(prop_key)
+            except (ValueError, KeyError) as e:
+                self.logger.warning("Unsupported operation for %s: %s", prop_key, str(e))
+        return signals, keys, ids
+
+    def update_env_properties(self):
+        """
+        Computes the environmental properties and dispatches them to tf and the UI.
+        """
+        signals, keys, ids = self.env_signals
+        for prop_key, val in zip(keys, signals.values(ids).tolist()):
+            self.env_properties[prop_key] = val
 
-        self.stopped = True
-        self.logger.warning("Environmental dynamic properties thread stopped")
+        # Update tf
+        self.tf.set_env_properties(self.env_properties)
+        self.mqtt_notifier.dispatch_env_properties(self.env_properties)
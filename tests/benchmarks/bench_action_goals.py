@@ -0,0 +1,92 @@
+"""
+Benchmark of concurrent action goals, on the in-memory broker.
+
+It sends one goal of one second to each of N devices at once and reports the threads
+held while the goals run and their completion times, for the action servers driven by
+the simulation scheduler (goal queues) and for the previous blocking callbacks, which
+sleep in a thread of their own (--blocking).
+
+Usage:
+    PYTHONPATH=. python tests/benchmarks/bench_action_goals.py [-n 200] [--blocking]
+"""
+
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import argparse
+import logging
+import os
+import threading
+import time
+
+os.environ['USE_INMEMORY_BROKER'] = '1'
+os.environ.setdefault('STREAMSIM_STATS_PERIOD', '0')
+
+# pylint: disable=wrong-import-position
+from stream_simulator.base_classes import Scheduler
+from stream_simulator.connectivity import CommlibFactory, GoalQueue
+
+DURATION = 1.0
+
+def blocking_goal(_):
+    """
+    A goal sleeping until it is done, as the controllers used to do.
+    """
+    started = time.time()
+    while time.time() - started < DURATION:
+        time.sleep(0.05)
+    return {"took": time.time() - started}
+
+def scheduled_goal(goalh):
+    """
+    The same goal, driven by the scheduler.
+    """
+    started = time.time()
+    Scheduler.run_goal(goalh, [started + DURATION], \
+        result = lambda: {"took": time.time() - started})
+
+def main():
+    """
+    Runs the benchmark.
+    """
+    parser = argparse.ArgumentParser(description = "Streamsim action goals benchmark")
+    parser.add_argument("-n", type = int, default = 200, help = "Number of devices")
+    parser.add_argument("--blocking", action = "store_true",
+                        help = "Use blocking goal callbacks")
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    cfact = CommlibFactory(node_name = "bench")
+    for i in range(args.n):
+        if args.blocking:
+            cfact.get_action_server(action_name = f"bench.device_{i}.action",
+                                    callback = blocking_goal, auto_run = False)
+        else:
+            cfact.get_action_server(action_name = f"bench.device_{i}.action",
+                                    callback = scheduled_goal, auto_run = False,
+                                    goal_queue = GoalQueue(f"device_{i}"))
+    clients = [cfact.create_action_client(action_name = f"bench.device_{i}.action") \
+        for i in range(args.n)]
+    cfact.run()
+
+    for rnd in ["warm-up", "measured"]:
+        threads = threading.active_count()
+        start = time.perf_counter()
+        for client in clients:
+            client.send_goal({})
+        sent = time.perf_counter() - start
+        time.sleep(DURATION / 2)
+        held = threading.active_count() - threads
+        results = [client.get_result(wait = True) for client in clients]
+        took = [r["took"] for r in results if r and "took" in r]
+        if rnd == "measured":
+            print(f"{'goals sent':<30} {args.n:10d} in {sent * 1000:.1f} ms")
+            print(f"{'threads held while running':<30} {held:10d}")
+            print(f"{'completed':<30} {len(took):10d}, "
+                  f"max duration {max(took) if took else 0:.3f} s")
+
+    # The endpoints leave non-daemon threads behind
+    os._exit(0) # pylint: disable=protected-access
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Benchmark of the microphone audio mixing.
+
+It measures, for an increasing number of sound sources spread over a map with a wall,
+the update of the heard sources (gains and wall cells crossed) and the mixing of a chunk.
+A microphone is real-time as long as both stay well below the chunk duration.
+
+Usage:
+    PYTHONPATH=. python tests/benchmarks/bench_audio_mix.py [--chunk 0.25] [--sources 1 10 50 200]
+"""
+
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import argparse
+import time
+
+import numpy as np
+
+from stream_simulator.controllers.audio_pipeline import AudioMixer, AcousticMap, SAMPLE_RATE
+
+def timed(n, func):
+    """
+    Runs func n times and returns the time per call in ms.
+    """
+    start = time.perf_counter()
+    for _ in range(n):
+        func()
+    return (time.perf_counter() - start) / n * 1000
+
+def main():
+    """
+    Runs the benchmark.
+    """
+    parser = argparse.ArgumentParser(description = "Streamsim audio mixing benchmark")
+    parser.add_argument("--chunk", type = float, default = 0.25, help = "Chunk duration (s)")
+    parser.add_argument("--sources", type = int, nargs = "+", default = [1, 10, 50, 200])
+    parser.add_argument("-n", type = int, default = 20, help = "Repetitions")
+    args = parser.parse_args()
+
+    map_ = np.zeros((1000, 1000))
+    map_[500, :] = 1
+    acoustic = AcousticMap(map_, 0.1)
+    pose = {'x': 50.0, 'y': 50.0, 'theta': 0}
+    rng = np.random.default_rng(0)
+    samples = int(args.chunk * SAMPLE_RATE)
+
+    for count in args.sources:
+        affections = {}
+        for i in range(count):
+            affections[f"sound_source_{i}"] = {
+                'type': 'sound_source',
+                'info': {'language': 'EL' if i % 2 else 'EN'},
+                'distance': float(rng.uniform(1, 20)),
+                'range': 30,
+                'position': {'x': float(rng.uniform(0, 100)), 'y': float(rng.uniform(0, 100))}
+            }
+        mixer = AudioMixer(acoustic)
+        update = timed(args.n, lambda: mixer.update(affections, pose)) # pylint: disable=cell-var-from-loop
+        mix = timed(args.n, lambda: mixer.chunk(samples)) # pylint: disable=cell-var-from-loop
+        print(f"{count:>5} sources   update {update:8.2f} ms   mix {mix:8.2f} ms   "
+              f"({(update + mix) / (args.chunk * 1000) * 100:5.1f}% of a chunk)")
+
+if __name__ == "__main__":
+    main()
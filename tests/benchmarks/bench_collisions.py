@@ -0,0 +1,56 @@
+"""
+Benchmark of the sweep of the robot footprints against the walls.
+
+It builds the distance field of a 1000x1000 map with a long wall and measures the
+sweep of a footprint for steps of increasing length, far from and along the wall.
+A robot checks one sweep per tick, which is expected to take well below a millisecond.
+
+Usage:
+    PYTHONPATH=. python tests/benchmarks/bench_collisions.py [-n 1000] [--steps 0.01 0.1 1.0]
+"""
+
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import argparse
+import time
+
+import numpy as np
+
+from stream_simulator.transformations import DistanceField
+
+def timed(n, func):
+    """
+    Runs func(k) for k in range(n) and returns the time per call in ms.
+    """
+    start = time.perf_counter()
+    for k in range(n):
+        func(k)
+    return (time.perf_counter() - start) / n * 1000
+
+def main():
+    """
+    Runs the benchmark.
+    """
+    parser = argparse.ArgumentParser(description = "Streamsim wall collisions benchmark")
+    parser.add_argument("-n", type = int, default = 1000, help = "Sweeps per measure")
+    parser.add_argument("--steps", type = float, nargs = "+", default = [0.01, 0.1, 1.0],
+                        help = "Step lengths (m)")
+    args = parser.parse_args()
+
+    walls = np.zeros((1000, 1000))
+    walls[500, 100:900] = 1
+    start = time.perf_counter()
+    field = DistanceField(walls, 0.1)
+    print(f"distance field            {(time.perf_counter() - start) * 1000:8.2f} ms")
+
+    for step in args.steps:
+        free = timed(args.n, lambda k: field.sweep_collides( # pylint: disable=cell-var-from-loop
+            20.0 + k * 0.01, 20.0, 20.0 + k * 0.01 + step, 20.0, 0.25)) # pylint: disable=cell-var-from-loop
+        along = timed(args.n, lambda k: field.sweep_collides( # pylint: disable=cell-var-from-loop
+            49.6, 20.0 + k * 0.01, 49.6, 20.0 + k * 0.01 + step, 0.25)) # pylint: disable=cell-var-from-loop
+        print(f"step {step:5.2f} m   free {free * 1000:8.1f} us   "
+              f"along a wall {along * 1000:8.1f} us")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Benchmark of the crowd engine of the humans, on the in-memory broker.
+
+It walks crowds of an increasing number of humans, with random routes in a 30x30 m
+area below a wall, and reports the time of a step and of the publication of the poses.
+A crowd is real-time as long as both stay well below its tick (100 ms).
+
+Usage:
+    PYTHONPATH=. python tests/benchmarks/bench_crowd.py [-n 10] [--humans 10 100 1000]
+"""
+
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import argparse
+import logging
+import os
+import time
+
+os.environ['USE_INMEMORY_BROKER'] = '1'
+os.environ.setdefault('STREAMSIM_STATS_PERIOD', '0')
+
+# pylint: disable=wrong-import-position
+import numpy as np
+
+from stream_simulator.controllers import CrowdEngine
+
+def timed(n, func):
+    """
+    Runs func n times and returns the time per call in ms.
+    """
+    start = time.perf_counter()
+    for _ in range(n):
+        func()
+    return (time.perf_counter() - start) / n * 1000
+
+def main():
+    """
+    Runs the benchmark.
+    """
+    parser = argparse.ArgumentParser(description = "Streamsim crowd benchmark")
+    parser.add_argument("-n", type = int, default = 10, help = "Steps per measure")
+    parser.add_argument("--humans", type = int, nargs = "+", default = [10, 100, 1000])
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    map_ = np.zeros((400, 400))
+    # A horizontal wall at y = 30 m
+    map_[:, 300] = 1
+    rng = np.random.default_rng(0)
+
+    for count in args.humans:
+        crowd = CrowdEngine("streamsim.bench_crowd", map_, 0.1)
+        for k, (x, y) in enumerate(rng.uniform(1, 29, (count, 2)).tolist()):
+            gx, gy = rng.uniform(1, 29, 2).tolist()
+            crowd.add_walker(f"h{k}", x, y, [{'x': gx, 'y': gy}], 1.0)
+        crowd.step(0.1)
+        step = timed(args.n, lambda: crowd.step(0.1)) # pylint: disable=cell-var-from-loop
+        publish = timed(args.n, crowd.publish)
+        print(f"{count:>5} humans   step {step:8.2f} ms   publish {publish:8.2f} ms   "
+              f"({(step + publish) / (crowd.tick * 1000) * 100:5.1f}% of a tick)")
+        crowd.stop()
+
+if __name__ == "__main__":
+    main()
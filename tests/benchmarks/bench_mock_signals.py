@@ -0,0 +1,55 @@
+"""
+Benchmark of the vectorized mock signals.
+
+It fills banks of an increasing number of signals of mixed operations, with noise, and
+measures the computation of the next values of all of them in one call. A Scheduler
+tick hands the values of all the due signals at once, so it should stay well below 10 ms.
+
+Usage:
+    PYTHONPATH=. python tests/benchmarks/bench_mock_signals.py [-n 10] [--signals 100 1000 10000]
+"""
+
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import argparse
+import time
+
+from stream_simulator.base_classes import MockSignals
+
+PARAMETERS = {
+    "constant": {"value": 1},
+    "random": {"min": 0, "max": 1},
+    "normal": {"mean": 0, "std": 1},
+    "triangle": {"min": 0, "max": 10, "step": 0.5},
+    "sinus": {"dc": 0, "amplitude": 1, "step": 0.1},
+}
+
+def timed(n, func):
+    """
+    Runs func n times and returns the time per call in ms.
+    """
+    start = time.perf_counter()
+    for _ in range(n):
+        func()
+    return (time.perf_counter() - start) / n * 1000
+
+def main():
+    """
+    Runs the benchmark.
+    """
+    parser = argparse.ArgumentParser(description = "Streamsim mock signals benchmark")
+    parser.add_argument("-n", type = int, default = 10, help = "Repetitions")
+    parser.add_argument("--signals", type = int, nargs = "+", default = [100, 1000, 10000])
+    args = parser.parse_args()
+
+    operations = list(PARAMETERS)
+    for count in args.signals:
+        signals = MockSignals()
+        ids = [signals.add(operations[k % 5], PARAMETERS[operations[k % 5]], noise = 0.1) \
+            for k in range(count)]
+        values = timed(args.n, lambda: signals.values(ids)) # pylint: disable=cell-var-from-loop
+        print(f"{count:>6} signals   values {values:8.3f} ms")
+
+if __name__ == "__main__":
+    main()
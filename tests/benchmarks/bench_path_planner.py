@@ -0,0 +1,64 @@
+"""
+Benchmark of the global path planner of the robots.
+
+It builds a 1000x1000 map with a row of walls, each with a door, and measures the
+construction of the planner (inflated costmap), a plan across all the walls and a plan
+to a goal behind a closed wall. A plan is expected to take well below 100 ms.
+
+Usage:
+    PYTHONPATH=. python tests/benchmarks/bench_path_planner.py [-n 10]
+"""
+
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import argparse
+import time
+
+import numpy as np
+
+from stream_simulator.transformations import PathPlanner
+
+def walls_map(closed = False):
+    """
+    Returns a 1000x1000 map with a wall every 10 m, each with a door, the middle one
+    closed if asked.
+    """
+    map_ = np.zeros((1000, 1000))
+    for k, x in enumerate(range(100, 1000, 100)):
+        map_[x, :] = 1
+        door = 50 + (k * 370) % 850
+        map_[x, door:door + 15] = 0
+    if closed:
+        map_[500, :] = 1
+    return map_
+
+def timed(n, func):
+    """
+    Runs func n times and returns the time per call in ms.
+    """
+    start = time.perf_counter()
+    for _ in range(n):
+        func()
+    return (time.perf_counter() - start) / n * 1000
+
+def main():
+    """
+    Runs the benchmark.
+    """
+    parser = argparse.ArgumentParser(description = "Streamsim path planner benchmark")
+    parser.add_argument("-n", type = int, default = 10, help = "Repetitions")
+    args = parser.parse_args()
+
+    open_map = walls_map()
+    closed_map = walls_map(closed = True)
+    build = timed(args.n, lambda: PathPlanner(open_map, 0.1))
+    # A new planner per plan, so the plans are not taken from its cache
+    across = timed(args.n, lambda: PathPlanner(open_map, 0.1).plan((5.0, 5.0), (95.0, 95.0)))
+    closed = timed(args.n, lambda: PathPlanner(closed_map, 0.1).plan((5.0, 5.0), (95.0, 95.0)))
+    print(f"costmap             {build:8.2f} ms")
+    print(f"plan across walls   {across - build:8.2f} ms")
+    print(f"unreachable goal    {closed - build:8.2f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark of the simulator startup costs.
+
+It measures, on the in-memory broker:
+- the bookkeeping of the endpoint registrations (caller location capture), compared
+  to the previous `inspect.getouterframes` based capture
+- the creation of CommlibFactory instances and the registration of endpoints
+- the full startup of the simulator with the `testing` configuration (--simulator)
+
+Usage:
+    PYTHONPATH=. python tests/benchmarks/bench_startup.py [-n 2000] [--simulator]
+"""
+
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import argparse
+import inspect
+import logging
+import os
+import time
+
+os.environ['USE_INMEMORY_BROKER'] = '1'
+os.environ.setdefault('STREAMSIM_STATS_PERIOD', '0')
+
+# pylint: disable=wrong-import-position
+from stream_simulator.connectivity import CommlibFactory
+from stream_simulator.connectivity.commlib_factory import caller_location, format_location
+
+def timed(label, n, func):
+    """
+    Runs func n times and prints the total and per call time.
+    """
+    start = time.perf_counter()
+    for i in range(n):
+        func(i)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {elapsed * 1000:10.1f} ms total {elapsed / n * 1e6:10.1f} us/call")
+    return elapsed
+
+def legacy_capture(_):
+    """
+    The caller capture used before: full frame info, including source lines.
+    """
+    calframe = inspect.getouterframes(inspect.currentframe(), 2)
+    return f"{calframe[1][1].split('/')[-1]}:{calframe[1][2]}"
+
+def lazy_capture(_):
+    """
+    The current caller capture.
+    """
+    return caller_location()
+
+def main():
+    """
+    Runs the benchmarks.
+    """
+    parser = argparse.ArgumentParser(description = "Streamsim startup benchmark")
+    parser.add_argument("-n", type = int, default = 2000, help = "Number of endpoints")
+    parser.add_argument("--simulator", action = "store_true",
+                        help = "Also measure a full simulator startup")
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    legacy = timed("caller capture (getouterframes)", args.n, legacy_capture)
+    lazy = timed("caller capture (lazy)", args.n, lazy_capture)
+    print(f"{'speedup':<40} {legacy / lazy:10.1f} x")
+    timed("caller resolution (print_topics)", args.n,
+          lambda i: format_location(caller_location(1)))
+
+    factories = max(1, args.n // 100)
+    timed("CommlibFactory()", factories,
+          lambda i: CommlibFactory(node_name = f"bench_{i}"))
+
+    cfact = CommlibFactory(node_name = "bench")
+    timed("get_publisher", args.n,
+          lambda i: cfact.get_publisher(topic = f"bench.pub.{i}", auto_run = False))
+    timed("get_subscriber", args.n,
+          lambda i: cfact.get_subscriber(topic = f"bench.sub.{i}", callback = print,
+                                         auto_run = False))
+    timed("get_rpc_client", args.n,
+          lambda i: cfact.get_rpc_client(rpc_name = f"bench.rpc.{i}", auto_run = False))
+    timed("get_rpc_service", args.n // 10,
+          lambda i: cfact.get_rpc_service(rpc_name = f"bench.srv.{i}", callback = print,
+                                          auto_run = False))
+
+    if args.simulator:
+        # pylint: disable=import-outside-toplevel
+        from stream_simulator import Simulator
+        from stream_simulator.bin import SimulatorStartup
+        start = time.perf_counter()
+        startup = SimulatorStartup(conf_file = "testing", uid = "benchuid")
+        Simulator(uid = "benchuid", message = startup.configuration)
+        print(f"{'simulator startup (testing.yaml)':<40} "
+              f"{(time.perf_counter() - start) * 1000:10.1f} ms")
+
+    # The simulator and the endpoints leave non-daemon threads behind
+    os._exit(0) # pylint: disable=protected-access
+
+if __name__ == "__main__":
+    main()
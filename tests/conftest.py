@@ -0,0 +1,60 @@
+"""
+Pytest configuration for the Streamsim integration tests.
+
+When the in-memory broker is enabled (`USE_INMEMORY_BROKER=1` in the environment
+or in `.env`), the simulator is started in the test process with the `testing`
+configuration and uid `testinguid`, so no external broker or simulator is needed.
+Otherwise the tests expect an already running simulator, as before.
+"""
+
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import os
+import threading
+
+import pytest
+from dotenv import load_dotenv
+
+load_dotenv(os.path.join(os.path.dirname(os.path.realpath(__file__)), '../.env'))
+
+# Set when the in-process simulator could not be stopped cleanly
+_SESSION = {"hard_exit": False, "status": 0}
+
+@pytest.fixture(scope = "session", autouse = True)
+def inprocess_simulator():
+    """
+    Starts the simulator in-process if the in-memory broker is enabled.
+    """
+    if os.getenv('USE_INMEMORY_BROKER', "False") not in ('True', 'true', '1'):
+        yield None
+        return
+
+    # pylint: disable=import-outside-toplevel
+    from stream_simulator import Simulator
+    from stream_simulator.bin import SimulatorStartup
+
+    startup = SimulatorStartup(conf_file = "testing", uid = "testinguid")
+    simulator = Simulator(uid = "testinguid", message = startup.configuration)
+    yield simulator
+
+    # Some controllers never return from stop() if their thread was not started,
+    # so bound the shutdown and exit hard at the end of the session if needed
+    stopper = threading.Thread(target = simulator.stop, daemon = True)
+    stopper.start()
+    stopper.join(timeout = 30)
+    _SESSION["hard_exit"] = True
+
+def pytest_sessionfinish(session, exitstatus): # pylint: disable=unused-argument
+    """
+    Keeps the exit status for pytest_unconfigure.
+    """
+    _SESSION["status"] = int(exitstatus)
+
+def pytest_unconfigure(config): # pylint: disable=unused-argument
+    """
+    The in-process simulator leaves non-daemon controller threads behind,
+    which would keep the interpreter alive after the session.
+    """
+    if _SESSION["hard_exit"]:
+        os._exit(_SESSION["status"]) # pylint: disable=protected-access
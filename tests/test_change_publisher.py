@@ -0,0 +1,106 @@
+"""
+Test to check the publish on change of the sensors
+"""
+
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import unittest
+import sys
+import time
+import traceback
+
+from stream_simulator.connectivity import CommlibFactory
+from stream_simulator.base_classes import ChangePublisher
+
+class Test(unittest.TestCase):
+    """
+    Test class for testing the change driven publishing of the data.
+    Methods:
+        setUp(): Creates a publisher and a subscriber of a data topic.
+        test_deadband(): Tests the suppression of the unchanged values.
+        test_heartbeat(): Tests the publishing of the unchanged values on heartbeat.
+        test_conf(): Tests the wrapping of the publishers from the configuration.
+        tearDown(): Stops the factory.
+    """
+    def setUp(self):
+        self.cfact = CommlibFactory(node_name = "Test")
+        self.topic = "streamsim.testinguid.test_change_publisher.data"
+        self.received = []
+        self.raw = self.cfact.get_publisher(topic = self.topic, auto_run = False)
+        self.cfact.get_subscriber(
+            topic = self.topic,
+            callback = self.received.append,
+            auto_run = False
+        )
+        self.cfact.run()
+        time.sleep(0.2)
+
+    def test_deadband(self):
+        """
+        Publishes noisy distances, empty tag lists and an alarm.
+        """
+        try:
+            publisher = ChangePublisher(self.raw, deadband = 0.05, heartbeat = 60)
+            for value in [1.0, 1.02, 0.98, 1.04, 1.2, 1.21]:
+                publisher.publish({"distance": value, "timestamp": time.time()})
+            publisher.publish({"data": {"tags": []}, "name": "rfid"})
+            publisher.publish({"data": {"tags": []}, "name": "rfid"})
+            publisher.publish({"data": {"tags": [{"id": "t1"}]}, "name": "rfid"})
+            publisher.publish({"value": [], "timestamp": time.time()})
+            publisher.publish({"value": [], "timestamp": time.time()})
+            publisher.publish({"value": ["human_1"], "timestamp": time.time()})
+            time.sleep(0.3)
+            self.assertEqual([m.get("distance") for m in self.received[:2]], [1.0, 1.2])
+            self.assertEqual(len(self.received), 2 + 2 + 2)
+            self.assertEqual(self.received[-1]["value"], ["human_1"])
+            self.assertEqual((publisher.published, publisher.suppressed), (6, 6))
+
+        except: # pylint: disable=bare-except
+            traceback.print_exc(file=sys.stdout)
+            self.fail("Test failed due to exception")
+
+    def test_heartbeat(self):
+        """
+        Publishes the same value at 50 Hz for a second.
+        """
+        try:
+            publisher = ChangePublisher(self.raw, heartbeat = 0.25)
+            start = time.time()
+            while time.time() - start < 1.0:
+                publisher.publish({"value": 0, "timestamp": time.time()})
+                time.sleep(0.02)
+            time.sleep(0.3)
+            self.assertTrue(4 <= len(self.received) <= 5)
+
+        except: # pylint: disable=bare-except
+            traceback.print_exc(file=sys.stdout)
+            self.fail("Test failed due to exception")
+
+    def test_conf(self):
+        """
+        Wraps publishers according to the device configurations.
+        """
+        try:
+            self.assertIs(ChangePublisher.from_conf(self.raw, None), self.raw)
+            self.assertIs(ChangePublisher.from_conf(self.raw, {"hz": 1}), self.raw)
+            publisher = ChangePublisher.from_conf(self.raw, {"publish_on_change": True})
+            self.assertEqual((publisher.deadband, publisher.heartbeat), \
+                (0, ChangePublisher.HEARTBEAT))
+            publisher = ChangePublisher.from_conf(self.raw, \
+                {"publish_on_change": {"deadband": 0.5, "heartbeat": 10}})
+            self.assertEqual((publisher.deadband, publisher.heartbeat), (0.5, 10))
+            self.assertIs(publisher.publisher, self.raw)
+
+        except: # pylint: disable=bare-except
+            traceback.print_exc(file=sys.stdout)
+            self.fail("Test failed due to exception")
+
+    def tearDown(self):
+        """
+        Tear down method for cleaning up after each test case.
+        """
+        self.cfact.stop()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,178 @@
+"""
+Test to check the collision service of the world
+"""
+
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import unittest
+import sys
+import time
+import traceback
+
+import numpy as np
+
+from stream_simulator.connectivity import CommlibFactory
+from stream_simulator.transformations import CollisionService, DistanceField
+
+class Test(unittest.TestCase):
+    """
+    Test class for testing the contacts of the robots with robots and humans.
+    Methods:
+        setUp(): Creates a collision service for two robots, one of them checked, and
+                 the publishers of the robot and human poses.
+        test_contacts(): Tests the contact events of the checked robot.
+        test_swept(): Tests that robots crossing each other within a tick collide.
+        test_walls(): Tests the sweep of a footprint against the walls.
+        test_escape(): Tests that a footprint next to a wall may only move away from it
+                       or along it.
+        tearDown(): Stops the service and the factory.
+    """
+    def setUp(self):
+        self.cfact = CommlibFactory(node_name = "Test")
+        self.namespace = "streamsim.testinguid.test_collisions"
+        self.robots = [f"{self.namespace}.r1", f"{self.namespace}.r2"]
+        self.events = []
+
+        self.service = CollisionService(namespace = self.namespace, tick = 0.05)
+        self.service.add_robot(self.robots[0])
+        self.service.add_robot(self.robots[1], checked = False)
+
+        self.pose_pubs = [
+            self.cfact.get_publisher(topic = f"{name}.pose.internal", auto_run = False)
+            for name in self.robots
+        ]
+        self.human_pub = self.cfact.get_publisher(
+            topic = f"{self.namespace}.actor.human.h1.pose.internal",
+            auto_run = False
+        )
+        self.cfact.get_subscriber(
+            topic = f"{self.robots[0]}.collisions.internal",
+            callback = self.events.append,
+            auto_run = False
+        )
+        self.cfact.run()
+        self.service.start()
+        time.sleep(0.5)
+
+    def publish(self, pub, name, x, y):
+        """
+        Publishes a pose as the robots and the humans do.
+        """
+        pub.publish({"x": x, "y": y, "theta": 0, "resolution": 0.1, \
+            "name": name, "raw_name": name.split(".")[-1]})
+
+    def test_contacts(self):
+        """
+        Moves the second robot and a human next to the first robot and away.
+        """
+        try:
+            self.publish(self.pose_pubs[0], self.robots[0], 10.0, 10.0)
+            self.publish(self.pose_pubs[1], self.robots[1], 12.0, 10.0)
+            time.sleep(0.5)
+            self.assertEqual(self.events, [])
+
+            self.publish(self.pose_pubs[1], self.robots[1], 10.3, 10.0)
+            self.publish(self.human_pub, "h1", 9.8, 10.1)
+            time.sleep(0.5)
+            self.assertTrue(self.events[-1]['crashed'])
+            self.assertEqual(self.events[-1]['with'], ["h1", "r2"])
+            # The unchecked robot gets no events
+            self.assertEqual(list(self.service.contacts), [self.robots[0]])
+
+            self.publish(self.pose_pubs[1], self.robots[1], 15.0, 10.0)
+            self.publish(self.human_pub, "h1", 5.0, 10.0)
+            time.sleep(0.5)
+            self.assertEqual(self.events[-1], {"crashed": False, "with": []})
+            # One event per change, not per tick
+            self.assertLessEqual(len(self.events), 4)
+
+        except: # pylint: disable=bare-except
+            traceback.print_exc(file=sys.stdout)
+            self.fail("Test failed due to exception")
+
+    def test_swept(self):
+        """
+        Moves two robots through each other between two checks.
+        """
+        try:
+            service = CollisionService(namespace = f"{self.namespace}.swept")
+            service.checked = {"a": self.cfact.get_publisher(
+                topic = f"{self.namespace}.swept.a.collisions.internal")}
+            service.radii.update({"a": 0.2, "b": 0.2})
+            service.update("a", "a", 0.0, 0.0)
+            service.update("b", "b", 3.0, 0.3)
+            self.assertEqual(service.check(), {})
+            # They swap places, they are never closer than 0.3 m apart
+            service.update("a", "a", 3.0, 0.0)
+            service.update("b", "b", 0.0, 0.3)
+            self.assertEqual(service.check(), {"a": ["b"]})
+            # Parallel motion 0.5 m apart, no contact
+            service.update("a", "a", 6.0, 0.0)
+            service.update("b", "b", 3.0, 0.5)
+            service.update("b", "b", 6.0, 0.5)
+            self.assertEqual(service.check(), {"a": []})
+
+        except: # pylint: disable=bare-except
+            traceback.print_exc(file=sys.stdout)
+            self.fail("Test failed due to exception")
+
+    def test_walls(self):
+        """
+        Sweeps a footprint through and along a wall of a distance field.
+        """
+        try:
+            walls = np.zeros((1000, 1000))
+            walls[500, 100:900] = 1
+            field = DistanceField(walls, 0.1)
+            # Through the wall within one step
+            self.assertTrue(field.sweep_collides(45.0, 50.0, 55.0, 50.0, 0.0))
+            # Along the wall, 0.3 m from its edge
+            self.assertFalse(field.sweep_collides(49.7, 20.0, 49.7, 80.0, 0.25))
+            # Towards the wall, up to 0.3 m from its edge
+            self.assertFalse(field.sweep_collides(45.0, 20.0, 49.7, 20.0, 0.25))
+            self.assertTrue(field.sweep_collides(45.0, 20.0, 49.7, 20.0, 0.35))
+            # Far from the wall, the tiles do not see it
+            self.assertFalse(field.sweep_collides(10.0, 10.0, 10.5, 10.0, 0.25))
+
+        except: # pylint: disable=bare-except
+            traceback.print_exc(file=sys.stdout)
+            self.fail("Test failed due to exception")
+
+    def test_escape(self):
+        """
+        Starts a footprint next to a wall and drives it away, step by step.
+        """
+        try:
+            walls = np.zeros((1000, 1000))
+            walls[500, 100:900] = 1
+            field = DistanceField(walls, 0.1)
+            radius = 0.25
+            # 0.15 m from the edge of the wall, the footprint reaches it
+            x, y = 49.85, 50.0
+            self.assertLess(field.clearance(x, y, x, y), radius)
+            # Closer is a crash, turning in place or sliding along the wall is not
+            self.assertTrue(field.sweep_collides(x, y, x + 0.1, y, radius))
+            self.assertFalse(field.sweep_collides(x, y, x, y, radius))
+            self.assertFalse(field.sweep_collides(x, y, x, y + 0.05, radius))
+            # Steps of 5 cm away from the wall, as a robot at 0.5 m/s
+            for _ in range(20):
+                self.assertFalse(field.sweep_collides(x, y, x - 0.05, y, radius))
+                x -= 0.05
+            self.assertGreater(field.clearance(x, y, x, y), radius)
+            # Once clear, the wall is hit again on the way back
+            self.assertTrue(field.sweep_collides(x, y, 49.85, y, radius))
+
+        except: # pylint: disable=bare-except
+            traceback.print_exc(file=sys.stdout)
+            self.fail("Test failed due to exception")
+
+    def tearDown(self):
+        """
+        Tear down method for cleaning up after each test case.
+        """
+        self.service.stop()
+        self.cfact.stop()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,181 @@
+"""
+Test to check the crowd engine of the humans
+"""
+
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import unittest
+import sys
+import time
+import math
+import traceback
+
+import numpy as np
+
+from stream_simulator.connectivity import CommlibFactory
+from stream_simulator.controllers import CrowdEngine
+
+class _Actor:
+    """
+    An actor walked by the crowd, keeping the poses it publishes.
+    """
+    def __init__(self):
+        self._x, self._y, self._theta = 0.0, 0.0, 0.0
+        self.poses = []
+
+    def publish_pose(self):
+        """
+        Keeps the current pose.
+        """
+        self.poses.append((self._x, self._y, self._theta))
+
+class Test(unittest.TestCase):
+    """
+    Test class for testing the crowd engine.
+    Methods:
+        setUp(): Creates a map with a wall and the subscriber of the crowd poses.
+        test_routes(): Tests that the humans follow their points, back and forth.
+        test_avoidance(): Tests that two humans walking at each other pass each other.
+        test_walls(): Tests that the humans keep off the walls.
+        test_large_crowd(): Tests the steps of a crowd of 1000 humans.
+        test_actor_poses(): Tests that the actors of the humans publish their own poses.
+        tearDown(): Stops the factory.
+    """
+    def setUp(self):
+        self.cfact = CommlibFactory(node_name = "Test")
+        self.namespace = "streamsim.testinguid.test_crowd"
+        self.resolution = 0.1
+        self.map = np.zeros((400, 400))
+        # A horizontal wall at y = 30 m
+        self.map[:, 300] = 1
+        self.messages = []
+        self.cfact.get_subscriber(
+            topic = f"{self.namespace}.actor.crowd.poses.internal",
+            callback = self.messages.append,
+            auto_run = False
+        )
+        self.cfact.run()
+
+    def walk(self, crowd, seconds, dt = 0.1):
+        """
+        Steps a crowd and returns the smallest distance between two of its humans.
+        """
+        closest = math.inf
+        for _ in range(int(seconds / dt)):
+            crowd.step(dt)
+            if len(crowd) > 1:
+                diff = crowd.pos[:, None, :] - crowd.pos[None, :, :]
+                dist = np.hypot(diff[..., 0], diff[..., 1])
+                np.fill_diagonal(dist, math.inf)
+                closest = min(closest, dist.min())
+        return closest
+
+    def test_routes(self):
+        """
+        Tests that the humans follow their points, back and forth, and that their
+        poses are published together.
+        """
+        try:
+            crowd = CrowdEngine(self.namespace, self.map, self.resolution)
+            points = [{'x': 5.0, 'y': 5.0}, {'x': 10.0, 'y': 5.0}]
+            crowd.add_walker("h1", 2.0, 5.0, points, 1.0, reverse = True)
+            crowd.add_walker("h2", 2.0, 15.0, [{'x': 2.0, 'y': 20.0}], 1.0)
+            self.walk(crowd, 10)
+            self.assertLess(math.dist(crowd.pos[1], (2.0, 20.0)), crowd.REACHED)
+            self.assertFalse(crowd.walking[1])
+            # Walked to the last point and back to the first one
+            self.walk(crowd, 15)
+            self.assertFalse(crowd.walking[0])
+            self.assertLess(math.dist(crowd.pos[0], (5.0, 5.0)), crowd.REACHED)
+            self.assertFalse(crowd.step(0.1))
+
+            crowd.publish()
+            time.sleep(0.5)
+            self.assertEqual(len(self.messages), 1)
+            self.assertEqual([p['raw_name'] for p in self.messages[0]['poses']], ["h1", "h2"])
+            crowd.stop()
+        except: # pylint: disable=bare-except
+            traceback.print_exc(file=sys.stdout)
+            self.fail("Test failed due to exception")
+
+    def test_avoidance(self):
+        """
+        Tests that two humans walking at each other pass each other without touching.
+        """
+        try:
+            crowd = CrowdEngine(self.namespace, self.map, self.resolution)
+            crowd.add_walker("h1", 5.0, 10.0, [{'x': 15.0, 'y': 10.0}], 1.0)
+            crowd.add_walker("h2", 15.0, 10.01, [{'x': 5.0, 'y': 10.01}], 1.0)
+            closest = self.walk(crowd, 20)
+            self.assertGreater(closest, crowd.RADIUS)
+            self.assertFalse(crowd.walking.any())
+            crowd.stop()
+        except: # pylint: disable=bare-except
+            traceback.print_exc(file=sys.stdout)
+            self.fail("Test failed due to exception")
+
+    def test_walls(self):
+        """
+        Tests that a human walking along a wall keeps off it.
+        """
+        try:
+            crowd = CrowdEngine(self.namespace, self.map, self.resolution)
+            crowd.add_walker("h1", 5.0, 29.7, [{'x': 25.0, 'y': 29.7}], 1.0)
+            lowest = math.inf
+            for _ in range(300):
+                crowd.step(0.1)
+                lowest = min(lowest, 30.0 - crowd.pos[0, 1])
+            self.assertGreater(lowest, crowd.RADIUS)
+            crowd.stop()
+        except: # pylint: disable=bare-except
+            traceback.print_exc(file=sys.stdout)
+            self.fail("Test failed due to exception")
+
+    def test_large_crowd(self):
+        """
+        Tests that a crowd of 1000 humans walks, on the side of the wall it started.
+        """
+        try:
+            crowd = CrowdEngine(self.namespace, self.map, self.resolution)
+            rng = np.random.default_rng(0)
+            for k, (x, y) in enumerate(rng.uniform(1, 29, (1000, 2)).tolist()):
+                gx, gy = rng.uniform(1, 29, 2).tolist()
+                crowd.add_walker(f"h{k}", x, y, [{'x': gx, 'y': gy}], 1.0)
+            start = crowd.pos.copy()
+            for _ in range(10):
+                self.assertTrue(crowd.step(0.1))
+            self.assertTrue(np.isfinite(crowd.pos).all())
+            # Most of them walk freely, the others are held by their neighbours
+            self.assertGreater((np.hypot(*(crowd.pos - start).T) > 0.1).mean(), 0.9)
+            self.assertLess(crowd.pos[:, 1].max(), 30.0)
+            crowd.stop()
+        except: # pylint: disable=bare-except
+            traceback.print_exc(file=sys.stdout)
+            self.fail("Test failed due to exception")
+
+    def test_actor_poses(self):
+        """
+        Tests that every published pose of the crowd is also published by the actor of
+        the human.
+        """
+        try:
+            crowd = CrowdEngine(self.namespace, self.map, self.resolution)
+            actor = _Actor()
+            crowd.add_walker("h1", 2.0, 5.0, [{'x': 10.0, 'y': 5.0}], 1.0, actor = actor)
+            for _ in range(3):
+                crowd.step(0.1)
+                crowd.publish()
+            self.assertEqual(len(actor.poses), 3)
+            self.assertEqual(actor.poses[-1], (crowd.pos[0, 0], crowd.pos[0, 1], crowd.theta[0]))
+            self.assertGreater(actor.poses[-1][0], 2.0)
+            crowd.stop()
+        except: # pylint: disable=bare-except
+            traceback.print_exc(file=sys.stdout)
+            self.fail("Test failed due to exception")
+
+    def tearDown(self):
+        self.cfact.stop()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+"""
+Test to check the TF declaration of the things
+"""
+
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import unittest
+import sys
+import traceback
+
+from stream_simulator.base_classes import BaseThing
+
+class Test(unittest.TestCase):
+    """
+    Test class for the TF declaration of the things, batched or not.
+    Methods:
+        setUp(): Creates a thing with a client recording its declarations.
+        test_direct(): Tests that a thing declares itself when not batched.
+        test_batched(): Tests that a batched thing keeps its declaration for its owner.
+    """
+    def setUp(self):
+        self.calls = []
+        self.thing = BaseThing("test_declare_tf", auto_start = False)
+        self.thing.tf_declare_rpc = type("Client", (), {"call": \
+            lambda _, msg: self.calls.append(msg)})()
+        self.package = {"type": "env", "name": "test_declare_tf"}
+
+    def test_direct(self):
+        """
+        Declares a thing built without tf_batch_declare.
+        """
+        try:
+            self.thing.declare_tf(self.package)
+            self.assertEqual(self.calls, [self.package])
+            self.assertIsNone(self.thing.tf_declaration)
+
+        except: # pylint: disable=bare-except
+            traceback.print_exc(file=sys.stdout)
+            self.fail("Test failed due to exception")
+
+    def test_batched(self):
+        """
+        Declares a thing whose owner batches the declarations.
+        """
+        try:
+            self.thing.tf_batch_declare = True
+            self.thing.declare_tf(self.package)
+            self.assertEqual(self.calls, [])
+            self.assertEqual(self.thing.tf_declaration, self.package)
+
+        except: # pylint: disable=bare-except
+            traceback.print_exc(file=sys.stdout)
+            self.fail("Test failed due to exception")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+"""
+Test to check the shared memory frame transport
+"""
+
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import unittest
+import sys
+import traceback
+
+import numpy as np
+
+from stream_simulator.connectivity import FrameRing, FrameRingReader, ring_name
+
+class Test(unittest.TestCase):
+    """
+    Test class for testing the shared memory frame ring.
+    Methods:
+        setUp(): Creates a ring of two slots and attaches a reader to it.
+        test_frames(): Tests that the frames are read back zero-copy and copied.
+        test_overwrite(): Tests that overwritten frames are detected.
+        tearDown(): Detaches the reader and removes the ring.
+    """
+    def setUp(self):
+        self.ring = FrameRing(ring_name("streamsim.testinguid.test_frame_ring"), 4 * 5 * 3, 2)
+        self.reader = FrameRingReader(self.ring.name)
+
+    def test_frames(self):
+        """
+        Writes a frame and reads it back through its descriptor.
+        """
+        try:
+            image = np.arange(60, dtype = np.uint8).reshape(4, 5, 3)
+            descriptor = self.ring.write(image, timestamp = 1.0)
+            self.assertEqual(descriptor['shape'], [4, 5, 3])
+            self.assertEqual(descriptor['timestamp'], 1.0)
+
+            view = self.reader.frame(descriptor)
+            self.assertTrue(np.array_equal(view, image))
+            self.assertTrue(self.reader.valid(descriptor))
+            del view
+
+            copy = self.reader.frame(descriptor, copy = True)
+            self.assertTrue(np.array_equal(copy, image))
+
+            with self.assertRaises(ValueError):
+                self.ring.write(np.zeros((10, 10, 3), np.uint8))
+
+        except: # pylint: disable=bare-except
+            traceback.print_exc(file=sys.stdout)
+            self.fail("Test failed due to exception")
+
+    def test_overwrite(self):
+        """
+        Checks that a frame overwritten by newer ones is not returned.
+        """
+        try:
+            first = self.ring.write(np.zeros((4, 5, 3), np.uint8))
+            self.ring.write(np.ones((4, 5, 3), np.uint8))
+            self.assertTrue(self.reader.valid(first))
+            last = self.ring.write(np.full((4, 5, 3), 2, np.uint8))
+            self.assertFalse(self.reader.valid(first))
+            self.assertIsNone(self.reader.frame(first))
+            self.assertEqual(int(self.reader.frame(last, copy = True)[0, 0, 0]), 2)
+
+        except: # pylint: disable=bare-except
+            traceback.print_exc(file=sys.stdout)
+            self.fail("Test failed due to exception")
+
+    def tearDown(self):
+        """
+        Tear down method for cleaning up after each test case.
+        """
+        self.reader.close()
+        self.ring.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+"""
+Test to check the motion the IMUs read from the kinematics of the robots
+"""
+
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import unittest
+import sys
+import math
+import traceback
+
+from stream_simulator.base_classes import KinematicsState
+
+class Test(unittest.TestCase):
+    """
+    Test class for testing the velocities and accelerations derived from the poses.
+    Methods:
+        setUp(): Creates the kinematics state of a robot.
+        integrate(linear, angular, steps): Steps the robot as its kinematics loop does.
+        test_straight(): Tests the acceleration of a robot speeding up on a line.
+        test_circle(): Tests the angular velocity and the centripetal acceleration.
+        test_rest(): Tests the readings after a teleport and when the loop stops.
+    """
+    def setUp(self):
+        self.kinematics = KinematicsState(1.0, 2.0, 0.5)
+        self.t = 1000.0
+        self.pose = [1.0, 2.0, 0.5]
+        self.dt = 0.1
+
+    def integrate(self, linear, angular, steps):
+        """
+        Integrates constant velocities for some steps of 0.1 sec.
+        """
+        x, y, theta = self.pose
+        for _ in range(steps):
+            if angular == 0:
+                x += linear * self.dt * math.cos(theta)
+                y += linear * self.dt * math.sin(theta)
+            else:
+                arc = linear / angular
+                x += - arc * math.sin(theta) + arc * math.sin(theta + self.dt * angular)
+                y -= - arc * math.cos(theta) + arc * math.cos(theta + self.dt * angular)
+            theta += angular * self.dt
+            self.t += self.dt
+            self.kinematics.record(self.t, x, y, theta)
+        self.pose = [x, y, theta]
+        return self.kinematics.reading(self.t)
+
+    def test_straight(self):
+        """
+        Speeds up from 0 to 0.5 m/s in 1 sec.
+        """
+        try:
+            reading = self.integrate(0, 0, 2)
+            self.assertEqual(reading["acceleration"], (0, 0))
+            for k in range(1, 11):
+                reading = self.integrate(0.05 * k, 0, 1)
+                self.assertAlmostEqual(reading["acceleration"][0], 0.5, places = 6)
+                self.assertAlmostEqual(reading["acceleration"][1], 0.0, places = 6)
+            self.assertAlmostEqual(reading["linear"], 0.5, places = 6)
+            reading = self.integrate(0.5, 0, 3)
+            self.assertAlmostEqual(reading["acceleration"][0], 0.0, places = 6)
+
+        except: # pylint: disable=bare-except
+            traceback.print_exc(file=sys.stdout)
+            self.fail("Test failed due to exception")
+
+    def test_circle(self):
+        """
+        Drives on a circle of 1 m radius at 0.5 m/s.
+        """
+        try:
+            self.integrate(0.5, 0.5, 1)
+            reading = self.integrate(0.5, 0.5, 20)
+            self.assertAlmostEqual(reading["angular"], 0.5, places = 6)
+            self.assertAlmostEqual(reading["linear"], 0.5, places = 2)
+            # v^2 / r to the left, no forward acceleration
+            self.assertAlmostEqual(reading["acceleration"][0], 0.0, places = 3)
+            self.assertAlmostEqual(reading["acceleration"][1], 0.25, places = 2)
+
+        except: # pylint: disable=bare-except
+            traceback.print_exc(file=sys.stdout)
+            self.fail("Test failed due to exception")
+
+    def test_rest(self):
+        """
+        Teleports a moving robot and stops its kinematics loop.
+        """
+        try:
+            self.integrate(0.5, 0.2, 5)
+            self.kinematics.reset(10.0, 10.0, 0.0)
+            self.pose = [10.0, 10.0, 0.0]
+            reading = self.integrate(0, 0, 1)
+            self.assertEqual((reading["linear"], reading["angular"]), (0, 0))
+            self.assertEqual(reading["acceleration"], (0, 0))
+
+            self.integrate(0.5, 0.2, 5)
+            reading = self.kinematics.reading(self.t + 2 * KinematicsState.STALE)
+            self.assertEqual((reading["linear"], reading["angular"]), (0, 0))
+            self.assertAlmostEqual(reading["theta"], 0.1)
+
+        except: # pylint: disable=bare-except
+            traceback.print_exc(file=sys.stdout)
+            self.fail("Test failed due to exception")
+
+if __name__ == '__main__':
+    unittest.main()
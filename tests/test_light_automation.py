@@ -0,0 +1,80 @@
+"""
+Test to check the automation of the environmental lights
+"""
+
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import unittest
+import sys
+import traceback
+import time
+
+from stream_simulator.controllers import EnvLightController
+
+class Test(unittest.TestCase):
+    """
+    Test class for the step program of an automated light.
+    Methods:
+        setUp(): Creates a light with a program of three colors.
+        test_program(): Tests that the light takes the state of each step in turn.
+        tearDown(): Stops the light.
+    """
+    def setUp(self):
+        namespace = "streamsim.testinguid.test_light_automation"
+        conf = {
+            "pose": {"x": 10, "y": 10, "theta": 0},
+            "name": "light_auto",
+            "range": 100,
+            "luminosity": 0,
+            "mode": "simulation",
+            "place": "office",
+            "automation": {
+                "loop": False,
+                "reverse": False,
+                "steps": [
+                    {"state": {"luminosity": 100, "r": 255, "g": 0, "b": 0}, "duration": 0.5},
+                    {"state": {"luminosity": 100, "r": 0, "g": 255, "b": 0}, "duration": 0.5},
+                    {"state": {"luminosity": 50, "r": 255, "g": 100, "b": 100}, "duration": 0.5},
+                ]
+            }
+        }
+        package = {
+            "logger": None,
+            "namespace": namespace,
+            "base": "world",
+            "tf_declare_rpc_topic": f"{namespace}.tf.declare",
+            "tf_batch_declare": True,
+            "tf_distance_calculator_rpc_topic": f"{namespace}.tf.distance_calculator",
+            "tf_affection_rpc_topic": f"{namespace}.tf.get_affections",
+        }
+        self.light = EnvLightController(conf = conf, package = package)
+
+    def test_program(self):
+        """
+        Follows the colors and the luminosity of the light along its program.
+        """
+        try:
+            time.sleep(0.25)
+            self.assertEqual(self.light.luminosity, 100)
+            self.assertEqual((self.light.color['r'], self.light.color['g']), (255, 0))
+            time.sleep(0.5)
+            self.assertEqual((self.light.color['r'], self.light.color['g']), (0, 255))
+            time.sleep(0.5)
+            self.assertEqual(self.light.luminosity, 50)
+            self.assertEqual(self.light.color['a'], 50 * 255.0 / 100.0)
+            self.assertEqual((self.light.color['r'], self.light.color['g'], \
+                self.light.color['b']), (255, 100, 100))
+
+        except: # pylint: disable=bare-except
+            traceback.print_exc(file=sys.stdout)
+            self.fail("Test failed due to exception")
+
+    def tearDown(self):
+        """
+        Tear down method for cleaning up after each test case.
+        """
+        self.light.stop()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+"""
+Test to check the linear alarms against the steps of the robots
+"""
+
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import unittest
+import sys
+import time
+import traceback
+
+from stream_simulator.transformations import TfController, SegmentIndex
+
+class Test(unittest.TestCase):
+    """
+    Test class for testing the swept linear alarms of the tf controller.
+    Methods:
+        setUp(): Creates a tf controller with two linear alarms.
+        step(name, a, b): Sweeps a robot step against the alarms.
+        test_crossings(): Tests the crossings between two checks of the alarms.
+        test_index(): Tests the segments found near a step.
+    """
+    def setUp(self):
+        self.tf = TfController()
+        self.tf.lin_alarms_index.add("beam", (5.0, 0.0), (5.0, 4.0))
+        self.tf.lin_alarms_index.add("far_beam", (50.0, 0.0), (50.0, 4.0))
+
+    def step(self, name, a, b):
+        """
+        Sweeps a step of a robot from a to b.
+        """
+        self.tf.sweep_linear_alarms(name, {'x': a[0], 'y': a[1]}, {'x': b[0], 'y': b[1]})
+
+    def test_crossings(self):
+        """
+        Crosses the beam forth and back between two checks, and passes by it.
+        """
+        try:
+            self.step("r1", (4.0, 2.0), (4.9, 2.0))
+            self.assertEqual(self.tf.handle_linear_alarm("beam"), {})
+            # A fast robot crosses it and returns within the same sampling period
+            self.step("r1", (4.9, 2.0), (5.5, 2.0))
+            self.step("r1", (5.5, 2.0), (4.5, 2.0))
+            self.step("r2", (4.0, 5.0), (6.0, 5.0))
+            self.assertEqual(self.tf.handle_linear_alarm("beam"), {"r1": True})
+            # Reported once
+            self.assertEqual(self.tf.handle_linear_alarm("beam"), {})
+            self.assertEqual(self.tf.handle_linear_alarm("far_beam"), {})
+
+            start = time.time()
+            for k in range(10000):
+                self.step("r1", (10.0 + k * 0.001, 2.0), (10.001 + k * 0.001, 2.0))
+            self.assertLess(time.time() - start, 1.0)
+
+        except: # pylint: disable=bare-except
+            traceback.print_exc(file=sys.stdout)
+            self.fail("Test failed due to exception")
+
+    def test_index(self):
+        """
+        Queries the segments near some steps.
+        """
+        try:
+            index = SegmentIndex(cell_size = 2.0)
+            index.add("a", (0.0, 0.0), (10.0, 0.0))
+            index.add("b", (20.0, 20.0), (21.0, 25.0))
+            self.assertEqual(index.query((5.0, -1.0), (5.0, 1.0)), {"a"})
+            self.assertEqual(index.query((20.5, 22.0), (20.7, 22.0)), {"b"})
+            self.assertEqual(index.query((40.0, 40.0), (41.0, 40.0)), set())
+            index.remove("a")
+            self.assertEqual(index.query((5.0, -1.0), (5.0, 1.0)), set())
+            self.assertEqual(len(index), 1)
+
+        except: # pylint: disable=bare-except
+            traceback.print_exc(file=sys.stdout)
+            self.fail("Test failed due to exception")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+"""
+Test to check the mock signals of the sensors
+"""
+
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import unittest
+import sys
+import math
+import time
+import traceback
+
+from stream_simulator.base_classes import MockSignals
+
+class Test(unittest.TestCase):
+    """
+    Test class for testing the vectorized mock signals.
+    Methods:
+        setUp(): Creates a bank of signals.
+        test_operations(): Tests the values of every operation.
+        test_scheduled(): Tests the rate of the signals handed to callbacks.
+        test_large_bank(): Tests the values of 10000 signals in one call.
+    """
+    def setUp(self):
+        self.signals = MockSignals()
+
+    def test_operations(self):
+        """
+        Computes the values of one signal per operation together.
+        """
+        try:
+            ids = [
+                self.signals.add("constant", {"value": 3}),
+                self.signals.add("random", {"min": 10, "max": 20}),
+                self.signals.add("normal", {"mean": 5, "std": 0.1}),
+                self.signals.add("triangle", {"min": 0, "max": 2, "step": 1}),
+                self.signals.add("sinus", {"dc": 1, "amplitude": 2, "step": math.pi / 2}),
+            ]
+            rows = [self.signals.values(ids).tolist() for _ in range(6)]
+            constant, rand, normal, triangle, sinus = zip(*rows)
+            self.assertEqual(constant, (3,) * 6)
+            self.assertTrue(all(10 <= v <= 20 for v in rand))
+            self.assertTrue(all(abs(v - 5) < 1 for v in normal))
+            self.assertEqual(triangle, (1, 2, 1, 0, 1, 2))
+            for v, expected in zip(sinus, [1, 3, 1, -1, 1, 3]):
+                self.assertAlmostEqual(v, expected)
+
+            # A new operation starts over
+            self.signals.set_operation(ids[3], "triangle", {"min": 5, "max": 7, "step": 1})
+            self.assertEqual(self.signals.values([ids[3]]).tolist(), [6])
+            with self.assertRaises(ValueError):
+                self.signals.add("square", {})
+            with self.assertRaises(KeyError):
+                self.signals.add("random", {"min": 1})
+
+        except: # pylint: disable=bare-except
+            traceback.print_exc(file=sys.stdout)
+            self.fail("Test failed due to exception")
+
+    def test_scheduled(self):
+        """
+        Hands the values of two signals to callbacks at their rates, until removed.
+        """
+        try:
+            slow, fast = [], []
+            self.signals.add("constant", {"value": 1}, hz = 10, callback = slow.append)
+            sid = self.signals.add("constant", {"value": 2}, hz = 40, callback = fast.append)
+            time.sleep(1.02)
+            self.assertIn(len(slow), (9, 10, 11))
+            self.assertTrue(38 <= len(fast) <= 42, len(fast))
+            self.assertEqual(set(slow), {1})
+
+            self.signals.remove(sid)
+            count = len(fast)
+            time.sleep(0.2)
+            self.assertEqual(len(fast), count)
+
+        except: # pylint: disable=bare-except
+            traceback.print_exc(file=sys.stdout)
+            self.fail("Test failed due to exception")
+
+    def test_large_bank(self):
+        """
+        Computes the values of 10000 signals of mixed operations.
+        """
+        try:
+            parameters = {
+                "constant": {"value": 1},
+                "random": {"min": 0, "max": 1},
+                "normal": {"mean": 0, "std": 1},
+                "triangle": {"min": 0, "max": 10, "step": 0.5},
+                "sinus": {"dc": 0, "amplitude": 1, "step": 0.1},
+            }
+            operations = list(parameters)
+            ids = [self.signals.add(operations[k % 5], parameters[operations[k % 5]], \
+                noise = 0.1) for k in range(10000)]
+            for _ in range(10):
+                values = self.signals.values(ids)
+            self.assertEqual(len(values), 10000)
+            # 2000 signals per operation, their mean is close to the one of the operation
+            self.assertAlmostEqual(values[0::5].mean(), 1.0, delta = 0.05)
+            self.assertAlmostEqual(values[1::5].mean(), 0.5, delta = 0.05)
+            self.assertAlmostEqual(values[2::5].mean(), 0.0, delta = 0.1)
+            # The ramps and the sinus advanced by 10 steps
+            self.assertAlmostEqual(values[3::5].mean(), 5.0, delta = 0.05)
+            self.assertAlmostEqual(values[4::5].mean(), math.sin(0.9), delta = 0.05)
+
+        except: # pylint: disable=bare-except
+            traceback.print_exc(file=sys.stdout)
+            self.fail("Test failed due to exception")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+"""
+Test to check the global path planner of the robots
+"""
+
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import unittest
+import sys
+import traceback
+
+import numpy as np
+
+from stream_simulator.transformations import PathPlanner
+
+class Test(unittest.TestCase):
+    """
+    Test class for testing the path planner.
+    Methods:
+        setUp(): Creates a 1000x1000 map with a row of walls, each with a door.
+        test_plan(): Tests that the path goes through the doors without crossing walls.
+        test_unreachable(): Tests that a goal behind a closed wall is reported.
+        test_narrow_doors(): Tests the doors narrower than two blocks at every offset.
+        test_cache(): Tests that the costmap and the plans are reused.
+    """
+    def setUp(self):
+        self.map = np.zeros((1000, 1000))
+        self.doors = {}
+        for k, x in enumerate(range(100, 1000, 100)):
+            self.map[x, :] = 1
+            door = 50 + (k * 370) % 850
+            self.map[x, door:door + 15] = 0
+            self.doors[x] = door
+        self.planner = PathPlanner(self.map, 0.1)
+
+    def test_plan(self):
+        """
+        Plans a path across all the walls.
+        """
+        try:
+            waypoints = self.planner.plan((5.0, 5.0), (95.0, 95.0))
+
+            self.assertEqual(waypoints[-1], (95.0, 95.0))
+            points = [(5.0, 5.0)] + waypoints
+            for p, q in zip(points, points[1:]):
+                self.assertTrue(self.planner._visible(p, q, self.planner.walls)) # pylint: disable=protected-access
+            # The robot keeps clear of the walls after the start
+            for p, q in zip(points[1:], points[2:]):
+                self.assertTrue(self.planner._visible(p, q, self.planner.inflated)) # pylint: disable=protected-access
+
+        except: # pylint: disable=bare-except
+            traceback.print_exc(file=sys.stdout)
+            self.fail("Test failed due to exception")
+
+    def test_unreachable(self):
+        """
+        Closes a door and plans to the other side.
+        """
+        try:
+            closed = self.map.copy()
+            closed[500, :] = 1
+            planner = PathPlanner(closed, 0.1)
+            self.assertIsNone(planner.plan((5.0, 5.0), (95.0, 95.0)))
+            # The failures are not cached
+            self.assertEqual(len(planner.paths), 0)
+            self.assertIsNotNone(planner.plan((5.0, 5.0), (45.0, 95.0)))
+            # Out of the map
+            self.assertIsNone(planner.plan((5.0, 5.0), (150.0, 5.0)))
+
+        except: # pylint: disable=bare-except
+            traceback.print_exc(file=sys.stdout)
+            self.fail("Test failed due to exception")
+
+    def test_narrow_doors(self):
+        """
+        Plans through a door of 0.8 m to 1.2 m at every offset in the blocks of the graph.
+        """
+        try:
+            for width in (8, 10, 12):
+                for offset in range(8):
+                    walls = np.zeros((1000, 1000))
+                    walls[500, :] = 1
+                    walls[500, 400 + offset:400 + offset + width] = 0
+                    planner = PathPlanner(walls, 0.1)
+                    self.assertEqual(planner.block, 8)
+                    waypoints = planner.plan((10.0, 10.0), (90.0, 90.0))
+                    self.assertIsNotNone(waypoints, f"door {width} at {offset}")
+                    points = [(10.0, 10.0)] + waypoints
+                    for p, q in zip(points, points[1:]):
+                        self.assertTrue(planner._visible(p, q, planner.inflated)) # pylint: disable=protected-access
+
+        except: # pylint: disable=bare-except
+            traceback.print_exc(file=sys.stdout)
+            self.fail("Test failed due to exception")
+
+    def test_cache(self):
+        """
+        Gets the planner of a map twice and plans twice between the same cells.
+        """
+        try:
+            planner = PathPlanner.for_map(self.map, 0.1)
+            self.assertIs(PathPlanner.for_map(self.map, 0.1), planner)
+            self.assertIsNot(PathPlanner.for_map(self.map.copy(), 0.1), planner)
+
+            first = planner.plan((5.0, 5.0), (95.0, 95.0))
+            self.assertEqual(len(planner.paths), 1)
+            second = planner.plan((5.01, 5.01), (95.0, 95.0))
+            self.assertEqual(len(planner.paths), 1)
+            self.assertEqual(first, second)
+
+            # Another start in the same block is shortened from itself
+            third = planner.plan((5.4, 5.0), (95.0, 95.0))
+            self.assertEqual(len(planner.paths), 1)
+            points = [(5.4, 5.0)] + third
+            for p, q in zip(points, points[1:]):
+                self.assertTrue(planner._visible(p, q, planner.walls)) # pylint: disable=protected-access
+
+
+        except: # pylint: disable=bare-except
+            traceback.print_exc(file=sys.stdout)
+            self.fail("Test failed due to exception")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+"""
+Test to check the pose history of the robots and the actors
+"""
+
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import unittest
+import sys
+import math
+import time
+import traceback
+
+from stream_simulator.connectivity import CommlibFactory
+from stream_simulator.transformations import PoseHistory
+
+class Test(unittest.TestCase):
+    """
+    Test class for testing the pose history and its RPCs.
+    Methods:
+        setUp(): Creates a pose history and the RPC clients of the simulator.
+        test_interpolation(): Tests the poses between and after the samples.
+        test_bounded(): Tests the ring of samples and the entities at rest.
+        test_teleport(): Tests that the poses are not interpolated across a jump.
+        test_rpcs(): Tests the get_poses_at and get_trajectory RPCs.
+        tearDown(): Stops the factory.
+    """
+    def setUp(self):
+        self.history = PoseHistory(capacity = 16)
+        self.cfact = CommlibFactory(node_name = "Test")
+        sim_name = "streamsim.testinguid"
+        self.poses_at_rpc = self.cfact.get_rpc_client(
+            rpc_name = f"{sim_name}.tf.get_poses_at",
+            auto_run = False
+        )
+        self.trajectory_rpc = self.cfact.get_rpc_client(
+            rpc_name = f"{sim_name}.tf.get_trajectory",
+            auto_run = False
+        )
+        self.cfact.run()
+
+    def test_interpolation(self):
+        """
+        Interpolates the poses of a robot turning through pi.
+        """
+        try:
+            self.history.record("r", 10.0, 0.0, 0.0, 3.0)
+            self.history.record("r", 11.0, 1.0, 2.0, 3.0 + 2 * (math.pi - 3.0) - 2 * math.pi)
+            self.assertIsNone(self.history.pose_at("r", 9.0))
+            self.assertIsNone(self.history.pose_at("other", 10.0))
+            pose = self.history.pose_at("r", 10.5)
+            self.assertAlmostEqual(pose["x"], 0.5)
+            self.assertAlmostEqual(pose["y"], 1.0)
+            # Through pi, not back through 0
+            self.assertAlmostEqual(pose["theta"], math.pi)
+            self.assertEqual(self.history.pose_at("r", 20.0)["x"], 1.0)
+
+            self.history.record("h", 10.5, 5.0, 5.0, 0.0)
+            self.assertEqual(list(self.history.poses_at(10.25)), ["r"])
+            self.assertEqual(sorted(self.history.poses_at(10.75)), ["h", "r"])
+
+            trajectory = self.history.trajectory("r", 10.25, 12.0)
+            self.assertEqual([p["t"] for p in trajectory], [10.25, 11.0, 12.0])
+            self.assertAlmostEqual(trajectory[0]["x"], 0.25)
+
+        except: # pylint: disable=bare-except
+            traceback.print_exc(file=sys.stdout)
+            self.fail("Test failed due to exception")
+
+    def test_teleport(self):
+        """
+        Moves a robot, puts it back to its start at once and moves it again.
+        """
+        try:
+            self.history.record("r", 10.0, 0.0, 0.0, 0.0)
+            self.history.record("r", 11.0, 1.0, 0.0, 0.0)
+            self.history.record("r", 13.0, 5.0, 5.0, 1.0, teleport = True)
+            self.history.record("r", 14.0, 6.0, 5.0, 1.0)
+            # At its last pose until the jump, not on the way to the new one
+            self.assertEqual(self.history.pose_at("r", 12.0), {"x": 1.0, "y": 0.0, "theta": 0.0})
+            self.assertEqual(self.history.pose_at("r", 13.0), {"x": 5.0, "y": 5.0, "theta": 1.0})
+            self.assertAlmostEqual(self.history.pose_at("r", 13.5)["x"], 5.5)
+
+            trajectory = self.history.trajectory("r", 10.5, 13.5)
+            self.assertEqual([(p["t"], p["x"]) for p in trajectory],
+                             [(10.5, 0.5), (11.0, 1.0), (13.0, 1.0), (13.0, 5.0), (13.5, 5.5)])
+
+            # The first pose of an entity is not a jump
+            self.history.record("h", 10.0, 2.0, 2.0, 0.0, teleport = True)
+            self.assertEqual(len(self.history.trajectory("h", 9.0, 11.0)), 2)
+
+        except: # pylint: disable=bare-except
+            traceback.print_exc(file=sys.stdout)
+            self.fail("Test failed due to exception")
+
+    def test_bounded(self):
+        """
+        Records more samples than the capacity, and a long rest.
+        """
+        try:
+            for k in range(40):
+                self.history.record("r", float(k), float(k), 0.0, 0.0)
+            # Only the last 16 samples are kept
+            self.assertIsNone(self.history.pose_at("r", 23.5))
+            self.assertAlmostEqual(self.history.pose_at("r", 24.5)["x"], 24.5)
+
+            for k in range(40, 100):
+                self.history.record("r", float(k), 39.0, 0.0, 0.0)
+            self.history.record("r", 100.0, 40.0, 0.0, 0.0)
+            # The rest is one sample, the motion before it is still there
+            self.assertAlmostEqual(self.history.pose_at("r", 38.5)["x"], 38.5)
+            self.assertEqual(self.history.pose_at("r", 70.0)["x"], 39.0)
+            self.assertAlmostEqual(self.history.pose_at("r", 99.5)["x"], 39.5)
+            self.assertEqual(self.history.times.shape[1], 16)
+
+        except: # pylint: disable=bare-except
+            traceback.print_exc(file=sys.stdout)
+            self.fail("Test failed due to exception")
+
+    def test_rpcs(self):
+        """
+        Gets the poses of the simulated robots and the trajectory of one of them.
+        """
+        try:
+            time.sleep(0.5)
+            res = self.poses_at_rpc.call({"t": time.time()}, timeout = 5)
+            self.assertIn("robot_1", res["poses"])
+            self.assertEqual(sorted(res["poses"]["robot_1"]), ["theta", "x", "y"])
+
+            res = self.trajectory_rpc.call({
+                "name": "robot_1",
+                "t0": time.time() - 1.0,
+            }, timeout = 5)
+            self.assertEqual(res["name"], "robot_1")
+            self.assertGreaterEqual(len(res["trajectory"]), 2)
+            times = [p["t"] for p in res["trajectory"]]
+            self.assertEqual(times, sorted(times))
+
+        except: # pylint: disable=bare-except
+            traceback.print_exc(file=sys.stdout)
+            self.fail("Test failed due to exception")
+
+    def tearDown(self):
+        """
+        Tear down method for cleaning up after each test case.
+        """
+        self.cfact.stop()
+
+if __name__ == '__main__':
+    unittest.main()
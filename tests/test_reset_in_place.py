@@ -0,0 +1,102 @@
+"""
+Test to check the in-place reset of the simulation
+"""
+
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import unittest
+import sys
+import traceback
+import time
+
+from stream_simulator.connectivity import CommlibFactory
+
+class Test(unittest.TestCase):
+    """
+    Test class for the in-place reset of the simulation.
+    Methods:
+        setUp(): Creates the reset, teleport and thermostat clients and the robot pose
+                 subscriber, and runs the factory.
+        test_reset(): Moves the robot and sets the thermostat, then checks that the
+                      reset restores both while the controllers keep running.
+        tearDown(): Cleans up the test environment by stopping the factory.
+    """
+    def setUp(self):
+        self.cfact = CommlibFactory(node_name = "Test")
+        sim_name = "streamsim.testinguid"
+        thermostat = f"{sim_name}.world.office.actuator.env.thermostat.thermostat_env"
+        self.pose = None
+
+        self.reset_rpc = self.cfact.get_rpc_client(
+            rpc_name = f"{sim_name}.reset_in_place",
+            auto_run = False
+        )
+        self.teleport_rpc = self.cfact.get_rpc_client(
+            rpc_name = f"{sim_name}.robot_1.teleport",
+            auto_run = False
+        )
+        self.thermostat_set_pub = self.cfact.get_publisher(
+            topic = f"{thermostat}.set",
+            auto_run = False
+        )
+        self.thermostat_get_rpc = self.cfact.get_rpc_client(
+            rpc_name = f"{thermostat}.get",
+            auto_run = False
+        )
+        self.cfact.get_subscriber(
+            topic = f"{sim_name}.robot_1.pose.internal",
+            callback = self.robot_pose_callback,
+            auto_run = False
+        )
+
+        self.cfact.run(wait=2.0)
+
+    def test_reset(self):
+        """
+        Test the `reset_in_place` RPC.
+        This test performs the following steps:
+        1. Teleports the robot and sets the temperature of the thermostat.
+        2. Calls the reset RPC and asserts that it succeeded within a second.
+        3. Asserts that the robot is back at its starting pose once the RPC returns,
+            and the thermostat at its initial temperature, with the same controllers
+            answering.
+        """
+        try:
+            self.teleport_rpc.call({'x': 30.0, 'y': 35.0, 'theta': 1.0})
+            self.thermostat_set_pub.publish({'temperature': 35})
+            time.sleep(1)
+            self.assertAlmostEqual(self.pose['x'], 30.0, places = 1)
+            self.assertEqual(self.thermostat_get_rpc.call({})['temperature'], 35)
+
+            res = self.reset_rpc.call({})
+            self.assertTrue(res['success'])
+            self.assertLess(res['duration'], 1.0)
+            # The pose is applied before the RPC returns, only its message is awaited
+            time.sleep(0.1)
+
+            self.assertAlmostEqual(self.pose['x'], 50.0, places = 1)
+            self.assertAlmostEqual(self.pose['y'], 50.0, places = 1)
+            self.assertAlmostEqual(self.pose['theta'], 0.0, places = 2)
+            self.assertEqual(self.thermostat_get_rpc.call({})['temperature'], 0)
+
+        except: # pylint: disable=bare-except
+            traceback.print_exc(file=sys.stdout)
+            self.fail("Test failed due to exception")
+
+    def robot_pose_callback(self, pose):
+        """
+        Callback function to handle robot pose updates.
+        Args:
+            pose (dict): The updated pose of the robot.
+        """
+        self.pose = pose
+
+    def tearDown(self):
+        """
+        Tear down method for cleaning up after each test case.
+        """
+        self.cfact.stop()
+
+if __name__ == '__main__':
+    unittest.main()
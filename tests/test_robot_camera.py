@@ -0,0 +1,181 @@
+"""
+Test to check the generation of the camera frames
+"""
+
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import unittest
+import sys
+import traceback
+import time
+import base64
+
+import numpy as np
+import cv2
+
+from stream_simulator.controllers.camera_frames import FrameCache, affection_frame, file_frame, \
+    sprite, video_source, affection_image, RAW_CACHE
+from stream_simulator.controllers.camera_render import CameraRenderer
+from stream_simulator.controllers.video_sources import VideoSources
+
+def decode(frame):
+    """
+    Decodes a base64 encoded frame to an image.
+    """
+    data = np.frombuffer(base64.b64decode(frame), np.uint8)
+    return cv2.imdecode(data, cv2.IMREAD_COLOR) # pylint: disable=no-member
+
+class Test(unittest.TestCase):
+    """
+    Test class for testing the camera frames.
+    Methods:
+        test_frame_cache(): Tests that frames are built once and evicted in LRU order.
+        test_affection_frames(): Tests that the generated frames decode to the expected images.
+        test_render_perspective(): Tests the ray cast walls and the actor sprites.
+        test_render_topdown(): Tests the top-down frames.
+        test_video_frames(): Tests that video actors are decoded once for all cameras.
+    """
+    def test_frame_cache(self):
+        """
+        Checks that the same key is built only once and that the least recently
+        used frames are dropped.
+        """
+        try:
+            cache = FrameCache(maxsize = 2)
+            builds = []
+            def builder():
+                builds.append(1)
+                return "frame"
+
+            self.assertEqual(cache.get(("qr", "a", None, None), builder), "frame")
+            self.assertEqual(cache.get(("qr", "a", None, None), builder), "frame")
+            self.assertEqual(len(builds), 1)
+            self.assertEqual(cache.hits, 1)
+
+            cache.get(("qr", "b", None, None), builder)
+            cache.get(("qr", "c", None, None), builder)
+            self.assertNotIn(("qr", "a", None, None), cache.frames)
+
+        except: # pylint: disable=bare-except
+            traceback.print_exc(file=sys.stdout)
+            self.fail("Test failed due to exception")
+
+    def test_affection_frames(self):
+        """
+        Checks the frames generated for the supported affections.
+        """
+        try:
+            frame = affection_frame("color", {"r": 255, "g": 0, "b": 0}, 32, 16)
+            self.assertIs(frame, affection_frame("color", {"r": 255, "g": 0, "b": 0}, 32, 16))
+            image = decode(frame)
+            self.assertEqual(image.shape, (16, 32, 3))
+            self.assertEqual(list(image[0, 0]), [0, 0, 255])
+
+            self.assertIsNotNone(decode(affection_frame("qr", {"message": "hello"}, 64, 64)))
+            self.assertIsNotNone(decode(affection_frame("text", {"text": "hello"}, 64, 64)))
+            self.assertEqual(affection_frame("unknown", {}, 64, 64), file_frame("all.png"))
+
+        except: # pylint: disable=bare-except
+            traceback.print_exc(file=sys.stdout)
+            self.fail("Test failed due to exception")
+
+    def test_render_perspective(self):
+        """
+        Checks the perspective rendering of a wall 10m ahead and of a color actor.
+        """
+        try:
+            map_ = np.zeros((200, 200))
+            map_[150, :] = 1 # wall at x = 15m
+            renderer = CameraRenderer("perspective", map_, 0.1, 320, 240, 60, 20)
+            pose = {'x': 5.0, 'y': 10.0, 'theta': 0.0}
+
+            depth = renderer.depths(pose)
+            self.assertAlmostEqual(float(depth[len(depth) // 2]), 10.0, delta = 0.3)
+            # Looking away from the wall, the map border is hit instead
+            back = renderer.depths({'x': 5.0, 'y': 10.0, 'theta': np.pi})
+            self.assertAlmostEqual(float(back[len(back) // 2]), 5.0, delta = 0.3)
+
+            affections = {
+                'color_1': {'type': 'color', 'info': {'r': 255, 'g': 0, 'b': 0},
+                            'distance': 3.0, 'actor_ang': 0.0},
+            }
+            image = renderer.render(pose, affections)
+            self.assertEqual(image.shape, (240, 320, 3))
+            self.assertEqual(list(image[120, 160]), [0, 0, 255])
+
+            # An actor behind the wall is hidden
+            affections['color_1']['distance'] = 12.0
+            image = renderer.render(pose, affections)
+            self.assertNotEqual(list(image[120, 160]), [0, 0, 255])
+
+            frame = renderer.render_encoded(pose, affections)
+            self.assertEqual(decode(frame).shape, (240, 320, 3))
+
+        except: # pylint: disable=bare-except
+            traceback.print_exc(file=sys.stdout)
+            self.fail("Test failed due to exception")
+
+    def test_render_topdown(self):
+        """
+        Checks that the top-down frames draw the actors ahead of the camera.
+        """
+        try:
+            renderer = CameraRenderer("topdown", np.zeros((200, 200)), 0.1, 320, 240, 60, 10)
+            affections = {
+                'color_1': {'type': 'color', 'info': {'r': 0, 'g': 255, 'b': 0},
+                            'distance': 5.0, 'actor_ang': 1.0},
+            }
+            image = renderer.render({'x': 10.0, 'y': 10.0, 'theta': 1.0}, affections)
+            self.assertEqual(image.shape, (240, 320, 3))
+            # Straight ahead, half the range up from the camera
+            y = int(renderer.origin[1] - 5.0 / 0.1 * renderer.scale)
+            self.assertEqual(list(image[y, 160]), [0, 255, 0])
+
+            with self.assertRaises(ValueError):
+                CameraRenderer("fisheye", None, 0.1, 320, 240, 60, 10)
+
+        except: # pylint: disable=bare-except
+            traceback.print_exc(file=sys.stdout)
+            self.fail("Test failed due to exception")
+
+    def test_video_frames(self):
+        """
+        Checks that the frames of a video actor are streamed from a shared source.
+        """
+        try:
+            info = {'temperature': 140, 'video': 'flame.avi'}
+            source = video_source('flame.avi')
+            self.assertIs(source, video_source('flame.avi'))
+            self.assertEqual(len(VideoSources.sources), 1)
+
+            frame = decode(affection_frame("fire", info, 64, 48))
+            self.assertEqual(frame.shape, (48, 64, 3))
+            self.assertEqual(sprite("fire", info, 16).shape, (16, 16, 3))
+
+            # The raw frames of the video are not cached, unlike the static ones
+            cached = len(RAW_CACHE.frames)
+            for _ in range(3):
+                self.assertEqual(affection_image("fire", info, 64, 48).shape, (48, 64, 3))
+                time.sleep(0.1)
+            self.assertEqual(len(RAW_CACHE.frames), cached)
+            self.assertEqual(affection_image("human", {}, 64, 48).shape, (48, 64, 3))
+
+            # The playback goes on at the frame rate of the video
+            first, _ = source.frame()
+            time.sleep(0.3)
+            second, _ = source.frame()
+            self.assertGreater(second, first)
+            self.assertLessEqual(len(source.buffer), source.BUFFER_SIZE)
+
+            VideoSources.stop_all()
+            source.thread.join(timeout = 2)
+            self.assertFalse(source.thread.is_alive())
+            self.assertEqual(len(VideoSources.sources), 0)
+
+        except: # pylint: disable=bare-except
+            traceback.print_exc(file=sys.stdout)
+            self.fail("Test failed due to exception")
+
+if __name__ == '__main__':
+    unittest.main()
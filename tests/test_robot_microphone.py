@@ -0,0 +1,247 @@
+"""
+Test to check the audio pipeline of the microphones
+"""
+
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import base64
+import unittest
+import sys
+import traceback
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from stream_simulator.controllers.audio_pipeline import AudioMixer, AcousticMap, load_clip, \
+    attenuation, chunk_plan, record_goal, SAMPLE_RATE, SILENT_CLIP
+
+class _Goal:
+    """
+    A goal handle that keeps the feedback and the result of the goal.
+    """
+    def __init__(self):
+        self.id = "goal"
+        self.cancel_event = threading.Event()
+        self.finished = threading.Event()
+        self.on_cancel = None
+        self.feedback = []
+        self.result = None
+
+    def send_feedback(self, msg):
+        """
+        Keeps the feedback data.
+        """
+        self.feedback.append(msg.feedback_data)
+
+    def finish(self, result):
+        """
+        Keeps the result of the goal.
+        """
+        self.result = result
+        self.finished.set()
+
+    def cancel(self):
+        """
+        Cancels the goal, as the GoalQueue does.
+        """
+        self.cancel_event.set()
+        self.on_cancel()
+
+class Test(unittest.TestCase):
+    """
+    Test class for testing the microphone audio pipeline.
+    Methods:
+        test_clips(): Tests that the WAV resources are decoded once.
+        test_mixer(): Tests the mixing of the sources in range.
+        test_chunk_plan(): Tests the splitting of a recording in fixed-size chunks.
+        test_record_goal(): Tests the streaming of the chunks by the Scheduler, the
+                            requests of the heard sources and the cancellation.
+        test_walls(): Tests the attenuation by the walls crossed.
+        test_many_sources(): Tests the mixing of many sources in one pass.
+    """
+    def test_clips(self):
+        """
+        Checks the decoded clips.
+        """
+        try:
+            clip = load_clip("english_sentence.wav")
+            self.assertIs(clip, load_clip("english_sentence.wav"))
+            self.assertEqual(clip.dtype, np.float32)
+            self.assertFalse(clip.flags.writeable)
+            # 36864 frames at 24kHz
+            self.assertAlmostEqual(len(clip) / SAMPLE_RATE, 1.536, places = 2)
+
+        except: # pylint: disable=bare-except
+            traceback.print_exc(file=sys.stdout)
+            self.fail("Test failed due to exception")
+
+    def test_mixer(self):
+        """
+        Checks the attenuation and the mixing of the heard sources.
+        """
+        try:
+            self.assertEqual(attenuation(0.5, 10), 0.95)
+            self.assertEqual(attenuation(10, 10), 0.0)
+            self.assertGreater(attenuation(2, 10), attenuation(4, 10))
+
+            mixer = AudioMixer()
+            self.assertEqual(list(mixer.sources), [SILENT_CLIP])
+
+            mixer.update({
+                'human_1': {'type': 'human', 'info': {'sound': 1, 'language': 'EN'},
+                            'distance': 0.5, 'range': 10},
+                'human_2': {'type': 'human', 'info': {'sound': 0, 'language': 'EN'},
+                            'distance': 0.5, 'range': 10},
+                'sound_source_4': {'type': 'sound_source', 'info': {'language': 'EL'},
+                                   'distance': 20, 'range': 10},
+            })
+            self.assertEqual(list(mixer.sources), ['human_1'])
+
+            clip = load_clip("english_sentence.wav")
+            out = mixer.mix(len(clip) + 10)
+            self.assertTrue(np.allclose(out[:len(clip)], 0.95 * clip, atol = 1e-6))
+            # The clip loops
+            self.assertTrue(np.allclose(out[len(clip):], 0.95 * clip[:10], atol = 1e-6))
+            self.assertEqual(mixer.sources['human_1']['position'], 10)
+            self.assertEqual(len(mixer.chunk(100)), 200)
+
+        except: # pylint: disable=bare-except
+            traceback.print_exc(file=sys.stdout)
+            self.fail("Test failed due to exception")
+
+    def test_chunk_plan(self):
+        """
+        Checks that a recording is split in fixed-size chunks, heard one after the other.
+        """
+        try:
+            plan = chunk_plan(0.25, 0.1, 100.0)
+            self.assertEqual([c[0] for c in plan], [0, 1, 2])
+            self.assertEqual([c[2] for c in plan], [1600, 1600, 800])
+            for (_, chunk_start, _, due), (start, end) in \
+                    zip(plan, [(100.0, 100.1), (100.1, 100.2), (100.2, 100.25)]):
+                self.assertAlmostEqual(chunk_start, start)
+                self.assertAlmostEqual(due, end)
+            self.assertEqual(chunk_plan(0, 0.1, 100.0), [])
+
+        except: # pylint: disable=bare-except
+            traceback.print_exc(file=sys.stdout)
+            self.fail("Test failed due to exception")
+
+    def test_record_goal(self):
+        """
+        Checks that the Scheduler streams the chunks of a recording in order, asking for
+        the heard sources without waiting for them, and stops at a cancellation.
+        """
+        try:
+            requests = []
+            def request():
+                requests.append(1)
+                future = Future()
+                future.set_result({'affections': {
+                    'human_1': {'type': 'human', 'info': {'sound': 1, 'language': 'EN'},
+                                'distance': 0.5, 'range': 10}
+                }})
+                return future
+
+            goal = _Goal()
+            plan = chunk_plan(0.25, 0.1, time.time())
+            record_goal(goal, AudioMixer(), plan, request = request,
+                        result = lambda: {"chunks": len(plan)})
+            self.assertTrue(goal.finished.wait(2.0))
+            self.assertEqual([f["seq"] for f in goal.feedback], [0, 1, 2])
+            chunks = [base64.b64decode(f["chunk"]) for f in goal.feedback]
+            self.assertEqual([len(c) for c in chunks], [3200, 3200, 1600])
+            self.assertTrue(np.any(np.frombuffer(chunks[0], "<i2")))
+            # Once before the recording, then once before each next chunk
+            self.assertEqual(len(requests), 3)
+            self.assertEqual(goal.result, {"chunks": 3})
+
+            # An unanswered request delays neither the chunks nor the end of the goal
+            requests.clear()
+            goal = _Goal()
+            plan = chunk_plan(0.25, 0.1, time.time())
+            record_goal(goal, AudioMixer(), plan, request = lambda: requests.append(1) or Future())
+            self.assertTrue(goal.finished.wait(2.0))
+            self.assertEqual(len(goal.feedback), 3)
+            self.assertEqual(len(requests), 1)
+
+            goal = _Goal()
+            plan = chunk_plan(10, 0.05, time.time())
+            record_goal(goal, AudioMixer(), plan)
+            for _ in range(100):
+                if len(goal.feedback) >= 2:
+                    break
+                time.sleep(0.01)
+            goal.cancel()
+            self.assertTrue(goal.finished.wait(1.0))
+            streamed = len(goal.feedback)
+            time.sleep(0.2)
+            self.assertEqual(len(goal.feedback), streamed)
+            self.assertLess(streamed, len(plan))
+
+        except: # pylint: disable=bare-except
+            traceback.print_exc(file=sys.stdout)
+            self.fail("Test failed due to exception")
+
+    def test_walls(self):
+        """
+        Checks that the wall cells between a source and the microphone are counted once.
+        """
+        try:
+            map_ = np.zeros((100, 100))
+            map_[50, :] = 1 # wall at x = 5m
+            map_[60:62, :] = 1 # two cells thick wall at x = 6m
+            acoustic = AcousticMap(map_, 0.1)
+            cells = acoustic.wall_cells((2.05, 5.05), [[4.05, 5.05], [5.55, 5.05],
+                                                       [8.05, 5.05], [8.05, 8.05]])
+            self.assertEqual([int(c) for c in cells[:3]], [0, 1, 3])
+            # A diagonal may cross more cells of the thick wall
+            self.assertGreaterEqual(int(cells[3]), 3)
+
+            affections = {
+                'sound_source_4': {'type': 'sound_source', 'info': {'language': 'EN'},
+                                   'distance': 3.0, 'range': 10,
+                                   'position': {'x': 5.05, 'y': 5.05}},
+            }
+            pose = {'x': 2.05, 'y': 5.05, 'theta': 0}
+            free = AudioMixer()
+            free.update(affections, pose)
+            walled = AudioMixer(acoustic)
+            walled.update(affections, pose)
+            self.assertAlmostEqual(walled.sources['sound_source_4']['gain'], \
+                free.sources['sound_source_4']['gain'] * AcousticMap.WALL_LOSS, places = 6)
+
+        except: # pylint: disable=bare-except
+            traceback.print_exc(file=sys.stdout)
+            self.fail("Test failed due to exception")
+
+    def test_many_sources(self):
+        """
+        Checks that the mix of many sources is the sum of their attenuated clips.
+        """
+        try:
+            affections = {}
+            for i in range(40):
+                affections[f"sound_source_{i}"] = {
+                    'type': 'sound_source', 'info': {'language': 'EL' if i % 2 else 'EN'},
+                    'distance': 1.0 + i * 0.5, 'range': 30}
+            mixer = AudioMixer()
+            mixer.update(affections)
+            self.assertEqual(len(mixer.sources), 40)
+
+            out = mixer.mix(1000)
+            en = load_clip("english_sentence.wav")[:1000]
+            el = load_clip("greek_sentence.wav")[:1000]
+            expected = sum(s['gain'] * (el if i % 2 else en) \
+                for i, s in enumerate(mixer.sources.values()))
+            self.assertTrue(np.allclose(out, np.clip(expected, -1, 1), atol = 1e-5))
+
+        except: # pylint: disable=bare-except
+            traceback.print_exc(file=sys.stdout)
+            self.fail("Test failed due to exception")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+"""
+Test to check that the distance and turn goals end at the exact target.
+"""
+
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import unittest
+import sys
+import traceback
+import time
+import math
+
+from stream_simulator.connectivity import CommlibFactory
+
+class Test(unittest.TestCase):
+    """
+    Test class for verifying that the distance and turn goals of the robot complete
+    when the integrated pose reaches the target, independently of the loop jitter.
+    Methods:
+        setUp(): Initializes the test environment, including creating the teleport RPC
+            client, the velocity publisher, the motion action clients and the pose
+            subscriber.
+        test_distance(): Moves the robot by a distance and checks the covered distance.
+        test_turn(): Turns the robot by an angle and checks the covered angle.
+        robot_pose_callback(pose): Callback function to handle robot pose updates.
+        tearDown(): Cleans up after each test case by stopping the communication
+            factory.
+    """
+    def setUp(self):
+        self.cfact = CommlibFactory(node_name = "Test")
+        sim_name = "streamsim.testinguid"
+        motion = f"{sim_name}.robot_1.actuator.motion.twist.skid_steer_robot_1"
+        self.pose = None
+
+        self.teleport_rpc = self.cfact.get_rpc_client(
+            rpc_name = f"{sim_name}.robot_1.teleport",
+            auto_run = False
+        )
+
+        self.velocity_publisher = self.cfact.get_publisher(
+            topic = f"{motion}.set",
+            auto_run = False
+        )
+
+        self.cfact.get_subscriber(
+            topic = f"{sim_name}.robot_1.pose.internal",
+            callback = self.robot_pose_callback,
+            auto_run = False
+        )
+
+        self.move_distance = self.cfact.create_action_client(
+            action_name = f"{motion}.move.distance")
+        self.turn = self.cfact.create_action_client(
+            action_name = f"{motion}.move.turn")
+
+        self.cfact.run()
+
+        # Stop the motion left by the previous tests before teleporting
+        self.velocity_publisher.publish({'linear': 0, 'angular': 0})
+        time.sleep(0.5)
+
+    def test_distance(self):
+        """
+        Teleports the robot to (50, 50, 0), moves it by 1 m at 0.3 m/s (not a multiple
+        of the simulation step) and checks that it stopped at x = 51.
+        """
+        try:
+            self.teleport_rpc.call({'x': 50.0, 'y': 50.0, 'theta': 0})
+            time.sleep(0.5)
+
+            self.move_distance.send_goal({'distance': 1, 'linear': 0.3})
+            result = self.move_distance.get_result(wait = True, wait_max_sec = 10)
+            self.assertEqual(result, {"status": "done"})
+            time.sleep(0.5)
+
+            self.assertAlmostEqual(self.pose['x'], 51.0, delta = 0.002)
+            self.assertAlmostEqual(self.pose['y'], 50.0, delta = 0.002)
+
+        except: # pylint: disable=bare-except
+            traceback.print_exc(file=sys.stdout)
+            self.fail("Test failed due to exception")
+
+    def test_turn(self):
+        """
+        Teleports the robot to (50, 50, 0), turns it by pi/2 at 0.7 rad/s and checks
+        its orientation.
+        """
+        try:
+            self.teleport_rpc.call({'x': 50.0, 'y': 50.0, 'theta': 0})
+            time.sleep(0.5)
+
+            self.turn.send_goal({'angle': math.pi / 2, 'angular': 0.7})
+            result = self.turn.get_result(wait = True, wait_max_sec = 10)
+            self.assertEqual(result, {"status": "done"})
+            time.sleep(0.5)
+
+            self.assertAlmostEqual(self.pose['theta'], math.pi / 2, delta = 0.002)
+            self.assertAlmostEqual(self.pose['x'], 50.0, delta = 0.002)
+
+        except: # pylint: disable=bare-except
+            traceback.print_exc(file=sys.stdout)
+            self.fail("Test failed due to exception")
+
+    def robot_pose_callback(self, pose):
+        """
+        Callback function to handle robot pose updates.
+        Args:
+            pose (dict): The updated pose of the robot.
+        """
+        self.pose = pose
+
+    def tearDown(self):
+        """
+        Tear down method for cleaning up after each test case.
+        """
+        self.cfact.stop()
+
+if __name__ == '__main__':
+    unittest.main()
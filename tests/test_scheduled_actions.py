@@ -0,0 +1,181 @@
+"""
+Test to check the non-blocking action goals and the device goal queues
+"""
+
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import unittest
+import sys
+import threading
+import time
+import traceback
+
+from commlib.action import GoalStatus
+
+from stream_simulator.base_classes import Scheduler, StepAutomation
+from stream_simulator.connectivity import CommlibFactory, GoalQueue
+
+class Test(unittest.TestCase):
+    """
+    Test class for testing the actions driven by the simulation scheduler.
+    Methods:
+        setUp(): Creates two actions sharing a goal queue, as the play and speak
+                 actions of a speaker, and their clients.
+        test_scheduler(): Tests the timers of the scheduler.
+        test_queue(): Tests that the goals of a device are executed one at a time,
+                      in arrival order, without a thread each.
+        test_cancel(): Tests the cancellation of a running and of a queued goal.
+        test_step_automation(): Tests the order and the timing of a step program.
+        tearDown(): Cleans up the test environment by stopping the factory.
+    """
+    def setUp(self):
+        self.cfact = CommlibFactory(node_name = "Test")
+        self.queue = GoalQueue("test_device")
+        self.started = []
+        # Unique names, the servers of the previous tests may still be draining
+        base = f"streamsim.testinguid.test_scheduled.{self.id().split('.')[-1]}"
+        for action in ["first", "second"]:
+            self.cfact.get_action_server(
+                callback = self.on_goal,
+                action_name = f"{base}.{action}",
+                goal_queue = self.queue
+            )
+        self.clients = [
+            self.cfact.create_action_client(action_name = f"{base}.{action}")
+            for action in ["first", "first", "second"]
+        ]
+        self.cfact.run()
+
+    def on_goal(self, goalh):
+        """
+        Runs for goalh.data["duration"] seconds without blocking.
+        """
+        started = time.time()
+        self.started.append((goalh.data["name"], started))
+        Scheduler.run_goal(goalh, [started + goalh.data["duration"]], \
+            result = lambda: {"name": goalh.data["name"], "finished": time.time()})
+
+    def test_scheduler(self):
+        """
+        Checks that the timers fire in order and that cancelled ones do not.
+        """
+        try:
+            fired = []
+            event = threading.Event()
+            now = time.time()
+            Scheduler.call_at(now + 0.2, fired.append, "late")
+            Scheduler.call_at(now + 0.1, fired.append, "early")
+            Scheduler.call_later(0.15, fired.append, "cancelled").cancel()
+            Scheduler.call_at(now + 0.3, event.set)
+            self.assertTrue(event.wait(2))
+            self.assertEqual(fired, ["early", "late"])
+
+        except: # pylint: disable=bare-except
+            traceback.print_exc(file=sys.stdout)
+            self.fail("Test failed due to exception")
+
+    def test_queue(self):
+        """
+        Sends three goals at once to the device, two of them to the same action, and
+        checks that they are executed one after the other.
+        """
+        try:
+            threads = threading.active_count()
+            for i, client in enumerate(self.clients):
+                resp = client.send_goal({"name": f"goal_{i}", "duration": 0.3})
+                self.assertEqual(resp.status, 1)
+            # Waiting goals do not hold threads
+            self.assertLessEqual(threading.active_count(), threads + 2)
+
+            results = [client.get_result(wait = True, wait_max_sec = 5) \
+                for client in self.clients]
+            self.assertEqual([r["name"] for r in results], ["goal_0", "goal_1", "goal_2"])
+            self.assertEqual([s[0] for s in self.started], ["goal_0", "goal_1", "goal_2"])
+            for previous, result in zip(results, results[1:]):
+                self.assertGreaterEqual(result["finished"] - previous["finished"], 0.25)
+            self.assertEqual(len(self.queue), 0)
+
+        except: # pylint: disable=bare-except
+            traceback.print_exc(file=sys.stdout)
+            self.fail("Test failed due to exception")
+
+    def test_cancel(self):
+        """
+        Cancels the running goal and a queued goal.
+        """
+        try:
+            self.clients[0].send_goal({"name": "running", "duration": 5})
+            self.clients[2].send_goal({"name": "queued", "duration": 5})
+            time.sleep(0.2)
+            self.assertEqual(len(self.queue), 2)
+
+            start = time.time()
+            self.clients[2].cancel_goal()
+            self.clients[0].cancel_goal()
+            result = self.clients[0].get_result(wait = True, wait_max_sec = 5)
+            self.assertEqual(result["name"], "running")
+            self.assertLess(time.time() - start, 2)
+            self.assertEqual(self.clients[0].status.status, int(GoalStatus.CANCELED))
+            self.assertEqual(self.clients[2].get_result(wait = True, wait_max_sec = 5), {})
+            # The queued goal never started
+            self.assertEqual([s[0] for s in self.started], ["running"])
+            self.assertEqual(len(self.queue), 0)
+
+        except: # pylint: disable=bare-except
+            traceback.print_exc(file=sys.stdout)
+            self.fail("Test failed due to exception")
+
+    def test_step_automation(self):
+        """
+        Runs a reversed step program and checks that the steps start at their exact
+        boundaries, and that a stopped program applies no more steps.
+        """
+        try:
+            applied = []
+            ended = threading.Event()
+            automation = {
+                "reverse": True,
+                "loop": False,
+                "steps": [
+                    {"state": "a", "duration": 0.1},
+                    {"state": "b", "duration": 0.2},
+                    {"state": "c", "duration": 0.1},
+                ]
+            }
+            program = StepAutomation("test_program", automation, \
+                lambda step: applied.append((step["state"], time.time())), on_end = ended.set)
+            start = time.time() + 0.1
+            program.start(start)
+            self.assertTrue(ended.wait(3))
+            # Walked back without repeating the last step
+            self.assertEqual([s for s, _ in applied], ["a", "b", "c", "b", "a"])
+            for (_, t), expected in zip(applied, [0, 0.1, 0.3, 0.4, 0.6]):
+                self.assertAlmostEqual(t - start, expected, delta = 0.03)
+            # The configuration is not reversed
+            self.assertEqual(automation["steps"][0]["state"], "a")
+
+            applied.clear()
+            automation["loop"] = True
+            program = StepAutomation("test_loop", automation, \
+                lambda step: applied.append(step["state"]))
+            program.start()
+            time.sleep(0.25)
+            program.stop()
+            count = len(applied)
+            time.sleep(0.3)
+            self.assertEqual(len(applied), count)
+            self.assertFalse(program.active)
+
+        except: # pylint: disable=bare-except
+            traceback.print_exc(file=sys.stdout)
+            self.fail("Test failed due to exception")
+
+    def tearDown(self):
+        """
+        Tear down method for cleaning up after each test case.
+        """
+        self.cfact.stop()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+"""
+Test to check the routing of the speech from the speakers to the microphones
+"""
+
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import unittest
+import sys
+import time
+import traceback
+
+from stream_simulator.connectivity import CommlibFactory
+from stream_simulator.transformations import SpatialIndex
+
+class Test(unittest.TestCase):
+    """
+    Test class for testing the speech routing of tf.
+    Methods:
+        setUp(): Initializes the test environment by creating the tf declarations and
+                 stats RPC clients, and running the factory.
+        test_index(): Tests the spatial index of the microphones.
+        test_routing(): Tests that a speak event reaches the microphones in range.
+        tearDown(): Cleans up the test environment by stopping the factory.
+    """
+    def setUp(self):
+        self.cfact = CommlibFactory(node_name = "Test")
+        sim_name = "streamsim.testinguid"
+
+        self.declarations_rpc = self.cfact.get_rpc_client(
+            rpc_name = f"{sim_name}.tf.get_declarations",
+            auto_run = False
+        )
+        self.stats_rpc = self.cfact.get_rpc_client(
+            rpc_name = f"{sim_name}.stats",
+            auto_run = False
+        )
+
+        self.cfact.run()
+
+    def test_index(self):
+        """
+        Checks the insertions, moves and range queries of the spatial index.
+        """
+        try:
+            index = SpatialIndex(4.0)
+            index.update("a", 1.0, 1.0)
+            index.update("b", 3.0, 1.0)
+            index.update("c", 50.0, 50.0)
+            self.assertEqual(len(index), 3)
+
+            found = dict(index.query(0.0, 1.0, 2.5))
+            self.assertEqual(set(found), {"a"})
+            self.assertAlmostEqual(found["a"], 1.0)
+            self.assertEqual({n for n, _ in index.query(0.0, 1.0, 3.0)}, {"a", "b"})
+
+            # Moving to another cell
+            index.update("c", 2.0, -1.0)
+            self.assertEqual({n for n, _ in index.query(2.0, -1.5, 0.6)}, {"c"})
+            self.assertEqual(index.query(50.0, 50.0, 10.0), [])
+
+            index.remove("c")
+            index.remove("c")
+            self.assertEqual(len(index), 2)
+            self.assertEqual(index.query(2.0, -1.0, 0.5), [])
+
+        except: # pylint: disable=bare-except
+            traceback.print_exc(file=sys.stdout)
+            self.fail("Test failed due to exception")
+
+    def test_routing(self):
+        """
+        Publishes a speak event of the robot speaker, which is hosted with the robot
+        microphone, and checks the delivery statistics of the microphone.
+        """
+        try:
+            declarations = self.declarations_rpc.call({})['declarations']
+            speaker = [d for d in declarations if d['type'] == 'robot' and \
+                'speaker' in d['subtype']['subclass']][0]
+            microphone = [d for d in declarations if d['type'] == 'robot' and \
+                'microphone' in d['subtype']['subclass']][0]
+            topic = microphone['base_topic'] + ".speech_detected"
+
+            speak_pub = self.cfact.get_publisher(
+                topic = speaker['base_topic'] + ".speak.notify"
+            )
+            before = self.stats_rpc.call({})['traffic']['delivery'].get(topic, {'count': 0})
+            speak_pub.publish({
+                "text": "Hello",
+                "volume": 50,
+                "language": "EN",
+                "speaker": speaker['name'],
+                "timestamp": time.time(),
+            })
+
+            delivered = before
+            for _ in range(50):
+                time.sleep(0.1)
+                delivered = self.stats_rpc.call({})['traffic']['delivery'].get(topic, before)
+                if delivered['count'] > before['count']:
+                    break
+            self.assertEqual(delivered['count'], before['count'] + 1)
+            self.assertLess(delivered['max_ms'], 5000)
+
+        except: # pylint: disable=bare-except
+            traceback.print_exc(file=sys.stdout)
+            self.fail("Test failed due to exception")
+
+    def tearDown(self):
+        """
+        Tear down method for cleaning up after each test case.
+        """
+        self.cfact.stop()
+
+if __name__ == '__main__':
+    unittest.main()
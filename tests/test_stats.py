@@ -0,0 +1,112 @@
+"""
+Test to check the runtime communication statistics
+"""
+
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import unittest
+import sys
+import traceback
+
+from stream_simulator.connectivity import CommlibFactory
+from stream_simulator.connectivity.traffic_stats import TrafficStats, InstrumentedPublisher, \
+    payload_size
+
+class Test(unittest.TestCase):
+    """
+    Test class for testing the stats RPC of the simulator.
+    Methods:
+        setUp(): Initializes the test environment by creating the stats RPC client
+                 and a thermostat get RPC client, and running the factory.
+        test_stats(): Tests that served RPCs show up in the traffic statistics.
+        test_sampled_sizes(): Tests the accounted sizes of the published messages.
+        tearDown(): Cleans up the test environment by stopping the factory.
+    """
+    def setUp(self):
+        self.cfact = CommlibFactory(node_name = "Test")
+        sim_name = "streamsim.testinguid"
+        self.thermostat_get_name = f"{sim_name}.world.office.actuator.env.thermostat.thermostat_env.get"
+
+        self.stats_rpc = self.cfact.get_rpc_client(
+            rpc_name = f"{sim_name}.stats",
+            auto_run = False
+        )
+
+        self.thermostat_get_rpc = self.cfact.get_rpc_client(
+            rpc_name = self.thermostat_get_name,
+            auto_run = False
+        )
+
+        self.cfact.run()
+
+    def test_stats(self):
+        """
+        Test the `stats` RPC.
+        This test performs the following steps:
+        1. Calls the thermostat get RPC a few times.
+        2. Calls the stats RPC and asserts that the thermostat get RPC has been
+            accounted for by the simulator, and that the worker queues are reported.
+        """
+        try:
+            for _ in range(3):
+                self.thermostat_get_rpc.call({})
+
+            res = self.stats_rpc.call({})
+            traffic = res['traffic']
+            self.assertIn(self.thermostat_get_name, traffic['rpc_services'])
+            self.assertGreaterEqual(
+                traffic['rpc_services'][self.thermostat_get_name]['count'], 3)
+            self.assertIn('published', traffic)
+            self.assertIn('worker_queues', traffic)
+            self.assertIn('config_to_start_s', res['startup'])
+
+            # The client side is instrumented as well
+            local = CommlibFactory.traffic.snapshot()
+            self.assertGreaterEqual(
+                local['rpc_clients'][self.thermostat_get_name]['count'], 3)
+
+        except: # pylint: disable=bare-except
+            traceback.print_exc(file=sys.stdout)
+            self.fail("Test failed due to exception")
+
+    def test_sampled_sizes(self):
+        """
+        Publishes messages through an instrumented publisher and checks that the
+        structured messages are measured once every SIZE_SAMPLING publishes, and the
+        strings every time.
+        """
+        try:
+            sent = []
+            stats = TrafficStats()
+            publisher = InstrumentedPublisher(type("Raw", (), {"publish": sent.append})(), \
+                "sizes", stats)
+            msg = {"value": "x" * 100}
+            n = 2 * InstrumentedPublisher.SIZE_SAMPLING
+            for _ in range(n):
+                publisher.publish(msg)
+            self.assertEqual(len(sent), n)
+            self.assertEqual(stats.published["sizes"].bytes, n * payload_size(msg))
+
+            # The next sample measures the size again
+            publisher.publish({"value": "x" * 1000})
+            self.assertGreater(stats.published["sizes"].bytes, (n + 1) * payload_size(msg))
+
+            text = InstrumentedPublisher(type("Raw", (), {"publish": sent.append})(), \
+                "text", stats)
+            text.publish("abc")
+            text.publish("abcdef")
+            self.assertEqual(stats.published["text"].bytes, 9)
+
+        except: # pylint: disable=bare-except
+            traceback.print_exc(file=sys.stdout)
+            self.fail("Test failed due to exception")
+
+    def tearDown(self):
+        """
+        Tear down method for cleaning up after each test case.
+        """
+        self.cfact.stop()
+
+if __name__ == '__main__':
+    unittest.main()